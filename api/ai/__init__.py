@@ -0,0 +1,28 @@
+"""
+Embeddle AI Module
+
+Array-backed building blocks for the AI opponents, and the compact
+record their private state is stored in.
+"""
+
+from .beliefs import (
+    BELIEF_SIGMA,
+    EIG_BINS,
+    NemesisBeliefs,
+    distribution_entropy,
+    observation_likelihoods,
+)
+from .memory import AI_STATE_FIELDS, pack_ai_state, unpack_ai_state
+
+__all__ = [
+    # Nemesis belief engine
+    "BELIEF_SIGMA",
+    "EIG_BINS",
+    "NemesisBeliefs",
+    "distribution_entropy",
+    "observation_likelihoods",
+    # AI private state record
+    "AI_STATE_FIELDS",
+    "pack_ai_state",
+    "unpack_ai_state",
+]
@@ -0,0 +1,345 @@
+"""
+Nemesis Belief Engine
+Per-opponent probability vectors over a theme's words
+
+Nemesis keeps a posterior over each opponent's secret word. Each posterior is
+one float64 vector indexed by word id (position in the theme's lowercased,
+de-duplicated word list), so a Bayesian update after a guess is a handful of
+array operations over the guess's similarity-matrix row instead of a Python
+loop with math.exp per word.
+
+Likelihood model (unchanged from the dict implementation): the similarity
+reported for an opponent is Gaussian around the similarity between the
+guess and their secret, sigma = BELIEF_SIGMA.
+
+Expected information gain is exact under a discretized version of the same
+model: reported similarities fall into EIG_BINS equal bins over [-1, 1],
+and the gain of a guess against an opponent is the mutual information
+I(secret; observed bin) = H(observation) - H(observation | secret). All
+candidate guesses are scored at once from their matrix rows.
+
+Stored in ai_memory["nemesis_beliefs"] as
+    {"words": [...], "probs": {player_id: base64 little-endian float64}}
+The legacy {player_id: {word: prob}} format is converted on load.
+"""
+
+import base64
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Standard deviation of the observed-vs-expected similarity likelihood
+BELIEF_SIGMA: float = 0.15
+
+# Observation bins over [-1, 1] for expected information gain
+EIG_BINS: int = 41
+
+
+def _unique_lower(words: Iterable[str]) -> List[str]:
+    seen = set()
+    out = []
+    for w in words or []:
+        wl = str(w).lower()
+        if wl not in seen:
+            seen.add(wl)
+            out.append(wl)
+    return out
+
+
+def _encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f8").tobytes()).decode("ascii")
+
+
+def _decode_vector(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype="<f8").copy()
+
+
+class NemesisBeliefs:
+    """
+    One probability vector per opponent, aligned with .words.
+
+    Empty vectors stand for "no theme words" (nothing to believe), matching
+    the empty dicts of the legacy format.
+    """
+
+    __slots__ = ("words", "index", "probs", "_columns")
+
+    def __init__(self, words: list, probs: Dict[str, np.ndarray] = None):
+        self.words = list(words)
+        self.index = {w: i for i, w in enumerate(self.words)}
+        self.probs: Dict[str, np.ndarray] = dict(probs or {})
+        # (matrix, column of each word in that matrix or -1), for the last matrix used
+        self._columns = None
+
+    # ============== CONSTRUCTION ==============
+
+    @classmethod
+    def for_theme(cls, theme_words: list) -> "NemesisBeliefs":
+        """Empty beliefs over a theme's words (lowercased, first occurrence wins)."""
+        return cls(_unique_lower(theme_words))
+
+    @classmethod
+    def from_memory(cls, stored, theme_words: list) -> "NemesisBeliefs":
+        """
+        Load beliefs stored in ai_memory (either format).
+
+        Vectors whose length no longer matches the word list are dropped, so
+        the caller re-initializes those opponents.
+        """
+        if not isinstance(stored, dict) or not stored:
+            return cls.for_theme(theme_words)
+
+        if "probs" in stored and isinstance(stored.get("words"), list):
+            beliefs = cls(stored["words"])
+            for pid, value in (stored.get("probs") or {}).items():
+                try:
+                    vector = _decode_vector(value) if value else np.zeros(0)
+                except Exception:
+                    continue
+                if len(vector) in (0, len(beliefs.words)):
+                    beliefs.probs[pid] = vector
+            return beliefs
+
+        # Legacy: {player_id: {word: prob}}
+        if not theme_words:
+            theme_words = next((list(v) for v in stored.values() if isinstance(v, dict) and v), [])
+        beliefs = cls.for_theme(theme_words)
+        n = len(beliefs.words)
+        for pid, word_probs in stored.items():
+            if not isinstance(word_probs, dict):
+                continue
+            if not word_probs:
+                beliefs.probs[pid] = np.zeros(0)
+                continue
+            vector = np.zeros(n)
+            for word, prob in word_probs.items():
+                i = beliefs.index.get(str(word).lower())
+                if i is not None:
+                    vector[i] = float(prob)
+            beliefs.probs[pid] = vector
+        return beliefs
+
+    def to_memory(self) -> dict:
+        """JSON-serializable form for ai_memory."""
+        return {
+            "words": self.words,
+            "probs": {pid: _encode_vector(v) if len(v) else "" for pid, v in self.probs.items()},
+        }
+
+    def ensure_opponent(self, player_id: str) -> None:
+        """Start a uniform prior for an opponent we have no beliefs about."""
+        if player_id in self.probs:
+            return
+        n = len(self.words)
+        self.probs[player_id] = np.full(n, 1.0 / n) if n else np.zeros(0)
+
+    # ============== MATRIX ALIGNMENT ==============
+
+    def expected_similarities(self, matrix, guess_word: str) -> Optional[np.ndarray]:
+        """
+        Similarity from a guess to every belief word, as float64 aligned with .words.
+
+        Words the matrix doesn't know are NaN. Returns None if there is no
+        matrix or the guess isn't in it (no information).
+        """
+        if matrix is None:
+            return None
+        row = matrix.sim_row(str(guess_word).lower())
+        if row is None:
+            return None
+        if matrix.words == self.words:
+            return row
+        columns = self._matrix_columns(matrix)
+        out = np.full(len(self.words), np.nan)
+        known = columns >= 0
+        out[known] = row[columns[known]]
+        return out
+
+    def expected_similarity_rows(self, matrix, guess_words: list) -> np.ndarray:
+        """
+        expected_similarities for several guesses, stacked as a (guesses x words) array.
+
+        Rows for guesses the matrix doesn't know are all NaN.
+        """
+        rows = np.full((len(guess_words), len(self.words)), np.nan)
+        for r, guess in enumerate(guess_words):
+            expected = self.expected_similarities(matrix, guess)
+            if expected is not None:
+                rows[r] = expected
+        return rows
+
+    def _matrix_columns(self, matrix) -> np.ndarray:
+        cached = self._columns
+        if cached is not None and cached[0] is matrix:
+            return cached[1]
+        columns = np.fromiter((matrix.index.get(w, -1) for w in self.words), dtype=np.int64,
+                              count=len(self.words))
+        self._columns = (matrix, columns)
+        return columns
+
+    # ============== UPDATES ==============
+
+    def update(self, matrix, guess_word: str, similarities: Dict[str, float],
+               skip_id: str = None) -> None:
+        """
+        Bayesian update after a guess: P(word | obs) ∝ P(obs | word) * P(word).
+
+        Args:
+            matrix: SimilarityMatrix for the theme (or None)
+            guess_word: The word that was guessed
+            similarities: player_id -> similarity reported for the guess
+            skip_id: Player to leave out (the believer itself)
+        """
+        expected = self.expected_similarities(matrix, guess_word)
+        known = None if expected is None else ~np.isnan(expected)
+
+        for player_id, observed_sim in similarities.items():
+            if player_id == skip_id:
+                continue
+            prior = self.probs.get(player_id)
+            if prior is None or not len(prior):
+                continue
+            if expected is None:
+                # No information: the posterior is the (renormalized) prior
+                posterior = prior.copy()
+            else:
+                diff = float(observed_sim) - expected
+                likelihood = np.exp(-(diff ** 2) / (2 * BELIEF_SIGMA ** 2))
+                # Words the matrix doesn't cover keep their prior
+                posterior = np.where(known, prior * likelihood, prior)
+            total = posterior.sum()
+            if total > 0:
+                posterior /= total
+            self.probs[player_id] = posterior
+
+    # ============== QUERIES ==============
+
+    def probability(self, player_id: str, word: str) -> float:
+        """P(word is player_id's secret), 0.0 if unknown."""
+        vector = self.probs.get(player_id)
+        i = self.index.get(str(word).lower())
+        if vector is None or i is None or not len(vector):
+            return 0.0
+        return float(vector[i])
+
+    def top_indices(self, player_id: str, k: int) -> np.ndarray:
+        """
+        Word ids of the k most likely words, most likely first.
+
+        Ties keep word order (like a stable sort of the legacy dict), which
+        argpartition alone doesn't guarantee, so everything tied with the
+        k-th value is kept before the final ordering.
+        """
+        vector = self.probs.get(player_id)
+        if vector is None or not len(vector) or k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        n = len(vector)
+        if k >= n:
+            candidates = np.arange(n)
+        else:
+            kth = vector[np.argpartition(-vector, k - 1)[k - 1]]
+            candidates = np.flatnonzero(vector >= kth)
+        order = np.lexsort((candidates, -vector[candidates]))
+        return candidates[order][:k]
+
+    def top_candidates(self, player_id: str, k: int = 5) -> List[Tuple[str, float]]:
+        """(word, probability) pairs for the k most likely words."""
+        vector = self.probs.get(player_id)
+        return [(self.words[i], float(vector[i])) for i in self.top_indices(player_id, k)]
+
+    def expected_information_gain(self, expected_rows: np.ndarray, player_ids: Iterable[str],
+                                  bins: int = EIG_BINS) -> np.ndarray:
+        """
+        Expected posterior entropy reduction (bits) of each candidate guess,
+        summed over the given opponents.
+
+        Args:
+            expected_rows: (guesses x words) similarities, from expected_similarity_rows
+            player_ids: Opponents to count (unknown ones contribute nothing)
+            bins: Number of observation bins
+
+        Returns:
+            float64 array with one gain per guess
+        """
+        expected_rows = np.asarray(expected_rows, dtype=np.float64)
+        gains = np.zeros(expected_rows.shape[0])
+        vectors = [self.probs[pid] for pid in player_ids
+                   if pid in self.probs and len(self.probs[pid]) == expected_rows.shape[1]]
+        if not vectors or not expected_rows.size:
+            return gains
+
+        likelihoods = observation_likelihoods(expected_rows, bins)  # guesses x words x bins
+        row_entropy = _entropy_bits(likelihoods)                     # guesses x words
+        for prior in vectors:
+            marginal = np.einsum("w,gwb->gb", prior, likelihoods)   # P(bin | guess)
+            gains += _entropy_bits(marginal) - row_entropy @ prior
+        # Rounding can leave tiny negatives for uninformative guesses
+        return np.maximum(gains, 0.0)
+
+    def entropy(self, player_id: str) -> float:
+        """Shannon entropy (bits) of an opponent's posterior."""
+        vector = self.probs.get(player_id)
+        if vector is None or not len(vector):
+            return 0.0
+        return distribution_entropy(vector)
+
+
+def distribution_entropy(probabilities) -> float:
+    """Shannon entropy (bits) of a probability vector; zero entries are skipped."""
+    p = np.asarray(probabilities, dtype=np.float64)
+    p = p[p > 0]
+    return float(-(p * np.log2(p)).sum())
+
+
+def _entropy_bits(distributions: np.ndarray) -> np.ndarray:
+    """Entropy (bits) along the last axis; zero entries are skipped."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(distributions > 0, distributions * np.log2(distributions), 0.0)
+    return -terms.sum(axis=-1)
+
+
+# Matrix similarities have 4 decimals, so likelihoods come from a table over that grid
+_GRID_STEPS = 20000
+_GRID_SCALE = _GRID_STEPS / 2.0
+
+
+def _gaussian_bins(expected: np.ndarray, bins: int, sigma: float) -> np.ndarray:
+    centers = np.linspace(-1.0, 1.0, bins)
+    weights = np.exp(-((centers - expected[..., None]) ** 2) / (2 * sigma ** 2))
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+@lru_cache(maxsize=4)
+def _likelihood_table(bins: int, sigma: float) -> np.ndarray:
+    """Bin distributions for every grid similarity, plus a last uniform row for unknowns."""
+    grid = np.round(np.linspace(-1.0, 1.0, _GRID_STEPS + 1), 4)
+    table = np.vstack([_gaussian_bins(grid, bins, sigma), np.full(bins, 1.0 / bins)])
+    table.setflags(write=False)
+    return table
+
+
+def observation_likelihoods(expected: np.ndarray, bins: int = EIG_BINS,
+                            sigma: float = BELIEF_SIGMA) -> np.ndarray:
+    """
+    P(observed similarity bin | secret) under the Gaussian belief model.
+
+    Args:
+        expected: Expected similarities, any shape (...); NaN means unknown
+        bins: Number of equal bins over [-1, 1]
+        sigma: Likelihood standard deviation
+
+    Returns:
+        Array of shape (..., bins) whose last axis sums to 1. Unknown
+        expectations get a uniform (uninformative) distribution.
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    known = ~np.isnan(expected)
+    scaled = (np.where(known, expected, 0.0) + 1.0) * _GRID_SCALE
+    index = np.rint(scaled)
+    if np.all((np.abs(scaled - index) < 1e-6) & (index >= 0) & (index <= _GRID_STEPS)):
+        # Matrix values: look the rows up
+        index = np.where(known, index, _GRID_STEPS + 1).astype(np.int64)
+        return _likelihood_table(bins, float(sigma))[index]
+    likelihoods = _gaussian_bins(np.where(known, expected, 0.0), bins, sigma)
+    return np.where(known[..., None], likelihoods, 1.0 / bins)
@@ -0,0 +1,90 @@
+"""
+AI Private State Record
+
+An AI player's ai_memory (targets, grudges, streaks, Nemesis beliefs) and
+ai_state (confidence, panic) are stored beside the game, not in it: one
+hash field per AI player, so only code that runs AI turns loads them.
+
+Field values are compact JSON:
+- Theme words in guessed_words and high_similarity_targets become their
+  index in the theme word list (lowercased, first occurrence wins).
+- Nemesis belief vectors are already aligned with that list, so they don't
+  repeat it.
+unpack_ai_state restores exactly the in-memory format the AI code uses.
+"""
+
+import json
+from typing import Optional
+
+from .beliefs import _unique_lower
+
+# Player keys that hold AI private state
+AI_STATE_FIELDS = ("ai_memory", "ai_state")
+
+
+def _word_to_ref(word, index: dict):
+    i = index.get(str(word).lower()) if isinstance(word, str) else None
+    return i if i is not None else word
+
+
+def _ref_to_word(ref, words: list):
+    if isinstance(ref, int) and 0 <= ref < len(words):
+        return words[ref]
+    return ref
+
+
+def pack_ai_state(player: dict, theme_words: list) -> Optional[str]:
+    """
+    Encode a player's AI state for the side record.
+
+    Returns:
+        JSON string, or None if the player carries no AI state
+    """
+    if not any(field in player for field in AI_STATE_FIELDS):
+        return None
+    words = _unique_lower(theme_words)
+    index = {w: i for i, w in enumerate(words)}
+    memory = dict(player.get("ai_memory") or {})
+
+    if "guessed_words" in memory:
+        memory["guessed_words"] = [_word_to_ref(w, index) for w in memory["guessed_words"] or []]
+    if "high_similarity_targets" in memory:
+        memory["high_similarity_targets"] = {
+            pid: [[_word_to_ref(word, index), sim] for word, sim in (entries or [])]
+            for pid, entries in (memory["high_similarity_targets"] or {}).items()
+        }
+    beliefs = memory.get("nemesis_beliefs")
+    if isinstance(beliefs, dict) and "probs" in beliefs and beliefs.get("words") == words:
+        memory["nemesis_beliefs"] = {"probs": beliefs["probs"]}
+
+    return json.dumps({"ai_memory": memory, "ai_state": player.get("ai_state") or {}},
+                      separators=(",", ":"))
+
+
+def unpack_ai_state(raw, theme_words: list) -> dict:
+    """
+    Decode a side-record field into {"ai_memory": ..., "ai_state": ...}.
+
+    Unreadable values decode to empty state (the AI code fills in defaults).
+    """
+    try:
+        stored = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    except Exception:
+        stored = None
+    if not isinstance(stored, dict):
+        return {"ai_memory": {}, "ai_state": {}}
+
+    words = _unique_lower(theme_words)
+    memory = dict(stored.get("ai_memory") or {})
+    if "guessed_words" in memory:
+        memory["guessed_words"] = [_ref_to_word(w, words) for w in memory["guessed_words"] or []]
+    if "high_similarity_targets" in memory:
+        memory["high_similarity_targets"] = {
+            pid: [(_ref_to_word(ref, words), sim) for ref, sim in (entries or [])]
+            for pid, entries in (memory["high_similarity_targets"] or {}).items()
+        }
+    beliefs = memory.get("nemesis_beliefs")
+    if isinstance(beliefs, dict) and "probs" in beliefs and "words" not in beliefs:
+        memory["nemesis_beliefs"] = {"words": words, "probs": beliefs["probs"]}
+
+    return {"ai_memory": memory, "ai_state": dict(stored.get("ai_state") or {})}
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+End-to-end handler benchmark.
+
+Drives the API handler from index.py directly (no sockets) through scripted
+sessions and reports, per endpoint, latency, Redis round trips and commands
+per request, and payload sizes:
+
+    singleplayer  create, join, add AIs, vote, start, AI word picks, set
+                  word, begin, then guesses and ai-step until the game ends
+    multiplayer   create, three humans join, vote, start, set words, begin,
+                  then guesses with every player polling the game state
+    matchmaking   four players join the quick play queue and poll until
+                  matched, then play the matched lobby like multiplayer
+
+Redis is the in-memory stand-in (REDIS_BACKEND=memory, always: the harness
+never touches a real database) and embeddings default to the local provider
+(EMBEDDING_PROVIDER=local), so runs need no network and are repeatable for
+a given --seed. Every Redis request is counted at the client transport, so
+"redis req" is the number of HTTP round trips the same code would make to
+Upstash, and bytes are the JSON bodies it would send and receive.
+
+Each session uses its own client IPs, so rate limits never trip. Warm-up
+sessions (one of each kind by default) run first and are not recorded: they
+pay for theme loading and embedding fetches.
+
+Usage:
+    python api/benchmark.py
+    python api/benchmark.py --sessions 20 --kinds singleplayer,matchmaking --json bench.json
+
+Options:
+    --kinds LIST        Comma-separated session kinds (default: all)
+    --sessions N        Recorded sessions of each kind (default 5)
+    --warmup N          Unrecorded sessions of each kind first (default 1)
+    --max-guesses N     Human guesses before a session stops playing (default 20)
+    --seed N            Random seed for theme votes, words and guesses
+    --json PATH         Also write the report as JSON
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from http.client import HTTPMessage
+from pathlib import Path
+
+# The harness always runs against the in-memory Redis; embeddings default to
+# the offline provider. Both must be set before index is imported.
+os.environ["REDIS_BACKEND"] = "memory"
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index  # noqa: E402
+
+KINDS = ("singleplayer", "multiplayer", "matchmaking")
+DEFAULT_SESSIONS = 5
+DEFAULT_WARMUP = 1
+DEFAULT_MAX_GUESSES = 20
+
+# Upper bound on ai-step calls and queue polls, so a stuck session can't spin forever
+MAX_AI_STEPS = 200
+MAX_QUEUE_POLLS = 20
+
+
+class BenchmarkError(Exception):
+    """A scripted request got an unexpected response."""
+
+
+class _BenchHandler(index.handler):
+    """The API handler without request logging."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Recorder:
+    """Per-endpoint samples: latency, Redis traffic and payload sizes."""
+
+    def __init__(self):
+        self.enabled = True
+        self.samples = {}
+
+    def add(self, endpoint: str, status: int, seconds: float, redis: dict,
+            request_bytes: int, response_bytes: int):
+        if not self.enabled:
+            return
+        self.samples.setdefault(endpoint, []).append({
+            "status": status,
+            "seconds": seconds,
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            **redis,
+        })
+
+    def report(self) -> dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            n = len(samples)
+            ms = sorted(s["seconds"] * 1000 for s in samples)
+            endpoints[endpoint] = {
+                "count": n,
+                "errors": sum(1 for s in samples if s["status"] >= 400),
+                "mean_ms": sum(ms) / n,
+                "p50_ms": _percentile(ms, 0.50),
+                "p95_ms": _percentile(ms, 0.95),
+                "max_ms": ms[-1],
+                "redis_requests": _mean(samples, "redis_requests"),
+                "redis_commands": _mean(samples, "redis_commands"),
+                "redis_bytes_sent": _mean(samples, "redis_bytes_sent"),
+                "redis_bytes_received": _mean(samples, "redis_bytes_received"),
+                "request_bytes": _mean(samples, "request_bytes"),
+                "response_bytes": _mean(samples, "response_bytes"),
+            }
+        return endpoints
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _mean(samples: list, field: str) -> float:
+    return sum(s[field] for s in samples) / len(samples)
+
+
+# ============== CLIENT ==============
+
+class Client:
+    """Calls the handler in-process, one request at a time, recording each one."""
+
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+        self.redis = index.get_redis()
+
+    def _redis_counters(self) -> tuple:
+        stats = self.redis.stats
+        return stats.requests, stats.commands, stats.bytes_sent, stats.bytes_received
+
+    def request(self, method: str, path: str, body: dict = None, ip: str = "10.0.0.1") -> tuple:
+        """
+        Serve one request.
+
+        Returns:
+            (status, decoded JSON body or None)
+        """
+        raw = json.dumps(body).encode() if body is not None else b""
+        headers = HTTPMessage()
+        headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(len(raw))
+        headers["X-Forwarded-For"] = ip
+
+        h = _BenchHandler.__new__(_BenchHandler)
+        h.headers = headers
+        h.rfile = io.BytesIO(raw)
+        h.wfile = io.BytesIO()
+        h.path = path
+        h.command = method
+        h.request_version = "HTTP/1.1"
+        h.requestline = f"{method} {path} HTTP/1.1"
+        h.client_address = (ip, 0)
+
+        before = self._redis_counters()
+        start = time.perf_counter()
+        getattr(h, "do_" + method)()
+        seconds = time.perf_counter() - start
+        after = self._redis_counters()
+
+        head, _, payload = h.wfile.getvalue().partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1]) if head else 0
+        found = index.ROUTES.match(method, path.split("?", 1)[0])
+        endpoint = found[0].name if found else f"{method} (unmatched)"
+        redis = dict(zip(("redis_requests", "redis_commands", "redis_bytes_sent", "redis_bytes_received"),
+                         (b - a for a, b in zip(before, after))))
+        self.recorder.add(endpoint, status, seconds, redis, len(raw), len(payload))
+
+        try:
+            data = json.loads(payload) if payload else None
+        except ValueError:
+            data = None
+        return status, data
+
+    def expect(self, method: str, path: str, body: dict = None, ip: str = "10.0.0.1") -> dict:
+        """request() that raises BenchmarkError unless the status is 2xx."""
+        status, data = self.request(method, path, body, ip)
+        if not 200 <= status < 300:
+            detail = data.get("detail") if isinstance(data, dict) else data
+            raise BenchmarkError(f"{method} {path} -> {status}: {detail}")
+        return data
+
+
+class Seat:
+    """One human player in a session: identity, client IP and last seen state version."""
+
+    def __init__(self, name: str, ip: str, player_id: str = "", session_token: str = ""):
+        self.name = name
+        self.ip = ip
+        self.player_id = player_id
+        self.session_token = session_token
+        self.queue_id = ""
+        self.version = None
+
+    @property
+    def auth(self) -> dict:
+        return {"player_id": self.player_id, "session_token": self.session_token}
+
+
+# ============== SESSIONS ==============
+
+def _state(client: Client, code: str, seat: Seat, poll: bool = False) -> dict:
+    """GET the game as seat; poll=True sends since_version like the frontend's poll loop."""
+    path = f"/api/games/{code}?player_id={seat.player_id}"
+    if poll and seat.version is not None:
+        path += f"&since_version={seat.version}"
+    data = client.expect("GET", path, ip=seat.ip)
+    if data.get("state_version") is not None:
+        seat.version = data["state_version"]
+    return data
+
+
+def _join(client: Client, code: str, seat: Seat):
+    data = client.expect("POST", f"/api/games/{code}/join", {"name": seat.name}, ip=seat.ip)
+    seat.player_id = data["player_id"]
+    seat.session_token = data["session_token"]
+
+
+def _start(client: Client, code: str, seats: list, rng: random.Random):
+    """Vote, start, pick secret words and begin; seats[0] must be the host."""
+    host = seats[0]
+    options = _state(client, code, host)["theme_options"]
+    for seat in seats:
+        client.expect("POST", f"/api/games/{code}/vote", {**seat.auth, "theme": rng.choice(options)}, ip=seat.ip)
+    client.expect("POST", f"/api/games/{code}/start", host.auth, ip=host.ip)
+
+    if _state(client, code, host).get("is_singleplayer"):
+        client.expect("POST", f"/api/games/{code}/ai-pick-words", {**host.auth, "max_to_pick": 10}, ip=host.ip)
+    for seat in seats:
+        me = next(p for p in _state(client, code, seat)["players"] if p["id"] == seat.player_id)
+        client.expect("POST", f"/api/games/{code}/set-word",
+                      {**seat.auth, "secret_word": rng.choice(me["word_pool"])}, ip=seat.ip)
+    client.expect("POST", f"/api/games/{code}/begin", host.auth, ip=host.ip)
+
+
+def _guess_word(state: dict, guessed: set, rng: random.Random) -> str:
+    guessed.update(str(h.get("word", "")).lower() for h in state.get("history", []) if isinstance(h, dict))
+    words = [w for w in (state.get("theme") or {}).get("words", []) if w.lower() not in guessed]
+    return rng.choice(words) if words else ""
+
+
+def _change_word(client: Client, code: str, seat: Seat, guessed: set, rng: random.Random):
+    """Spend the word change a seat earned by eliminating someone (skip it if no word is accepted)."""
+    me = next(p for p in _state(client, code, seat)["players"] if p["id"] == seat.player_id)
+    options = [w for w in (me.get("word_change_options") or me.get("word_pool") or []) if w.lower() not in guessed]
+    if options:
+        status, _ = client.request("POST", f"/api/games/{code}/change-word",
+                                   {**seat.auth, "new_word": rng.choice(options)}, ip=seat.ip)
+        if 200 <= status < 300:
+            return
+    client.expect("POST", f"/api/games/{code}/skip-word-change", seat.auth, ip=seat.ip)
+
+
+def _play(client: Client, code: str, seats: list, rng: random.Random, max_guesses: int):
+    """Take human turns (every seat polls after each one) until the game ends or max_guesses."""
+    by_id = {seat.player_id: seat for seat in seats}
+    singleplayer = False
+    guessed = set()
+    guesses = 0
+    ai_steps = 0
+    while guesses < max_guesses and ai_steps < MAX_AI_STEPS:
+        state = _state(client, code, seats[0], poll=True)
+        singleplayer = state.get("is_singleplayer", singleplayer)
+        if state.get("status") != "playing":
+            return
+        if state.get("waiting_for_word_change") in by_id:
+            _change_word(client, code, by_id[state["waiting_for_word_change"]], guessed, rng)
+            continue
+        seat = by_id.get(state.get("current_player_id"))
+        if seat is None:
+            if not singleplayer:
+                return
+            ai_steps += 1
+            client.expect("POST", f"/api/games/{code}/ai-step", seats[0].auth, ip=seats[0].ip)
+            continue
+        word = _guess_word(_state(client, code, seat), guessed, rng)
+        if not word:
+            return
+        client.expect("POST", f"/api/games/{code}/guess", {**seat.auth, "word": word}, ip=seat.ip)
+        guesses += 1
+        for other in seats[1:]:
+            _state(client, code, other, poll=True)
+
+
+def singleplayer_session(client: Client, n: int, rng: random.Random, max_guesses: int):
+    seat = Seat("Solo", f"10.1.{n // 250}.{n % 250 + 1}")
+    code = client.expect("POST", "/api/singleplayer", {"name": seat.name}, ip=seat.ip)["code"]
+    _join(client, code, seat)
+    for difficulty in ("rookie", "analyst"):
+        client.expect("POST", f"/api/games/{code}/add-ai", {**seat.auth, "difficulty": difficulty}, ip=seat.ip)
+    _start(client, code, [seat], rng)
+    _play(client, code, [seat], rng, max_guesses)
+
+
+def multiplayer_session(client: Client, n: int, rng: random.Random, max_guesses: int):
+    seats = [Seat(f"Player{i + 1}", f"10.2.{n % 250}.{i + 1}") for i in range(3)]
+    code = client.expect("POST", "/api/games", {"visibility": "private"}, ip=seats[0].ip)["code"]
+    for seat in seats:
+        _join(client, code, seat)
+    _start(client, code, seats, rng)
+    _play(client, code, seats, rng, max_guesses)
+
+
+def matchmaking_session(client: Client, n: int, rng: random.Random, max_guesses: int):
+    seats = [Seat(f"Queue{n}x{i + 1}", f"10.3.{n % 250}.{i + 1}") for i in range(index.QUEUE_MATCH_SIZE_MAX)]
+    for seat in seats:
+        seat.queue_id = client.expect("POST", "/api/queue/join",
+                                      {"mode": "quick_play", "player_name": seat.name}, ip=seat.ip)["player_id"]
+
+    code = None
+    waiting = list(seats)
+    for _ in range(MAX_QUEUE_POLLS):
+        for seat in list(waiting):
+            status = client.expect("GET", f"/api/queue/status?mode=quick_play&player_id={seat.queue_id}", ip=seat.ip)
+            if status.get("status") == "matched":
+                code = status["game_code"]
+                seat.player_id = status["player_id"]
+                seat.session_token = status["session_token"]
+                waiting.remove(seat)
+        if not waiting:
+            break
+    if waiting or not code:
+        raise BenchmarkError(f"{len(waiting)} of {len(seats)} queued players were never matched")
+
+    host_id = _state(client, code, seats[0]).get("host_id")
+    seats.sort(key=lambda s: s.player_id != host_id)
+    _start(client, code, seats, rng)
+    _play(client, code, seats, rng, max_guesses)
+
+
+SESSIONS = {
+    "singleplayer": singleplayer_session,
+    "multiplayer": multiplayer_session,
+    "matchmaking": matchmaking_session,
+}
+
+
+# ============== REPORT ==============
+
+def run(kinds: list, sessions: int, warmup: int, max_guesses: int, seed: int) -> dict:
+    recorder = Recorder()
+    client = Client(recorder)
+    rng = random.Random(seed)
+    random.seed(seed)
+    failures = []
+
+    start = time.time()
+    n = 0
+    for phase, count in (("warmup", warmup), ("measure", sessions)):
+        recorder.enabled = phase == "measure"
+        for kind in kinds:
+            for _ in range(count):
+                n += 1
+                try:
+                    SESSIONS[kind](client, n, rng, max_guesses)
+                except BenchmarkError as e:
+                    failures.append(f"{kind} #{n}: {e}")
+
+    return {
+        "kinds": kinds,
+        "sessions": sessions,
+        "seed": seed,
+        "embedding_provider": index.EMBEDDING_PROVIDER.name,
+        "seconds": time.time() - start,
+        "failures": failures,
+        "endpoints": recorder.report(),
+        "redis_by_command": client.redis.stats.snapshot()["by_command"],
+    }
+
+
+def print_report(result: dict):
+    print(f"\n{'Endpoint':<44} {'Count':>6} {'Err':>4} {'p50 ms':>8} {'p95 ms':>8} {'Max ms':>8} "
+          f"{'Redis req':>9} {'Cmds':>6} {'Redis out':>9} {'Redis in':>9} {'Req B':>7} {'Resp B':>8}")
+    for endpoint, s in result["endpoints"].items():
+        print(f"{endpoint:<44} {s['count']:>6} {s['errors']:>4} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} "
+              f"{s['max_ms']:>8.2f} {s['redis_requests']:>9.2f} {s['redis_commands']:>6.1f} "
+              f"{s['redis_bytes_sent']:>9.0f} {s['redis_bytes_received']:>9.0f} "
+              f"{s['request_bytes']:>7.0f} {s['response_bytes']:>8.0f}")
+    for failure in result["failures"]:
+        print(f"FAILED {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API handlers on scripted sessions")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Comma-separated session kinds")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="Recorded sessions of each kind")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="Unrecorded sessions of each kind")
+    parser.add_argument("--max-guesses", type=int, default=DEFAULT_MAX_GUESSES,
+                        help="Human guesses before a session stops playing")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    kinds = [k.strip().lower() for k in args.kinds.split(",") if k.strip()]
+    unknown = [k for k in kinds if k not in SESSIONS]
+    if not kinds or unknown:
+        parser.error(f"--kinds takes any of: {', '.join(KINDS)}" + (f" (unknown: {', '.join(unknown)})" if unknown else ""))
+    if args.sessions < 1:
+        parser.error("--sessions must be at least 1")
+
+    print("=" * 60)
+    print(f"Benchmarking {args.sessions} x {', '.join(kinds)} "
+          f"(warm-up {args.warmup}, embeddings: {index.EMBEDDING_PROVIDER.name})")
+    print("=" * 60)
+
+    result = run(kinds, args.sessions, max(0, args.warmup), args.max_guesses, args.seed)
+    print_report(result)
+    print(f"\nTotal time: {result['seconds']:.2f}s")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return 1 if result["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,30 @@ Data Layer Module
 Re-exports all data access modules
 """
 
-from .redis_client import get_redis, is_redis_configured
+from .redis_client import get_redis, is_redis_configured, create_redis_client
+from .redis_batch import RedisBatch, BatchResult, GuardedBatch, VersionConflict, delete_if_equal, zadd_if_field
+from .memory_redis import MemoryRedis, MemoryServer, RedisStats
+from .redis_metrics import (
+    RequestTrace,
+    instrument_redis,
+    start_request_trace,
+    current_request_trace,
+    end_request_trace,
+    redis_command_totals,
+    add_redis_observer,
+)
+from .game_events import (
+    EVENT_TYPES,
+    events_key,
+    is_event_id,
+    event_id_before,
+    queue_game_event,
+    parse_stream_entries,
+    read_game_events,
+    latest_event_id,
+    oldest_event_id,
+    format_sse,
+)
 from .game_repository import (
     save_game,
     load_game,
@@ -29,6 +52,37 @@ __all__ = [
     # Redis client
     "get_redis",
     "is_redis_configured",
+    "create_redis_client",
+    # Request-scoped batching
+    "RedisBatch",
+    "BatchResult",
+    "GuardedBatch",
+    "VersionConflict",
+    "delete_if_equal",
+    "zadd_if_field",
+    # In-memory stand-in
+    "MemoryRedis",
+    "MemoryServer",
+    "RedisStats",
+    # Round-trip instrumentation
+    "RequestTrace",
+    "instrument_redis",
+    "start_request_trace",
+    "current_request_trace",
+    "end_request_trace",
+    "redis_command_totals",
+    "add_redis_observer",
+    # Game event log
+    "EVENT_TYPES",
+    "events_key",
+    "is_event_id",
+    "event_id_before",
+    "queue_game_event",
+    "parse_stream_entries",
+    "read_game_events",
+    "latest_event_id",
+    "oldest_event_id",
+    "format_sse",
     # Game repository
     "save_game",
     "load_game",
@@ -0,0 +1,146 @@
+"""
+Game Event Log
+Per-game event stream in Redis for Server-Sent Events clients
+
+Events are appended to a Redis stream `events:{code}` (XADD with approximate
+MAXLEN trimming). Stream entry ids ("<ms>-<seq>") double as SSE event ids, so
+a reconnecting client resumes with Last-Event-ID through an exclusive XRANGE.
+
+Each entry has two fields: `type` (one of EVENT_TYPES) and `data` (JSON).
+Presence events are not logged - streams synthesize them from the presence
+sets - but they use the same wire format.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# Event types carried on the game event stream
+EVENT_TYPES = ("guess", "elimination", "word_change", "turn", "chat", "presence", "status")
+
+# Approximate number of entries kept per game
+EVENTS_MAXLEN: int = 500
+
+_EVENT_ID = re.compile(r"^\d{1,20}-\d{1,20}$")
+
+
+def events_key(code: str) -> str:
+    """
+    Generate Redis key for a game's event stream.
+
+    Args:
+        code: Game code
+
+    Returns:
+        Redis key string
+    """
+    return f"events:{code}"
+
+
+def is_event_id(value: Any) -> bool:
+    """True if value looks like a stream entry id (e.g. from Last-Event-ID)."""
+    return isinstance(value, str) and bool(_EVENT_ID.match(value))
+
+
+def _id_tuple(event_id: str) -> tuple:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def event_id_before(a: str, b: str) -> bool:
+    """True if stream id a sorts before stream id b."""
+    return _id_tuple(a) < _id_tuple(b)
+
+
+def queue_game_event(batch, code: str, event_type: str, data: Dict[str, Any],
+                     expiry_seconds: int) -> None:
+    """
+    Queue an event append (and the stream's expiry) on a RedisBatch.
+
+    Args:
+        batch: RedisBatch (or any client with xadd/expire)
+        code: Game code
+        event_type: One of EVENT_TYPES
+        data: JSON-serializable payload
+        expiry_seconds: TTL for the stream (kept in line with the game)
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown game event type: {event_type}")
+    key = events_key(code)
+    batch.xadd(key, "*", {"type": event_type, "data": json.dumps(data)}, maxlen=EVENTS_MAXLEN)
+    batch.expire(key, expiry_seconds)
+
+
+def parse_stream_entries(entries) -> List[Dict[str, Any]]:
+    """
+    Convert raw XRANGE entries ([id, [field, value, ...]]) into event dicts.
+
+    Returns:
+        List of {"id", "type", "data"}; malformed entries are skipped
+    """
+    events = []
+    for entry in entries or []:
+        try:
+            entry_id, fields = entry[0], entry[1]
+            if isinstance(fields, dict):
+                values = fields
+            else:
+                values = dict(zip(fields[0::2], fields[1::2]))
+            events.append({
+                "id": str(entry_id),
+                "type": values.get("type", "status"),
+                "data": json.loads(values.get("data") or "{}"),
+            })
+        except Exception:
+            continue
+    return events
+
+
+def read_game_events(redis, code: str, after_id: Optional[str] = None,
+                     count: int = 100) -> List[Dict[str, Any]]:
+    """
+    Read events after an id (exclusive), oldest first.
+
+    Args:
+        redis: Redis client
+        code: Game code
+        after_id: Last id the client has seen; None reads from the start
+        count: Maximum number of events
+
+    Returns:
+        List of {"id", "type", "data"}
+    """
+    start = f"({after_id}" if after_id else "-"
+    return parse_stream_entries(redis.xrange(events_key(code), start, "+", count=count))
+
+
+def latest_event_id(redis, code: str) -> Optional[str]:
+    """Id of the newest event, or None if the stream is empty."""
+    entries = redis.xrevrange(events_key(code), "+", "-", count=1)
+    return str(entries[0][0]) if entries else None
+
+
+def oldest_event_id(redis, code: str) -> Optional[str]:
+    """Id of the oldest retained event, or None if the stream is empty."""
+    entries = redis.xrange(events_key(code), "-", "+", count=1)
+    return str(entries[0][0]) if entries else None
+
+
+def format_sse(event_type: str, data: Any, event_id: Optional[str] = None) -> str:
+    """
+    Format one Server-Sent Events message.
+
+    Args:
+        event_type: SSE event name
+        data: JSON-serializable payload (sent on a single data line)
+        event_id: Optional id; clients send the last one back as Last-Event-ID
+
+    Returns:
+        Message text, terminated by a blank line
+    """
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,1026 @@
+"""
+In-Memory Redis Stand-in
+Process-local replacement for the Upstash REST client
+
+MemoryRedis is the real upstash_redis.Redis client with its HTTP transport
+swapped for an in-process server. Command building, pipelines and response
+formatting are therefore exactly the production code paths. Only the
+network is gone. Every request is counted: round trips, commands, and the
+bytes of the JSON request and base64-encoded JSON response Upstash would
+have exchanged (see RedisStats).
+
+Select it with REDIS_BACKEND=memory (data/redis_client.create_redis_client),
+or construct one directly in tests and benchmarks:
+
+    redis = MemoryRedis()
+    redis.set("key", "value")
+    redis.stats.snapshot()   # {"requests": 1, "commands": 1, "bytes_sent": ..., ...}
+
+Supported: strings, expiry, keys/scan, sorted sets, sets, hashes, lists and
+streams (the commands the API uses), plus EVAL of the Lua scripts the API
+sends. There is no Lua interpreter: each known script is registered with a
+Python equivalent (register_script), and unknown scripts fail like an
+unknown command.
+"""
+
+import base64
+import fnmatch
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from upstash_redis import Redis
+from upstash_redis.http import format_response
+
+from .redis_batch import _COMPARE_AND_DELETE_SCRIPT, _GUARDED_SCRIPT, _ZADD_IF_FIELD_SCRIPT
+
+
+class CommandError(Exception):
+    """A command the server rejects (sent back to the client as an error response)."""
+
+
+class _Hash(dict):
+    pass
+
+
+class _ZSet(dict):
+    pass
+
+
+class _Stream(list):
+    """Entries as (id tuple, flat field/value list); remembers the last id."""
+
+    def __init__(self):
+        super().__init__()
+        self.last_id = (0, 0)
+
+
+_TYPE_NAMES = {str: "string", _Hash: "hash", _ZSet: "zset", _Stream: "stream", list: "list", set: "set"}
+
+_WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+# ============== VALUE HELPERS ==============
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return _format_score(value)
+    return str(value)
+
+
+def _int(value: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CommandError("ERR value is not an integer or out of range")
+
+
+def _float(value: str) -> float:
+    text = value.lower()
+    if text in ("inf", "+inf"):
+        return float("inf")
+    if text == "-inf":
+        return float("-inf")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise CommandError("ERR value is not a valid float")
+
+
+def _format_score(score: float) -> str:
+    if score == float("inf"):
+        return "inf"
+    if score == float("-inf"):
+        return "-inf"
+    if score.is_integer() and abs(score) < 1e17:
+        return str(int(score))
+    return repr(score)
+
+
+def _score_bound(value: str):
+    """Parse a ZRANGEBYSCORE bound: (number, exclusive)."""
+    if value.startswith("("):
+        return _float(value[1:]), True
+    return _float(value), False
+
+
+def _in_range(score: float, low, high) -> bool:
+    (lo, lo_excl), (hi, hi_excl) = low, high
+    above = score > lo if lo_excl else score >= lo
+    below = score < hi if hi_excl else score <= hi
+    return above and below
+
+
+def _slice(items: list, start: int, stop: int) -> list:
+    """Redis inclusive index range (negative = from the end)."""
+    n = len(items)
+    if start < 0:
+        start = max(0, n + start)
+    if stop < 0:
+        stop = n + stop
+    if start > stop or start >= n:
+        return []
+    return items[start:stop + 1]
+
+
+def _stream_id(value: str, default_seq: int) -> tuple:
+    ms, sep, seq = value.partition("-")
+    try:
+        return int(ms), int(seq) if sep else default_seq
+    except ValueError:
+        raise CommandError("ERR Invalid stream ID specified as stream command argument")
+
+
+def _format_id(entry_id: tuple) -> str:
+    return f"{entry_id[0]}-{entry_id[1]}"
+
+
+# ============== SERVER ==============
+
+_COMMANDS: Dict[str, Callable] = {}
+
+# Normalized Lua source -> handler(server, keys, args) returning the script's result
+_SCRIPTS: Dict[str, Callable] = {}
+
+
+def _command(*names: str):
+    def register(fn: Callable) -> Callable:
+        for name in names:
+            _COMMANDS[name] = fn
+        return fn
+    return register
+
+
+def register_script(source: str, handler: Callable) -> None:
+    """
+    Teach the server a Lua script.
+
+    Args:
+        source: Script text exactly as sent with EVAL (surrounding whitespace ignored)
+        handler: handler(server, keys, args) -> result, running the same
+            commands through server.call()
+    """
+    _SCRIPTS[source.strip()] = handler
+
+
+class MemoryServer:
+    """
+    Redis data and command execution.
+
+    Commands take and return REST-level values (strings, integers, nested
+    lists, None) like the Upstash REST API. A lock makes every command, and
+    every EVAL as a whole, atomic.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def call(self, *command) -> Any:
+        """Run one raw command, e.g. call("SET", "key", "value", "EX", 60)."""
+        if not command:
+            raise CommandError("ERR empty command")
+        name = _to_str(command[0]).upper()
+        handler = _COMMANDS.get(name)
+        if handler is None:
+            raise CommandError(f"ERR unknown command '{name}'")
+        with self._lock:
+            return handler(self, [_to_str(arg) for arg in command[1:]])
+
+    # Storage helpers (caller holds the lock)
+
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= self._clock():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _get(self, key: str, kind: type, create: bool = False):
+        if self._alive(key):
+            value = self._data[key]
+            if type(value) is not kind:
+                raise CommandError(_WRONGTYPE)
+            return value
+        if not create:
+            return None
+        value = self._data[key] = kind()
+        return value
+
+    def _set(self, key: str, value: Any, keep_ttl: bool = False):
+        self._data[key] = value
+        if not keep_ttl:
+            self._expires.pop(key, None)
+
+    def _delete(self, key: str) -> bool:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _drop_if_empty(self, key: str):
+        if key in self._data and not self._data[key] and type(self._data[key]) is not str:
+            self._delete(key)
+
+    def _keys(self) -> List[str]:
+        return sorted(key for key in list(self._data) if self._alive(key))
+
+
+# ============== STRINGS ==============
+
+@_command("GET")
+def _cmd_get(s: MemoryServer, a):
+    return s._get(a[0], str)
+
+
+@_command("SET")
+def _cmd_set(s: MemoryServer, a):
+    key, value, options = a[0], a[1], [o.upper() for o in a[2:]]
+    ttl = None
+    keep_ttl = "KEEPTTL" in options
+    for i, option in enumerate(options):
+        if option in ("EX", "PX", "EXAT", "PXAT"):
+            amount = _int(a[3 + i])
+            ttl = {"EX": amount, "PX": amount / 1000,
+                   "EXAT": amount - s._clock(), "PXAT": amount / 1000 - s._clock()}[option]
+    old = s._get(key, str) if "GET" in options else None
+    exists = s._alive(key)
+    if ("NX" in options and exists) or ("XX" in options and not exists):
+        return old if "GET" in options else None
+    s._set(key, value, keep_ttl=keep_ttl)
+    if ttl is not None:
+        s._expires[key] = s._clock() + ttl
+    return old if "GET" in options else "OK"
+
+
+@_command("SETEX")
+def _cmd_setex(s: MemoryServer, a):
+    ttl = _int(a[1])
+    if ttl <= 0:
+        raise CommandError("ERR invalid expire time in 'setex' command")
+    s._set(a[0], a[2])
+    s._expires[a[0]] = s._clock() + ttl
+    return "OK"
+
+
+@_command("PSETEX")
+def _cmd_psetex(s: MemoryServer, a):
+    s._set(a[0], a[2])
+    s._expires[a[0]] = s._clock() + _int(a[1]) / 1000
+    return "OK"
+
+
+@_command("SETNX")
+def _cmd_setnx(s: MemoryServer, a):
+    if s._alive(a[0]):
+        return 0
+    s._set(a[0], a[1])
+    return 1
+
+
+@_command("GETDEL")
+def _cmd_getdel(s: MemoryServer, a):
+    value = s._get(a[0], str)
+    s._delete(a[0])
+    return value
+
+
+@_command("MGET")
+def _cmd_mget(s: MemoryServer, a):
+    return [s._data[k] if s._alive(k) and type(s._data[k]) is str else None for k in a]
+
+
+@_command("MSET")
+def _cmd_mset(s: MemoryServer, a):
+    for i in range(0, len(a) - 1, 2):
+        s._set(a[i], a[i + 1])
+    return "OK"
+
+
+def _incr(s: MemoryServer, key: str, amount: int) -> int:
+    value = _int(s._get(key, str) or "0") + amount
+    s._set(key, str(value), keep_ttl=True)
+    return value
+
+
+@_command("INCR")
+def _cmd_incr(s: MemoryServer, a):
+    return _incr(s, a[0], 1)
+
+
+@_command("INCRBY")
+def _cmd_incrby(s: MemoryServer, a):
+    return _incr(s, a[0], _int(a[1]))
+
+
+@_command("DECR")
+def _cmd_decr(s: MemoryServer, a):
+    return _incr(s, a[0], -1)
+
+
+@_command("DECRBY")
+def _cmd_decrby(s: MemoryServer, a):
+    return _incr(s, a[0], -_int(a[1]))
+
+
+# ============== KEYS AND EXPIRY ==============
+
+def _expire(s: MemoryServer, key: str, seconds: float, options: list) -> int:
+    if not s._alive(key):
+        return 0
+    current = s._expires.get(key)
+    deadline = s._clock() + seconds
+    options = [o.upper() for o in options]
+    if ("NX" in options and current is not None) or ("XX" in options and current is None):
+        return 0
+    if "GT" in options and (current is None or deadline <= current):
+        return 0
+    if "LT" in options and current is not None and deadline >= current:
+        return 0
+    if seconds <= 0:
+        s._delete(key)
+    else:
+        s._expires[key] = deadline
+    return 1
+
+
+@_command("EXPIRE")
+def _cmd_expire(s: MemoryServer, a):
+    return _expire(s, a[0], _int(a[1]), a[2:])
+
+
+@_command("PEXPIRE")
+def _cmd_pexpire(s: MemoryServer, a):
+    return _expire(s, a[0], _int(a[1]) / 1000, a[2:])
+
+
+@_command("EXPIREAT")
+def _cmd_expireat(s: MemoryServer, a):
+    return _expire(s, a[0], _int(a[1]) - s._clock(), a[2:])
+
+
+def _ttl(s: MemoryServer, key: str, scale: int) -> int:
+    if not s._alive(key):
+        return -2
+    deadline = s._expires.get(key)
+    return -1 if deadline is None else max(0, int(round((deadline - s._clock()) * scale)))
+
+
+@_command("TTL")
+def _cmd_ttl(s: MemoryServer, a):
+    return _ttl(s, a[0], 1)
+
+
+@_command("PTTL")
+def _cmd_pttl(s: MemoryServer, a):
+    return _ttl(s, a[0], 1000)
+
+
+@_command("PERSIST")
+def _cmd_persist(s: MemoryServer, a):
+    return int(s._alive(a[0]) and s._expires.pop(a[0], None) is not None)
+
+
+@_command("EXISTS")
+def _cmd_exists(s: MemoryServer, a):
+    return sum(1 for key in a if s._alive(key))
+
+
+@_command("DEL", "UNLINK")
+def _cmd_del(s: MemoryServer, a):
+    return sum(1 for key in a if s._alive(key) and s._delete(key))
+
+
+@_command("TYPE")
+def _cmd_type(s: MemoryServer, a):
+    return _TYPE_NAMES[type(s._data[a[0]])] if s._alive(a[0]) else "none"
+
+
+@_command("KEYS")
+def _cmd_keys(s: MemoryServer, a):
+    return [key for key in s._keys() if fnmatch.fnmatchcase(key, a[0])]
+
+
+@_command("SCAN")
+def _cmd_scan(s: MemoryServer, a):
+    cursor = _int(a[0])
+    match, count, kind = None, 10, None
+    for i in range(1, len(a) - 1, 2):
+        option = a[i].upper()
+        if option == "MATCH":
+            match = a[i + 1]
+        elif option == "COUNT":
+            count = max(1, _int(a[i + 1]))
+        elif option == "TYPE":
+            kind = a[i + 1].lower()
+    keys = s._keys()
+    page = keys[cursor:cursor + count]
+    next_cursor = cursor + count if cursor + count < len(keys) else 0
+    found = [key for key in page
+             if (match is None or fnmatch.fnmatchcase(key, match))
+             and (kind is None or _TYPE_NAMES[type(s._data[key])] == kind)]
+    return [str(next_cursor), found]
+
+
+@_command("DBSIZE")
+def _cmd_dbsize(s: MemoryServer, a):
+    return len(s._keys())
+
+
+@_command("FLUSHDB", "FLUSHALL")
+def _cmd_flush(s: MemoryServer, a):
+    s._data.clear()
+    s._expires.clear()
+    return "OK"
+
+
+@_command("PING")
+def _cmd_ping(s: MemoryServer, a):
+    return a[0] if a else "PONG"
+
+
+# ============== SORTED SETS ==============
+
+def _sorted(zset: Optional[_ZSet]) -> list:
+    return sorted((zset or {}).items(), key=lambda item: (item[1], item[0]))
+
+
+def _with_scores(items: list, with_scores: bool) -> list:
+    if not with_scores:
+        return [member for member, _ in items]
+    out = []
+    for member, score in items:
+        out += [member, _format_score(score)]
+    return out
+
+
+@_command("ZADD")
+def _cmd_zadd(s: MemoryServer, a):
+    key, i = a[0], 1
+    flags = set()
+    while i < len(a) and a[i].upper() in ("NX", "XX", "GT", "LT", "CH", "INCR"):
+        flags.add(a[i].upper())
+        i += 1
+    zset = s._get(key, _ZSet, create=True)
+    added = changed = 0
+    result = None
+    for j in range(i, len(a) - 1, 2):
+        score, member = _float(a[j]), a[j + 1]
+        current = zset.get(member)
+        if "INCR" in flags:
+            score = (current or 0.0) + score
+        if ("NX" in flags and current is not None) or ("XX" in flags and current is None):
+            continue
+        if current is not None and (("GT" in flags and score <= current) or ("LT" in flags and score >= current)):
+            continue
+        if current is None:
+            added += 1
+        elif current != score:
+            changed += 1
+        zset[member] = score
+        result = score
+    s._drop_if_empty(key)
+    if "INCR" in flags:
+        return None if result is None else _format_score(result)
+    return added + changed if "CH" in flags else added
+
+
+def _range_by_score(s: MemoryServer, key: str, low: str, high: str, reverse: bool,
+                    limit: Optional[tuple]) -> list:
+    low_bound, high_bound = _score_bound(low), _score_bound(high)
+    items = [item for item in _sorted(s._get(key, _ZSet)) if _in_range(item[1], low_bound, high_bound)]
+    if reverse:
+        items.reverse()
+    if limit is not None:
+        offset, count = limit
+        items = items[offset:] if count < 0 else items[offset:offset + count]
+    return items
+
+
+def _range_options(args: list) -> tuple:
+    options = [o.upper() for o in args]
+    limit = None
+    if "LIMIT" in options:
+        i = options.index("LIMIT")
+        limit = (_int(args[i + 1]), _int(args[i + 2]))
+    return options, limit
+
+
+@_command("ZRANGE")
+def _cmd_zrange(s: MemoryServer, a):
+    key, start, stop = a[0], a[1], a[2]
+    options, limit = _range_options(a[3:])
+    reverse = "REV" in options
+    if "BYLEX" in options:
+        raise CommandError("ERR BYLEX is not supported by the in-memory server")
+    if "BYSCORE" in options:
+        low, high = (stop, start) if reverse else (start, stop)
+        items = _range_by_score(s, key, low, high, reverse, limit)
+    else:
+        items = _sorted(s._get(key, _ZSet))
+        if reverse:
+            items.reverse()
+        items = _slice(items, _int(start), _int(stop))
+    return _with_scores(items, "WITHSCORES" in options)
+
+
+@_command("ZREVRANGE")
+def _cmd_zrevrange(s: MemoryServer, a):
+    items = list(reversed(_sorted(s._get(a[0], _ZSet))))
+    return _with_scores(_slice(items, _int(a[1]), _int(a[2])), "WITHSCORES" in [o.upper() for o in a[3:]])
+
+
+@_command("ZRANGEBYSCORE")
+def _cmd_zrangebyscore(s: MemoryServer, a):
+    options, limit = _range_options(a[3:])
+    return _with_scores(_range_by_score(s, a[0], a[1], a[2], False, limit), "WITHSCORES" in options)
+
+
+@_command("ZREVRANGEBYSCORE")
+def _cmd_zrevrangebyscore(s: MemoryServer, a):
+    options, limit = _range_options(a[3:])
+    return _with_scores(_range_by_score(s, a[0], a[2], a[1], True, limit), "WITHSCORES" in options)
+
+
+@_command("ZREMRANGEBYSCORE")
+def _cmd_zremrangebyscore(s: MemoryServer, a):
+    zset = s._get(a[0], _ZSet)
+    doomed = [member for member, _ in _range_by_score(s, a[0], a[1], a[2], False, None)]
+    for member in doomed:
+        del zset[member]
+    s._drop_if_empty(a[0])
+    return len(doomed)
+
+
+@_command("ZREMRANGEBYRANK")
+def _cmd_zremrangebyrank(s: MemoryServer, a):
+    zset = s._get(a[0], _ZSet)
+    doomed = _slice(_sorted(zset), _int(a[1]), _int(a[2]))
+    for member, _ in doomed:
+        del zset[member]
+    s._drop_if_empty(a[0])
+    return len(doomed)
+
+
+@_command("ZCARD")
+def _cmd_zcard(s: MemoryServer, a):
+    return len(s._get(a[0], _ZSet) or {})
+
+
+@_command("ZCOUNT")
+def _cmd_zcount(s: MemoryServer, a):
+    return len(_range_by_score(s, a[0], a[1], a[2], False, None))
+
+
+@_command("ZRANK")
+def _cmd_zrank(s: MemoryServer, a):
+    members = [member for member, _ in _sorted(s._get(a[0], _ZSet))]
+    if a[1] not in members:
+        return None
+    return members.index(a[1])
+
+
+@_command("ZREVRANK")
+def _cmd_zrevrank(s: MemoryServer, a):
+    members = [member for member, _ in reversed(_sorted(s._get(a[0], _ZSet)))]
+    return members.index(a[1]) if a[1] in members else None
+
+
+@_command("ZSCORE")
+def _cmd_zscore(s: MemoryServer, a):
+    score = (s._get(a[0], _ZSet) or {}).get(a[1])
+    return None if score is None else _format_score(score)
+
+
+@_command("ZINCRBY")
+def _cmd_zincrby(s: MemoryServer, a):
+    zset = s._get(a[0], _ZSet, create=True)
+    zset[a[2]] = zset.get(a[2], 0.0) + _float(a[1])
+    return _format_score(zset[a[2]])
+
+
+@_command("ZREM")
+def _cmd_zrem(s: MemoryServer, a):
+    zset = s._get(a[0], _ZSet) or {}
+    removed = sum(1 for member in a[1:] if zset.pop(member, None) is not None)
+    s._drop_if_empty(a[0])
+    return removed
+
+
+# ============== SETS ==============
+
+@_command("SADD")
+def _cmd_sadd(s: MemoryServer, a):
+    members = s._get(a[0], set, create=True)
+    before = len(members)
+    members.update(a[1:])
+    return len(members) - before
+
+
+@_command("SREM")
+def _cmd_srem(s: MemoryServer, a):
+    members = s._get(a[0], set) or set()
+    removed = sum(1 for member in a[1:] if member in members)
+    members.difference_update(a[1:])
+    s._drop_if_empty(a[0])
+    return removed
+
+
+@_command("SMEMBERS")
+def _cmd_smembers(s: MemoryServer, a):
+    return sorted(s._get(a[0], set) or ())
+
+
+@_command("SISMEMBER")
+def _cmd_sismember(s: MemoryServer, a):
+    return int(a[1] in (s._get(a[0], set) or ()))
+
+
+@_command("SCARD")
+def _cmd_scard(s: MemoryServer, a):
+    return len(s._get(a[0], set) or ())
+
+
+# ============== HASHES ==============
+
+@_command("HSET")
+def _cmd_hset(s: MemoryServer, a):
+    fields = s._get(a[0], _Hash, create=True)
+    added = 0
+    for i in range(1, len(a) - 1, 2):
+        added += a[i] not in fields
+        fields[a[i]] = a[i + 1]
+    return added
+
+
+@_command("HGET")
+def _cmd_hget(s: MemoryServer, a):
+    return (s._get(a[0], _Hash) or {}).get(a[1])
+
+
+@_command("HMGET")
+def _cmd_hmget(s: MemoryServer, a):
+    fields = s._get(a[0], _Hash) or {}
+    return [fields.get(field) for field in a[1:]]
+
+
+@_command("HGETALL")
+def _cmd_hgetall(s: MemoryServer, a):
+    out = []
+    for field, value in (s._get(a[0], _Hash) or {}).items():
+        out += [field, value]
+    return out
+
+
+@_command("HDEL")
+def _cmd_hdel(s: MemoryServer, a):
+    fields = s._get(a[0], _Hash) or {}
+    removed = sum(1 for field in a[1:] if fields.pop(field, None) is not None)
+    s._drop_if_empty(a[0])
+    return removed
+
+
+@_command("HEXISTS")
+def _cmd_hexists(s: MemoryServer, a):
+    return int(a[1] in (s._get(a[0], _Hash) or {}))
+
+
+@_command("HLEN")
+def _cmd_hlen(s: MemoryServer, a):
+    return len(s._get(a[0], _Hash) or {})
+
+
+@_command("HINCRBY")
+def _cmd_hincrby(s: MemoryServer, a):
+    fields = s._get(a[0], _Hash, create=True)
+    value = _int(fields.get(a[1], "0")) + _int(a[2])
+    fields[a[1]] = str(value)
+    return value
+
+
+# ============== LISTS ==============
+
+@_command("LPUSH")
+def _cmd_lpush(s: MemoryServer, a):
+    items = s._get(a[0], list, create=True)
+    for value in a[1:]:
+        items.insert(0, value)
+    return len(items)
+
+
+@_command("RPUSH")
+def _cmd_rpush(s: MemoryServer, a):
+    items = s._get(a[0], list, create=True)
+    items.extend(a[1:])
+    return len(items)
+
+
+@_command("LRANGE")
+def _cmd_lrange(s: MemoryServer, a):
+    return _slice(list(s._get(a[0], list) or []), _int(a[1]), _int(a[2]))
+
+
+@_command("LTRIM")
+def _cmd_ltrim(s: MemoryServer, a):
+    items = s._get(a[0], list)
+    if items is not None:
+        items[:] = _slice(items, _int(a[1]), _int(a[2]))
+        s._drop_if_empty(a[0])
+    return "OK"
+
+
+@_command("LLEN")
+def _cmd_llen(s: MemoryServer, a):
+    return len(s._get(a[0], list) or [])
+
+
+@_command("LPOP")
+def _cmd_lpop(s: MemoryServer, a):
+    items = s._get(a[0], list)
+    if not items:
+        return None
+    value = items.pop(0)
+    s._drop_if_empty(a[0])
+    return value
+
+
+@_command("RPOP")
+def _cmd_rpop(s: MemoryServer, a):
+    items = s._get(a[0], list)
+    if not items:
+        return None
+    value = items.pop()
+    s._drop_if_empty(a[0])
+    return value
+
+
+# ============== STREAMS ==============
+
+def _trim_stream(stream: _Stream, options: list, i: int) -> int:
+    """Apply MAXLEN/MINID starting at options[i]; returns the index after them."""
+    strategy = options[i].upper()
+    i += 1
+    if options[i] in ("~", "="):
+        i += 1
+    threshold = options[i]
+    i += 1
+    if i < len(options) and options[i].upper() == "LIMIT":
+        i += 2
+    if strategy == "MAXLEN":
+        excess = len(stream) - _int(threshold)
+        if excess > 0:
+            del stream[:excess]
+    else:
+        floor = _stream_id(threshold, 0)
+        stream[:] = [entry for entry in stream if entry[0] >= floor]
+    return i
+
+
+@_command("XADD")
+def _cmd_xadd(s: MemoryServer, a):
+    key, i = a[0], 1
+    if a[i].upper() == "NOMKSTREAM":
+        if not s._alive(key):
+            return None
+        i += 1
+    stream = s._get(key, _Stream, create=True)
+    trim_at = None
+    if a[i].upper() in ("MAXLEN", "MINID"):
+        trim_at = i
+        i = _trim_stream(_Stream(), a, i)  # skip the options; trimmed after the append
+    requested = a[i]
+    if requested == "*":
+        ms = max(int(s._clock() * 1000), stream.last_id[0])
+        entry_id = (ms, stream.last_id[1] + 1 if ms == stream.last_id[0] else 0)
+    else:
+        entry_id = _stream_id(requested, 0)
+        if entry_id <= stream.last_id:
+            raise CommandError("ERR The ID specified in XADD is equal or smaller than the target stream top item")
+    stream.append((entry_id, a[i + 1:]))
+    stream.last_id = entry_id
+    if trim_at is not None:
+        _trim_stream(stream, a, trim_at)
+    return _format_id(entry_id)
+
+
+def _stream_range(stream: Optional[_Stream], start: str, end: str, count: Optional[int], reverse: bool) -> list:
+    low_excl = start.startswith("(")
+    high_excl = end.startswith("(")
+    low = (0, 0) if start == "-" else _stream_id(start.lstrip("("), 0)
+    high = (float("inf"), float("inf")) if end == "+" else _stream_id(end.lstrip("("), float("inf"))
+    entries = [entry for entry in (stream or [])
+               if (entry[0] > low if low_excl else entry[0] >= low)
+               and (entry[0] < high if high_excl else entry[0] <= high)]
+    if reverse:
+        entries.reverse()
+    if count is not None:
+        entries = entries[:count]
+    return [[_format_id(entry_id), list(fields)] for entry_id, fields in entries]
+
+
+def _count_option(args: list) -> Optional[int]:
+    options = [o.upper() for o in args]
+    return _int(args[options.index("COUNT") + 1]) if "COUNT" in options else None
+
+
+@_command("XRANGE")
+def _cmd_xrange(s: MemoryServer, a):
+    return _stream_range(s._get(a[0], _Stream), a[1], a[2], _count_option(a[3:]), False)
+
+
+@_command("XREVRANGE")
+def _cmd_xrevrange(s: MemoryServer, a):
+    return _stream_range(s._get(a[0], _Stream), a[2], a[1], _count_option(a[3:]), True)
+
+
+@_command("XLEN")
+def _cmd_xlen(s: MemoryServer, a):
+    return len(s._get(a[0], _Stream) or [])
+
+
+@_command("XTRIM")
+def _cmd_xtrim(s: MemoryServer, a):
+    stream = s._get(a[0], _Stream)
+    if stream is None:
+        return 0
+    before = len(stream)
+    _trim_stream(stream, a, 1)
+    return before - len(stream)
+
+
+# ============== SCRIPTS ==============
+
+@_command("EVAL")
+def _cmd_eval(s: MemoryServer, a):
+    handler = _SCRIPTS.get(a[0].strip())
+    if handler is None:
+        raise CommandError("NOSCRIPT The in-memory server has no Python equivalent for this script")
+    key_count = _int(a[1])
+    return handler(s, a[2:2 + key_count], a[2 + key_count:])
+
+
+def _guarded_write(s: MemoryServer, keys: list, args: list):
+    stored = s.call("GET", keys[0])
+    match = re.match(r"\d+", stored) if stored is not None else None
+    current = match.group() if match else ""
+    if current != args[0] and (stored is not None or args[0] != "0"):
+        return [0, current]
+    i = 1
+    while i < len(args):
+        n = int(args[i])
+        s.call(*args[i + 1:i + 1 + n])
+        i += n + 1
+    return [1, current]
+
+
+def _compare_and_delete(s: MemoryServer, keys: list, args: list):
+    if s.call("GET", keys[0]) == args[0]:
+        return s.call("DEL", keys[0])
+    return 0
+
+
+def _zadd_if_field(s: MemoryServer, keys: list, args: list):
+    if not s.call("HEXISTS", keys[0], args[0]):
+        return 0
+    s.call("ZADD", keys[1], args[1], args[0])
+    s.call("ZREMRANGEBYSCORE", keys[1], 0, args[2])
+    return 1
+
+
+def _fixed_window(s: MemoryServer, keys: list, args: list):
+    count = s.call("INCRBY", keys[0], args[1])
+    if count == int(args[1]):
+        s.call("PEXPIRE", keys[0], args[0])
+    return count
+
+
+register_script(_GUARDED_SCRIPT, _guarded_write)
+register_script(_COMPARE_AND_DELETE_SCRIPT, _compare_and_delete)
+register_script(_ZADD_IF_FIELD_SCRIPT, _zadd_if_field)
+try:
+    from upstash_ratelimit import FixedWindow
+    register_script(FixedWindow.SCRIPT, _fixed_window)
+except ImportError:
+    pass
+
+
+# ============== CLIENT ==============
+
+def _wire_command(command: list) -> list:
+    """A command as the REST client serializes it."""
+    return [part if isinstance(part, (str, int, float)) else json.dumps(part) for part in command]
+
+
+def _encode_result(value: Any) -> Any:
+    """Base64-encode strings as Upstash does for Upstash-Encoding: base64."""
+    if isinstance(value, str):
+        return value if value == "OK" else base64.b64encode(value.encode("utf-8")).decode("ascii")
+    if isinstance(value, list):
+        return [_encode_result(item) for item in value]
+    return value
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+class RedisStats:
+    """Round trips, commands and wire bytes seen by a MemoryRedis client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.commands = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.by_command: Dict[str, Dict[str, int]] = {}
+
+    def record(self, commands: list, responses: list, request_bytes: int, response_bytes: int):
+        with self._lock:
+            self.requests += 1
+            self.commands += len(commands)
+            self.bytes_sent += request_bytes
+            self.bytes_received += response_bytes
+            for command, response in zip(commands, responses):
+                name = str(command[0]).upper()
+                entry = self.by_command.setdefault(name, {"calls": 0, "bytes_sent": 0, "bytes_received": 0})
+                entry["calls"] += 1
+                entry["bytes_sent"] += _json_size(command)
+                entry["bytes_received"] += _json_size(response)
+
+    def snapshot(self) -> dict:
+        """Copy of the counters: requests, commands, bytes_sent, bytes_received, by_command."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "commands": self.commands,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "by_command": {name: dict(entry) for name, entry in self.by_command.items()},
+            }
+
+
+class _MemoryTransport:
+    """Stands in for upstash_redis' SyncHttpClient: same execute() contract, no network."""
+
+    def __init__(self, server: MemoryServer, stats: RedisStats):
+        self._server = server
+        self._stats = stats
+
+    def execute(self, url: str, headers: dict, command: list, from_pipeline: bool = False):
+        commands = [_wire_command(c) for c in command] if from_pipeline else [_wire_command(command)]
+        responses = []
+        for raw in commands:
+            try:
+                responses.append({"result": _encode_result(self._server.call(*raw))})
+            except CommandError as e:
+                responses.append({"error": str(e)})
+        request = commands if from_pipeline else commands[0]
+        response = responses if from_pipeline else responses[0]
+        self._stats.record(commands, responses, _json_size(request), _json_size(response))
+        if from_pipeline:
+            return [format_response(r, "base64") for r in responses]
+        return format_response(responses[0], "base64")
+
+    def close(self):
+        pass
+
+
+class MemoryRedis(Redis):
+    """
+    upstash_redis.Redis backed by a MemoryServer instead of the REST API.
+
+    Attributes:
+        server: The MemoryServer holding the data (can be shared by clients)
+        stats: RedisStats for requests made through this client
+    """
+
+    def __init__(self, server: Optional[MemoryServer] = None):
+        super().__init__(url="memory://local", token="memory", allow_telemetry=False, read_your_writes=False)
+        self.server = server or MemoryServer()
+        self.stats = RedisStats()
+        self._http.close()
+        self._http = _MemoryTransport(self.server, self.stats)
+
+
+_shared: Optional[MemoryRedis] = None
+_shared_lock = threading.Lock()
+
+
+def shared_memory_redis() -> MemoryRedis:
+    """The process-wide MemoryRedis that REDIS_BACKEND=memory hands to every caller."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = MemoryRedis()
+        return _shared
@@ -0,0 +1,309 @@
+"""
+Redis Batch Module
+Request-scoped command batching for the Upstash REST client
+
+Every Upstash command is a separate HTTPS round trip. RedisBatch queues
+independent commands and sends them in a single pipeline request when the
+first result is needed (or on flush()), so a handler that touches presence,
+counts spectators and reads a game pays for one round trip instead of five.
+
+Usage:
+    batch = RedisBatch(get_redis())
+    batch.zadd(key, {member: now})
+    count = batch.zcard(key)
+    batch.flush()            # optional - result() flushes on demand
+    count.result()
+
+Commands are not transactional (Upstash /pipeline, not /multi-exec).
+GuardedBatch is the transactional variant for writes: one Lua script that
+applies them all only if a version key is unchanged (compare-and-set).
+"""
+
+from typing import Any, Optional
+
+
+class BatchResult:
+    """Deferred result of a queued command; result() flushes the batch if needed."""
+
+    __slots__ = ("_batch", "_value", "_error", "_done")
+
+    def __init__(self, batch: "RedisBatch"):
+        self._batch = batch
+        self._value = None
+        self._error: Optional[BaseException] = None
+        self._done = False
+
+    def _resolve(self, value: Any):
+        self._value = value
+        self._done = True
+
+    def _fail(self, error: BaseException):
+        self._error = error
+        self._done = True
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def result(self) -> Any:
+        """
+        Get the command's result.
+
+        Raises:
+            Exception: The error the command (or the whole pipeline) failed with
+        """
+        if not self._done:
+            self._batch.flush()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class RedisBatch:
+    """
+    Queue of Redis commands sent as one pipeline request.
+
+    Any client method can be queued by calling it on the batch with the same
+    arguments; it returns a BatchResult. Clients without pipeline() support
+    (or single-command batches) fall back to sequential calls with the same
+    semantics.
+    """
+
+    def __init__(self, redis: Any):
+        self._redis = redis
+        self._queued: list = []
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs) -> BatchResult:
+            pending = BatchResult(self)
+            self._queued.append((name, args, kwargs, pending))
+            return pending
+
+        return queue
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def __enter__(self) -> "RedisBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.flush()
+
+    def execute(self) -> list:
+        """Flush and return every queued command's result in order, raising the first error."""
+        pending = [queued[-1] for queued in self._queued]
+        self.flush()
+        return [p.result() for p in pending]
+
+    def flush(self) -> None:
+        """Send all queued commands. Errors are delivered through each BatchResult."""
+        if not self._queued:
+            return
+        queued, self._queued = self._queued, []
+
+        pipeline = getattr(self._redis, "pipeline", None)
+        if pipeline is None or len(queued) == 1:
+            for name, args, kwargs, pending in queued:
+                try:
+                    pending._resolve(getattr(self._redis, name)(*args, **kwargs))
+                except Exception as e:
+                    pending._fail(e)
+            return
+
+        try:
+            pipe = pipeline()
+            for name, args, kwargs, _ in queued:
+                getattr(pipe, name)(*args, **kwargs)
+            results = pipe.exec()
+        except Exception as e:
+            for _, _, _, pending in queued:
+                pending._fail(e)
+            return
+
+        for (_, _, _, pending), value in zip(queued, results):
+            pending._resolve(value)
+
+
+# ============== GUARDED WRITES ==============
+# A GuardedBatch queues writes like a RedisBatch but sends them as one Lua
+# script that first checks a version key. If the key no longer holds the
+# expected version, nothing is written and every result fails with
+# VersionConflict. That makes load -> mutate -> save a compare-and-set
+# without any lock.
+
+class VersionConflict(Exception):
+    """A guarded write found its version key moved on (another write won)."""
+
+    def __init__(self, key: str, expected: str, current: str):
+        super().__init__(f"{key} is at version {current}, expected {expected}")
+        self.key = key
+        self.expected = expected
+        self.current = current
+
+
+# KEYS[1] = version key, ARGV[1] = expected version, then per command:
+# argument count followed by the command and its arguments. Only the leading
+# digits of the key's value are compared. A missing key only passes when
+# version 0 is expected (a new document, or one from before the key
+# existed); otherwise the document was deleted or expired since it was read,
+# and writing would bring it back.
+_GUARDED_SCRIPT = """
+local stored = redis.call('GET', KEYS[1])
+local current = stored and string.match(stored, '^%d+') or ''
+if current ~= ARGV[1] and (stored or ARGV[1] ~= '0') then
+  return {0, current}
+end
+local i = 2
+while i <= #ARGV do
+  local n = tonumber(ARGV[i])
+  redis.call(unpack(ARGV, i + 1, i + n))
+  i = i + n + 1
+end
+return {1, current}
+"""
+
+
+# KEYS[1] = key, ARGV[1] = value it must still hold to be deleted
+_COMPARE_AND_DELETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def delete_if_equal(redis: Any, key: str, value: str) -> bool:
+    """Delete key only if it still holds value (e.g. a lease token), atomically; True if deleted."""
+    return bool(redis.eval(_COMPARE_AND_DELETE_SCRIPT, [key], [value]))
+
+
+# KEYS[1] = hash, KEYS[2] = sorted set; ARGV = member, score, prune-below score
+_ZADD_IF_FIELD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+  return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], 0, ARGV[3])
+return 1
+"""
+
+
+def zadd_if_field(redis: Any, hash_key: str, zset_key: str, member: str, score: float, prune_below: float):
+    """
+    Add member to a sorted set (pruning scores up to prune_below) only if it
+    is a field of hash_key, atomically. Returns 1 if added, else 0 - or a
+    BatchResult when redis is a RedisBatch.
+    """
+    return redis.eval(_ZADD_IF_FIELD_SCRIPT, [hash_key, zset_key], [member, score, prune_below])
+
+
+def _args(*values) -> list:
+    return [str(v) for v in values]
+
+
+def _set_args(key, value, ex=None, px=None, nx=False, xx=False):
+    command = _args("SET", key, value)
+    if ex is not None:
+        command += _args("EX", ex)
+    if px is not None:
+        command += _args("PX", px)
+    if nx:
+        command.append("NX")
+    if xx:
+        command.append("XX")
+    return command
+
+
+def _hset_args(key, field=None, value=None, values=None):
+    command = _args("HSET", key)
+    if field is not None:
+        command += _args(field, value)
+    for f, v in (values or {}).items():
+        command += _args(f, v)
+    return command
+
+
+def _xadd_args(key, id, data, maxlen=None, approximate_trim=True):
+    command = _args("XADD", key)
+    if maxlen is not None:
+        command += ["MAXLEN", "~" if approximate_trim else "=", str(maxlen)]
+    command.append(str(id))
+    for field, value in data.items():
+        command += _args(field, value)
+    return command
+
+
+# Client method -> (raw command builder, number of leading key arguments;
+# None = every positional argument is a key)
+_WRITE_COMMANDS = {
+    "set": (_set_args, 1),
+    "setex": (lambda key, seconds, value: _args("SETEX", key, seconds, value), 1),
+    "expire": (lambda key, seconds: _args("EXPIRE", key, seconds), 1),
+    "delete": (lambda *keys: _args("DEL", *keys), None),
+    "hset": (_hset_args, 1),
+    "hdel": (lambda key, *fields: _args("HDEL", key, *fields), 1),
+    "rpush": (lambda key, *values: _args("RPUSH", key, *values), 1),
+    "ltrim": (lambda key, start, stop: _args("LTRIM", key, start, stop), 1),
+    "xadd": (_xadd_args, 1),
+}
+
+
+class GuardedBatch(RedisBatch):
+    """
+    Write commands applied atomically, and only if a version key still holds
+    the expected version.
+
+    Supports the client write methods in _WRITE_COMMANDS, called with the same
+    arguments. execute() raises VersionConflict if the guard failed.
+    """
+
+    def __init__(self, redis: Any, version_key: str, expected_version: int):
+        super().__init__(redis)
+        self._version_key = version_key
+        self._expected = str(int(expected_version or 0))
+        self._keys: list = [version_key]
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in _WRITE_COMMANDS:
+            raise AttributeError(f"{name} cannot be queued on a GuardedBatch")
+        build, key_count = _WRITE_COMMANDS[name]
+
+        def queue(*args, **kwargs) -> BatchResult:
+            command = build(*args, **kwargs)
+            keys = args if key_count is None else args[:key_count]
+            self._keys.extend(str(k) for k in keys if str(k) not in self._keys)
+            pending = BatchResult(self)
+            self._queued.append((name, command, None, pending))
+            return pending
+
+        return queue
+
+    def flush(self) -> None:
+        """Run the guarded script. Errors (including VersionConflict) are delivered through each BatchResult."""
+        queued, self._queued = self._queued, []
+        args = [self._expected]
+        for _, command, _, _ in queued:
+            args.append(str(len(command)))
+            args.extend(command)
+        try:
+            applied, current = self._redis.eval(_GUARDED_SCRIPT, self._keys, args)
+            error = None if int(applied) else VersionConflict(self._version_key, self._expected, str(current))
+        except Exception as e:
+            error = e
+        for _, _, _, pending in queued:
+            if error is None:
+                pending._resolve(None)
+            else:
+                pending._fail(error)
+
+    def execute(self) -> list:
+        """Apply the writes; raises VersionConflict (or the client error) if nothing was written."""
+        pending = [queued[-1] for queued in self._queued]
+        self.flush()
+        return [p.result() for p in pending]
@@ -5,11 +5,17 @@ Centralized Redis connection management
 This module provides a singleton Redis client for all data operations.
 It handles connection initialization and provides helper functions
 for checking Redis configuration status.
+
+REDIS_BACKEND=memory swaps Upstash for the in-process stand-in in
+memory_redis.py (offline development, tests, benchmarks). Either way the
+client's round trips are recorded by redis_metrics.py.
 """
 
 import os
 from typing import Optional, Any
 
+from .redis_metrics import instrument_redis
+
 # Type alias for Redis client (actual type depends on upstash_redis)
 RedisClient = Any
 
@@ -17,6 +23,30 @@ RedisClient = Any
 _redis_client: Optional[RedisClient] = None
 
 
+def redis_backend() -> str:
+    """Configured backend: "upstash" (default) or "memory"."""
+    return (os.getenv("REDIS_BACKEND") or "upstash").strip().lower()
+
+
+def create_redis_client() -> RedisClient:
+    """
+    Create an instrumented client for the configured backend.
+    
+    Returns:
+        Upstash REST client from UPSTASH_REDIS_REST_URL/TOKEN, or with
+        REDIS_BACKEND=memory the process-wide MemoryRedis (every caller
+        shares its data).
+    """
+    if redis_backend() == "memory":
+        from .memory_redis import shared_memory_redis
+        return instrument_redis(shared_memory_redis())
+    from upstash_redis import Redis
+    return instrument_redis(Redis(
+        url=os.getenv("UPSTASH_REDIS_REST_URL"),
+        token=os.getenv("UPSTASH_REDIS_REST_TOKEN"),
+    ))
+
+
 def get_redis() -> Optional[RedisClient]:
     """
     Get Redis client singleton.
@@ -31,11 +61,7 @@ def get_redis() -> Optional[RedisClient]:
     global _redis_client
     if _redis_client is None:
         try:
-            from upstash_redis import Redis
-            _redis_client = Redis(
-                url=os.getenv("UPSTASH_REDIS_REST_URL"),
-                token=os.getenv("UPSTASH_REDIS_REST_TOKEN"),
-            )
+            _redis_client = create_redis_client()
         except Exception as e:
             print(f"[DATA] Failed to initialize Redis: {e}")
             return None
@@ -67,7 +93,7 @@ def is_redis_configured() -> bool:
     Check if Redis is properly configured.
     
     Returns:
-        True if both URL and token are set.
+        True if both URL and token are set, or the memory backend is selected.
     """
-    return bool(get_redis_url() and get_redis_token())
+    return redis_backend() == "memory" or bool(get_redis_url() and get_redis_token())
 
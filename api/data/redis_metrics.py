@@ -0,0 +1,180 @@
+"""
+Redis Metrics Module
+Per-request and process-wide accounting of Redis round trips
+
+instrument_redis() wraps a client's HTTP transport (the Upstash REST
+client or MemoryRedis), so every round trip - single command, pipeline or
+script - is timed and sized without touching call sites. Each round trip is
+recorded twice:
+
+- on the current request's RequestTrace (started by the API dispatcher with
+  start_request_trace()), which feeds the Server-Timing header and the
+  per-route statistics
+- in process-wide per-command totals (redis_command_totals())
+
+Observers added with add_redis_observer(fn) also get fn(name, commands,
+seconds, error) for every round trip; name is the command, or "PIPELINE".
+
+Payload sizes are estimates of the JSON bodies exchanged with Upstash
+(string lengths plus a few bytes per value); they are cheap enough to take
+on every call and track real sizes closely.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Round trips kept per trace in detail (totals keep counting past this)
+MAX_TRACE_CALLS = 200
+
+
+def payload_size(value: Any) -> int:
+    """Approximate JSON size of a command or decoded reply, in bytes."""
+    if value is None:
+        return 4
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 2
+    if isinstance(value, (list, tuple)):
+        return 2 + sum(payload_size(item) + 1 for item in value)
+    if isinstance(value, dict):
+        return 2 + sum(payload_size(k) + payload_size(v) + 2 for k, v in value.items())
+    return len(str(value))
+
+
+class RequestTrace:
+    """Redis round trips made while serving one request."""
+
+    __slots__ = ("started", "status", "response_bytes", "redis_calls", "redis_commands",
+                 "redis_seconds", "redis_bytes_sent", "redis_bytes_received", "calls")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.status: Optional[int] = None
+        self.response_bytes = 0
+        self.redis_calls = 0
+        self.redis_commands = 0
+        self.redis_seconds = 0.0
+        self.redis_bytes_sent = 0
+        self.redis_bytes_received = 0
+        # (command name or "PIPELINE", seconds, bytes sent, bytes received)
+        self.calls: List[tuple] = []
+
+    def record(self, name: str, commands: int, seconds: float, sent: int, received: int):
+        self.redis_calls += 1
+        self.redis_commands += commands
+        self.redis_seconds += seconds
+        self.redis_bytes_sent += sent
+        self.redis_bytes_received += received
+        if len(self.calls) < MAX_TRACE_CALLS:
+            self.calls.append((name, seconds, sent, received))
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: Redis time and round trips, and total time so far."""
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (f'redis;dur={self.redis_seconds * 1000:.1f};desc="{self.redis_calls} calls, '
+                f'{self.redis_commands} cmds", total;dur={total_ms:.1f}')
+
+
+_local = threading.local()
+
+
+def start_request_trace() -> RequestTrace:
+    """Start tracing the current thread's request (replacing any unfinished trace)."""
+    trace = RequestTrace()
+    _local.trace = trace
+    return trace
+
+
+def current_request_trace() -> Optional[RequestTrace]:
+    """The current thread's trace, or None outside a traced request."""
+    return getattr(_local, "trace", None)
+
+
+def end_request_trace() -> Optional[RequestTrace]:
+    """Stop tracing the current thread's request and return its trace."""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace
+
+
+# ============== PROCESS TOTALS ==============
+
+_totals_lock = threading.Lock()
+_totals: Dict[str, Dict[str, float]] = {}
+
+
+def _add_totals(names: List[str], seconds: float, error: bool):
+    """Count each command of a round trip; its time is split evenly between them."""
+    share = seconds / len(names)
+    with _totals_lock:
+        for name in names:
+            entry = _totals.get(name)
+            if entry is None:
+                entry = _totals[name] = {"calls": 0, "errors": 0, "seconds": 0.0}
+            entry["calls"] += 1
+            entry["seconds"] += share
+            if error:
+                entry["errors"] += 1
+
+
+def redis_command_totals() -> Dict[str, Dict[str, float]]:
+    """Per-command calls, errors and seconds since the process started."""
+    with _totals_lock:
+        return {name: dict(entry) for name, entry in _totals.items()}
+
+
+_observers: List[Callable] = []
+
+
+def add_redis_observer(observer: Callable):
+    """Call observer(name, commands, seconds, error) after every instrumented round trip."""
+    _observers.append(observer)
+
+
+# ============== TRANSPORT WRAPPER ==============
+
+class InstrumentedTransport:
+    """Wraps a client's HTTP transport (same execute() contract) and records every round trip."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def execute(self, url: str, headers: dict, command: list, from_pipeline: bool = False):
+        commands = command if from_pipeline else [command]
+        names = [str(c[0]).upper() if c else "?" for c in commands] or ["?"]
+        start = time.perf_counter()
+        result, error = None, False
+        try:
+            result = self.inner.execute(url, headers, command, from_pipeline)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            name = "PIPELINE" if from_pipeline else names[0]
+            _add_totals(names, seconds, error)
+            trace = getattr(_local, "trace", None)
+            if trace is not None:
+                trace.record(name, len(names), seconds, payload_size(command), payload_size(result))
+            for observer in _observers:
+                try:
+                    observer(name, len(names), seconds, error)
+                except Exception as e:
+                    print(f"Redis observer error: {e}")
+
+    def close(self):
+        self.inner.close()
+
+
+def instrument_redis(client):
+    """
+    Record the client's round trips (see module docstring); returns the client.
+
+    Clients without an HTTP transport are returned unchanged, and
+    instrumenting twice is a no-op.
+    """
+    transport = getattr(client, "_http", None)
+    if transport is not None and not isinstance(transport, InstrumentedTransport):
+        client._http = InstrumentedTransport(transport)
+    return client
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Local development server.
+
+Serves the API handler from index.py on a ThreadingHTTPServer, so
+long-lived requests (GET /api/games/{code}/events SSE streams and /wait
+long-polls) don't block other requests. The static frontend is served too,
+with the same rewrites as vercel.json.
+
+Unlike the serverless deployment, event streams here run continuously
+(up to events.max_seconds) instead of ending after each batch of events.
+With REDIS_BACKEND=memory and EMBEDDING_PROVIDER=local it needs no
+Upstash or OpenAI credentials (games live only as long as the process).
+
+--startup-report prints where a cold start spends its time instead of
+serving: import time of index.py broken down by top-level module (measured
+in a fresh interpreter with -X importtime), then the first-use cost of the
+clients and tables index.py initializes lazily.
+
+Usage:
+    python api/dev_server.py [--host 127.0.0.1] [--port 3000]
+    python api/dev_server.py --startup-report
+"""
+
+import argparse
+import mimetypes
+import os
+import subprocess
+import sys
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+from index import handler  # noqa: E402
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
+
+# vercel.json rewrites for client-side routes and static pages
+REWRITES = {
+    "/": "index.html",
+    "/privacy": "privacy.html",
+    "/privacy/": "privacy.html",
+    "/terms": "terms.html",
+    "/terms/": "terms.html",
+}
+SPA_PREFIXES = ("/game/", "/replay/", "/challenge/")
+
+
+class DevHandler(handler):
+    """API handler plus static frontend files."""
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/api/'):
+            return super().do_GET()
+        return self._serve_static(path)
+
+    def _serve_static(self, path: str):
+        if path in REWRITES:
+            relative = REWRITES[path]
+        elif path.startswith(SPA_PREFIXES):
+            relative = "index.html"
+        else:
+            relative = path.lstrip('/')
+
+        file_path = (FRONTEND_DIR / relative).resolve()
+        if FRONTEND_DIR not in file_path.parents or not file_path.is_file():
+            return self._send_error("Not found", 404)
+
+        body = file_path.read_bytes()
+        content_type = mimetypes.guess_type(str(file_path))[0] or 'application/octet-stream'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ============== STARTUP REPORT ==============
+
+def _import_times(module: str = "index") -> list:
+    """
+    Cumulative import time of a module and of each module it imports directly.
+
+    Runs a fresh interpreter with -X importtime so nothing is already loaded.
+
+    Returns:
+        [(name, seconds)], the module itself first (its own body is "(self)")
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(Path(__file__).parent), capture_output=True, text=True,
+    )
+    # Lines are "import time: self | cumulative | <indent>name", children before parents
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+
+    total = own = None
+    children = []
+    pending = []
+    for depth, name, self_us, cumulative_us in rows:
+        if name == module and depth == 0:
+            total, own = cumulative_us, self_us
+            children = pending
+            break
+        if depth == 0:
+            pending = []
+        elif depth == 1:
+            pending.append((name, cumulative_us / 1e6))
+    if total is None:
+        raise RuntimeError(f"Could not import {module}: {result.stderr.strip()[-500:]}")
+    children.sort(key=lambda item: item[1], reverse=True)
+    return [(module, total / 1e6), ("(self)", own / 1e6)] + children
+
+
+def _first_use_times() -> list:
+    """Time the lazily initialized pieces of index.py on first use, in this process."""
+    import index
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+            return label, time.perf_counter() - start, ""
+        except Exception as e:
+            return label, time.perf_counter() - start, f"failed: {e}"
+
+    def theme_matrix():
+        name = next(iter(index.PREGENERATED_THEMES), None)
+        matrix = index._load_theme_artifact(name) if name else None
+        if matrix is None:
+            raise LookupError("no similarity artifact shipped")
+        matrix.neighbors.nearest(matrix.words[0], 5)
+
+    return [
+        timed("openai import + client", index.get_openai_client),
+        timed("wordfreq import + first lookup", lambda: index.word_frequency("test", "en")),
+        timed("themes reload", index.load_themes),
+        timed("cosmetics catalog reload", index.load_cosmetics_catalog),
+        timed("profanity lists reload", index.load_profanity_words),
+        timed("theme matrix artifact + neighbours", theme_matrix),
+    ]
+
+
+def startup_report(top: int = 15):
+    """Print import-time and first-use breakdowns for a cold start."""
+    imports = _import_times()
+    name, total = imports[0]
+    print(f"Import of {name}.py: {total * 1000:.1f} ms (fresh interpreter, -X importtime)")
+    for module, seconds in imports[1:top + 2]:
+        print(f"  {seconds * 1000:8.1f} ms  {module}")
+
+    print("\nFirst use of lazily initialized pieces:")
+    for label, seconds, note in _first_use_times():
+        print(f"  {seconds * 1000:8.1f} ms  {label}" + (f"  ({note})" if note else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API and frontend locally")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "3000")))
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print import and first-use timings for a cold start, then exit")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        startup_report()
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port), DevHandler)
+    server.daemon_threads = True
+    print(f"Embeddle dev server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Embeddle Embeddings Module
+
+Compact storage formats for word embeddings, theme similarity data and
+nearest-neighbour tables, the prebuilt per-theme artifacts shipped with
+the deployment, the tiered store every embedding lookup goes through, and
+the providers (OpenAI or deterministic local) behind it.
+"""
+
+from .similarity_matrix import SimilarityMatrix
+from .neighbors import NEIGHBOR_K, NeighborTable
+from .codec import (
+    pack_embedding,
+    unpack_embedding,
+    encode_embedding,
+    decode_embedding,
+    is_legacy_embedding,
+)
+from .artifacts import (
+    ARTIFACTS_DIR,
+    theme_id,
+    artifact_words,
+    content_version,
+    artifact_path,
+    neighbor_artifact_path,
+    write_similarity_artifact,
+    load_similarity_artifact,
+)
+from .providers import (
+    EmbeddingProvider,
+    OpenAIProvider,
+    LocalProvider,
+    provider_from_config,
+)
+from .store import (
+    EmbeddingStore,
+    get_store,
+    store_from_config,
+)
+
+__all__ = [
+    # Similarity matrix
+    "SimilarityMatrix",
+    # Nearest-neighbour table
+    "NEIGHBOR_K",
+    "NeighborTable",
+    # Embedding codec
+    "pack_embedding",
+    "unpack_embedding",
+    "encode_embedding",
+    "decode_embedding",
+    "is_legacy_embedding",
+    # Prebuilt artifacts
+    "ARTIFACTS_DIR",
+    "theme_id",
+    "artifact_words",
+    "content_version",
+    "artifact_path",
+    "neighbor_artifact_path",
+    "write_similarity_artifact",
+    "load_similarity_artifact",
+    # Embedding providers
+    "EmbeddingProvider",
+    "OpenAIProvider",
+    "LocalProvider",
+    "provider_from_config",
+    # Tiered embedding store
+    "EmbeddingStore",
+    "get_store",
+    "store_from_config",
+]
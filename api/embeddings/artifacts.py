@@ -0,0 +1,125 @@
+"""
+Prebuilt Theme Similarity Artifacts
+
+Themes in api/themes/*.json are static, so their similarity matrices can be
+built once by precompute_embeddings.py and shipped with the deployment.
+At runtime the .npy files are memory-mapped, so a cold instance can start a
+game without touching Redis or OpenAI.
+
+Artifacts live in api/themes/artifacts/ and are named
+
+    {theme_id}.{embedding_model}.{content_hash}.npy
+
+The content hash covers the theme's word list, so editing a theme file (or
+switching embedding model) makes old artifacts invisible instead of wrong.
+Rows/columns follow artifact_words(): the sorted, de-duplicated, lowercased
+theme words.
+
+Each matrix has a sorted top-K neighbour table beside it (see neighbors.py),
+stored under the same name with a .knn.npy suffix.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .similarity_matrix import SimilarityMatrix
+
+ARTIFACTS_DIR = Path(__file__).resolve().parent.parent / "themes" / "artifacts"
+
+ARTIFACT_SUFFIX = ".npy"
+
+NEIGHBOR_SUFFIX = ".knn.npy"
+
+
+def theme_id(theme_name: str) -> str:
+    """Stable id for a theme name (matches the theme_sim:* Redis key suffix)."""
+    return (theme_name or "").lower().replace(" ", "_").replace("&", "and")
+
+
+def artifact_words(words: list) -> list:
+    """Canonical word order for an artifact: sorted, unique, lowercase."""
+    return sorted({str(w).strip().lower() for w in (words or []) if str(w or "").strip()})
+
+
+def content_version(words: list) -> str:
+    """Content hash of a word list (order-insensitive)."""
+    return hashlib.sha256("\n".join(artifact_words(words)).encode()).hexdigest()[:16]
+
+
+def artifact_path(theme_name: str, words: list, model: str, directory: Path = None) -> Path:
+    """
+    Path of the artifact for a theme word list and embedding model.
+
+    Args:
+        theme_name: Display name of the theme
+        words: Full theme word list
+        model: Embedding model the similarities were computed with
+        directory: Override for ARTIFACTS_DIR
+
+    Returns:
+        Path (which may not exist)
+    """
+    name = f"{theme_id(theme_name)}.{model}.{content_version(words)}{ARTIFACT_SUFFIX}"
+    return Path(directory or ARTIFACTS_DIR) / name
+
+
+def neighbor_artifact_path(theme_name: str, words: list, model: str, directory: Path = None) -> Path:
+    """Path of the neighbour table that goes with artifact_path() (which may not exist)."""
+    path = artifact_path(theme_name, words, model, directory)
+    return path.with_name(path.name[:-len(ARTIFACT_SUFFIX)] + NEIGHBOR_SUFFIX)
+
+
+def write_similarity_artifact(theme_name: str, words: list, matrix: SimilarityMatrix,
+                              model: str, directory: Path = None) -> Path:
+    """
+    Write a theme's similarity matrix and its neighbour table as versioned
+    .npy artifacts.
+
+    Stale artifacts for the same theme and model are removed.
+
+    Returns:
+        Path of the written matrix artifact
+    """
+    path = artifact_path(theme_name, words, model, directory)
+    neighbors_path = neighbor_artifact_path(theme_name, words, model, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    ordered = matrix.reordered(artifact_words(words))
+    np.save(path, np.ascontiguousarray(ordered.quantized, dtype="<u2"))
+    np.save(neighbors_path, np.ascontiguousarray(ordered.neighbors.array, dtype="<u2"))
+
+    # The glob also matches .knn.npy files
+    for stale in path.parent.glob(f"{theme_id(theme_name)}.{model}.*{ARTIFACT_SUFFIX}"):
+        if stale not in (path, neighbors_path):
+            stale.unlink()
+    return path
+
+
+def load_similarity_artifact(theme_name: str, words: list, model: str,
+                             directory: Path = None) -> Optional[SimilarityMatrix]:
+    """
+    Memory-map a theme's prebuilt similarity matrix and neighbour table.
+
+    A missing or mismatched neighbour table is not an error; the matrix
+    then builds its table on first use.
+
+    Returns:
+        SimilarityMatrix backed by the memory-mapped file, or None if there
+        is no artifact for this exact word list and model
+    """
+    path = artifact_path(theme_name, words, model, directory)
+    if not path.exists():
+        return None
+    ordered_words = artifact_words(words)
+    quantized = np.load(path, mmap_mode="r")
+    if quantized.dtype != np.dtype("<u2") or quantized.shape != (len(ordered_words), len(ordered_words)):
+        return None
+    matrix = SimilarityMatrix(ordered_words, quantized)
+
+    neighbors_path = neighbor_artifact_path(theme_name, words, model, directory)
+    if neighbors_path.exists():
+        matrix.attach_neighbors(np.load(neighbors_path, mmap_mode="r"))
+    return matrix
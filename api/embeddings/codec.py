@@ -0,0 +1,134 @@
+"""
+Packed Binary Embedding Codec
+
+Embeddings are cached in Redis under emb:{word}. They used to be JSON arrays
+(~60 KB for a 3072-dim text-embedding-3-large vector). They are now packed
+float32/float16 with a small header, base64-encoded because Upstash REST
+values are strings.
+
+Binary layout (little-endian):
+    magic       4 bytes   b"EMB1"
+    dtype       uint8     0 = float32, 1 = float16
+    model_len   uint8     length of the model name
+    dims        uint32    number of components
+    norm        float32   L2 norm of the original vector
+    model       bytes     UTF-8 model name
+    padding     0-3 bytes aligns the vector to 4 bytes
+    vector      dims * itemsize bytes
+
+Legacy JSON values are still decoded so the cache can migrate in place.
+"""
+
+import base64
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+
+MAGIC = b"EMB1"
+
+_HEADER = struct.Struct("<4sBBIf")
+
+DTYPES = {
+    "float32": (0, np.dtype("<f4")),
+    "float16": (1, np.dtype("<f2")),
+}
+_DTYPES_BY_CODE = {code: (name, dtype) for name, (code, dtype) in DTYPES.items()}
+
+# Base64 of MAGIC, used to tell packed values from legacy JSON without decoding
+_B64_PREFIX = base64.b64encode(MAGIC)[:4].decode("ascii")
+
+
+def pack_embedding(vector, model: str, dtype: str = "float32") -> bytes:
+    """
+    Pack an embedding into the binary layout.
+
+    Args:
+        vector: Sequence or array of floats
+        model: Embedding model name recorded in the header
+        dtype: Storage dtype ("float32" or "float16")
+
+    Returns:
+        Packed bytes
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    code, np_dtype = DTYPES[dtype]
+    values = np.asarray(vector, dtype=np.float32).ravel()
+    model_bytes = (model or "").encode("utf-8")[:255]
+    norm = float(np.linalg.norm(values))
+    header = _HEADER.pack(MAGIC, code, len(model_bytes), values.size, norm) + model_bytes
+    padding = b"\x00" * (-len(header) % 4)
+    return header + padding + values.astype(np_dtype).tobytes()
+
+
+def unpack_embedding(blob) -> tuple[dict, np.ndarray]:
+    """
+    Unpack the binary layout.
+
+    Returns:
+        (header, vector) where header has model, dims, dtype and norm, and
+        vector is a float32 array
+
+    Raises:
+        ValueError: If the blob is not a packed embedding
+    """
+    view = memoryview(blob)
+    if len(view) < _HEADER.size or bytes(view[:4]) != MAGIC:
+        raise ValueError("Not a packed embedding")
+    _, code, model_len, dims, norm = _HEADER.unpack_from(view, 0)
+    if code not in _DTYPES_BY_CODE:
+        raise ValueError(f"Unknown embedding dtype code: {code}")
+    dtype_name, np_dtype = _DTYPES_BY_CODE[code]
+    model_end = _HEADER.size + model_len
+    offset = model_end + (-model_end % 4)
+    vector = np.frombuffer(blob, dtype=np_dtype, count=dims, offset=offset)
+    if np_dtype != np.float32:
+        vector = vector.astype(np.float32)
+    header = {
+        "model": bytes(view[_HEADER.size:model_end]).decode("utf-8"),
+        "dims": dims,
+        "dtype": dtype_name,
+        "norm": norm,
+    }
+    return header, vector
+
+
+def encode_embedding(vector, model: str, dtype: str = "float32") -> str:
+    """Pack an embedding and base64-encode it for string-only stores (Upstash REST)."""
+    return base64.b64encode(pack_embedding(vector, model, dtype)).decode("ascii")
+
+
+def is_legacy_embedding(value) -> bool:
+    """True if a cached value is a legacy JSON array."""
+    if isinstance(value, (bytes, bytearray)):
+        value = value[:1].decode("ascii", "ignore")
+    return isinstance(value, list) or (isinstance(value, str) and value.lstrip().startswith("["))
+
+
+def decode_embedding(value, model: str = None) -> Optional[np.ndarray]:
+    """
+    Decode a cached embedding in either format.
+
+    Args:
+        value: Base64 packed string, raw packed bytes, legacy JSON string or list
+        model: If given, packed values recorded for a different model are
+            treated as a cache miss (legacy values carry no model and pass)
+
+    Returns:
+        float32 array, or None if the value is empty or for another model
+    """
+    if value is None or (isinstance(value, (str, bytes, list)) and not value):
+        return None
+    if is_legacy_embedding(value):
+        data = json.loads(value) if not isinstance(value, list) else value
+        return np.asarray(data, dtype=np.float32)
+    if isinstance(value, str):
+        if not value.startswith(_B64_PREFIX):
+            raise ValueError("Unrecognized embedding encoding")
+        value = base64.b64decode(value)
+    header, vector = unpack_embedding(value)
+    if model and header["model"] and header["model"] != model:
+        return None
+    return vector
@@ -0,0 +1,162 @@
+"""
+Per-Theme Nearest-Neighbour Table
+
+For every word of a similarity matrix, the K most similar words sorted by
+descending similarity (ties in matrix word order). Each row includes the
+word itself, which is normally first. The table is built once per theme,
+shipped as a .knn.npy artifact next to the matrix and otherwise built from
+the matrix on first use. Queries walk a sorted row, so "top N of these
+words" or "every word above a threshold" needs no sort.
+
+Storage: one uint16 array of shape (2, n, K). Plane 0 holds word indices
+and plane 1 holds quantized similarities in the SimilarityMatrix encoding.
+When a query runs past the K stored neighbours, it falls back to sorting
+that one matrix row.
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Neighbours kept per word (the whole row for smaller themes)
+NEIGHBOR_K = 32
+
+# Same quantization as SimilarityMatrix
+_QUANT_MAX = 65535
+_QUANT_SCALE = 2.0 / _QUANT_MAX
+_SIM_DECIMALS = 4
+
+
+def _sort_rows(quantized: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k largest values per row, descending, ties by column."""
+    # Stable sort on the negated values keeps equal similarities in word order
+    order = np.argsort(-quantized.astype(np.int32), axis=1, kind="stable")
+    return order[:, :k]
+
+
+class NeighborTable:
+    """
+    Sorted top-K neighbours for each word of a SimilarityMatrix.
+
+    Query results are (lowercase word, similarity) pairs. Similarities are
+    rounded the same way SimilarityMatrix.sim rounds them.
+    """
+
+    __slots__ = ("words", "index", "k", "_neighbors", "_quantized")
+
+    def __init__(self, words: list, index: dict, table: np.ndarray, quantized: np.ndarray):
+        n = len(words)
+        if table.ndim != 3 or table.shape[0] != 2 or table.shape[1] != n:
+            raise ValueError(f"Neighbour table shape {table.shape} does not match {n} words")
+        self.words = words
+        self.index = index
+        self.k = int(table.shape[2])
+        self._neighbors = table
+        self._quantized = quantized
+
+    # ============== CONSTRUCTION ==============
+
+    @classmethod
+    def from_matrix(cls, matrix, k: int = NEIGHBOR_K) -> "NeighborTable":
+        """
+        Build the table from a SimilarityMatrix.
+
+        Args:
+            matrix: Source SimilarityMatrix
+            k: Neighbours per word (capped at the number of words)
+        """
+        quantized = matrix.quantized
+        k = min(int(k), len(matrix.words))
+        order = _sort_rows(quantized, k)
+        table = np.stack([order, np.take_along_axis(quantized, order, axis=1)]).astype("<u2")
+        return cls(matrix.words, matrix.index, table, quantized)
+
+    @classmethod
+    def from_array(cls, matrix, table: np.ndarray) -> Optional["NeighborTable"]:
+        """Wrap a stored (2, n, K) table for a matrix, or None if it doesn't fit."""
+        if table.dtype != np.dtype("<u2") or table.ndim != 3 or table.shape[:2] != (2, len(matrix.words)):
+            return None
+        return cls(matrix.words, matrix.index, table, matrix.quantized)
+
+    @property
+    def array(self) -> np.ndarray:
+        """Raw (2, n, K) uint16 table, as written to artifacts."""
+        return self._neighbors
+
+    # ============== QUERIES ==============
+
+    def _walk(self, word: str) -> Iterator[Tuple[int, int]]:
+        """(column, quantized similarity) pairs for a word's row, best first."""
+        i = self.index[word]
+        stored = self._neighbors[:, i, :]
+        yield from zip(stored[0].tolist(), stored[1].tolist())
+        if self.k < len(self.words):
+            # Past the stored neighbours: sort the rest of this one row
+            row = self._quantized[i]
+            for j in _sort_rows(row[None, :], len(self.words))[0][self.k:].tolist():
+                yield j, int(row[j])
+
+    @staticmethod
+    def _similarity(q: int) -> float:
+        return round(q * _QUANT_SCALE - 1.0, _SIM_DECIMALS)
+
+    def nearest(self, word: str, count: int, allowed: Optional[set] = None,
+                exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        The count most similar words to a word.
+
+        Args:
+            word: Lowercase query word
+            count: Number of neighbours wanted
+            allowed: Only return these lowercase words (None = any matrix word)
+            exclude: Lowercase words to skip (e.g. already guessed)
+
+        Returns:
+            Up to count (word, similarity) pairs, most similar first; [] if
+            the word is not in the matrix
+        """
+        if word not in self.index or count <= 0:
+            return []
+        exclude = set(exclude)
+        out = []
+        for j, q in self._walk(word):
+            other = self.words[j]
+            if other in exclude or (allowed is not None and other not in allowed):
+                continue
+            out.append((other, self._similarity(q)))
+            if len(out) >= count:
+                break
+        return out
+
+    def within(self, word: str, low: float, high: Optional[float] = None,
+               allowed: Optional[set] = None, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        Words whose similarity to a word lies strictly between low and high.
+
+        Args:
+            word: Lowercase query word
+            low: Exclusive lower bound
+            high: Exclusive upper bound (None = no upper bound, so the word
+                  itself is included unless excluded)
+            allowed: Only return these lowercase words (None = any matrix word)
+            exclude: Lowercase words to skip
+
+        Returns:
+            (word, similarity) pairs, most similar first; [] if the word is
+            not in the matrix
+        """
+        if word not in self.index:
+            return []
+        exclude = set(exclude)
+        out = []
+        for j, q in self._walk(word):
+            sim = self._similarity(q)
+            if sim <= low:
+                break
+            if high is not None and sim >= high:
+                continue
+            other = self.words[j]
+            if other in exclude or (allowed is not None and other not in allowed):
+                continue
+            out.append((other, sim))
+        return out
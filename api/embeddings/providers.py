@@ -0,0 +1,174 @@
+"""
+Embedding Providers
+
+Where embeddings come from when no cache tier has them:
+
+    openai  the OpenAI embeddings endpoint (production)
+    local   deterministic vectors computed in-process, no network: a seeded
+            random vector per word plus a random projection of its hashed
+            character n-grams, so words sharing spelling are somewhat
+            similar. Same seed and settings = same vectors everywhere.
+
+The provider is chosen by EMBEDDING_PROVIDER, else embedding.provider in
+config.json (default "openai"). Local vectors are recorded under their own
+model name and Redis key prefix, so they never mix with OpenAI ones. Local
+similarities are not semantic: use them for tests, benchmarks and offline
+development, not for real games.
+"""
+
+import hashlib
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+PROVIDERS = ("openai", "local")
+
+# Defaults for the local provider ("embedding" section of config.json)
+DEFAULT_LOCAL_DIMENSIONS = 256
+DEFAULT_LOCAL_NGRAM = 3
+DEFAULT_LOCAL_SEED = 0
+
+
+class EmbeddingProvider:
+    """
+    Base class: embed(words) returns one vector per word, in order.
+
+    Subclasses implement _embed(words) -> (vectors, tokens used). Observers
+    added with add_observer(fn) get fn(provider, word_count, seconds,
+    tokens, error) after every call.
+    """
+
+    name = ""
+    model = ""
+    _observers: tuple = ()
+
+    @property
+    def key_prefix(self) -> str:
+        """Redis key prefix for this provider's cached vectors."""
+        return "emb:"
+
+    def add_observer(self, observer: Callable):
+        self._observers = self._observers + (observer,)
+
+    def embed(self, words: List[str]) -> list:
+        start = time.perf_counter()
+        vectors, tokens, error = None, 0, True
+        try:
+            vectors, tokens = self._embed(words)
+            error = False
+            return vectors
+        finally:
+            for observer in self._observers:
+                try:
+                    observer(self, len(words), time.perf_counter() - start, tokens, error)
+                except Exception as e:
+                    print(f"Embedding observer error: {e}")
+
+    def _embed(self, words: List[str]) -> Tuple[list, int]:
+        raise NotImplementedError
+
+
+class OpenAIProvider(EmbeddingProvider):
+    """OpenAI embeddings endpoint; the client is created on first use."""
+
+    name = "openai"
+
+    def __init__(self, model: str, get_client: Optional[Callable] = None):
+        """
+        Args:
+            model: OpenAI embedding model
+            get_client: Returns an OpenAI client (default: one built from OPENAI_API_KEY)
+        """
+        self.model = model
+        self._get_client = get_client
+        self._client = None
+
+    def _client_for_request(self):
+        if self._get_client is not None:
+            return self._get_client()
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def _embed(self, words: List[str]) -> Tuple[list, int]:
+        response = self._client_for_request().embeddings.create(model=self.model, input=words)
+        usage = getattr(response, "usage", None)
+        return [item.embedding for item in response.data], int(getattr(usage, "total_tokens", 0) or 0)
+
+
+class LocalProvider(EmbeddingProvider):
+    """
+    Deterministic offline embeddings.
+
+    Each word is the sum of a unit random vector seeded by the word's hash
+    and (if ngram > 0) a unit random projection of its hashed character
+    n-grams, normalized. Unrelated words are close to orthogonal; words
+    sharing n-grams ("cat", "cats") score higher.
+    """
+
+    name = "local"
+
+    def __init__(self, dimensions: int = DEFAULT_LOCAL_DIMENSIONS,
+                 ngram: int = DEFAULT_LOCAL_NGRAM, seed: int = DEFAULT_LOCAL_SEED):
+        if dimensions < 1:
+            raise ValueError("Local embedding dimensions must be positive")
+        self.dimensions = int(dimensions)
+        self.ngram = max(0, int(ngram))
+        self.seed = int(seed)
+        self.model = f"local-hash-d{self.dimensions}-n{self.ngram}-s{self.seed}"
+
+    @property
+    def key_prefix(self) -> str:
+        return f"emb:{self.model}:"
+
+    def _feature_vector(self, feature: str) -> np.ndarray:
+        """Seeded Gaussian row of the (implicit) projection matrix for one feature."""
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8,
+                                 key=self.seed.to_bytes(8, "little", signed=True)).digest()
+        rng = np.random.default_rng(int.from_bytes(digest, "little"))
+        return rng.standard_normal(self.dimensions, dtype=np.float32)
+
+    def _ngrams(self, word: str) -> List[str]:
+        padded = f"<{word}>"
+        n = self.ngram
+        if len(padded) <= n:
+            return [padded]
+        return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+    def vector(self, word: str) -> np.ndarray:
+        """Unit-length embedding for one word."""
+        own = self._feature_vector("w:" + word)
+        vector = own / (np.linalg.norm(own) or 1.0)
+        if self.ngram:
+            projected = sum(self._feature_vector("g:" + gram) for gram in self._ngrams(word))
+            vector = vector + projected / (np.linalg.norm(projected) or 1.0)
+        return (vector / (np.linalg.norm(vector) or 1.0)).astype(np.float32)
+
+    def _embed(self, words: List[str]) -> Tuple[list, int]:
+        return [self.vector(word) for word in words], 0
+
+
+def provider_from_config(config: dict, get_openai_client: Optional[Callable] = None) -> EmbeddingProvider:
+    """
+    Build the configured provider from the "embedding" section of config.json.
+
+    EMBEDDING_PROVIDER overrides embedding.provider. Local settings are
+    embedding.local_dimensions, local_ngram and local_seed.
+
+    Raises:
+        ValueError: Unknown provider name
+    """
+    settings = (config or {}).get("embedding", {})
+    name = (os.getenv("EMBEDDING_PROVIDER") or settings.get("provider") or "openai").strip().lower()
+    if name == "openai":
+        return OpenAIProvider(settings.get("model", "text-embedding-3-small"), get_openai_client)
+    if name == "local":
+        return LocalProvider(
+            dimensions=settings.get("local_dimensions", DEFAULT_LOCAL_DIMENSIONS),
+            ngram=settings.get("local_ngram", DEFAULT_LOCAL_NGRAM),
+            seed=settings.get("local_seed", DEFAULT_LOCAL_SEED),
+        )
+    raise ValueError(f"Unknown embedding provider {name!r} (expected one of: {', '.join(PROVIDERS)})")
@@ -0,0 +1,274 @@
+"""
+Compact Theme Similarity Matrix
+
+Stores a theme's pairwise cosine similarities as an ordered word list plus a
+uint16-quantized NumPy matrix. The binary form is loaded with np.frombuffer
+(no per-element Python objects), so a 100-word theme costs ~20 KB instead of
+~1 MB of nested dicts.
+
+Binary layout (little-endian):
+    magic       4 bytes   b"ESM1"
+    header_len  uint32    length of the JSON header
+    header      JSON      {"words": [...], "dtype": "uint16q"}
+    padding     0-1 byte  aligns the matrix to 2 bytes
+    matrix      uint16    n * n quantized similarities, row-major
+"""
+
+import base64
+import json
+import struct
+
+import numpy as np
+
+from .neighbors import NeighborTable
+
+MAGIC = b"ESM1"
+DTYPE = "uint16q"
+
+# Similarities in [-1, 1] map onto the full uint16 range
+_QUANT_MAX = 65535
+_QUANT_SCALE = 2.0 / _QUANT_MAX
+
+# Values are rounded like the legacy dict format
+SIM_DECIMALS = 4
+
+
+def _quantize(values: np.ndarray) -> np.ndarray:
+    clipped = np.clip(values, -1.0, 1.0)
+    return np.rint((clipped + 1.0) / _QUANT_SCALE).astype("<u2")
+
+
+def _dequantize(values: np.ndarray) -> np.ndarray:
+    return values.astype(np.float32) * np.float32(_QUANT_SCALE) - np.float32(1.0)
+
+
+class SimilarityMatrix:
+    """
+    Pairwise similarities for an ordered list of theme words.
+
+    Words are lowercase. Lookups for unknown words return the given default
+    (None unless specified), mirroring dict.get on the legacy format.
+    """
+
+    __slots__ = ("words", "index", "_quantized", "_dense", "_neighbors")
+
+    def __init__(self, words: list, quantized: np.ndarray):
+        if quantized.shape != (len(words), len(words)):
+            raise ValueError(f"Matrix shape {quantized.shape} does not match {len(words)} words")
+        self.words = list(words)
+        self.index = {w: i for i, w in enumerate(self.words)}
+        self._quantized = quantized
+        self._dense = None
+        self._neighbors = None
+
+    # ============== CONSTRUCTION ==============
+
+    @classmethod
+    def from_embeddings(cls, embeddings: dict) -> "SimilarityMatrix":
+        """
+        Build from a {word: embedding} mapping using vectorized cosine similarity.
+
+        Args:
+            embeddings: Dict mapping words to embedding vectors
+
+        Returns:
+            SimilarityMatrix over the lowercased words, in insertion order
+        """
+        words = [w.lower() for w in embeddings.keys()]
+        if not words:
+            return cls([], np.zeros((0, 0), dtype="<u2"))
+
+        vectors = np.asarray([embeddings[w] for w in embeddings.keys()], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1  # Avoid division by zero
+        normalized = vectors / norms
+        return cls.from_array(words, normalized @ normalized.T)
+
+    @classmethod
+    def from_array(cls, words: list, similarities: np.ndarray) -> "SimilarityMatrix":
+        """Build from an ordered word list and a dense (n x n) similarity array."""
+        return cls([w.lower() for w in words], _quantize(np.asarray(similarities, dtype=np.float32)))
+
+    @classmethod
+    def from_dict(cls, matrix: dict) -> "SimilarityMatrix":
+        """
+        Convert the legacy {word: {word: similarity}} format.
+
+        Missing pairs are filled with 0.0 (the legacy format is always complete
+        for theme words, so this only matters for hand-built dicts).
+        """
+        words = [w.lower() for w in matrix.keys()]
+        index = {w: i for i, w in enumerate(words)}
+        dense = np.zeros((len(words), len(words)), dtype=np.float32)
+        for w1, row in matrix.items():
+            i = index[w1.lower()]
+            for w2, sim in (row or {}).items():
+                j = index.get(w2.lower())
+                if j is not None:
+                    dense[i, j] = sim
+        return cls.from_array(words, dense)
+
+    # ============== SERIALIZATION ==============
+
+    def to_bytes(self) -> bytes:
+        """Serialize to the compact binary layout."""
+        header = json.dumps({"words": self.words, "dtype": DTYPE}, separators=(",", ":")).encode()
+        prefix_len = len(MAGIC) + 4 + len(header)
+        padding = b"\x00" * (prefix_len % 2)
+        return MAGIC + struct.pack("<I", len(header)) + header + padding + self._quantized.astype("<u2").tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob) -> "SimilarityMatrix":
+        """
+        Deserialize from the compact binary layout.
+
+        The matrix is a read-only view over the blob (np.frombuffer), not a copy.
+        """
+        view = memoryview(blob)
+        if bytes(view[:4]) != MAGIC:
+            raise ValueError("Not a similarity matrix blob")
+        (header_len,) = struct.unpack_from("<I", view, 4)
+        header_end = 8 + header_len
+        header = json.loads(bytes(view[8:header_end]))
+        if header.get("dtype") != DTYPE:
+            raise ValueError(f"Unsupported similarity matrix dtype: {header.get('dtype')}")
+        words = header["words"]
+        n = len(words)
+        offset = header_end + (header_end % 2)
+        quantized = np.frombuffer(blob, dtype="<u2", count=n * n, offset=offset).reshape(n, n)
+        return cls(words, quantized)
+
+    def to_base64(self) -> str:
+        """Serialize for string-only stores (Upstash REST)."""
+        return base64.b64encode(self.to_bytes()).decode("ascii")
+
+    @classmethod
+    def from_base64(cls, value: str) -> "SimilarityMatrix":
+        return cls.from_bytes(base64.b64decode(value))
+
+    @classmethod
+    def loads(cls, value) -> "SimilarityMatrix":
+        """
+        Load a cached value in either format.
+
+        Accepts the base64 binary form, raw bytes, or legacy JSON dicts
+        written before the compact format existed.
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if bytes(value[:4]) == MAGIC:
+                return cls.from_bytes(value)
+            value = bytes(value).decode()
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        if value.lstrip().startswith("{"):
+            return cls.from_dict(json.loads(value))
+        return cls.from_base64(value)
+
+    def to_dict(self) -> dict:
+        """Expand to the legacy nested-dict format (for debugging/export)."""
+        dense = self.dense()
+        return {
+            w1: {w2: round(float(dense[i, j]), SIM_DECIMALS) for j, w2 in enumerate(self.words)}
+            for i, w1 in enumerate(self.words)
+        }
+
+    # ============== ACCESSORS ==============
+
+    def __contains__(self, word) -> bool:
+        return word in self.index
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._quantized.nbytes)
+
+    @property
+    def quantized(self) -> np.ndarray:
+        """Raw uint16 matrix (may be a read-only view or memory map)."""
+        return self._quantized
+
+    def reordered(self, words: list) -> "SimilarityMatrix":
+        """
+        Matrix restricted to (and ordered by) the given words.
+
+        Raises:
+            KeyError: If any word is not in this matrix
+        """
+        order = [self.index[w] for w in words]
+        return SimilarityMatrix(list(words), self._quantized[np.ix_(order, order)])
+
+    def dense(self) -> np.ndarray:
+        """Dequantized float32 (n x n) array, computed once and cached."""
+        if self._dense is None:
+            self._dense = _dequantize(self._quantized)
+        return self._dense
+
+    @property
+    def neighbors(self) -> NeighborTable:
+        """Sorted top-K neighbour table: the shipped artifact, else built once from the matrix."""
+        if self._neighbors is None:
+            self._neighbors = NeighborTable.from_matrix(self)
+        return self._neighbors
+
+    def attach_neighbors(self, table: np.ndarray) -> bool:
+        """Use a prebuilt (2, n, K) neighbour table. Returns False if it doesn't fit this matrix."""
+        neighbors = NeighborTable.from_array(self, table)
+        if neighbors is None:
+            return False
+        self._neighbors = neighbors
+        return True
+
+    def sim(self, a: str, b: str, default=None):
+        """Similarity between two words, or default if either is unknown."""
+        i = self.index.get(a)
+        j = self.index.get(b)
+        if i is None or j is None:
+            return default
+        value = float(self._quantized[i, j]) * _QUANT_SCALE - 1.0
+        return round(value, SIM_DECIMALS)
+
+    def row(self, word: str):
+        """Similarities from a word to every word (aligned with .words), or None."""
+        i = self.index.get(word)
+        if i is None:
+            return None
+        return self.dense()[i]
+
+    def sim_row(self, word: str):
+        """Row of the values sim() returns (float64, rounded), aligned with .words, or None."""
+        i = self.index.get(word)
+        if i is None:
+            return None
+        return np.round(self._quantized[i].astype(np.float64) * _QUANT_SCALE - 1.0, SIM_DECIMALS)
+
+    def sims_to_many(self, word: str, words: list, default: float = np.nan) -> np.ndarray:
+        """
+        Similarities from a word to each of the given words.
+
+        Args:
+            word: Source word
+            words: Target words
+            default: Value for targets not in the matrix (or if word is unknown)
+
+        Returns:
+            float32 array aligned with words
+        """
+        out = np.full(len(words), default, dtype=np.float32)
+        i = self.index.get(word)
+        if i is None:
+            return out
+        row = self.dense()[i]
+        for k, w in enumerate(words):
+            j = self.index.get(w)
+            if j is not None:
+                out[k] = row[j]
+        return out
+
+    def items(self, word: str) -> list:
+        """(other_word, similarity) pairs for a word's row, or [] if unknown."""
+        row = self.row(word)
+        if row is None:
+            return []
+        return [(w, round(float(s), SIM_DECIMALS)) for w, s in zip(self.words, row)]
@@ -0,0 +1,387 @@
+"""
+Tiered Embedding Store
+
+One lookup path for word embeddings, checking each tier in turn:
+
+    memory  bounded per-process LRU
+    disk    optional local directory of packed embeddings (one file per word)
+    redis   emb:{word}, packed with the codec (shared by every instance)
+    fetch   the embedding provider (OpenAI or local), in batches
+
+Hits are copied into the faster tiers on the way back. Misses in the same
+process are single-flight: if another thread is already loading a word,
+callers wait for its result instead of making their own API call. Every
+tier counts hits and misses (see stats()).
+
+Usage:
+    store = get_store(lambda: store_from_config(CONFIG, provider_from_config(CONFIG, get_openai_client), get_redis))
+    vector = store.get("apple")
+    vectors = store.get_many(theme_words)   # one Redis round trip, batched API calls
+    vectors = store.cached(theme_words)     # cache tiers only, never calls the API
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .codec import decode_embedding, encode_embedding, pack_embedding
+from .providers import EmbeddingProvider, provider_from_config
+
+TIERS = ("memory", "disk", "redis", "fetch")
+
+# Defaults for the "embedding" section of config.json
+DEFAULT_MEMORY_CACHE_SIZE = 2048
+DEFAULT_FETCH_BATCH_SIZE = 100
+
+# How long a caller waits for another thread's in-flight load of the same word
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 30.0
+
+
+def redis_key(word: str, prefix: str = "emb:") -> str:
+    """Redis key for a normalized word's embedding (prefix comes from the provider)."""
+    return f"{prefix}{word}"
+
+
+def normalize_words(words: Iterable[str]) -> List[str]:
+    """Lowercase, strip and de-duplicate words, keeping first-seen order."""
+    seen = set()
+    out = []
+    for word in words:
+        word = (word or "").lower().strip()
+        if word and word not in seen:
+            seen.add(word)
+            out.append(word)
+    return out
+
+
+class _InFlight:
+    """A word some thread is loading; waiters block on done."""
+
+    __slots__ = ("done", "vector")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.vector: Optional[np.ndarray] = None
+
+
+class EmbeddingStore:
+    """
+    Embeddings from one provider, looked up memory -> disk -> Redis -> fetch.
+
+    Vectors are float32 arrays shared between callers; treat them as
+    read-only.
+    """
+
+    def __init__(self, provider: EmbeddingProvider,
+                 redis: Callable[[], object] = None,
+                 redis_ttl_seconds: int = 86400,
+                 storage_dtype: str = "float32",
+                 memory_size: int = DEFAULT_MEMORY_CACHE_SIZE,
+                 disk_dir: Optional[str] = None,
+                 batch_size: int = DEFAULT_FETCH_BATCH_SIZE):
+        """
+        Args:
+            provider: Source of vectors no tier has; its model name is recorded
+                with cached values (values for other models are misses)
+            redis: Returns the Redis client (called per lookup), or None to skip Redis
+            redis_ttl_seconds: Expiry of emb:{word} keys
+            storage_dtype: Packed dtype for Redis and disk ("float32" or "float16")
+            memory_size: Maximum words kept in the process LRU (0 disables it)
+            disk_dir: Directory for the disk tier, or None to skip it
+            batch_size: Maximum words per fetch call
+        """
+        self.provider = provider
+        self.model = provider.model
+        self._key_prefix = provider.key_prefix
+        self._redis = redis
+        self._redis_ttl = int(redis_ttl_seconds)
+        self._dtype = storage_dtype
+        self._memory_size = max(0, int(memory_size))
+        self._disk_dir = Path(disk_dir) if disk_dir else None
+        self._batch_size = max(1, int(batch_size))
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._counts = {tier: {"hits": 0, "misses": 0, "errors": 0} for tier in TIERS}
+        self._counts["single_flight"] = {"waits": 0}
+
+    # ============== LOOKUPS ==============
+
+    def get(self, word: str) -> np.ndarray:
+        """
+        Embedding for one word, from the first tier that has it.
+
+        Raises:
+            LookupError: The word is empty or could not be fetched
+        """
+        found = self.get_many([word])
+        if not found:
+            raise LookupError(f"No embedding for {word!r}")
+        return next(iter(found.values()))
+
+    def get_many(self, words: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Embeddings for many words, fetching whatever no tier has.
+
+        Returns:
+            Dict of normalized word -> vector; words that could not be
+            fetched are left out
+        """
+        words = normalize_words(words)
+        result = self._from_memory(words)
+        missing = [w for w in words if w not in result]
+        if not missing:
+            return result
+
+        owned, waiting = [], []
+        with self._lock:
+            for word in missing:
+                flight = self._in_flight.get(word)
+                if flight is None:
+                    self._in_flight[word] = _InFlight()
+                    owned.append(word)
+                else:
+                    waiting.append((word, flight))
+
+        loaded = {}
+        try:
+            loaded = self._load(owned, fetch=True)
+        finally:
+            with self._lock:
+                for word in owned:
+                    flight = self._in_flight.pop(word)
+                    flight.vector = loaded.get(word)
+                    flight.done.set()
+        result.update(loaded)
+
+        if waiting:
+            self._count("single_flight", "waits", len(waiting))
+        for word, flight in waiting:
+            if flight.done.wait(SINGLE_FLIGHT_TIMEOUT_SECONDS) and flight.vector is not None:
+                result[word] = flight.vector
+        return result
+
+    def cached(self, words: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Embeddings the cache tiers already hold; never calls fetch."""
+        words = normalize_words(words)
+        result = self._from_memory(words)
+        result.update(self._load([w for w in words if w not in result], fetch=False))
+        return result
+
+    def stats(self) -> dict:
+        """Hit/miss/error counts per tier, plus single-flight waits and LRU size."""
+        with self._lock:
+            counts = {tier: dict(values) for tier, values in self._counts.items()}
+            counts["memory"]["size"] = len(self._memory)
+        return counts
+
+    # ============== TIERS ==============
+
+    def _count(self, tier: str, field: str, n: int = 1):
+        if n:
+            with self._lock:
+                self._counts[tier][field] += n
+
+    def _from_memory(self, words: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        if self._memory_size:
+            with self._lock:
+                for word in words:
+                    vector = self._memory.get(word)
+                    if vector is not None:
+                        self._memory.move_to_end(word)
+                        found[word] = vector
+        self._count("memory", "hits", len(found))
+        self._count("memory", "misses", len(words) - len(found))
+        return found
+
+    def _remember(self, vectors: Dict[str, np.ndarray]):
+        if not self._memory_size or not vectors:
+            return
+        with self._lock:
+            for word, vector in vectors.items():
+                self._memory[word] = vector
+                self._memory.move_to_end(word)
+            while len(self._memory) > self._memory_size:
+                self._memory.popitem(last=False)
+
+    def _load(self, words: List[str], fetch: bool) -> Dict[str, np.ndarray]:
+        """Look words up below the memory tier, filling the tiers above each hit."""
+        if not words:
+            return {}
+        found = self._from_disk(words)
+        from_redis = self._from_redis([w for w in words if w not in found])
+        self._to_disk(from_redis)
+        found.update(from_redis)
+
+        if fetch:
+            fetched = self._from_fetch([w for w in words if w not in found])
+            self._to_redis(fetched)
+            self._to_disk(fetched)
+            found.update(fetched)
+
+        self._remember(found)
+        return found
+
+    def _disk_path(self, word: str) -> Path:
+        digest = hashlib.sha1(f"{self.model}\0{word}".encode("utf-8")).hexdigest()
+        return self._disk_dir / digest[:2] / f"{digest}.emb"
+
+    def _from_disk(self, words: List[str]) -> Dict[str, np.ndarray]:
+        if self._disk_dir is None:
+            return {}
+        found = {}
+        for word in words:
+            try:
+                vector = decode_embedding(self._disk_path(word).read_bytes(), self.model)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                self._count("disk", "errors")
+                continue
+            if vector is not None:
+                found[word] = vector
+        self._count("disk", "hits", len(found))
+        self._count("disk", "misses", len(words) - len(found))
+        return found
+
+    def _to_disk(self, vectors: Dict[str, np.ndarray]):
+        if self._disk_dir is None:
+            return
+        for word, vector in vectors.items():
+            path = self._disk_path(word)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(pack_embedding(vector, self.model, self._dtype))
+                os.replace(tmp, path)
+            except Exception:
+                self._count("disk", "errors")
+
+    def _client(self):
+        if self._redis is None:
+            return None
+        try:
+            return self._redis()
+        except Exception:
+            self._count("redis", "errors")
+            return None
+
+    def _from_redis(self, words: List[str]) -> Dict[str, np.ndarray]:
+        if not words:
+            return {}
+        redis = self._client()
+        if redis is None:
+            return {}
+        try:
+            values = redis.mget(*[redis_key(w, self._key_prefix) for w in words])
+        except Exception as e:
+            print(f"Embedding cache read error: {e}")
+            self._count("redis", "errors")
+            return {}
+
+        found = {}
+        for word, value in zip(words, values):
+            try:
+                vector = decode_embedding(value, self.model)
+            except Exception:
+                vector = None
+            if vector is not None:
+                found[word] = vector
+        self._count("redis", "hits", len(found))
+        self._count("redis", "misses", len(words) - len(found))
+        return found
+
+    def _to_redis(self, vectors: Dict[str, np.ndarray]):
+        """Write fetched vectors with their TTL, in one pipeline request when the client has one."""
+        redis = self._client() if vectors else None
+        if redis is None:
+            return
+        items = [(redis_key(word, self._key_prefix), encode_embedding(vector, self.model, self._dtype))
+                 for word, vector in vectors.items()]
+        try:
+            pipeline = getattr(redis, "pipeline", None)
+            if pipeline is None or len(items) == 1:
+                for key, value in items:
+                    redis.setex(key, self._redis_ttl, value)
+            else:
+                pipe = pipeline()
+                for key, value in items:
+                    pipe.setex(key, self._redis_ttl, value)
+                pipe.exec()
+        except Exception as e:
+            print(f"Embedding cache write error: {e}")
+            self._count("redis", "errors")
+
+    def _from_fetch(self, words: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch in batches; a failed batch is reported and left out (no sleeping retries here)."""
+        found = {}
+        for i in range(0, len(words), self._batch_size):
+            batch = words[i:i + self._batch_size]
+            try:
+                vectors = self.provider.embed(batch)
+            except Exception as e:
+                print(f"Embedding fetch error ({len(batch)} words): {e}")
+                self._count("fetch", "errors")
+                continue
+            for word, vector in zip(batch, vectors):
+                found[word] = np.asarray(vector, dtype=np.float32)
+        self._count("fetch", "hits", len(found))
+        self._count("fetch", "misses", len(words) - len(found))
+        return found
+
+
+# ============== CONSTRUCTION ==============
+
+_shared_store: Optional[EmbeddingStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_store(factory: Callable[[], EmbeddingStore] = None) -> EmbeddingStore:
+    """
+    The process-wide store every embedding lookup shares (one LRU, one
+    single-flight map, one set of counters).
+
+    The first call's factory creates it; later factories are ignored.
+    api/index.py installs its store at import, so other callers' factories
+    only matter outside the API process.
+
+    Raises:
+        RuntimeError: No store exists yet and no factory was given
+    """
+    global _shared_store
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                if factory is None:
+                    raise RuntimeError("No embedding store has been created")
+                _shared_store = factory()
+    return _shared_store
+
+
+def store_from_config(config: dict, provider: EmbeddingProvider = None,
+                      redis: Callable[[], object] = None) -> EmbeddingStore:
+    """
+    Build a store from the "embedding" section of config.json.
+
+    provider defaults to provider_from_config(config).
+
+    EMBEDDING_DISK_CACHE_DIR overrides embedding.disk_cache_dir (unset or
+    empty = no disk tier).
+    """
+    settings = (config or {}).get("embedding", {})
+    return EmbeddingStore(
+        provider=provider or provider_from_config(config),
+        redis=redis,
+        redis_ttl_seconds=settings.get("cache_expiry_seconds", 86400),
+        storage_dtype=settings.get("storage_dtype", "float32"),
+        memory_size=settings.get("memory_cache_size", DEFAULT_MEMORY_CACHE_SIZE),
+        disk_dir=os.getenv("EMBEDDING_DISK_CACHE_DIR", settings.get("disk_cache_dir")) or None,
+        batch_size=settings.get("fetch_batch_size", DEFAULT_FETCH_BATCH_SIZE),
+    )
@@ -35,8 +35,10 @@ For more details, see README.md
 """
 
 import json
+import functools
 import hashlib
 import hmac
+import importlib
 import os
 import re
 import html
@@ -52,12 +54,48 @@ from pathlib import Path
 
 import jwt
 import numpy as np
-import requests
-from openai import OpenAI
-from wordfreq import word_frequency
-from upstash_redis import Redis
 from upstash_ratelimit import Ratelimit, FixedWindow
 
+from data.redis_batch import GuardedBatch, RedisBatch, VersionConflict, delete_if_equal, zadd_if_field
+from data.redis_client import create_redis_client
+from data.redis_metrics import (
+    add_redis_observer,
+    current_request_trace,
+    end_request_trace,
+    redis_command_totals,
+    start_request_trace,
+)
+from data.game_events import (
+    queue_game_event,
+    latest_event_id,
+    oldest_event_id,
+    is_event_id,
+    event_id_before,
+    parse_stream_entries,
+    format_sse,
+    events_key,
+)
+from embeddings.similarity_matrix import SimilarityMatrix
+from embeddings.providers import provider_from_config
+from embeddings.store import get_store, store_from_config
+from embeddings.artifacts import (
+    theme_id as _theme_id,
+    content_version as theme_matrix_version,
+    load_similarity_artifact,
+)
+from ai.beliefs import EIG_BINS, NemesisBeliefs, distribution_entropy
+from ai.memory import AI_STATE_FIELDS, pack_ai_state, unpack_ai_state
+from router import RouteTable
+from metrics import (
+    DEFAULT_WINDOW,
+    FAST_BUCKETS,
+    WAIT_BUCKETS,
+    MetricsFlusher,
+    MetricsRegistry,
+    RouteStats,
+    render,
+)
+
 # Import security modules with graceful fallback
 # These provide enhanced security features but the app can run without them
 _SECURITY_MODULES_AVAILABLE = False
@@ -422,6 +460,87 @@ WORDS_PER_PLAYER = max(1, min(50, WORDS_PER_PLAYER))
 # Presence settings (spectator counts, etc.)
 PRESENCE_TTL_SECONDS = int((CONFIG.get("presence", {}) or {}).get("ttl_seconds", 15) or 15)
 
+# Long-poll settings (GET /api/games/{code}/wait)
+LONG_POLL_MAX_SECONDS = float((CONFIG.get("long_poll", {}) or {}).get("max_seconds", 25) or 25)
+LONG_POLL_CHECK_SECONDS = float((CONFIG.get("long_poll", {}) or {}).get("check_interval_seconds", 0.5) or 0.5)
+LONG_POLL_MAX_CHECK_SECONDS = float((CONFIG.get("long_poll", {}) or {}).get("max_check_interval_seconds", 2) or 2)
+
+# Server-Sent Events settings (GET /api/games/{code}/events)
+EVENTS_CONFIG = CONFIG.get("events", {}) or {}
+EVENTS_MAX_SECONDS = float(EVENTS_CONFIG.get("max_seconds", 300) or 300)
+EVENTS_SERVERLESS_MAX_SECONDS = float(EVENTS_CONFIG.get("serverless_max_seconds", 25) or 25)
+EVENTS_CHECK_SECONDS = float(EVENTS_CONFIG.get("check_interval_seconds", 0.5) or 0.5)
+EVENTS_KEEPALIVE_SECONDS = float(EVENTS_CONFIG.get("keepalive_seconds", 15) or 15)
+EVENTS_RETRY_MS = int(EVENTS_CONFIG.get("retry_ms", 1000) or 1000)
+# Serverless functions buffer responses and are time-limited, so streams there
+# end after the first batch of events (or serverless_max_seconds) and clients
+# reconnect with Last-Event-ID. The threaded dev server streams continuously.
+SERVERLESS = bool(os.getenv('VERCEL'))
+
+# Metrics (GET /api/admin/metrics, Prometheus text format). Kept per process;
+# with metrics.flush_seconds > 0 each instance also writes its snapshot to
+# Redis that often, and scrapes merge every live instance.
+METRICS_CONFIG = CONFIG.get("metrics", {}) or {}
+SERVER_TIMING_ENABLED = env_bool("SERVER_TIMING", METRICS_CONFIG.get("server_timing", True))
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", METRICS_CONFIG.get("flush_seconds", 0)) or 0)
+METRICS_FLUSH_TTL_SECONDS = int(METRICS_CONFIG.get("flush_ttl_seconds", 3600) or 3600)
+
+METRICS = MetricsRegistry(prefix="embeddle_")
+METRICS.counter("http_requests_total", "Requests served, by route and status")
+METRICS.histogram("http_request_duration_seconds", "Handler time in seconds, by route and status")
+METRICS.histogram("http_stream_duration_seconds", "Streaming connection lifetimes in seconds, by route",
+                  WAIT_BUCKETS)
+METRICS.histogram("redis_roundtrip_duration_seconds",
+                  "Redis round trips (a command, pipeline or script) in seconds, by command", FAST_BUCKETS)
+METRICS.counter("redis_roundtrip_errors_total", "Redis round trips that failed, by command")
+METRICS.counter("redis_commands_total", "Redis commands sent (pipelined commands counted singly), by command")
+METRICS.histogram("embedding_request_duration_seconds", "Embedding provider calls in seconds, by provider")
+METRICS.counter("embedding_request_errors_total", "Embedding provider calls that failed, by provider")
+METRICS.counter("embedding_words_total", "Words sent to the embedding provider, by provider")
+METRICS.counter("embedding_tokens_total", "Tokens billed by the embedding provider, by provider")
+METRICS.counter("embedding_cache_lookups_total", "Embedding store lookups, by tier and result")
+METRICS.counter("similarity_matrix_lookups_total",
+                "Theme similarity matrix lookups by source (computed: built after a miss)")
+METRICS.histogram("ai_decision_duration_seconds", "AI decisions in seconds, by difficulty and decision",
+                  FAST_BUCKETS)
+METRICS.counter("matchmaking_matches_total", "Matches created from the queue, by mode")
+METRICS.histogram("matchmaking_wait_seconds", "Queue wait of matched players in seconds, by mode", WAIT_BUCKETS)
+
+
+def _observe_redis_roundtrip(name: str, commands: int, seconds: float, error: bool):
+    METRICS.observe("redis_roundtrip_duration_seconds", seconds, command=name)
+    if error:
+        METRICS.inc("redis_roundtrip_errors_total", command=name)
+
+
+def _observe_embedding_call(provider, words: int, seconds: float, tokens: int, error: bool):
+    METRICS.observe("embedding_request_duration_seconds", seconds, provider=provider.name)
+    METRICS.inc("embedding_words_total", words, provider=provider.name)
+    if tokens:
+        METRICS.inc("embedding_tokens_total", tokens, provider=provider.name)
+    if error:
+        METRICS.inc("embedding_request_errors_total", provider=provider.name)
+
+
+def _timed_ai_decision(decision: str, player_arg: int):
+    """Record an AI function's run time by the AI player's difficulty (args[player_arg])."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                player = args[player_arg] if len(args) > player_arg else kwargs.get('ai_player')
+                difficulty = (player or {}).get('difficulty', 'rookie') if isinstance(player, dict) else 'unknown'
+                METRICS.observe("ai_decision_duration_seconds", time.perf_counter() - start,
+                                difficulty=difficulty, decision=decision)
+        return timed
+    return wrap
+
+
+add_redis_observer(_observe_redis_roundtrip)
+
 # Ranked settings (ELO/MMR)
 RANKED_INITIAL_MMR = int((CONFIG.get("ranked", {}) or {}).get("initial_mmr", 1000) or 1000)
 RANKED_K_FACTOR = float((CONFIG.get("ranked", {}) or {}).get("k_factor", 30) or 30)
@@ -478,8 +597,12 @@ def get_time_control(is_ranked: bool, preset: str = "rapid", is_quickplay: bool
     }
 
 # Embedding settings
-EMBEDDING_MODEL = CONFIG.get("embedding", {}).get("model", "text-embedding-3-small")
-EMBEDDING_CACHE_SECONDS = CONFIG.get("embedding", {}).get("cache_expiry_seconds", 86400)
+# Provider: OpenAI, or deterministic local vectors (EMBEDDING_PROVIDER=local) for
+# offline development. Artifacts and cached vectors are keyed by its model name.
+EMBEDDING_PROVIDER = provider_from_config(CONFIG, lambda: get_openai_client())
+EMBEDDING_PROVIDER.add_observer(_observe_embedding_call)
+EMBEDDING_MODEL = EMBEDDING_PROVIDER.model
+# Cache settings (expiry, storage dtype, LRU size, disk dir) are read by store_from_config
 
 # Load pre-generated themes from individual JSON files in api/themes/ directory
 def load_themes():
@@ -962,7 +1085,9 @@ AI_DIFFICULTY_CONFIG = {
         "self_leak_hard_max": 0.80,          # Hard cutoff lower
         "panic_danger": "safe",              # Never panics (always calculated)
         "panic_aggression_boost": 0.0,       # No emotional response
-        "candidate_pool": 15,                # Reduced for speed (was 30)
+        "candidate_pool": 15,                # Priority candidates, scored first
+        "score_budget_ms": 60,               # Per-turn scoring time budget (all words usually fit)
+        "info_gain_bins": 41,                # Observation bins for exact information gain
         "clue_words_per_target": 5,          # Uses more intel
         "makes_mistakes": False,             # No human-like errors
         "has_personality": False,            # No personality modifiers
@@ -1055,7 +1180,7 @@ def create_ai_player(difficulty: str, existing_names: list) -> dict:
 
 # ============== NEMESIS AI FUNCTIONS ==============
 
-def _ai_select_isolated_word(word_pool: list) -> str:
+def _ai_select_isolated_word(word_pool: list, game: dict = None) -> str:
     """
     Nemesis word selection: pick the most semantically isolated word.
     
@@ -1073,20 +1198,19 @@ def _ai_select_isolated_word(word_pool: list) -> str:
     
     try:
         # Fast path: use pre-computed similarity matrix if available
-        similarity_matrix = game.get('theme_similarity_matrix') if game else None
+        similarity_matrix = get_game_similarity_matrix(game)
         if similarity_matrix:
             isolation_scores = []
             for word in word_pool:
                 word_lower = word.lower()
-                word_sims = similarity_matrix.get(word_lower, {})
-                if not word_sims:
+                if word_lower not in similarity_matrix:
                     continue
                 
                 similarities = []
                 for other_word in word_pool:
                     if other_word.lower() == word_lower:
                         continue
-                    sim = word_sims.get(other_word.lower(), 0.5)
+                    sim = similarity_matrix.sim(word_lower, other_word.lower(), 0.5)
                     similarities.append(sim)
                 
                 if similarities:
@@ -1181,20 +1305,19 @@ def _ai_select_counter_intel_word(ai_player: dict, game: dict, word_pool: list)
                     dangerous_words.append((word, sims[ai_id]))
         
         # Fast path: use pre-computed similarity matrix if available
-        similarity_matrix = game.get('theme_similarity_matrix') if game else None
+        similarity_matrix = get_game_similarity_matrix(game)
         if similarity_matrix:
             word_scores = []
             for word in word_pool:
                 word_lower = word.lower()
-                word_sims = similarity_matrix.get(word_lower, {})
-                if not word_sims:
+                if word_lower not in similarity_matrix:
                     continue
                 
                 # Distance from dangerous words
                 danger_distance = 0
                 if dangerous_words:
                     for dword, dsim in dangerous_words:
-                        sim_to_danger = word_sims.get(dword.lower(), 0.5)
+                        sim_to_danger = similarity_matrix.sim(word_lower, dword.lower(), 0.5)
                         danger_distance += (1 - sim_to_danger) * dsim
                     danger_distance /= len(dangerous_words)
                 else:
@@ -1205,7 +1328,7 @@ def _ai_select_counter_intel_word(ai_player: dict, game: dict, word_pool: list)
                 for other_word in word_pool:
                     if other_word.lower() == word_lower:
                         continue
-                    isolation_sims.append(word_sims.get(other_word.lower(), 0.5))
+                    isolation_sims.append(similarity_matrix.sim(word_lower, other_word.lower(), 0.5))
                 
                 if isolation_sims:
                     avg_sim = sum(isolation_sims) / len(isolation_sims)
@@ -1287,113 +1410,55 @@ def _ai_select_counter_intel_word(ai_player: dict, game: dict, word_pool: list)
         return random.choice(word_pool)
 
 
+def _nemesis_load_beliefs(ai_player: dict, game: dict, init: bool = True) -> NemesisBeliefs:
+    """
+    Load Nemesis's belief vectors (see ai/beliefs.py) from its memory.
+
+    With init, every alive opponent it has no beliefs about yet gets a
+    uniform prior. Changes are kept only via _nemesis_store_beliefs.
+    """
+    memory = ai_player.get("ai_memory", {})
+    theme_words = game.get("theme", {}).get("words", [])
+    beliefs = NemesisBeliefs.from_memory(memory.get("nemesis_beliefs"), theme_words)
+    if init:
+        for player in game.get("players", []):
+            pid = player.get("id")
+            if pid == ai_player.get("id"):
+                continue
+            if not player.get("is_alive", True):
+                continue
+            beliefs.ensure_opponent(pid)
+    return beliefs
+
+
+def _nemesis_store_beliefs(ai_player: dict, beliefs: NemesisBeliefs):
+    memory = ai_player.get("ai_memory", {})
+    memory["nemesis_beliefs"] = beliefs.to_memory()
+    ai_player["ai_memory"] = memory
+
+
 def _nemesis_init_beliefs(ai_player: dict, game: dict):
     """
     Initialize Bayesian belief tracking for Nemesis.
     
     For each opponent, maintain a probability distribution over their possible words.
-    Initially uniform over their word pool (or theme words if pool unknown).
+    Initially uniform over the theme words (we don't know their pool).
     """
-    memory = ai_player.get("ai_memory", {})
-    if "nemesis_beliefs" not in memory:
-        memory["nemesis_beliefs"] = {}
-    
-    beliefs = memory["nemesis_beliefs"]
-    theme_words = game.get("theme", {}).get("words", [])
-    
-    for player in game.get("players", []):
-        pid = player.get("id")
-        if pid == ai_player.get("id"):
-            continue
-        if not player.get("is_alive", True):
-            continue
-        if pid not in beliefs:
-            # Initialize uniform distribution over theme words
-            # In practice, we don't know their pool, so use theme words
-            word_count = len(theme_words)
-            if word_count > 0:
-                uniform_prob = 1.0 / word_count
-                beliefs[pid] = {w.lower(): uniform_prob for w in theme_words}
-            else:
-                beliefs[pid] = {}
-    
-    memory["nemesis_beliefs"] = beliefs
-    ai_player["ai_memory"] = memory
+    _nemesis_store_beliefs(ai_player, _nemesis_load_beliefs(ai_player, game))
 
 
 def _nemesis_update_beliefs(ai_player: dict, game: dict, guess_word: str, similarities: dict):
     """
     Update Bayesian beliefs based on observed similarity scores.
     
-    For each opponent, update P(word | observations) using the similarity
-    between the guess and each possible word.
-    
-    Uses pre-computed similarity matrix for O(1) lookups when available.
+    For each opponent, P(word | obs) ∝ P(obs | word) * P(word), with a
+    Gaussian likelihood around the guess's similarity-matrix row - one
+    array operation per opponent.
     """
-    import math
-    
-    memory = ai_player.get("ai_memory", {})
-    beliefs = memory.get("nemesis_beliefs", {})
-    
-    if not beliefs:
-        _nemesis_init_beliefs(ai_player, game)
-        beliefs = memory.get("nemesis_beliefs", {})
-    
-    guess_lower = guess_word.lower()
-    
-    # Fast path: use pre-computed similarity matrix
-    matrix = game.get('theme_similarity_matrix') if game else None
-    
-    for player_id, observed_sim in similarities.items():
-        if player_id == ai_player.get("id"):
-            continue
-        if player_id not in beliefs:
-            continue
-        
-        player_beliefs = beliefs[player_id]
-        if not player_beliefs:
-            continue
-        
-        # Bayesian update: P(word | obs) ∝ P(obs | word) * P(word)
-        # P(obs | word) = likelihood that we'd see this similarity if word is their secret
-        # We model this as a Gaussian centered on the expected similarity
-        
-        new_beliefs = {}
-        total_prob = 0.0
-        
-        for word, prior_prob in player_beliefs.items():
-            word_lower = word.lower()
-            
-            # Get expected similarity from matrix or compute as fallback
-            expected_sim = None
-            if matrix and guess_lower in matrix:
-                expected_sim = matrix[guess_lower].get(word_lower)
-            
-            if expected_sim is None:
-                # Fallback: skip this word (rare - only if matrix incomplete)
-                new_beliefs[word] = prior_prob
-                total_prob += prior_prob
-                continue
-            
-            # Likelihood: how well does observed similarity match expected?
-            # Use Gaussian likelihood with sigma=0.15
-            sigma = 0.15
-            diff = observed_sim - expected_sim
-            likelihood = math.exp(-(diff ** 2) / (2 * sigma ** 2))
-            
-            posterior = prior_prob * likelihood
-            new_beliefs[word] = posterior
-            total_prob += posterior
-        
-        # Normalize
-        if total_prob > 0:
-            for word in new_beliefs:
-                new_beliefs[word] /= total_prob
-        
-        beliefs[player_id] = new_beliefs
-    
-    memory["nemesis_beliefs"] = beliefs
-    ai_player["ai_memory"] = memory
+    beliefs = _nemesis_load_beliefs(ai_player, game)
+    beliefs.update(get_game_similarity_matrix(game), guess_word, similarities,
+                   skip_id=ai_player.get("id"))
+    _nemesis_store_beliefs(ai_player, beliefs)
 
 
 def _nemesis_get_top_candidates(ai_player: dict, player_id: str, k: int = 5) -> list:
@@ -1403,99 +1468,62 @@ def _nemesis_get_top_candidates(ai_player: dict, player_id: str, k: int = 5) ->
     Returns list of (word, probability) tuples sorted by probability.
     """
     memory = ai_player.get("ai_memory", {})
-    beliefs = memory.get("nemesis_beliefs", {})
-    
-    player_beliefs = beliefs.get(player_id, {})
-    if not player_beliefs:
-        return []
-    
-    sorted_beliefs = sorted(player_beliefs.items(), key=lambda x: x[1], reverse=True)
-    return sorted_beliefs[:k]
+    beliefs = NemesisBeliefs.from_memory(memory.get("nemesis_beliefs"), [])
+    return beliefs.top_candidates(player_id, k)
 
 
-def _nemesis_calculate_entropy(probabilities: dict) -> float:
-    """Calculate Shannon entropy of a probability distribution."""
-    import math
-    
-    entropy = 0.0
-    for prob in probabilities.values():
-        if prob > 0:
-            entropy -= prob * math.log2(prob)
-    return entropy
+def _nemesis_calculate_entropy(probabilities) -> float:
+    """Calculate Shannon entropy of a probability distribution (dict or vector)."""
+    if isinstance(probabilities, dict):
+        probabilities = list(probabilities.values())
+    return distribution_entropy(probabilities)
+
+
+# Candidates scored per batch in _nemesis_choose_guess (the time budget is checked between batches)
+NEMESIS_SCORE_BATCH = 64
+
+
+def _nemesis_opponent_ids(ai_player: dict, game: dict) -> list:
+    """Ids of the alive players other than this AI."""
+    return [
+        p.get("id") for p in game.get("players", [])
+        if p.get("id") != ai_player.get("id") and p.get("is_alive", True)
+    ]
 
 
 def _nemesis_expected_info_gain(ai_player: dict, game: dict, guess_word: str, 
-                                 available_words: list) -> float:
+                                 available_words: list, beliefs: NemesisBeliefs = None) -> float:
     """
     Calculate expected information gain from making a guess.
     
-    FAST VERSION: Uses a heuristic based on how well the guess word
-    discriminates between high-probability and low-probability candidates
-    in our beliefs. Uses pre-computed similarity matrix for speed.
+    Exact expected reduction in posterior entropy (bits), summed over alive
+    opponents, under a discretized version of the belief model's
+    observation likelihood (see ai/beliefs.py). 0.0 if the similarity
+    matrix doesn't know the guess.
     """
-    memory = ai_player.get("ai_memory", {})
-    beliefs = memory.get("nemesis_beliefs", {})
-    
-    if not beliefs:
+    if beliefs is None:
+        beliefs = _nemesis_load_beliefs(ai_player, game, init=False)
+    if not beliefs.probs:
         return 0.0
     
-    guess_lower = guess_word.lower()
-    
-    # Fast path: use pre-computed similarity matrix
-    matrix = game.get('theme_similarity_matrix') if game else None
-    
-    total_info_gain = 0.0
-    
-    for player in game.get("players", []):
-        pid = player.get("id")
-        if pid == ai_player.get("id"):
-            continue
-        if not player.get("is_alive", True):
-            continue
-        if pid not in beliefs:
-            continue
-        
-        player_beliefs = beliefs[pid]
-        if not player_beliefs:
-            continue
-        
-        # Fast heuristic: measure variance in similarities to top candidates
-        # High variance = good discriminating power = high info gain
-        top_candidates = sorted(player_beliefs.items(), key=lambda x: x[1], reverse=True)[:5]
-        if not top_candidates:
-            continue
-        
-        similarities = []
-        for word, prob in top_candidates:
-            word_lower = word.lower()
-            
-            # Get similarity from matrix
-            if matrix and guess_lower in matrix:
-                sim = matrix[guess_lower].get(word_lower)
-                if sim is not None:
-                    similarities.append(sim)
-        
-        if len(similarities) >= 2:
-            # Variance of similarities indicates discrimination power
-            mean_sim = sum(similarities) / len(similarities)
-            variance = sum((s - mean_sim) ** 2 for s in similarities) / len(similarities)
-            total_info_gain += variance * 10  # Scale up for scoring
-    
-    return total_info_gain
+    config = AI_DIFFICULTY_CONFIG.get("nemesis", {})
+    rows = beliefs.expected_similarity_rows(get_game_similarity_matrix(game), [guess_word])
+    gains = beliefs.expected_information_gain(rows, _nemesis_opponent_ids(ai_player, game),
+                                              int(config.get("info_gain_bins", EIG_BINS)))
+    return float(gains[0])
 
 
 def _nemesis_calculate_elimination_prob(ai_player: dict, game: dict, 
-                                         guess_word: str) -> dict:
+                                         guess_word: str, beliefs: NemesisBeliefs = None) -> dict:
     """
     Calculate probability that a guess will eliminate each opponent.
     
     Returns dict of player_id -> probability of elimination.
     """
-    memory = ai_player.get("ai_memory", {})
-    beliefs = memory.get("nemesis_beliefs", {})
+    if beliefs is None:
+        beliefs = _nemesis_load_beliefs(ai_player, game, init=False)
     
     elimination_probs = {}
-    guess_lower = guess_word.lower()
     
     for player in game.get("players", []):
         pid = player.get("id")
@@ -1504,66 +1532,97 @@ def _nemesis_calculate_elimination_prob(ai_player: dict, game: dict,
         if not player.get("is_alive", True):
             continue
         
-        player_beliefs = beliefs.get(pid, {})
-        
         # Probability of elimination = probability that guess IS their word
-        elim_prob = player_beliefs.get(guess_lower, 0.0)
-        elimination_probs[pid] = elim_prob
+        elimination_probs[pid] = beliefs.probability(pid, guess_word)
     
     return elimination_probs
 
 
 def _nemesis_score_guess(ai_player: dict, game: dict, guess_word: str,
-                         available_words: list) -> float:
+                         available_words: list, beliefs: NemesisBeliefs = None,
+                         threat_levels: dict = None) -> float:
     """
     Calculate total score for a guess using Nemesis strategy.
     
+    See _nemesis_score_candidates; this scores a single word.
+    """
+    if beliefs is None:
+        beliefs = _nemesis_load_beliefs(ai_player, game, init=False)
+    return float(_nemesis_score_candidates(ai_player, game, [guess_word], beliefs, threat_levels)[0])
+
+
+def _nemesis_score_candidates(ai_player: dict, game: dict, words: list,
+                              beliefs: NemesisBeliefs, threat_levels: dict = None) -> np.ndarray:
+    """
+    Score candidate guesses using Nemesis strategy, all at once.
+    
     Score combines:
     - Expected information gain (learning about opponents)
     - Elimination probability (chance of direct kill)
     - Self-leak penalty (risk of revealing our word)
     - Threat assessment (priority for dangerous opponents)
+    
+    threat_levels (player_id -> threat) don't depend on the guess; callers
+    scoring several batches pass them in once.
+    
+    Returns:
+        float64 array of scores aligned with words
     """
     config = AI_DIFFICULTY_CONFIG.get("nemesis", {})
+    matrix = get_game_similarity_matrix(game)
+    opponents = _nemesis_opponent_ids(ai_player, game)
+    if threat_levels is None:
+        threat_levels = {pid: _nemesis_get_threat_level(ai_player, game, pid) for pid in opponents}
     
-    # Information gain component
-    info_gain = _nemesis_expected_info_gain(ai_player, game, guess_word, available_words)
-    
-    # Elimination probability
-    elim_probs = _nemesis_calculate_elimination_prob(ai_player, game, guess_word)
-    total_elim_prob = sum(elim_probs.values())
+    word_ids = np.array([beliefs.index.get(w.lower(), -1) for w in words], dtype=np.int64)
+    in_theme = word_ids >= 0
+    safe_ids = np.where(in_theme, word_ids, 0)
     
-    # Threat-weighted elimination (prioritize eliminating players targeting us)
-    threat_weighted_elim = 0.0
-    for pid, elim_prob in elim_probs.items():
-        threat_level = _nemesis_get_threat_level(ai_player, game, pid)
-        threat_weighted_elim += elim_prob * (1 + threat_level)
+    # Information gain component
+    if beliefs.probs:
+        rows = beliefs.expected_similarity_rows(matrix, words)
+        info_gain = beliefs.expected_information_gain(
+            rows, opponents, int(config.get("info_gain_bins", EIG_BINS)))
+    else:
+        info_gain = np.zeros(len(words))
+    
+    # Elimination probability (probability that the guess IS their word),
+    # and threat-weighted elimination (prioritize eliminating players targeting us)
+    total_elim_prob = np.zeros(len(words))
+    threat_weighted_elim = np.zeros(len(words))
+    for pid in opponents:
+        vector = beliefs.probs.get(pid)
+        if vector is None or len(vector) != len(beliefs.words):
+            continue
+        elim_prob = np.where(in_theme, vector[safe_ids], 0.0)
+        total_elim_prob += elim_prob
+        threat_weighted_elim += elim_prob * (1 + threat_levels.get(pid, 0.0))
     
-    # Self-leak penalty (use cached embeddings)
-    self_sim = _ai_self_similarity(ai_player, guess_word, game)
-    if self_sim is None:
-        self_sim = 0.0
+    # Self-leak penalty (matrix row of our secret; cached embeddings for anything it lacks)
+    my_secret = (ai_player.get("secret_word") or "").lower().strip()
+    self_row = beliefs.expected_similarities(matrix, my_secret) if my_secret else None
+    self_sims = np.full(len(words), np.nan)
+    if self_row is not None:
+        self_sims = np.where(in_theme, self_row[safe_ids], np.nan)
+    for i in np.flatnonzero(np.isnan(self_sims)):
+        sim = _ai_self_similarity(ai_player, words[i], game)
+        self_sims[i] = 0.0 if sim is None else sim
     
     soft_max = float(config.get("self_leak_soft_max", 0.65))
     hard_max = float(config.get("self_leak_hard_max", 0.80))
-    
-    if self_sim > hard_max:
-        leak_penalty = 10.0  # Severe penalty
-    elif self_sim > soft_max:
-        leak_penalty = (self_sim - soft_max) * 5.0
-    else:
-        leak_penalty = 0.0
+    leak_penalty = np.where(
+        self_sims > hard_max, 10.0,  # Severe penalty
+        np.where(self_sims > soft_max, (self_sims - soft_max) * 5.0, 0.0),
+    )
     
     # Combined score
     # Weights tuned for aggressive but safe play
-    score = (
-        info_gain * 0.3 +           # Learning value
-        total_elim_prob * 2.0 +      # Direct elimination value
-        threat_weighted_elim * 1.0 - # Threat-weighted bonus
-        leak_penalty                 # Safety penalty
+    return (
+        info_gain * 0.3 +              # Learning value
+        total_elim_prob * 2.0 +        # Direct elimination value
+        threat_weighted_elim * 1.0 -   # Threat-weighted bonus
+        leak_penalty                   # Safety penalty
     )
-    
-    return score
 
 
 def _nemesis_get_threat_level(ai_player: dict, game: dict, opponent_id: str) -> float:
@@ -1637,7 +1696,8 @@ def _nemesis_choose_guess(ai_player: dict, game: dict) -> str:
     config = AI_DIFFICULTY_CONFIG.get("nemesis", {})
     
     # Initialize beliefs if needed
-    _nemesis_init_beliefs(ai_player, game)
+    beliefs = _nemesis_load_beliefs(ai_player, game)
+    _nemesis_store_beliefs(ai_player, beliefs)
     
     # Get stale guessed words (guessed but no word_change since)
     stale_guessed = _get_stale_guessed_words(game)
@@ -1661,31 +1721,47 @@ def _nemesis_choose_guess(ai_player: dict, game: dict) -> str:
     if not available_words:
         return None
     
-    # Get candidate pool size
+    # Priority candidates go first, so they are scored even if the time
+    # budget runs out; normally every available word gets scored.
     pool_size = int(config.get("candidate_pool", 30))
-    
-    # For efficiency, evaluate a sample of candidates
     if len(available_words) > pool_size:
-        # Prioritize words that are likely to be opponents' secrets
-        candidates = _nemesis_get_priority_candidates(ai_player, game, available_words, pool_size)
+        priority = _nemesis_get_priority_candidates(ai_player, game, available_words, pool_size, beliefs)
+        priority_set = set(priority)
+        candidates = priority + [w for w in available_words if w not in priority_set]
     else:
         candidates = available_words
+    if get_game_similarity_matrix(game) is None:
+        # Self-leak checks would need an embedding lookup per word
+        candidates = candidates[:pool_size]
+    
+    # Threat levels don't depend on the candidate - compute them once
+    threat_levels = {
+        pid: _nemesis_get_threat_level(ai_player, game, pid)
+        for pid in _nemesis_opponent_ids(ai_player, game)
+    }
     
-    # Score each candidate
+    # Score candidates in batches until done or out of time
+    budget = float(config.get("score_budget_ms", 60)) / 1000.0
+    deadline = time.perf_counter() + budget
     best_word = None
     best_score = float('-inf')
     
-    for word in candidates:
-        score = _nemesis_score_guess(ai_player, game, word, available_words)
-        if score > best_score:
-            best_score = score
-            best_word = word
+    for start in range(0, len(candidates), NEMESIS_SCORE_BATCH):
+        batch = candidates[start:start + NEMESIS_SCORE_BATCH]
+        scores = _nemesis_score_candidates(ai_player, game, batch, beliefs, threat_levels)
+        i = int(np.argmax(scores))
+        if scores[i] > best_score:
+            best_score = float(scores[i])
+            best_word = batch[i]
+        if time.perf_counter() > deadline:
+            break
     
     return best_word if best_word else random.choice(available_words)
 
 
 def _nemesis_get_priority_candidates(ai_player: dict, game: dict, 
-                                      available_words: list, count: int) -> list:
+                                      available_words: list, count: int,
+                                      beliefs: NemesisBeliefs = None) -> list:
     """
     Get priority candidate words for evaluation.
     
@@ -1696,24 +1772,23 @@ def _nemesis_get_priority_candidates(ai_player: dict, game: dict,
     """
     import random
     
-    memory = ai_player.get("ai_memory", {})
-    beliefs = memory.get("nemesis_beliefs", {})
-    matrix = game.get('theme_similarity_matrix') if game else None
+    if beliefs is None:
+        beliefs = _nemesis_load_beliefs(ai_player, game, init=False)
+    matrix = get_game_similarity_matrix(game)
     
     priority_words = set()
     
-    # Add top candidates from beliefs
-    for pid, player_beliefs in beliefs.items():
-        top_words = sorted(player_beliefs.items(), key=lambda x: x[1], reverse=True)[:10]
-        for word, prob in top_words:
-            if word in [w.lower() for w in available_words]:
-                # Find original casing
-                for aw in available_words:
-                    if aw.lower() == word:
-                        priority_words.add(aw)
-                        break
-    
-    # Add words similar to recent high-similarity guesses (using similarity matrix)
+    # Add top candidates from beliefs (in their original casing)
+    available_by_lower = {}
+    for aw in available_words:
+        available_by_lower.setdefault(aw.lower(), aw)
+    for pid in beliefs.probs:
+        for word, prob in beliefs.top_candidates(pid, 10):
+            if word in available_by_lower:
+                priority_words.add(available_by_lower[word])
+    
+    # Add words similar to recent high-similarity guesses (sorted neighbour table)
+    available_lower = set(available_by_lower)
     for player in game.get("players", []):
         pid = player.get("id")
         if pid == ai_player.get("id"):
@@ -1722,13 +1797,9 @@ def _nemesis_get_priority_candidates(ai_player: dict, game: dict,
         for word, sim in top_guesses:
             if sim > 0.5:
                 word_lower = word.lower()
-                # Find similar words using similarity matrix
                 if matrix and word_lower in matrix:
-                    for aw in available_words[:50]:  # Sample for efficiency
-                        aw_lower = aw.lower()
-                        sim_to_word = matrix[word_lower].get(aw_lower)
-                        if sim_to_word is not None and sim_to_word > 0.6:
-                            priority_words.add(aw)
+                    for similar, _ in matrix.neighbors.within(word_lower, 0.6, allowed=available_lower):
+                        priority_words.add(available_by_lower[similar])
     
     # Fill remaining with random sample
     remaining = count - len(priority_words)
@@ -1740,7 +1811,8 @@ def _nemesis_get_priority_candidates(ai_player: dict, game: dict,
     return list(priority_words)[:count]
 
 
-def ai_select_secret_word(ai_player: dict, word_pool: list) -> str:
+@_timed_ai_decision("secret", 0)
+def ai_select_secret_word(ai_player: dict, word_pool: list, game: dict = None) -> str:
     """AI selects a secret word based on difficulty."""
     import random
     
@@ -1775,7 +1847,7 @@ def ai_select_secret_word(ai_player: dict, word_pool: list) -> str:
         elif selection_mode == "isolated":
             # Nemesis strategy: pick words that are semantically isolated
             # (hard to triangulate because similar words don't exist in theme)
-            return _ai_select_isolated_word(word_pool)
+            return _ai_select_isolated_word(word_pool, game)
         
         return random.choice(word_pool)
     except Exception as e:
@@ -1859,34 +1931,32 @@ def ai_find_similar_words(target_word: str, theme_words: list, guessed_words: li
     Note: guessed_words parameter is kept for API compatibility but no longer used for filtering.
     Bots should be able to re-guess words because players may have changed their words.
     
-    Uses pre-computed similarity matrix for O(1) lookups when available.
+    Uses the theme's pre-computed neighbour table when available.
     """
     try:
         target_lower = target_word.lower()
         
-        # Fast path: use pre-computed similarity matrix
-        matrix = game.get('theme_similarity_matrix') if game else None
+        # Fast path: walk the theme's sorted neighbour table
+        matrix = get_game_similarity_matrix(game)
         if matrix and target_lower in matrix:
-            candidates = []
+            by_lower = {}
             for word in theme_words:
-                word_lower = word.lower()
-                sim = matrix[target_lower].get(word_lower, 0)
-                candidates.append((word, sim))
-            candidates.sort(key=lambda x: x[1], reverse=True)
-            return [c[0] for c in candidates[:count]]
+                by_lower.setdefault(word.lower(), word)
+            nearest = matrix.neighbors.nearest(target_lower, count, allowed=set(by_lower))
+            return [by_lower[w] for w, _ in nearest]
         
         # Fallback: use cached embeddings (shouldn't happen often if matrix is pre-computed)
         theme_embeddings = get_theme_embeddings(game) if game else {}
         
         target_embedding = theme_embeddings.get(target_lower)
-        if not target_embedding:
+        if target_embedding is None:
             target_embedding = get_embedding(target_word, game)
         
         candidates = []
         for word in theme_words:
             word_lower = word.lower()
             word_embedding = theme_embeddings.get(word_lower)
-            if not word_embedding:
+            if word_embedding is None:
                 word_embedding = get_embedding(word, game)
             sim = cosine_similarity(target_embedding, word_embedding)
             candidates.append((word, sim))
@@ -2041,9 +2111,9 @@ def _ai_self_similarity(ai_player: dict, word: str, game: dict = None) -> Option
         
         # Fast path: use pre-computed similarity matrix
         if game and my_secret:
-            matrix = game.get('theme_similarity_matrix')
+            matrix = get_game_similarity_matrix(game)
             if matrix and my_secret in matrix:
-                sim = matrix[my_secret].get(word_lower)
+                sim = matrix.sim(my_secret, word_lower)
                 if sim is not None:
                     return float(sim)
         
@@ -2057,14 +2127,14 @@ def _ai_self_similarity(ai_player: dict, word: str, game: dict = None) -> Option
             # Legacy fallback: use stored embedding if cache miss
             secret_emb = ai_player.get("secret_embedding")
         
-        if not secret_emb:
+        if secret_emb is None:
             return None
         
         # Try cached embedding first
         if game:
             theme_embeddings = get_theme_embeddings(game)
             emb = theme_embeddings.get(word_lower)
-            if emb:
+            if emb is not None:
                 return float(cosine_similarity(emb, secret_emb))
         
         emb = get_embedding(word, game)
@@ -2302,18 +2372,16 @@ def _ai_maybe_bluff(ai_player: dict, game: dict, available_words: list) -> Optio
     my_secret_lower = my_secret.lower()
     
     try:
-        # Fast path: use pre-computed similarity matrix
-        matrix = game.get('theme_similarity_matrix') if game else None
+        # Fast path: the band of the secret's sorted neighbour table
+        matrix = get_game_similarity_matrix(game)
         if matrix and my_secret_lower in matrix:
-            bluff_candidates = []
-            for word in available_words[:30]:  # Sample for performance
-                word_lower = word.lower()
-                sim = matrix[my_secret_lower].get(word_lower)
-                if sim is not None and 0.5 < sim < 0.75:
-                    bluff_candidates.append((word, sim))
+            by_lower = {}
+            for word in available_words:
+                by_lower.setdefault(word.lower(), word)
+            bluff_candidates = matrix.neighbors.within(my_secret_lower, 0.5, 0.75, allowed=set(by_lower))
             
             if bluff_candidates:
-                return random.choice(bluff_candidates)[0]
+                return by_lower[random.choice(bluff_candidates)[0]]
             return None
         
         # Fallback: use embeddings (rare - only if matrix not available)
@@ -2322,7 +2390,7 @@ def _ai_maybe_bluff(ai_player: dict, game: dict, available_words: list) -> Optio
         except Exception:
             my_embedding = ai_player.get("secret_embedding")
         
-        if not my_embedding:
+        if my_embedding is None:
             return None
         
         # Use cached embeddings if available
@@ -2331,7 +2399,7 @@ def _ai_maybe_bluff(ai_player: dict, game: dict, available_words: list) -> Optio
         bluff_candidates = []
         for word in available_words[:30]:  # Sample for performance
             word_emb = theme_embeddings.get(word.lower())
-            if not word_emb:
+            if word_emb is None:
                 word_emb = get_embedding(word, game)
             sim = cosine_similarity(my_embedding, word_emb)
             # Sweet spot: 0.5-0.75 similarity (close enough to mislead, not too close to self-eliminate)
@@ -2450,7 +2518,7 @@ def ai_choose_guess(ai_player: dict, game: dict) -> Optional[str]:
     
     theme_words = game.get("theme", {}).get("words", [])
     my_secret = (ai_player.get("secret_word") or "").lower().strip()
-    matrix = game.get('theme_similarity_matrix', {})
+    matrix = get_game_similarity_matrix(game)
     
     # Get all previously guessed words from history
     guessed_words = set()
@@ -2488,21 +2556,15 @@ def ai_choose_guess(ai_player: dict, game: dict) -> Optional[str]:
         
         # If we found a good clue, pick a similar word
         if best_clue and best_sim > 0.4 and best_clue in matrix:
-            # Get words similar to the clue
-            clue_sims = matrix[best_clue]
-            candidates = []
+            # Top 5 neighbours of the clue, not repeating the exact clue
+            by_lower = {}
             for w in available_words:
-                wl = w.lower()
-                if wl == best_clue:
-                    continue  # Don't repeat the exact clue
-                sim = clue_sims.get(wl, 0)
-                candidates.append((w, sim))
+                by_lower.setdefault(w.lower(), w)
+            candidates = matrix.neighbors.nearest(best_clue, 5, allowed=set(by_lower), exclude=(best_clue,))
             
             if candidates:
-                candidates.sort(key=lambda x: x[1], reverse=True)
                 # Pick from top candidates with some randomness
-                top_n = min(5, len(candidates))
-                return random.choice(candidates[:top_n])[0]
+                return by_lower[random.choice(candidates)[0]]
     
     # Random guess
     return random.choice(available_words)
@@ -2550,9 +2612,10 @@ def ai_change_word(ai_player: dict, game: dict) -> Optional[str]:
     if not available_words:
         return None
     
-    return ai_select_secret_word(ai_player, available_words)
+    return ai_select_secret_word(ai_player, available_words, game)
 
 
+@_timed_ai_decision("guess", 1)
 def process_ai_turn(game: dict, ai_player: dict) -> Optional[dict]:
     """Process an AI player's turn and return the guess result.
     
@@ -2578,7 +2641,7 @@ def process_ai_turn(game: dict, ai_player: dict) -> Optional[dict]:
     
     # Calculate similarities - use pre-computed matrix for speed
     similarities = {}
-    matrix = game.get('theme_similarity_matrix')
+    matrix = get_game_similarity_matrix(game)
     
     for p in game["players"]:
         secret = p.get("secret_word", "").lower()
@@ -2587,14 +2650,14 @@ def process_ai_turn(game: dict, ai_player: dict) -> Optional[dict]:
         
         # Fast path: use matrix
         if matrix and guess_lower in matrix:
-            sim = matrix[guess_lower].get(secret)
+            sim = matrix.sim(guess_lower, secret)
             if sim is not None:
                 similarities[p["id"]] = round(sim, 4)
                 continue
         
         # Fallback: compute from embeddings (should be rare)
         guess_emb = p.get("_guess_emb")
-        if not guess_emb:
+        if guess_emb is None:
             try:
                 guess_emb = get_embedding(guess_word)
             except Exception:
@@ -2607,7 +2670,7 @@ def process_ai_turn(game: dict, ai_player: dict) -> Optional[dict]:
             # Legacy fallback
             secret_emb = p.get("secret_embedding")
         
-        if secret_emb:
+        if secret_emb is not None:
             sim = cosine_similarity(guess_emb, secret_emb)
             similarities[p["id"]] = round(sim, 4)
     
@@ -2640,6 +2703,18 @@ def process_ai_turn(game: dict, ai_player: dict) -> Optional[dict]:
     }
 
 
+def _ai_prepare_secret(game: dict, word: str):
+    """
+    Make sure a new AI secret can be scored. Words in the theme matrix need
+    nothing; anything else is embedded (and cached) now, so a failure
+    leaves the old secret in place.
+    """
+    matrix = get_game_similarity_matrix(game)
+    if matrix is None or word.lower() not in matrix:
+        get_embedding(word)
+
+
+@_timed_ai_decision("word_change", 1)
 def process_ai_word_change(game: dict, ai_player: dict) -> bool:
     """Process AI word change after elimination."""
     import random
@@ -2685,7 +2760,7 @@ def process_ai_word_change(game: dict, ai_player: dict) -> bool:
             new_word = _ai_select_counter_intel_word(ai_player, game, available_words)
             if new_word:
                 try:
-                    get_embedding(new_word)  # Ensure cached
+                    _ai_prepare_secret(game, new_word)
                     ai_player["secret_word"] = new_word.lower()
                     
                     # Record word change in history
@@ -2729,7 +2804,7 @@ def process_ai_word_change(game: dict, ai_player: dict) -> bool:
         new_word = ai_change_word(ai_player, game)
         if new_word:
             try:
-                get_embedding(new_word)  # Ensure cached
+                _ai_prepare_secret(game, new_word)
                 ai_player["secret_word"] = new_word.lower()
                 
                 # Record word change in history
@@ -2753,20 +2828,30 @@ _redis_client = None
 def get_openai_client():
     global _openai_client
     if _openai_client is None:
+        # Imported here: the openai package is most of the cold-start import time
+        from openai import OpenAI
         _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     return _openai_client
 
 
+def word_frequency(word: str, lang: str) -> float:
+    """wordfreq.word_frequency, with wordfreq imported on first use (it is slow to import)."""
+    from wordfreq import word_frequency as lookup
+    return lookup(word, lang)
+
+
 def get_redis():
     global _redis_client
     if _redis_client is None:
-        _redis_client = Redis(
-            url=os.getenv("UPSTASH_REDIS_REST_URL"),
-            token=os.getenv("UPSTASH_REDIS_REST_TOKEN"),
-        )
+        _redis_client = create_redis_client()
     return _redis_client
 
 
+def redis_batch() -> RedisBatch:
+    """New request-scoped batch: queued commands are sent in one pipeline round trip."""
+    return RedisBatch(get_redis())
+
+
 # ============== RATE LIMITING ==============
 
 # Rate limiters (lazy initialized) - kept for backwards compatibility
@@ -4299,146 +4384,49 @@ def build_word_change_options(player: dict, game: dict) -> list:
     return sorted(random.sample(available, sample_size))
 
 
-def get_embedding(word: str, game: dict = None) -> list:
-    """Get embedding for a word from Redis cache (game parameter kept for API compatibility)."""
-    word_lower = word.lower().strip()
-    
-    # Check Redis cache
-    redis = get_redis()
-    cache_key = f"emb:{word_lower}"
-    cached = redis.get(cache_key)
-    if cached:
-        return json.loads(cached)
-    
-    client = get_openai_client()
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=word_lower,
-    )
-    embedding = response.data[0].embedding
-    
-    # Cache embedding
-    redis.setex(cache_key, EMBEDDING_CACHE_SECONDS, json.dumps(embedding))
-    return embedding
+# Every embedding lookup goes through one store: process LRU, optional disk
+# cache, Redis (emb:{word}), then EMBEDDING_PROVIDER, with concurrent misses for the
+# same word sharing one fetch. It is the process-wide embeddings.store.get_store()
+# instance, so services.embedding_service shares it too.
+def get_embedding_store():
+    return get_store(lambda: store_from_config(CONFIG, EMBEDDING_PROVIDER, get_redis))
+
 
+# Installed at import so the shared store uses EMBEDDING_PROVIDER (and its metrics observer)
+get_embedding_store()
 
-def batch_get_embeddings(words: list, max_retries: int = 2) -> dict:
+
+def get_embedding(word: str, game: dict = None) -> np.ndarray:
     """
-    Get embeddings for multiple words efficiently using batch API.
-    Returns dict mapping lowercase words to their embeddings.
-    
-    Uses Redis mget for batch cache lookups (1 HTTP call instead of N).
+    Get embedding for a word (game parameter kept for API compatibility).
+
+    Raises:
+        LookupError: No tier has the word and fetching it failed
     """
-    result = {}
-    redis = get_redis()
-    
-    # Normalize all words
-    normalized_words = []
-    seen = set()
-    for word in words:
-        word_lower = word.lower().strip()
-        if word_lower and word_lower not in seen:
-            normalized_words.append(word_lower)
-            seen.add(word_lower)
-    
-    if not normalized_words:
-        return result
-    
-    # Batch cache lookup using mget (1 HTTP call for all words)
-    cache_keys = [f"emb:{w}" for w in normalized_words]
-    to_fetch = []
-    
-    try:
-        cached_values = redis.mget(*cache_keys)
-        for i, cached in enumerate(cached_values):
-            word = normalized_words[i]
-            if cached:
-                try:
-                    result[word] = json.loads(cached)
-                except Exception:
-                    to_fetch.append(word)
-            else:
-                to_fetch.append(word)
-    except Exception:
-        # Fallback: all words need fetching
-        to_fetch = normalized_words
-    
-    # Batch fetch remaining from API with retry logic
-    if to_fetch:
-        retries = 0
-        while to_fetch and retries <= max_retries:
-            try:
-                client = get_openai_client()
-                # OpenAI batch limit is typically 2048 inputs, but chunk for safety
-                batch_size = 100
-                to_cache = {}  # Collect for batch cache write
-                
-                for i in range(0, len(to_fetch), batch_size):
-                    batch = to_fetch[i:i + batch_size]
-                    response = client.embeddings.create(
-                        model=EMBEDDING_MODEL,
-                        input=batch,
-                    )
-                    
-                    for j, embedding_data in enumerate(response.data):
-                        word = batch[j]
-                        embedding = embedding_data.embedding
-                        result[word] = embedding
-                        to_cache[f"emb:{word}"] = json.dumps(embedding)
-                
-                # Batch cache write using mset (1 HTTP call)
-                if to_cache:
-                    try:
-                        redis.mset(to_cache)
-                    except Exception:
-                        pass
-                
-                # Verify all words were fetched
-                to_fetch = [w for w in to_fetch if w not in result]
-                if not to_fetch:
-                    break
-                    
-            except Exception as e:
-                print(f"Batch embedding error (attempt {retries + 1}): {e}")
-                retries += 1
-                if retries <= max_retries:
-                    import time
-                    time.sleep(0.5 * retries)  # Exponential backoff
-        
-        # Log if some words still missing after retries
-        if to_fetch:
-            print(f"Warning: Failed to fetch embeddings for {len(to_fetch)} words after {max_retries + 1} attempts")
+    return get_embedding_store().get(word)
+
+
+def batch_get_embeddings(words: list) -> dict:
+    """
+    Get embeddings for multiple words efficiently.
+    Returns dict mapping lowercase words to their embeddings (float32 arrays).
     
-    return result
+    Cache misses are looked up with one Redis mget and fetched in batched provider
+    calls. Words that still can't be fetched are left out.
+    """
+    return get_embedding_store().get_many(words)
 
 
 def get_theme_embeddings(game: dict) -> dict:
     """
-    Get all theme word embeddings from Redis cache.
-    Returns dict mapping lowercase words to their embeddings.
+    Get all theme word embeddings that are already cached.
+    Returns dict mapping lowercase words to their embeddings (float32 arrays).
     
-    Embeddings are cached in Redis during game start, so this is fast.
+    Embeddings are cached during game start, so this is fast: the process
+    LRU, then a single Redis mget for the rest. Never calls the provider.
     """
     theme_words = game.get('theme', {}).get('words', [])
-    if not theme_words:
-        return {}
-    
-    result = {}
-    redis = get_redis()
-    
-    for word in theme_words:
-        word_lower = word.lower().strip()
-        if not word_lower:
-            continue
-        cache_key = f"emb:{word_lower}"
-        try:
-            cached = redis.get(cache_key)
-            if cached:
-                result[word_lower] = json.loads(cached)
-        except Exception:
-            pass
-    
-    return result
+    return get_embedding_store().cached(theme_words)
 
 
 # Cache TTL for precomputed similarity matrices (7 days)
@@ -4447,5435 +4435,6764 @@ SIMILARITY_MATRIX_CACHE_SECONDS = 86400 * 7
 
 def _theme_similarity_cache_key(theme_name: str) -> str:
     """Get Redis cache key for a theme's similarity matrix."""
-    return f"theme_sim:{theme_name.lower().replace(' ', '_').replace('&', 'and')}"
+    return f"theme_sim:{_theme_id(theme_name)}"
 
 
-def get_cached_theme_similarity_matrix(theme_name: str) -> dict | None:
+def get_cached_theme_similarity_matrix(theme_name: str) -> Optional[SimilarityMatrix]:
     """
     Get pre-computed similarity matrix for a theme from Redis cache.
     
     This is much faster than computing on-the-fly since the matrix is
     pre-computed by api/precompute_embeddings.py and cached for 7 days.
+    Reads both the compact binary format and legacy JSON dicts.
     
-    Returns dict mapping word -> {word: similarity} or None if not cached.
+    Returns SimilarityMatrix or None if not cached.
     """
     try:
         redis = get_redis()
         cache_key = _theme_similarity_cache_key(theme_name)
         cached = redis.get(cache_key)
         if cached:
-            return json.loads(cached)
+            return SimilarityMatrix.loads(cached)
     except Exception as e:
         print(f"Error loading cached similarity matrix for {theme_name}: {e}")
     return None
 
 
-def precompute_theme_similarities(game: dict, theme_embeddings: dict) -> dict:
+def precompute_theme_similarities(game: dict, theme_embeddings: dict) -> Optional[SimilarityMatrix]:
     """
     Pre-compute similarity matrix for all theme words using vectorized numpy operations.
-    Returns dict mapping word -> {word: similarity} for O(1) lookups.
+    Returns a SimilarityMatrix for O(1) lookups, or None if there are no embeddings.
     """
-    words = list(theme_embeddings.keys())
-    if not words:
-        return {}
-    
-    # Stack all embeddings into a matrix for vectorized computation
-    embeddings_matrix = np.array([theme_embeddings[w] for w in words])
-    
-    # Normalize all vectors (for cosine similarity)
-    norms = np.linalg.norm(embeddings_matrix, axis=1, keepdims=True)
-    norms[norms == 0] = 1  # Avoid division by zero
-    normalized = embeddings_matrix / norms
-    
-    # Compute all pairwise similarities at once: (n x d) @ (d x n) = (n x n)
-    similarity_matrix = np.dot(normalized, normalized.T)
-    
-    # Convert to dict format
-    matrix = {}
-    for i, w1 in enumerate(words):
-        matrix[w1] = {}
-        for j, w2 in enumerate(words):
-            matrix[w1][w2] = round(float(similarity_matrix[i, j]), 4)
-    
-    return matrix
+    if not theme_embeddings:
+        return None
+    return SimilarityMatrix.from_embeddings(theme_embeddings)
 
 
-def cosine_similarity(embedding1, embedding2) -> float:
-    vec1 = np.array(embedding1)
-    vec2 = np.array(embedding2)
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return float(dot_product / (norm1 * norm2))
+# ============== SHARED THEME SIMILARITY STORE ==============
+# Games reference their theme's similarity matrix by id + version instead of
+# embedding it in the game blob. Matrices are resolved from a per-process
+# cache, then the prebuilt artifacts shipped in api/themes/artifacts/,
+# then the shared Redis keys written by precompute/begin.
 
+# Max number of theme matrices kept per warm instance (13 themes x 2 sizes)
+THEME_MATRIX_PROCESS_CACHE_SIZE = 32
 
-# ============== GAME STORAGE ==============
+_theme_matrix_cache: dict = {}
 
-def save_game(code: str, game_data: dict):
-    redis = get_redis()
-    redis.setex(f"game:{code}", GAME_EXPIRY_SECONDS, json.dumps(game_data))
 
+def theme_matrix_ref(game: dict) -> dict | None:
+    """Build the {id, version} reference a game stores for its similarity matrix."""
+    theme = (game or {}).get('theme') or {}
+    words = theme.get('words') or []
+    if not words:
+        return None
+    return {"id": _theme_id(theme.get('name', '')), "version": theme_matrix_version(words)}
 
-def load_game(code: str) -> Optional[dict]:
-    redis = get_redis()
-    data = redis.get(f"game:{code}")
-    if data:
-        return json.loads(data)
-    return None
 
+def _versioned_theme_similarity_cache_key(theme_id: str, version: str) -> str:
+    """Redis key for a matrix computed for an exact theme word list."""
+    return f"theme_sim:{theme_id}:{version}"
 
-def delete_game(code: str):
-    redis = get_redis()
-    redis.delete(f"game:{code}")
 
+def _remember_theme_matrix(theme_id: str, version: str, matrix: SimilarityMatrix):
+    """Add a matrix to the process cache, evicting the oldest entry when full."""
+    if len(_theme_matrix_cache) >= THEME_MATRIX_PROCESS_CACHE_SIZE:
+        _theme_matrix_cache.pop(next(iter(_theme_matrix_cache)), None)
+    _theme_matrix_cache[(theme_id, version)] = matrix
 
-# ============== PRESENCE (SPECTATORS) ==============
 
-def _presence_key(code: str, kind: str) -> str:
-    return f"presence:{code}:{kind}"
+def _load_theme_artifact(theme_name: str) -> Optional[SimilarityMatrix]:
+    """Memory-map the prebuilt artifact for a pregenerated theme, if one was shipped."""
+    theme_data = PREGENERATED_THEMES.get(theme_name)
+    if not theme_data:
+        return None
+    source_words = theme_data if isinstance(theme_data, list) else theme_data.get('words', [])
+    try:
+        return load_similarity_artifact(theme_name, source_words, EMBEDDING_MODEL)
+    except Exception as e:
+        print(f"Error loading similarity artifact for {theme_name}: {e}")
+        return None
 
 
-def touch_presence(code: str, kind: str, member: str):
-    """Record a presence heartbeat for a member (player_id or spectator_id)."""
+def resolve_theme_similarity_matrix(theme_name: str, theme_words: list, version: str = None) -> Optional[SimilarityMatrix]:
+    """
+    Resolve the similarity matrix for a theme word list.
+
+    Lookup order: process cache, prebuilt artifact for the theme (memory-mapped),
+    versioned Redis key (computed at game begin), then the precomputed
+    full-theme Redis key. Shared matrices are only used if they cover every word.
+
+    Returns SimilarityMatrix or None if unavailable.
+    """
+    if not theme_words:
+        return None
+    theme_id = _theme_id(theme_name)
+    version = version or theme_matrix_version(theme_words)
+
+    matrix = _theme_matrix_cache.get((theme_id, version))
+    if matrix:
+        METRICS.inc("similarity_matrix_lookups_total", source="memory")
+        return matrix
+
+    matrix = _load_theme_artifact(theme_name)
+    if matrix and not all(str(w).lower() in matrix for w in theme_words):
+        matrix = None
+    if matrix:
+        METRICS.inc("similarity_matrix_lookups_total", source="artifact")
+        _remember_theme_matrix(theme_id, version, matrix)
+        return matrix
+
+    source = "redis"
     try:
-        if not code or not member:
-            return
-        now = float(time.time())
-        cutoff = now - float(PRESENCE_TTL_SECONDS)
-        redis = get_redis()
-        key = _presence_key(code, kind)
-        redis.zadd(key, {member: now})
-        # Best-effort prune of old entries
-        redis.zremrangebyscore(key, 0, cutoff)
-    except Exception:
-        # Presence is best-effort; never fail the request
-        return
+        cached = get_redis().get(_versioned_theme_similarity_cache_key(theme_id, version))
+        if cached:
+            matrix = SimilarityMatrix.loads(cached)
+    except Exception as e:
+        print(f"Error loading similarity matrix {theme_id}:{version}: {e}")
+
+    if not matrix and theme_name:
+        source = "shared"
+        shared = get_cached_theme_similarity_matrix(theme_name)
+        if shared and all(str(w).lower() in shared for w in theme_words):
+            matrix = shared
+
+    METRICS.inc("similarity_matrix_lookups_total", source=source if matrix else "miss")
+    if matrix:
+        _remember_theme_matrix(theme_id, version, matrix)
+    return matrix
 
 
-def get_spectator_count(code: str) -> int:
-    """Return the number of active spectators for a game (best-effort)."""
+def store_theme_similarity_matrix(theme_name: str, theme_words: list, matrix):
+    """Publish a computed matrix to the shared store so every game on the theme can use it."""
+    if not matrix or not theme_words:
+        return
+    if isinstance(matrix, dict):
+        matrix = SimilarityMatrix.from_dict(matrix)
+    theme_id = _theme_id(theme_name)
+    version = theme_matrix_version(theme_words)
+    _remember_theme_matrix(theme_id, version, matrix)
     try:
-        now = float(time.time())
-        cutoff = now - float(PRESENCE_TTL_SECONDS)
-        redis = get_redis()
-        # Prune both sets so they don't grow unbounded
-        redis.zremrangebyscore(_presence_key(code, "players"), 0, cutoff)
-        redis.zremrangebyscore(_presence_key(code, "spectators"), 0, cutoff)
-        val = redis.zcard(_presence_key(code, "spectators"))
-        try:
-            return int(val or 0)
-        except Exception:
-            return 0
-    except Exception:
-        return 0
+        get_redis().setex(
+            _versioned_theme_similarity_cache_key(theme_id, version),
+            SIMILARITY_MATRIX_CACHE_SECONDS,
+            matrix.to_base64(),
+        )
+    except Exception as e:
+        print(f"Error caching similarity matrix {theme_id}:{version}: {e}")
 
 
-# ============== PLAYER STATS ==============
+def get_game_similarity_matrix(game: dict) -> Optional[SimilarityMatrix]:
+    """
+    Get the similarity matrix for a game's theme.
 
-def get_player_stats(name: str) -> dict:
-    """Get stats for a player by name."""
-    redis = get_redis()
-    key = f"stats:{name.lower()}"
-    data = redis.get(key)
-    if data:
-        stats = json.loads(data)
-        # Ensure all new fields exist for backwards compatibility
-        stats.setdefault('eliminations', 0)
-        stats.setdefault('times_eliminated', 0)
-        stats.setdefault('win_streak', 0)
-        stats.setdefault('best_streak', 0)
-        return stats
-    return {
-        "name": name,
-        "wins": 0,
-        "games_played": 0,
-        "total_guesses": 0,
-        "total_similarity": 0.0,
-        "eliminations": 0,
-        "times_eliminated": 0,
-        "win_streak": 0,
-        "best_streak": 0,
-    }
+    Games started before the shared store embed the matrix directly under
+    'theme_similarity_matrix'; that copy is converted once and used until
+    the next save_game moves it to the shared store.
+    """
+    if not game:
+        return None
+    legacy = game.get('theme_similarity_matrix')
+    if legacy:
+        if isinstance(legacy, dict):
+            legacy = SimilarityMatrix.from_dict(legacy)
+            game['theme_similarity_matrix'] = legacy
+        return legacy
+    theme = game.get('theme') or {}
+    ref = game.get('theme_matrix') or {}
+    return resolve_theme_similarity_matrix(theme.get('name', ''), theme.get('words') or [], ref.get('version'))
+
+
+def ensure_game_similarity_matrix(game: dict) -> Optional[SimilarityMatrix]:
+    """
+    Get the game's similarity matrix, computing and publishing it if no store has it.
+
+    Used where a game cannot proceed without the matrix (begin, guess), so
+    there is no window where a started game has no matrix.
+    """
+    matrix = get_game_similarity_matrix(game)
+    if matrix:
+        return matrix
+    theme = (game or {}).get('theme') or {}
+    theme_words = theme.get('words') or []
+    if not theme_words:
+        return None
+    try:
+        matrix = precompute_theme_similarities(game, batch_get_embeddings(theme_words))
+    except Exception as e:
+        print(f"Theme similarity matrix error: {e}")
+        return None
+    if matrix and all(str(w).lower() in matrix for w in theme_words):
+        METRICS.inc("similarity_matrix_lookups_total", source="computed")
+        store_theme_similarity_matrix(theme.get('name', ''), theme_words, matrix)
+        return matrix
+    return None
 
 
-def save_player_stats(name: str, stats: dict):
-    """Save player stats."""
-    redis = get_redis()
-    key = f"stats:{name.lower()}"
-    # Stats never expire
-    redis.set(key, json.dumps(stats))
-    # Also add to leaderboard set
-    redis.sadd("leaderboard:players", name.lower())
-    
-    # Update weekly leaderboard (sorted sets)
-    week_key = get_weekly_leaderboard_key()
-    redis.zadd(f"leaderboard:weekly:{week_key}", {name.lower(): stats.get('wins', 0)})
+def cosine_similarity(embedding1, embedding2) -> float:
+    vec1 = np.asarray(embedding1, dtype=np.float32)
+    vec2 = np.asarray(embedding2, dtype=np.float32)
+    dot_product = np.dot(vec1, vec2)
+    norm1 = np.linalg.norm(vec1)
+    norm2 = np.linalg.norm(vec2)
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return float(dot_product / (norm1 * norm2))
 
 
-def get_weekly_leaderboard_key() -> str:
-    """Get the key for the current week's leaderboard."""
-    import datetime
-    today = datetime.date.today()
-    # Get the Monday of the current week
-    monday = today - datetime.timedelta(days=today.weekday())
-    return monday.strftime('%Y-%m-%d')
+# ============== GAME STORAGE ==============
+# Saves are compare-and-set: every write of a save (document, history, AI
+# record, version key, lobby index, events) goes out as one guarded script
+# that only applies if the version key still holds the version this game
+# was loaded at. A save that lost the race raises VersionConflict and writes
+# nothing; with_game_retry re-runs the load-mutate-save from the load.
 
+# Attempts per load-mutate-save before giving up on a contended game
+GAME_SAVE_ATTEMPTS = 3
 
-def _ranked_elimination_index(game: dict) -> dict:
+
+def save_game(code: str, game_data: dict):
     """
-    Build a mapping of player_id -> history index where they were eliminated/forfeited.
-    Players not present in the map are considered to have survived to the end.
+    Save a game loaded with load_game (or a new game).
+
+    Raises:
+        VersionConflict: Another save landed since this game was loaded, or
+            the game was deleted or expired since; nothing was written
     """
-    elim_at = {}
-    history = game.get('history', []) or []
-    for idx, entry in enumerate(history):
-        etype = entry.get('type')
-        if etype == 'word_change':
-            continue
-        if etype == 'forfeit':
-            pid = entry.get('player_id')
-            if pid and pid not in elim_at:
-                elim_at[pid] = idx
-            continue
-        eliminations = entry.get('eliminations') or []
-        if isinstance(eliminations, list) and eliminations:
-            for pid in eliminations:
-                if pid and pid not in elim_at:
-                    elim_at[pid] = idx
-    return elim_at
+    # Migrate legacy games: publish the embedded matrix to the shared store
+    # and keep only the {id, version} reference in the game blob.
+    legacy_matrix = game_data.pop('theme_similarity_matrix', None)
+    if legacy_matrix:
+        theme = game_data.get('theme') or {}
+        store_theme_similarity_matrix(theme.get('name', ''), theme.get('words') or [], legacy_matrix)
+        game_data['theme_matrix'] = theme_matrix_ref(game_data)
+    loaded_version = int(game_data.get('state_version', 0) or 0)
+    game_data['state_version'] = loaded_version + 1
+    events = _take_game_events(game_data)
+    batch = GuardedBatch(get_redis(), _game_version_key(code), loaded_version)
+    doc = _queue_history_append(batch, code, game_data)
+    doc = _queue_ai_state_save(batch, code, doc)
+    batch.setex(f"game:{code}", GAME_EXPIRY_SECONDS, json.dumps(doc))
+    batch.setex(_game_version_key(code), GAME_EXPIRY_SECONDS, _encode_game_version(game_data))
+    _queue_game_players_save(batch, code, game_data)
+    _queue_lobby_index_update(batch, code, game_data)
+    batch.hset(GAME_STATUS_INDEX_KEY, code, _game_status_entry(game_data))
+    for event_type, data in events:
+        queue_game_event(batch, code, event_type, data, GAME_EXPIRY_SECONDS)
+    batch.execute()
+
+
+def with_game_retry(action, *args, attempts: int = GAME_SAVE_ATTEMPTS):
+    """
+    Run a load-mutate-save action, re-running it when its save loses a race.
 
+    The action must load the game itself (so each attempt starts from the
+    latest state and re-checks it) and must not have effects before
+    save_game that are unsafe to repeat - end-of-game stats go through
+    save_finished_game. (A rate limit checked before the load counts the
+    retry too; that only throttles work the server really does.)
 
-def apply_ranked_mmr_updates(game: dict):
+    Raises:
+        VersionConflict: Every attempt lost
     """
-    Apply multi-player Elo/MMR updates for ranked games (Google-auth only).
+    for attempt in range(attempts):
+        try:
+            return action(*args)
+        except VersionConflict:
+            if attempt == attempts - 1:
+                raise
+            print(f"Save conflict, retrying ({attempt + 1}/{attempts - 1})")
 
-    Uses pairwise outcomes derived from elimination order in game.history.
-    Idempotent best-effort: guarded by game['ranked_processed'] and a Redis setnx key.
+
+def save_finished_game(code: str, game: dict):
     """
-    if not isinstance(game, dict):
-        print(f"[RANKED DEBUG] apply_ranked_mmr_updates: game is not a dict")
-        return
-    if not bool(game.get('is_ranked', False)):
-        print(f"[RANKED DEBUG] apply_ranked_mmr_updates: game is not ranked (is_ranked={game.get('is_ranked')})")
-        return
-    
-    code = game.get('code') or ''
-    print(f"[RANKED DEBUG] Processing ranked game {code}")
-    redis = get_redis()
-    result_key = f"ranked:{code}:mmr_result"
+    Save a game that just finished, then apply its end-of-game stats.
 
-    def _attach_saved_result():
-        """Best-effort: attach previously computed ranked MMR results to the game dict."""
+    Stats (leaderboards, user stats, quest progress, ranked MMR) are not safe
+    to repeat, so they only run once this save has won: a save that lost
+    raises VersionConflict before any stats are applied, and a retry finds
+    the game already finished. Ranked results are then saved onto the game
+    for the results screen.
+
+    Raises:
+        VersionConflict: The finishing save lost; no stats were applied
+    """
+    save_game(code, game)
+    update_game_stats(game)
+    if game.get('ranked_mmr'):
         try:
-            raw = redis.get(result_key)
-            if not raw:
-                return
-            if isinstance(raw, bytes):
-                raw = raw.decode()
-            data = json.loads(raw)
-            if isinstance(data, dict):
-                game['ranked_mmr'] = data
-        except Exception:
-            return
+            save_game(code, game)
+        except VersionConflict:
+            # The results stay under ranked:{code}:mmr_result; MMR itself was applied
+            print(f"Ranked results for {code} not saved onto the game (newer save won)")
 
-    # If already processed, still try to attach saved results (for robustness against concurrent saves)
-    if game.get('ranked_processed'):
-        print(f"[RANKED DEBUG] Game {code} already processed (ranked_processed=True)")
-        if not game.get('ranked_mmr'):
-            _attach_saved_result()
-        return
 
-    # Best-effort Redis guard to avoid double-processing across concurrent finish events
-    try:
-        guard_key = f"ranked:{code}:mmr_processed"
-        if hasattr(redis, 'setnx'):
-            ok = redis.setnx(guard_key, "1")
-            if not ok:
-                # Already processed elsewhere; attach saved results so we don't overwrite them on save.
-                print(f"[RANKED DEBUG] Game {code} already processed (Redis guard key exists)")
-                _attach_saved_result()
-                game['ranked_processed'] = True
-                return
-            try:
-                redis.expire(guard_key, GAME_EXPIRY_SECONDS)
-            except Exception:
-                pass
-    except Exception:
-        # If guard fails, fall back to in-game flag only
-        pass
+def load_game(code: str, with_history: bool = True, with_ai: bool = False) -> Optional[dict]:
+    """
+    Load a game. The history list is fetched in the same round trip unless
+    with_history is False (then only game['history_len'] is known - use
+    get_game_history for ranges, and don't save the game).
 
-    # Prefer a frozen participant snapshot (set at match start) so forfeits/leaves don't
-    # shrink the rating pool mid-match.
-    snapshot = game.get('ranked_participants')
-    players = snapshot if isinstance(snapshot, list) and snapshot else (game.get('players', []) or [])
-    winner_pid = game.get('winner')
+    AI players' private state (ai_memory/ai_state) is only loaded with
+    with_ai - pass it on paths that run AI turns, or call load_ai_state later.
+    """
+    batch = redis_batch()
+    data = batch.get(f"game:{code}")
+    history = batch.lrange(_game_history_key(code), 0, -1) if with_history else None
+    ai_record = batch.hgetall(_game_ai_key(code)) if with_ai else None
+    batch.flush()
+    data = data.result()
+    if not data:
+        return None
+    game = json.loads(data)
+    if history is not None and 'history' not in game:
+        game['history'] = _parse_history_entries(history.result(), int(game.get('history_len', 0) or 0))
+    if ai_record is not None:
+        _attach_ai_state(game, ai_record.result())
+    else:
+        _defer_ai_state(game)
+    return game
 
-    # Ranked participants: authenticated humans only (skip AIs)
-    participants = []
-    for p in players:
-        if not isinstance(p, dict):
-            continue
-        if p.get('is_ai'):
-            continue
-        uid = p.get('auth_user_id')
-        if not uid:
-            continue
-        participants.append(p)
 
-    print(f"[RANKED DEBUG] Game {code} has {len(participants)} authenticated participants")
+def delete_game(code: str):
+    batch = redis_batch()
+    batch.delete(f"game:{code}", *_game_side_keys(code))
+    batch.hdel(LOBBY_INDEX_KEY, code)
+    batch.hdel(GAME_STATUS_INDEX_KEY, code)
+    batch.execute()
 
-    if len(participants) < 2:
-        # Even if we can't do MMR calculations (not enough human players),
-        # still increment ranked_games for the solo human participant
-        # so placement progress (0/5) is tracked correctly.
-        print(f"[RANKED DEBUG] Game {code} has < 2 participants, updating stats without MMR calc")
-        for p in participants:
-            uid = p.get('auth_user_id')
-            if not uid:
-                continue
-            user = get_user_by_id(uid)
-            if not user:
-                continue
-            u_stats = get_user_stats(user)
-            u_stats['ranked_games'] = int(u_stats.get('ranked_games', 0) or 0) + 1
-            pid = p.get('id')
-            if pid and pid == winner_pid:
-                u_stats['ranked_wins'] = int(u_stats.get('ranked_wins', 0) or 0) + 1
-            else:
-                u_stats['ranked_losses'] = int(u_stats.get('ranked_losses', 0) or 0) + 1
-            user['stats'] = u_stats
-            save_user(user)
-            
-            # Also update leaderboard zset so player appears after placement
-            try:
-                current_mmr = int(u_stats.get('mmr', RANKED_INITIAL_MMR) or RANKED_INITIAL_MMR)
-                redis.zadd("leaderboard:mmr", {uid: current_mmr})
-            except Exception as e:
-                print(f"Failed to update ranked leaderboard for {uid}: {e}")
-        game['ranked_processed'] = True
-        return
 
-    elim_at = _ranked_elimination_index(game)
-    history_len = len(game.get('history', []) or [])
+def _game_side_keys(code: str) -> list:
+    """Keys stored alongside game:{code} that go away with it."""
+    return [_game_version_key(code), _game_players_key(code), events_key(code),
+            _game_history_key(code), _game_ai_key(code)]
 
-    # Ranking value: later elimination is better; winner gets a large value
-    rank_value = {}
-    for p in participants:
-        pid = p.get('id')
-        if pid == winner_pid:
-            rank_value[pid] = history_len + 10_000
-        else:
-            rank_value[pid] = elim_at.get(pid, history_len + 9_000)
 
-    # Load users and current ratings
-    user_map = {}
-    rating = {}
-    pre_game_ranked_games = {}  # Track ranked_games BEFORE this match for placement K-factor
-    for p in participants:
-        uid = p.get('auth_user_id')
-        user = get_user_by_id(uid)
-        if not user:
-            continue
-        stats = get_user_stats(user)
-        try:
-            mmr = int(stats.get('mmr', RANKED_INITIAL_MMR) or RANKED_INITIAL_MMR)
-        except Exception:
-            mmr = RANKED_INITIAL_MMR
-        user_map[uid] = user
-        rating[uid] = float(mmr)
-        # Store ranked_games count before this match (used for placement K-factor)
+# ============== GAME HISTORY ==============
+# The history is an append-only Redis list (game_history:{code}); the game
+# document only records how many entries belong to it (history_len). Saves
+# push just the new entries, so a turn costs the same late in a long game as
+# it does on turn one. Games loaded with_history get game['history'] as
+# before, so game logic is unchanged.
+
+def _game_history_key(code: str) -> str:
+    return f"game_history:{code}"
+
+
+def _parse_history_entries(raw, length: int = None) -> list:
+    """Decode list items; length (the document's history_len) hides entries past the saved length."""
+    items = list(raw or [])
+    if length is not None:
+        items = items[:length]
+    entries = []
+    for item in items:
         try:
-            pre_game_ranked_games[uid] = int(stats.get('ranked_games', 0) or 0)
+            entries.append(json.loads(item) if isinstance(item, (str, bytes)) else item)
         except Exception:
-            pre_game_ranked_games[uid] = 0
+            continue
+    return entries
 
-    # If we couldn't load at least 2 users, still update stats for loaded users
-    if len(rating) < 2:
-        print(f"[RANKED DEBUG] Game {code} couldn't load 2+ users (loaded {len(rating)}), updating stats without MMR calc")
-        # Update ranked_games for any users we did load
-        for uid, user in user_map.items():
-            u_stats = get_user_stats(user)
-            u_stats['ranked_games'] = int(u_stats.get('ranked_games', 0) or 0) + 1
-            # Find pid from participants
-            pid = None
-            for p in participants:
-                if p.get('auth_user_id') == uid:
-                    pid = p.get('id')
-                    break
-            if pid and pid == winner_pid:
-                u_stats['ranked_wins'] = int(u_stats.get('ranked_wins', 0) or 0) + 1
-            else:
-                u_stats['ranked_losses'] = int(u_stats.get('ranked_losses', 0) or 0) + 1
-            user['stats'] = u_stats
-            save_user(user)
-            
-            # Also update leaderboard zset so player appears after placement
-            try:
-                current_mmr = int(u_stats.get('mmr', RANKED_INITIAL_MMR) or RANKED_INITIAL_MMR)
-                redis.zadd("leaderboard:mmr", {uid: current_mmr})
-            except Exception as e:
-                print(f"Failed to update ranked leaderboard for {uid}: {e}")
-        game['ranked_processed'] = True
-        return
 
-    # Map uid -> pid for rank comparisons
-    uid_to_pid = {p.get('auth_user_id'): p.get('id') for p in participants if p.get('auth_user_id') in rating}
-    uids = list(uid_to_pid.keys())
-    n = len(uids)
-    if n < 2:
-        print(f"[RANKED DEBUG] Game {code} has < 2 uids after mapping ({n}), returning early")
-        game['ranked_processed'] = True
-        return
-    
-    print(f"[RANKED DEBUG] Game {code} processing MMR for {n} players")
+def _queue_history_append(batch: RedisBatch, code: str, game: dict) -> dict:
+    """
+    Queue the history write for a save and return the document to store
+    (the game without its history list).
 
-    deltas = {uid: 0.0 for uid in uids}
+    The list is first trimmed back to the length this game was loaded with,
+    so it always matches the document written with it. Documents from before the split carry their
+    whole history inline; their first save moves it into the list.
+    """
+    history = game.get('history')
+    doc = {k: v for k, v in game.items() if k != 'history'}
+    if history is None:
+        return doc
+    key = _game_history_key(code)
+    persisted = min(int(game.get('history_len', 0) or 0), len(history))
+    new_entries = history[persisted:]
+    if new_entries:
+        if persisted:
+            batch.ltrim(key, 0, persisted - 1)
+        else:
+            batch.delete(key)
+        batch.rpush(key, *[json.dumps(entry) for entry in new_entries])
+    batch.expire(key, GAME_EXPIRY_SECONDS)
+    game['history_len'] = doc['history_len'] = len(history)
+    return doc
 
-    def expected(ra: float, rb: float) -> float:
-        return 1.0 / (1.0 + (10.0 ** ((rb - ra) / 400.0)))
 
-    # Pairwise accumulation
-    for i in range(n):
-        for j in range(i + 1, n):
-            ui = uids[i]
-            uj = uids[j]
-            pi = uid_to_pid[ui]
-            pj = uid_to_pid[uj]
-            ri = rating[ui]
-            rj = rating[uj]
+def _history_length(game: dict) -> int:
+    """Number of history entries, whether or not the list itself was loaded."""
+    if 'history' in game:
+        return len(game['history'])
+    return int(game.get('history_len', 0) or 0)
 
-            ei = expected(ri, rj)
-            ej = 1.0 - ei
 
-            vi = rank_value.get(pi, 0)
-            vj = rank_value.get(pj, 0)
-            if vi > vj:
-                si, sj = 1.0, 0.0
-            elif vi < vj:
-                si, sj = 0.0, 1.0
-            else:
-                si, sj = 0.5, 0.5
+def load_game_since(code: str, history_since: int) -> tuple:
+    """
+    Load a game plus only the history entries from index history_since on
+    (GET and LRANGE in one round trip). For incremental views.
 
-            deltas[ui] += (si - ei)
-            deltas[uj] += (sj - ej)
+    Returns:
+        (game, entries) - game has no history list (don't save it); game is
+        None if not found. Pre-split documents are sliced from their inline
+        history.
+    """
+    batch = redis_batch()
+    data = batch.get(f"game:{code}")
+    tail = batch.lrange(_game_history_key(code), max(0, history_since), -1)
+    batch.flush()
+    data = data.result()
+    if not data:
+        return None, []
+    game = json.loads(data)
+    if 'history' in game:
+        history = game.pop('history') or []
+        game['history_len'] = len(history)
+        return game, history[history_since:]
+    length = int(game.get('history_len', 0) or 0)
+    return game, _parse_history_entries(tail.result(), max(0, length - history_since))
+
+
+def get_game_history(code: str, start: int = 0, game: dict = None) -> list:
+    """
+    History entries from index start on (one LRANGE).
 
-    # Apply updates + persist
-    # Also record per-game deltas so the frontend can show MMR change on the game-over screen.
-    # Use per-player K-factor: higher for placement players (< RANKED_PLACEMENT_GAMES)
-    mmr_result_by_pid = {}
-    for uid in uids:
-        user = user_map.get(uid)
-        if not user:
+    Args:
+        code: Game code
+        start: First entry index
+        game: The game, if loaded - its history_len bounds the range
+    """
+    if game is not None and 'history' in game:
+        return game['history'][start:]
+    length = int(game.get('history_len', 0) or 0) if game is not None else None
+    if length is not None and start >= length:
+        return []
+    end = (length - 1) if length is not None else -1
+    raw = get_redis().lrange(_game_history_key(code), max(0, start), end)
+    return _parse_history_entries(raw)
+
+
+# ============== AI PRIVATE STATE ==============
+# AI players' ai_memory and ai_state live in a hash beside the game
+# (game_ai:{code}, one field per AI player, see ai/memory.py), not in the
+# game document, so polls never load or ship them. Paths that run AI turns
+# load them with load_game(with_ai=True) or load_ai_state. A game loaded
+# without them is marked, and its saves leave the hash alone.
+
+# Transient game key: AI state exists but was not loaded
+_AI_STATE_DEFERRED = '_ai_state_deferred'
+
+
+def _game_ai_key(code: str) -> str:
+    return f"game_ai:{code}"
+
+
+def _defer_ai_state(game: dict):
+    """Mark a game whose AI players came without their state (documents from before the side record carry it inline)."""
+    if any(p.get('is_ai') and not any(field in p for field in AI_STATE_FIELDS)
+           for p in game.get('players') or []):
+        game[_AI_STATE_DEFERRED] = True
+
+
+def _attach_ai_state(game: dict, record) -> dict:
+    """Put side-record state onto the game's AI players (inline state wins)."""
+    record = record or {}
+    theme_words = (game.get('theme') or {}).get('words') or []
+    for p in game.get('players') or []:
+        if not p.get('is_ai') or any(field in p for field in AI_STATE_FIELDS):
             continue
-        
-        # Determine K-factor based on games played (before this match)
-        # Placement (0-4 games): highest K-factor for fast calibration
-        # Provisional (5-19 games): medium K-factor as rating stabilizes
-        # Established (20+ games): K decays over time but never below minimum
-        games_before = pre_game_ranked_games.get(uid, 0)
-        if games_before < RANKED_PLACEMENT_GAMES:
-            k_factor = RANKED_PLACEMENT_K_FACTOR
-        elif games_before < RANKED_PROVISIONAL_GAMES:
-            k_factor = RANKED_PROVISIONAL_K_FACTOR
+        raw = record.get(p.get('id'))
+        if raw:
+            p.update(unpack_ai_state(raw, theme_words))
+    game.pop(_AI_STATE_DEFERRED, None)
+    return game
+
+
+def load_ai_state(code: str, game: dict) -> dict:
+    """Load AI private state onto a game loaded without it (one HGETALL; no-op otherwise)."""
+    if not game.get(_AI_STATE_DEFERRED):
+        return game
+    try:
+        record = get_redis().hgetall(_game_ai_key(code))
+    except Exception as e:
+        print(f"Error loading AI state for {code}: {e}")
+        return game
+    return _attach_ai_state(game, record)
+
+
+def _queue_ai_state_save(batch: RedisBatch, code: str, doc: dict) -> dict:
+    """
+    Queue the AI side-record write for a save and return the document
+    without AI state. If the game was loaded without AI state, only AI
+    players carrying state inline (e.g. bots added since) are written.
+    """
+    deferred = doc.pop(_AI_STATE_DEFERRED, False)
+    players = doc.get('players') or []
+    if not any(p.get('is_ai') for p in players):
+        return doc
+    key = _game_ai_key(code)
+    theme_words = (doc.get('theme') or {}).get('words') or []
+    stripped = []
+    for p in players:
+        if p.get('is_ai') and (not deferred or any(field in p for field in AI_STATE_FIELDS)):
+            packed = pack_ai_state(p, theme_words)
+            if packed is not None:
+                batch.hset(key, p.get('id'), packed)
+        stripped.append({k: v for k, v in p.items() if k not in AI_STATE_FIELDS})
+    batch.expire(key, GAME_EXPIRY_SECONDS)
+    return dict(doc, players=stripped)
+
+
+# ============== GAME STATE VERSION ==============
+# save_game bumps game['state_version'] and mirrors it into a tiny side key,
+# so pollers that already have the current state can be answered without
+# loading the game blob. The side key also records whether a poll has work
+# to do (multiplayer bot turns / bot word picks run inside GET /api/games/{code}),
+# in which case the short-circuit is skipped.
+#
+# The side key is also the compare-and-set guard for save_game, so a
+# version number is only ever written once per game.
+
+def _game_version_key(code: str) -> str:
+    return f"game_version:{code}"
+
+
+def _game_players_key(code: str) -> str:
+    return f"game_players:{code}"
+
+
+def _queue_game_players_save(batch: RedisBatch, code: str, game: dict):
+    """
+    Queue the player-id hash a save writes beside the version key, so an
+    unchanged poll can check membership without loading the game.
+    """
+    key = _game_players_key(code)
+    batch.delete(key)
+    player_ids = [p.get('id') for p in game.get('players') or [] if p.get('id')]
+    if player_ids:
+        batch.hset(key, values={pid: 1 for pid in player_ids})
+        batch.expire(key, GAME_EXPIRY_SECONDS)
+
+
+def _game_needs_poll_tick(game: dict) -> bool:
+    """True if polling this game advances it server-side (see GET /api/games/{code})."""
+    if game.get('is_singleplayer'):
+        return False
+    players = game.get('players') or []
+    status = game.get('status')
+    if status == 'word_selection':
+        return any(p.get('is_ai') and not p.get('secret_word') for p in players)
+    if status != 'playing' or game.get('waiting_for_word_change') or not players:
+        return False
+    if not all(p.get('secret_word') for p in players):
+        return False
+    current = players[game.get('current_turn', 0) % len(players)]
+    return bool(current.get('is_ai') and current.get('is_alive'))
+
+
+def _encode_game_version(game: dict) -> str:
+    """Side key value: "<version>", or "<version>:tick" if a poll has work to do."""
+    version = str(int(game.get('state_version', 0) or 0))
+    return f"{version}:tick" if _game_needs_poll_tick(game) else version
+
+
+def _game_version_number(value) -> Optional[int]:
+    """The version number in a side key value, ignoring its flag (None if unreadable)."""
+    try:
+        return int(str(value or '').partition(':')[0])
+    except ValueError:
+        return None
+
+
+def _game_unchanged_since(value, since_version: int) -> bool:
+    """True if a side key value says the game is still at since_version with nothing to do."""
+    try:
+        version, _, flag = str(value or '').partition(':')
+        return bool(version) and not flag and int(version) == since_version
+    except (TypeError, ValueError):
+        return False
+
+
+def game_state_etag(version: int) -> str:
+    return f'"v{int(version or 0)}"'
+
+
+def wait_for_game_version(code: str, since_version: int, timeout: float) -> bool:
+    """
+    Block until the game's version moves off since_version, or timeout.
+
+    Only the tiny version key is read, first after LONG_POLL_CHECK_SECONDS
+    and then backing off to LONG_POLL_MAX_CHECK_SECONDS, so an idle waiter
+    costs a handful of reads rather than one every half second. Only the
+    number is compared: the ":tick" flag means bot work is due, which the
+    request holding the bot lease does and then saves under a new version.
+
+    Returns:
+        True if the game changed (or its side key is gone), False on timeout
+    """
+    redis = get_redis()
+    deadline = time.time() + max(0.0, timeout)
+    interval = LONG_POLL_CHECK_SECONDS
+    while True:
+        value = redis.get(_game_version_key(code))
+        if value is None or _game_version_number(value) != since_version:
+            return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max(LONG_POLL_CHECK_SECONDS, LONG_POLL_MAX_CHECK_SECONDS))
+
+
+# ============== BOT TURN LEASE ==============
+# Multiplayer bot turns run inside whichever poll notices them, and every
+# player polls. A short per-game lease (SET NX with a TTL) lets one request
+# advance the bots while the others serve the state they have. The holder
+# re-checks the version key before working, and save_game's compare-and-set
+# keeps it from overwriting a newer save.
+
+BOT_LEASE_SECONDS = 10
+
+
+def _bot_lease_key(code: str) -> str:
+    return f"bot_lease:{code}"
+
+
+def acquire_bot_lease(code: str) -> Optional[str]:
+    """Take the game's bot lease. Returns the lease token, or None if another request holds it."""
+    token = secrets.token_hex(8)
+    try:
+        if get_redis().set(_bot_lease_key(code), token, nx=True, ex=BOT_LEASE_SECONDS):
+            return token
+    except Exception as e:
+        print(f"Bot lease error for {code}: {e}")
+    return None
+
+
+# Delete the lease key only if it still holds our token
+def release_bot_lease(code: str, token: str):
+    """Release the lease if it is still ours (an expired lease may have been taken over)."""
+    try:
+        delete_if_equal(get_redis(), _bot_lease_key(code), token)
+    except Exception as e:
+        print(f"Bot lease release error for {code}: {e}")
+
+
+def get_saved_game_version(code: str) -> Optional[int]:
+    """state_version of the last save, from the version side key (None if the game is gone)."""
+    value = get_redis().get(_game_version_key(code))
+    return None if value is None else _game_version_number(value)
+
+
+# ============== GAME EVENTS ==============
+# save_game diffs the game against a small cursor stored on it and appends
+# what changed to the game's event stream (data/game_events.py), in the same
+# pipeline as the write (after it). SSE clients tail that stream.
+
+def _game_event_cursor(game: dict) -> dict:
+    """What the event stream has already reported about this game."""
+    return {
+        "history": _history_length(game),
+        "turn": [game.get('current_turn'), game.get('turn_started_at')],
+        "status": [game.get('status'), game.get('waiting_for_word_change'), game.get('winner')],
+    }
+
+
+def _history_events(entry: dict) -> list:
+    """(event_type, data) pairs for one history entry."""
+    kind = entry.get('type')
+    if kind == 'word_change':
+        return [("word_change", entry)]
+    if kind in ('timeout', 'forfeit'):
+        return [("elimination", {
+            "player_ids": [entry.get('player_id')],
+            "reason": kind,
+            "entry": entry,
+        })]
+    if kind:
+        return []
+    events = [("guess", entry)]
+    if entry.get('eliminations'):
+        events.append(("elimination", {
+            "player_ids": list(entry['eliminations']),
+            "reason": "guess",
+            "by": entry.get('guesser_id'),
+        }))
+    return events
+
+
+def _take_game_events(game: dict) -> list:
+    """
+    Events for everything that changed since the game's event cursor, as
+    (event_type, data) pairs; advances the cursor on the game.
+
+    Saves that change nothing the other events describe (joins, votes,
+    readiness, word picks) emit a status event, so listeners always learn
+    that state_version moved. Singleplayer games have no listeners.
+    """
+    if game.get('is_singleplayer'):
+        return []
+    current = _game_event_cursor(game)
+    previous = game.get('event_cursor')
+    if not isinstance(previous, dict):
+        # First save (or a game saved before events existed): start from here
+        previous = dict(current, turn=None, status=None)
+    game['event_cursor'] = current
+    version = game.get('state_version', 0)
+    
+    events = []
+    for entry in (game.get('history') or [])[int(previous.get('history') or 0):]:
+        if isinstance(entry, dict):
+            events.extend(_history_events(entry))
+    if previous.get('turn') != current['turn'] and game.get('status') == 'playing':
+        players = game.get('players') or []
+        turn = game.get('current_turn', 0) or 0
+        events.append(("turn", {
+            "current_turn": turn,
+            "current_player_id": players[turn]['id'] if 0 <= turn < len(players) else None,
+            "turn_started_at": game.get('turn_started_at'),
+        }))
+    if previous.get('status') != current['status'] or not events:
+        events.append(("status", {
+            "status": game.get('status'),
+            "waiting_for_word_change": game.get('waiting_for_word_change'),
+            "winner": game.get('winner'),
+        }))
+    
+    return [(event_type, dict(data, state_version=version)) for event_type, data in events]
+
+
+# ============== GAME CHAT ==============
+# Messages live in a sorted set chat:{code} scored by their id, so reading
+# after a client's last id is one ZRANGEBYSCORE. If the ZADD fails the message
+# is kept on the game document instead (chat_messages); reads merge both.
+
+# Messages returned per game poll that asks for chat (chat_after=)
+CHAT_POLL_LIMIT = 50
+
+def queue_chat_read(batch: RedisBatch, code: str, after_id: int, limit: int):
+    """Queue the read of up to limit messages with id > after_id; returns a BatchResult."""
+    return batch.zrangebyscore(f"chat:{code}", f"({int(after_id)}", "+inf", offset=0, count=limit)
+
+
+def _parse_chat_items(raw) -> list:
+    """Decode sorted-set members into message dicts, skipping anything malformed."""
+    messages = []
+    for item in raw or []:
+        if not item:
+            continue
+        # Some clients may return (member, score) pairs
+        if isinstance(item, (list, tuple)) and len(item) == 2:
+            item = item[0]
+        msg = None
+        # Some Upstash clients may already deserialize JSON into dicts
+        if isinstance(item, dict):
+            # If this looks like our payload, accept directly.
+            if 'text' in item and ('sender_id' in item or 'sender_name' in item):
+                msg = item
+            # Or if wrapped, unwrap common shapes
+            elif 'member' in item:
+                item = item.get('member')
+            elif 'value' in item:
+                item = item.get('value')
+        if msg is None:
+            try:
+                if isinstance(item, bytes):
+                    item = item.decode()
+                # Last resort: stringify and attempt JSON parse
+                msg = json.loads(item if isinstance(item, str) else str(item))
+            except Exception:
+                msg = None
+        if isinstance(msg, dict):
+            messages.append(msg)
+    return messages
+
+
+def _chat_message_id(msg: dict) -> int:
+    try:
+        return int(msg.get('id', 0) or 0)
+    except Exception:
+        return 0
+
+
+def get_chat_messages(code: str, after_id: int = 0, limit: int = 50,
+                      game: dict = None, pending=None) -> dict:
+    """
+    Chat messages with id > after_id, oldest first.
+
+    Args:
+        code: Game code
+        after_id: Last message id the client has
+        limit: Maximum number of messages
+        game: The game, if loaded - its fallback chat_messages are merged in
+        pending: BatchResult from queue_chat_read, if the read was batched
+
+    Returns:
+        {"messages": [...], "last_id": newest id returned (or after_id)}
+    """
+    try:
+        if pending is not None:
+            raw = pending.result()
         else:
-            # K decays from base K factor, losing decay_rate per game after provisional
-            games_after_provisional = games_before - RANKED_PROVISIONAL_GAMES
-            k_factor = max(
-                RANKED_K_FACTOR_MIN,
-                RANKED_K_FACTOR - (games_after_provisional * RANKED_K_FACTOR_DECAY_RATE)
-            )
-        scale = float(k_factor) / float(max(1, n - 1))
-        
-        old = rating[uid]
-        new = old + (scale * deltas.get(uid, 0.0)) + RANKED_PARTICIPATION_BONUS
+            raw = get_redis().zrangebyscore(f"chat:{code}", f"({int(after_id)}", "+inf",
+                                            offset=0, count=limit)
+    except Exception:
+        raw = []
+
+    game_messages = []
+    fallback = (game or {}).get('chat_messages', [])
+    if isinstance(fallback, list):
+        game_messages = [m for m in fallback if isinstance(m, dict)]
+
+    # Merge + dedupe by id (and keep order by id/ts).
+    merged = []
+    seen_ids = set()
+    for msg in _parse_chat_items(raw) + game_messages:
+        mid = _chat_message_id(msg)
+        # If id is missing, fall back to a tuple key; but normally all messages have ids.
+        key_id = mid if mid else (msg.get('ts'), msg.get('sender_id'), msg.get('text'))
+        if key_id in seen_ids:
+            continue
+        seen_ids.add(key_id)
+        merged.append(msg)
+
+    def _sort_key(m):
         try:
-            new_int = int(round(new))
+            ts = int(m.get('ts', 0) or 0)
         except Exception:
-            new_int = int(old)
-        if new_int < 0:
-            new_int = 0
+            ts = 0
+        return (_chat_message_id(m), ts)
+
+    merged.sort(key=_sort_key)
+
+    messages = []
+    last_id = after_id
+    for msg in merged:
+        mid = _chat_message_id(msg)
+        if mid <= after_id:
+            continue
+        messages.append(msg)
+        last_id = max(last_id, mid)
+        if len(messages) >= limit:
+            break
+    return {"messages": messages, "last_id": last_id}
+
+
+# ============== LOBBY INDEX ==============
+# Public multiplayer games that are not finished, as a hash of
+# code -> small JSON summary. Maintained by save_game/delete_game so the
+# lobby and spectate listings read one key instead of scanning game:*.
+
+LOBBY_INDEX_KEY = "lobbies:index"
+
+
+def _lobby_summary(game: dict) -> Optional[dict]:
+    """Listing summary for a game, or None if it should not be listed."""
+    if game.get('is_singleplayer'):
+        return None
+    if game.get('visibility', 'public') != 'public':
+        return None
+    status = game.get('status', '')
+    if status == 'finished' or not game.get('code'):
+        return None
+    votes = game.get('theme_votes', {}) or {}
+    winning_theme = max(votes.keys(), key=lambda k: len(votes[k])) if votes else None
+    return {
+        "code": game['code'],
+        "status": status,
+        "player_count": len(game.get('players', []) or []),
+        "theme_options": game.get('theme_options', []),
+        "winning_theme": winning_theme,
+        "is_ranked": bool(game.get('is_ranked', False)),
+        "created_at": float(game.get('created_at', 0) or 0),
+        "updated_at": time.time(),
+    }
+
+
+def _queue_lobby_index_update(batch: RedisBatch, code: str, game: dict):
+    """Queue the index write (or removal) matching a game's current state."""
+    summary = _lobby_summary(game)
+    if summary:
+        batch.hset(LOBBY_INDEX_KEY, code, json.dumps(summary))
+    else:
+        batch.hdel(LOBBY_INDEX_KEY, code)
+
+
+def get_indexed_games() -> list:
+    """
+    All listed game summaries (one HGETALL).
 
+    Entries whose game blob has expired without a delete are pruned here,
+    along with waiting lobbies past LOBBY_EXPIRY_SECONDS (which are deleted,
+    matching the old scan behaviour).
+    """
+    redis = get_redis()
+    raw = redis.hgetall(LOBBY_INDEX_KEY) or {}
+    now = time.time()
+    
+    summaries = []
+    stale = []
+    expired_lobbies = []
+    for code, value in raw.items():
         try:
-            old_int = int(round(old))
+            summary = json.loads(value)
         except Exception:
-            old_int = int(new_int)
-        delta_int = int(new_int - old_int)
-
-        u_stats = get_user_stats(user)
-        u_stats['mmr'] = new_int
+            stale.append(code)
+            continue
+        if now - float(summary.get('updated_at', 0) or 0) > GAME_EXPIRY_SECONDS:
+            stale.append(code)
+            continue
+        if summary.get('status') == 'waiting':
+            created_at = float(summary.get('created_at', now) or now)
+            if now - created_at > LOBBY_EXPIRY_SECONDS:
+                expired_lobbies.append(code)
+                continue
+        summaries.append(summary)
+    
+    if stale or expired_lobbies:
         try:
-            prev_peak = int(u_stats.get('peak_mmr', new_int) or new_int)
+            batch = redis_batch()
+            batch.hdel(LOBBY_INDEX_KEY, *(stale + expired_lobbies))
+            if expired_lobbies:
+                batch.delete(*[f"game:{c}" for c in expired_lobbies],
+                             *[key for c in expired_lobbies for key in _game_side_keys(c)])
+            batch.flush()
         except Exception:
-            prev_peak = new_int
-        u_stats['peak_mmr'] = max(prev_peak, new_int)
+            pass
+    
+    return summaries
 
-        u_stats['ranked_games'] = int(u_stats.get('ranked_games', 0) or 0) + 1
 
-        pid = uid_to_pid.get(uid)
-        if pid and pid == winner_pid:
-            u_stats['ranked_wins'] = int(u_stats.get('ranked_wins', 0) or 0) + 1
-        else:
-            u_stats['ranked_losses'] = int(u_stats.get('ranked_losses', 0) or 0) + 1
+# ============== GAME STATUS INDEX ==============
+# Every unexpired game as code -> "status|mode|updated_at", written by the
+# same guarded script as the save, so the metrics endpoint can count games
+# by status with one HGETALL instead of scanning and loading game:*.
 
-        user['stats'] = u_stats
-        save_user(user)
-        print(f"[RANKED DEBUG] Updated user {uid}: ranked_games={u_stats.get('ranked_games')}, mmr={u_stats.get('mmr')}, delta={delta_int}")
+GAME_STATUS_INDEX_KEY = "games:status"
 
-        # Update ranked leaderboard zset
-        try:
-            redis.zadd("leaderboard:mmr", {uid: new_int})
-        except Exception as e:
-            print(f"Failed to update ranked leaderboard for {uid}: {e}")
 
-        pid = uid_to_pid.get(uid)
-        if pid:
-            mmr_result_by_pid[str(pid)] = {
-                "uid": str(uid),
-                "old": int(old_int),
-                "new": int(new_int),
-                "delta": int(delta_int),
-            }
+def _game_status_entry(game: dict) -> str:
+    mode = 'singleplayer' if game.get('is_singleplayer') else ('ranked' if game.get('is_ranked') else 'casual')
+    return f"{game.get('status', '')}|{mode}|{int(time.time())}"
 
-    game['ranked_processed'] = True
-    if mmr_result_by_pid:
-        game['ranked_mmr'] = mmr_result_by_pid
-        print(f"[RANKED DEBUG] Game {code} finished processing, mmr_result_by_pid={mmr_result_by_pid}")
-        # Persist results in Redis so concurrent finish requests can attach them reliably.
+
+def count_games_by_status() -> dict:
+    """
+    {(status, mode): count} of unexpired games (one HGETALL).
+
+    Entries not updated within GAME_EXPIRY_SECONDS belong to expired games
+    and are pruned here.
+    """
+    redis = get_redis()
+    raw = redis.hgetall(GAME_STATUS_INDEX_KEY) or {}
+    cutoff = time.time() - GAME_EXPIRY_SECONDS
+    counts = {}
+    stale = []
+    for code, value in raw.items():
+        status, _, rest = str(value).partition('|')
+        mode, _, updated = rest.partition('|')
         try:
-            redis.setex(result_key, GAME_EXPIRY_SECONDS, json.dumps(mmr_result_by_pid))
+            fresh = float(updated) >= cutoff
+        except ValueError:
+            fresh = False
+        if not fresh:
+            stale.append(code)
+            continue
+        counts[(status, mode)] = counts.get((status, mode), 0) + 1
+    if stale:
+        try:
+            redis.hdel(GAME_STATUS_INDEX_KEY, *stale)
         except Exception:
-            try:
-                redis.set(result_key, json.dumps(mmr_result_by_pid))
-            except Exception:
-                pass
-    else:
-        print(f"[RANKED DEBUG] Game {code} finished processing but no mmr_result_by_pid")
+            pass
+    return counts
 
 
-def update_game_stats(game: dict):
-    """Update stats for all players after a game ends."""
-    winner_id = game.get('winner')
-    is_multiplayer = not bool(game.get('is_singleplayer'))
-    is_ranked = bool(game.get('is_ranked', False)) and is_multiplayer
-    
-    print(f"[RANKED DEBUG] update_game_stats called: is_ranked={is_ranked}, is_multiplayer={is_multiplayer}, winner={winner_id}")
-    
-    # Count eliminations per player
-    eliminations_by_player = {}
-    eliminated_players = set()
-    forfeited_players = set()  # Track forfeits separately - they shouldn't count towards games played
-    
-    for entry in game.get('history', []):
-        if entry.get('type') == 'word_change':
-            continue
-        if entry.get('type') == 'forfeit':
-            pid = entry.get('player_id')
-            if pid:
-                eliminated_players.add(pid)
-                forfeited_players.add(pid)
-            continue
-        guesser_id = entry.get('guesser_id')
-        if guesser_id and entry.get('eliminations'):
-            eliminations_by_player[guesser_id] = eliminations_by_player.get(guesser_id, 0) + len(entry['eliminations'])
-            eliminated_players.update(entry['eliminations'])
-    
-    for player in game['players']:
-        # Skip bots and guest players - they shouldn't appear on leaderboards
-        if player.get('is_ai'):
-            continue
-        if not player.get('auth_user_id'):
-            continue
-        
-        # Only update casual leaderboard stats for multiplayer CASUAL games (not solo, not ranked)
-        # Ranked games have their own separate stats tracked via apply_ranked_mmr_updates
-        # Skip forfeited players - they shouldn't get credit for games they quit
-        if is_multiplayer and not is_ranked and player['id'] not in forfeited_players:
-            stats = get_player_stats(player['name'])
-            stats['games_played'] += 1
-            
-            # Track eliminations
-            stats['eliminations'] = stats.get('eliminations', 0) + eliminations_by_player.get(player['id'], 0)
-            
-            # Track times eliminated
-            if player['id'] in eliminated_players:
-                stats['times_eliminated'] = stats.get('times_eliminated', 0) + 1
-            
-            if player['id'] == winner_id:
-                stats['wins'] += 1
-                # Update win streak
-                stats['win_streak'] = stats.get('win_streak', 0) + 1
-                if stats['win_streak'] > stats.get('best_streak', 0):
-                    stats['best_streak'] = stats['win_streak']
-            else:
-                # Reset win streak on loss
-                stats['win_streak'] = 0
-            
-            # Calculate average closeness from this player's guesses
-            for entry in game.get('history', []):
-                # Skip word_change entries which don't have guesser_id
-                if entry.get('type') == 'word_change':
-                    continue
-                if entry.get('guesser_id') == player['id']:
-                    stats['total_guesses'] += 1
-                    # Get the max similarity to other players (not self)
-                    similarities = entry.get('similarities', {})
-                    other_sims = [
-                        sim for pid, sim in similarities.items() 
-                        if pid != player['id']
-                    ]
-                    if other_sims:
-                        stats['total_similarity'] += max(other_sims)
-            
-            # Link player stats to their Google account if authenticated
-            auth_user_id = player.get('auth_user_id')
-            if auth_user_id:
-                stats['auth_user_id'] = auth_user_id
-            
-            save_player_stats(player['name'], stats)
-
-        # Update authenticated user's mp_* stats for cosmetics unlocks (for ALL multiplayer games)
-        # Skip forfeited players - they shouldn't get credit towards games played (prevents ranked unlock abuse)
-        if is_multiplayer and player['id'] not in forfeited_players:
-            auth_user_id = player.get('auth_user_id')
-            if auth_user_id:
-                auth_user = get_user_by_id(auth_user_id)
-                if auth_user:
-                    u_stats = get_user_stats(auth_user)
-                    u_stats['mp_games_played'] = u_stats.get('mp_games_played', 0) + 1
-                    elim_count = eliminations_by_player.get(player['id'], 0) or 0
-                    u_stats['mp_eliminations'] = u_stats.get('mp_eliminations', 0) + elim_count
-                    if player['id'] == winner_id:
-                        u_stats['mp_wins'] = u_stats.get('mp_wins', 0) + 1
-                    if player['id'] in eliminated_players:
-                        u_stats['mp_times_eliminated'] = u_stats.get('mp_times_eliminated', 0) + 1
-                    auth_user['stats'] = u_stats
+def get_active_spectator_counts(codes: list) -> dict:
+    """Active spectator counts for many games in one round trip (read-only ZCOUNTs)."""
+    if not codes:
+        return {}
+    cutoff = float(time.time()) - float(PRESENCE_TTL_SECONDS)
+    batch = redis_batch()
+    pending = {code: batch.zcount(_presence_key(code, "spectators"), cutoff, "+inf") for code in codes}
+    batch.flush()
+    counts = {}
+    for code, result in pending.items():
+        try:
+            counts[code] = int(result.result() or 0)
+        except Exception:
+            counts[code] = 0
+    return counts
 
-                    # Daily quests progress (credits awarded on claim).
-                    deltas = {
-                        "mp_games": 1,
-                        "mp_elims": int(elim_count or 0),
-                    }
-                    if player['id'] == winner_id:
-                        deltas["mp_wins"] = 1
-                    if is_ranked:
-                        deltas["ranked_games"] = 1
-                        if player['id'] == winner_id:
-                            deltas["ranked_wins"] = 1
-                    apply_daily_quest_progress(auth_user, deltas, persist=False)
-                    apply_weekly_quest_progress(auth_user, deltas, persist=False)
 
-                    save_user(auth_user)
+# ============== PRESENCE (SPECTATORS) ==============
 
-    # Ranked: update MMR once per finished game (best-effort + idempotent flag)
-    if is_ranked:
-        try:
-            apply_ranked_mmr_updates(game)
-        except Exception as e:
-            import traceback
-            print(f"Ranked MMR update error: {e}")
-            print(f"Ranked MMR update traceback: {traceback.format_exc()}")
+def _presence_key(code: str, kind: str) -> str:
+    return f"presence:{code}:{kind}"
 
 
-def get_leaderboard(leaderboard_type: str = 'alltime') -> list:
-    """Get all players sorted by wins.
+def touch_presence(code: str, kind: str, member: str, batch: RedisBatch = None):
+    """Record a presence heartbeat for a member (player_id or spectator_id).
     
-    Args:
-        leaderboard_type: 'alltime' or 'weekly'
+    If a batch is given the commands are only queued on it, so they ride along
+    with the caller's next round trip (e.g. get_spectator_count).
     """
-    redis = get_redis()
-    
-    if leaderboard_type == 'weekly':
-        # Get weekly leaderboard from sorted set
-        week_key = get_weekly_leaderboard_key()
-        weekly_data = redis.zrevrange(f"leaderboard:weekly:{week_key}", 0, 99, withscores=True)
-        
-        if not weekly_data:
-            return []
-        
-        players = []
-        for name, wins in weekly_data:
-            stats = get_player_stats(name)
-            if stats['games_played'] > 0:
-                stats['weekly_wins'] = int(wins)
-                stats['avg_closeness'] = (
-                    stats['total_similarity'] / stats['total_guesses'] 
-                    if stats['total_guesses'] > 0 else 0
-                )
-                stats['win_rate'] = stats['wins'] / stats['games_played'] if stats['games_played'] > 0 else 0
-                players.append(stats)
-        return players
-    
-    # All-time leaderboard
-    player_names = redis.smembers("leaderboard:players")
-    
-    if not player_names:
-        return []
-    
-    players = []
-    for name in player_names:
-        stats = get_player_stats(name)
-        if stats['games_played'] > 0:
-            stats['avg_closeness'] = (
-                stats['total_similarity'] / stats['total_guesses'] 
-                if stats['total_guesses'] > 0 else 0
-            )
-            stats['win_rate'] = stats['wins'] / stats['games_played'] if stats['games_played'] > 0 else 0
-            players.append(stats)
-    
-    # Sort by wins (desc), then win rate (desc), then games played (desc)
-    players.sort(key=lambda p: (
-        p['wins'], 
-        p['win_rate'],
-        p['games_played']
-    ), reverse=True)
-    
-    return players[:100]  # Limit to top 100
-
-
-# ============== MATCHMAKING QUEUE SYSTEM ==============
-
-# Queue configuration
-QUEUE_EXPIRY_SECONDS = 300  # 5 minutes max in queue
-QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT = 45  # 45 seconds before filling with rookie bots
-QUEUE_MATCH_SIZE_MIN = 2  # Minimum players for a quick play match
-QUEUE_MATCH_SIZE_MAX = 4  # Maximum players for matches
-QUEUE_MATCH_SIZE = 4  # Fixed match size for ranked
-QUEUE_MIN_CASUAL_GAMES_FOR_RANKED = 3  # Minimum casual games before ranked (lowered for accessibility)
+    try:
+        if not code or not member:
+            return
+        now = float(time.time())
+        cutoff = now - float(PRESENCE_TTL_SECONDS)
+        pipe = batch if batch is not None else redis_batch()
+        key = _presence_key(code, kind)
+        pipe.zadd(key, {member: now})
+        # Best-effort prune of old entries
+        pipe.zremrangebyscore(key, 0, cutoff)
+        if batch is None:
+            pipe.flush()
+    except Exception:
+        # Presence is best-effort; never fail the request
+        return
 
-# MMR range expansion for ranked matchmaking
-# More aggressive expansion to find matches faster
-RANKED_MMR_RANGE_INITIAL = 150  # Start wider for faster initial matches
-RANKED_MMR_RANGE_EXPANSIONS = [
-    (15, 250),   # After 15s: +/- 250 (expand quickly)
-    (30, 400),   # After 30s: +/- 400
-    (45, 600),   # After 45s: +/- 600
-    (60, 800),   # After 60s: +/- 800
-    (90, 1000),  # After 90s: +/- 1000 (match anyone)
-]
-RANKED_MMR_RANGE_MAX = 1000
 
-# Match size reduction based on wait time (for quick play only)
-# After waiting long enough, accept smaller matches
-QUICK_PLAY_MATCH_SIZE_REDUCTIONS = [
-    (30, 3),   # After 30s: accept 3-player matches
-    (60, 2),   # After 60s: accept 2-player matches
-]
+def touch_player_presence(code: str, player_id: str, batch: RedisBatch):
+    """
+    Queue a player heartbeat that only lands if player_id is in the game
+    (per the hash save_game keeps), without loading the game.
 
+    Returns:
+        BatchResult of 1 if the player is in the game, else 0 (also 0 for
+        games not saved since the hash was added - load those instead)
+    """
+    now = float(time.time())
+    return zadd_if_field(batch, _game_players_key(code), _presence_key(code, "players"),
+                         player_id, now, now - float(PRESENCE_TTL_SECONDS))
 
-def _queue_key(mode: str) -> str:
-    """Get Redis key for a queue mode."""
-    return f"queue:{mode}"
 
+def get_spectator_count(code: str, batch: RedisBatch = None) -> int:
+    """Return the number of active spectators for a game (best-effort).
+    
+    Flushes the given batch (or a new one), so any commands queued on it
+    share the same round trip.
+    """
+    try:
+        now = float(time.time())
+        cutoff = now - float(PRESENCE_TTL_SECONDS)
+        pipe = batch if batch is not None else redis_batch()
+        # Prune both sets so they don't grow unbounded
+        pipe.zremrangebyscore(_presence_key(code, "players"), 0, cutoff)
+        pipe.zremrangebyscore(_presence_key(code, "spectators"), 0, cutoff)
+        val = pipe.zcard(_presence_key(code, "spectators")).result()
+        try:
+            return int(val or 0)
+        except Exception:
+            return 0
+    except Exception:
+        return 0
 
-def _queue_data_key(mode: str, player_id: str) -> str:
-    """Get Redis key for player queue data."""
-    return f"queue_data:{mode}:{player_id}"
 
+# ============== PLAYER STATS ==============
 
-def _queue_match_key(player_id: str) -> str:
-    """Get Redis key for match notification."""
-    return f"queue_match:{player_id}"
+def get_player_stats(name: str) -> dict:
+    """Get stats for a player by name."""
+    redis = get_redis()
+    key = f"stats:{name.lower()}"
+    return _parse_player_stats(name, redis.get(key))
 
 
-def get_mmr_range_for_wait_time(wait_seconds: float) -> int:
-    """Get the MMR range based on how long the player has been waiting."""
-    mmr_range = RANKED_MMR_RANGE_INITIAL
-    for threshold_seconds, expanded_range in RANKED_MMR_RANGE_EXPANSIONS:
-        if wait_seconds >= threshold_seconds:
-            mmr_range = expanded_range
-    return min(mmr_range, RANKED_MMR_RANGE_MAX)
+# Keys per mget request when reading stats in bulk
+PLAYER_STATS_MGET_CHUNK = 200
 
 
-def get_min_match_size_for_quick_play(wait_seconds: float) -> int:
-    """Get the minimum acceptable match size for quick play based on wait time."""
-    min_size = QUEUE_MATCH_SIZE_MAX
-    for threshold_seconds, reduced_size in QUICK_PLAY_MATCH_SIZE_REDUCTIONS:
-        if wait_seconds >= threshold_seconds:
-            min_size = reduced_size
-    return max(min_size, QUEUE_MATCH_SIZE_MIN)
+def get_many_player_stats(names: list) -> list:
+    """Get stats for several players with one mget per chunk, in the order given."""
+    redis = get_redis()
+    values = []
+    for i in range(0, len(names), PLAYER_STATS_MGET_CHUNK):
+        chunk = names[i:i + PLAYER_STATS_MGET_CHUNK]
+        values.extend(redis.mget(*[f"stats:{name.lower()}" for name in chunk]))
+    return [_parse_player_stats(name, data) for name, data in zip(names, values)]
 
 
-def join_matchmaking_queue(
-    mode: str,
-    player_id: str,
-    player_name: str,
-    auth_user_id: Optional[str] = None,
-    mmr: int = 1000,
-    cosmetics: Optional[dict] = None,
-) -> dict:
-    """
-    Add a player to the matchmaking queue.
-    
-    Args:
-        mode: 'quick_play' or 'ranked'
-        player_id: Unique player ID for this session
-        player_name: Display name
-        auth_user_id: Authenticated user ID (required for ranked)
-        mmr: Player's MMR (used for ranked matching)
-        cosmetics: Player's equipped cosmetics
-    
-    Returns:
-        dict with queue status
-    """
-    redis = get_redis()
-    now = time.time()
-    
-    queue_key = _queue_key(mode)
-    data_key = _queue_data_key(mode, player_id)
-    
-    # Remove any existing queue entries for the same player name to prevent duplicates
-    # This handles the case where a player joins queue, navigates away without leaving,
-    # and then joins again - we don't want two entries with the same name
-    try:
-        existing_players = _get_queue_players(redis, queue_key, mode)
-        for existing in existing_players:
-            if existing.get("player_name") == player_name and existing.get("player_id") != player_id:
-                old_pid = existing.get("player_id")
-                leave_matchmaking_queue(mode, old_pid)
-                print(f"[QUEUE] Removed duplicate entry for {player_name} (old: {old_pid}, new: {player_id})")
-    except Exception as e:
-        print(f"[QUEUE] Error cleaning up duplicate entries: {e}")
-    
-    # Store player data
-    player_data = {
-        "player_id": player_id,
-        "player_name": player_name,
-        "auth_user_id": auth_user_id,
-        "mmr": mmr,
-        "cosmetics": cosmetics or {},
-        "joined_at": now,
+def _parse_player_stats(name: str, data) -> dict:
+    """Decode a stored stats record, filling defaults for new fields or missing players."""
+    if data:
+        stats = json.loads(data)
+        # Ensure all new fields exist for backwards compatibility
+        stats.setdefault('eliminations', 0)
+        stats.setdefault('times_eliminated', 0)
+        stats.setdefault('win_streak', 0)
+        stats.setdefault('best_streak', 0)
+        return stats
+    return {
+        "name": name,
+        "wins": 0,
+        "games_played": 0,
+        "total_guesses": 0,
+        "total_similarity": 0.0,
+        "eliminations": 0,
+        "times_eliminated": 0,
+        "win_streak": 0,
+        "best_streak": 0,
     }
-    
-    # For quick_play, sort by join time (FIFO)
-    # For ranked, sort by MMR for skill-based matching
-    score = now if mode == "quick_play" else mmr
-    
-    try:
-        # Add to sorted set
-        redis.zadd(queue_key, {player_id: score})
-        # Store player data
-        redis.setex(data_key, QUEUE_EXPIRY_SECONDS, json.dumps(player_data))
-        # Set queue expiry
-        redis.expire(queue_key, QUEUE_EXPIRY_SECONDS)
-        
-        return {
-            "status": "queued",
-            "mode": mode,
-            "position": redis.zrank(queue_key, player_id) or 0,
-            "queue_size": redis.zcard(queue_key) or 0,
-        }
-    except Exception as e:
-        print(f"[QUEUE] Error joining queue: {e}")
-        return {"status": "error", "message": "Failed to join queue"}
 
 
-def leave_matchmaking_queue(mode: str, player_id: str) -> bool:
-    """Remove a player from the matchmaking queue."""
-    redis = get_redis()
+def save_player_stats(name: str, stats: dict, batch: RedisBatch = None):
+    """Save player stats (one round trip; queued only if a batch is given)."""
+    pipe = batch if batch is not None else redis_batch()
+    key = f"stats:{name.lower()}"
+    # Stats never expire
+    pipe.set(key, json.dumps(stats))
+    # Also add to leaderboard set
+    pipe.sadd("leaderboard:players", name.lower())
     
-    try:
-        queue_key = _queue_key(mode)
-        data_key = _queue_data_key(mode, player_id)
-        match_key = _queue_match_key(player_id)
-        
-        redis.zrem(queue_key, player_id)
-        redis.delete(data_key)
-        redis.delete(match_key)
-        return True
-    except Exception as e:
-        print(f"[QUEUE] Error leaving queue: {e}")
-        return False
+    # Update weekly leaderboard (sorted sets)
+    week_key = get_weekly_leaderboard_key()
+    pipe.zadd(f"leaderboard:weekly:{week_key}", {name.lower(): stats.get('wins', 0)})
+    if batch is None:
+        pipe.execute()
 
 
-def get_queue_status(mode: str, player_id: str) -> dict:
+def get_weekly_leaderboard_key() -> str:
+    """Get the key for the current week's leaderboard."""
+    import datetime
+    today = datetime.date.today()
+    # Get the Monday of the current week
+    monday = today - datetime.timedelta(days=today.weekday())
+    return monday.strftime('%Y-%m-%d')
+
+
+def _ranked_elimination_index(game: dict) -> dict:
     """
-    Get a player's queue status and check for matches.
-    
-    This is called on poll and triggers the matching logic.
+    Build a mapping of player_id -> history index where they were eliminated/forfeited.
+    Players not present in the map are considered to have survived to the end.
     """
-    redis = get_redis()
-    now = time.time()
-    
-    # Check if player was matched
-    match_key = _queue_match_key(player_id)
-    try:
-        match_data = redis.get(match_key)
-        if match_data:
-            if isinstance(match_data, bytes):
-                match_data = match_data.decode()
-            match_info = json.loads(match_data)
-            # Clear the match notification
-            redis.delete(match_key)
-            return {
-                "status": "matched",
-                "game_code": match_info.get("game_code"),
-                "player_id": match_info.get("player_id"),
-                "session_token": match_info.get("session_token"),
-                "mode": mode,
-            }
-    except Exception as e:
-        print(f"[QUEUE] Error checking match: {e}")
-    
-    queue_key = _queue_key(mode)
-    data_key = _queue_data_key(mode, player_id)
-    
-    # Check if still in queue
-    try:
-        rank = redis.zrank(queue_key, player_id)
-        if rank is None:
-            return {"status": "not_in_queue", "mode": mode}
-    except Exception:
-        return {"status": "not_in_queue", "mode": mode}
-    
-    # Get player data
-    try:
-        raw_data = redis.get(data_key)
-        if not raw_data:
-            return {"status": "not_in_queue", "mode": mode}
-        if isinstance(raw_data, bytes):
-            raw_data = raw_data.decode()
-        player_data = json.loads(raw_data)
-    except Exception:
-        return {"status": "not_in_queue", "mode": mode}
-    
-    joined_at = player_data.get("joined_at", now)
-    wait_time = now - joined_at
-    queue_size = redis.zcard(queue_key) or 0
-    
-    # Try to find a match
-    match_result = try_create_match(mode, player_id, wait_time)
-    if match_result:
-        # Get our session token from the match notification
-        match_key = _queue_match_key(player_id)
-        try:
-            match_data = redis.get(match_key)
-            if match_data:
-                if isinstance(match_data, bytes):
-                    match_data = match_data.decode()
-                match_info = json.loads(match_data)
-                redis.delete(match_key)
-                return {
-                    "status": "matched",
-                    "game_code": match_info.get("game_code"),
-                    "player_id": match_info.get("player_id"),
-                    "session_token": match_info.get("session_token"),
-                    "mode": mode,
-                }
-        except Exception:
-            pass
-        # Fallback if notification not found
-        return {
-            "status": "matched",
-            "game_code": match_result.get("game_code"),
-            "mode": mode,
-        }
-    
-    # Still waiting
-    response = {
-        "status": "waiting",
-        "mode": mode,
-        "position": rank,
-        "queue_size": queue_size,
-        "wait_time": int(wait_time),
-    }
-    
-    # Add mode-specific info
-    if mode == "ranked":
-        # Ranked: show MMR range, always 4 players
-        response["mmr_range"] = get_mmr_range_for_wait_time(wait_time)
-        response["player_mmr"] = player_data.get("mmr", 1000)
-        response["match_size"] = QUEUE_MATCH_SIZE  # Always 4
-    elif mode == "quick_play":
-        # Quick play: show flexible match size
-        min_size = get_min_match_size_for_quick_play(wait_time)
-        response["min_match_size"] = min_size
-        response["max_match_size"] = QUEUE_MATCH_SIZE_MAX
-        # Show when bots will fill remaining slots
-        response["bot_fill_timeout"] = QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT
-        time_until_bots = max(0, QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT - wait_time)
-        response["time_until_bot_fill"] = int(time_until_bots)
-    
-    return response
+    elim_at = {}
+    history = game.get('history', []) or []
+    for idx, entry in enumerate(history):
+        etype = entry.get('type')
+        if etype == 'word_change':
+            continue
+        if etype == 'forfeit':
+            pid = entry.get('player_id')
+            if pid and pid not in elim_at:
+                elim_at[pid] = idx
+            continue
+        eliminations = entry.get('eliminations') or []
+        if isinstance(eliminations, list) and eliminations:
+            for pid in eliminations:
+                if pid and pid not in elim_at:
+                    elim_at[pid] = idx
+    return elim_at
 
 
-def try_create_match(mode: str, requesting_player_id: str, wait_time: float) -> Optional[dict]:
+def apply_ranked_mmr_updates(game: dict):
     """
-    Attempt to create a match from the queue.
-    
-    For quick_play: FIFO matching, fills with AI after timeout
-    For ranked: MMR-based matching, never adds AI
-    
-    Returns match info if created, None otherwise.
+    Apply multi-player Elo/MMR updates for ranked games (Google-auth only).
+
+    Uses pairwise outcomes derived from elimination order in game.history.
+    Idempotent best-effort: guarded by game['ranked_processed'] and a Redis setnx key.
     """
-    redis = get_redis()
-    now = time.time()
-    
-    queue_key = _queue_key(mode)
-    
-    if mode == "quick_play":
-        return _try_quick_play_match(redis, queue_key, requesting_player_id, wait_time, now)
-    elif mode == "ranked":
-        return _try_ranked_match(redis, queue_key, requesting_player_id, wait_time, now)
+    if not isinstance(game, dict):
+        print(f"[RANKED DEBUG] apply_ranked_mmr_updates: game is not a dict")
+        return
+    if not bool(game.get('is_ranked', False)):
+        print(f"[RANKED DEBUG] apply_ranked_mmr_updates: game is not ranked (is_ranked={game.get('is_ranked')})")
+        return
     
-    return None
-
+    code = game.get('code') or ''
+    print(f"[RANKED DEBUG] Processing ranked game {code}")
+    redis = get_redis()
+    result_key = f"ranked:{code}:mmr_result"
 
-def _get_queue_players(redis, queue_key: str, mode: str) -> list:
-    """Get all players in queue with their data."""
+    def _attach_saved_result():
+        """Best-effort: attach previously computed ranked MMR results to the game dict."""
+        try:
+            raw = redis.get(result_key)
+            if not raw:
+                return
+            if isinstance(raw, bytes):
+                raw = raw.decode()
+            data = json.loads(raw)
+            if isinstance(data, dict):
+                game['ranked_mmr'] = data
+        except Exception:
+            return
+
+    # If already processed, still try to attach saved results (for robustness against concurrent saves)
+    if game.get('ranked_processed'):
+        print(f"[RANKED DEBUG] Game {code} already processed (ranked_processed=True)")
+        if not game.get('ranked_mmr'):
+            _attach_saved_result()
+        return
+
+    # Best-effort Redis guard to avoid double-processing across concurrent finish events
     try:
-        # Get all player IDs from queue
-        if mode == "quick_play":
-            player_ids = redis.zrange(queue_key, 0, -1)
-        else:
-            # For ranked, get with scores (MMR)
-            player_ids = redis.zrange(queue_key, 0, -1)
-        
-        if not player_ids:
-            return []
-        
-        players = []
-        for pid in player_ids:
-            if isinstance(pid, bytes):
-                pid = pid.decode()
-            data_key = _queue_data_key(mode, pid)
-            raw = redis.get(data_key)
-            if raw:
-                if isinstance(raw, bytes):
-                    raw = raw.decode()
-                try:
-                    data = json.loads(raw)
-                    data["player_id"] = pid
-                    players.append(data)
-                except Exception:
-                    pass
-        
-        return players
-    except Exception as e:
-        print(f"[QUEUE] Error getting queue players: {e}")
-        return []
+        guard_key = f"ranked:{code}:mmr_processed"
+        if hasattr(redis, 'setnx'):
+            ok = redis.setnx(guard_key, "1")
+            if not ok:
+                # Already processed elsewhere; attach saved results so we don't overwrite them on save.
+                print(f"[RANKED DEBUG] Game {code} already processed (Redis guard key exists)")
+                _attach_saved_result()
+                game['ranked_processed'] = True
+                return
+            try:
+                redis.expire(guard_key, GAME_EXPIRY_SECONDS)
+            except Exception:
+                pass
+    except Exception:
+        # If guard fails, fall back to in-game flag only
+        pass
 
+    # Prefer a frozen participant snapshot (set at match start) so forfeits/leaves don't
+    # shrink the rating pool mid-match.
+    snapshot = game.get('ranked_participants')
+    players = snapshot if isinstance(snapshot, list) and snapshot else (game.get('players', []) or [])
+    winner_pid = game.get('winner')
 
-def _try_quick_play_match(redis, queue_key: str, requesting_player_id: str, wait_time: float, now: float) -> Optional[dict]:
-    """
-    Try to create a quick play match.
-    
-    - If 4 players: create match immediately (FIFO)
-    - After 30s: accept 3-player matches
-    - After 60s: accept 2-player matches
-    - After 45s: fill remaining slots with rookie bots
-    """
-    players = _get_queue_players(redis, queue_key, "quick_play")
-    
-    # Get minimum match size based on wait time
-    min_match_size = get_min_match_size_for_quick_play(wait_time)
-    
-    # Check if we should fill with bots (after timeout and at least 1 player)
-    should_fill_with_bots = wait_time >= QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT and len(players) >= 1
-    
-    if len(players) < min_match_size and not should_fill_with_bots:
-        return None
-    
-    # Sort by join time (FIFO)
-    players.sort(key=lambda p: p.get("joined_at", now))
-    
-    # Find the requesting player's position
-    requesting_idx = next((i for i, p in enumerate(players) if p.get("player_id") == requesting_player_id), None)
-    if requesting_idx is None:
-        return None
-    
-    # Check if all players ahead of us (and us) have waited long enough for this match size
-    # We need at least min_match_size players who all accept this size
-    eligible_players = []
+    # Ranked participants: authenticated humans only (skip AIs)
+    participants = []
     for p in players:
-        p_wait = now - p.get("joined_at", now)
-        p_min_size = get_min_match_size_for_quick_play(p_wait)
-        # This player accepts matches of size >= p_min_size
-        # We need players who accept our current min_match_size
-        if len(eligible_players) < QUEUE_MATCH_SIZE_MAX:
-            eligible_players.append((p, p_min_size, p_wait))
-    
-    # Find the best group we can form
-    # Start with max size and reduce
-    for target_size in range(QUEUE_MATCH_SIZE_MAX, min_match_size - 1, -1):
-        if len(eligible_players) < target_size:
-            # Not enough players for this size - check if we can fill with bots
-            if should_fill_with_bots and len(eligible_players) >= 1:
-                # Check if requesting player is in eligible players
-                eligible_player_ids = [p.get("player_id") for p, _, _ in eligible_players]
-                if requesting_player_id not in eligible_player_ids:
-                    continue
-                
-                # Check if all eligible players have waited long enough for bot fill
-                all_ready_for_bots = all(
-                    p_wait >= QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT 
-                    for _, _, p_wait in eligible_players
-                )
-                if not all_ready_for_bots:
-                    continue
-                
-                match_players = [p for p, _, _ in eligible_players]
-                bots_needed = QUEUE_MATCH_SIZE_MAX - len(match_players)
-                
-                # Use distributed lock to prevent race conditions
-                lock_key = f"queue_lock:quick_play:{':'.join(sorted(p.get('player_id', '') for p in match_players))}"
-                
-                # Try to acquire lock (SET NX with expiry)
-                lock_acquired = redis.set(lock_key, "1", nx=True, ex=10)  # 10 second lock
-                if not lock_acquired:
-                    # Another process is creating this match
-                    return None
-                
-                try:
-                    # Double-check all players are still in queue
-                    for p in match_players:
-                        pid = p.get("player_id")
-                        if redis.zrank(queue_key, pid) is None:
-                            # Player already matched, abort
-                            return None
-                    
-                    return _create_match_from_queue(redis, "quick_play", match_players, ai_fill=bots_needed)
-                finally:
-                    # Release lock
-                    redis.delete(lock_key)
+        if not isinstance(p, dict):
             continue
-        
-        # Take the first target_size players
-        group_candidates = eligible_players[:target_size]
-        
-        # Check if requesting player is in this group
-        group_player_ids = [p.get("player_id") for p, _, _ in group_candidates]
-        if requesting_player_id not in group_player_ids:
+        if p.get('is_ai'):
             continue
-        
-        # Check if all players in the group accept this match size
-        all_accept = all(p_min_size <= target_size for _, p_min_size, _ in group_candidates)
-        if all_accept:
-            match_players = [p for p, _, _ in group_candidates]
-            
-            # Use distributed lock to prevent race conditions
-            lock_key = f"queue_lock:quick_play:{':'.join(sorted(p.get('player_id', '') for p in match_players))}"
-            
-            # Try to acquire lock (SET NX with expiry)
-            lock_acquired = redis.set(lock_key, "1", nx=True, ex=10)  # 10 second lock
-            if not lock_acquired:
-                # Another process is creating this match
-                return None
+        uid = p.get('auth_user_id')
+        if not uid:
+            continue
+        participants.append(p)
+
+    print(f"[RANKED DEBUG] Game {code} has {len(participants)} authenticated participants")
+
+    if len(participants) < 2:
+        # Even if we can't do MMR calculations (not enough human players),
+        # still increment ranked_games for the solo human participant
+        # so placement progress (0/5) is tracked correctly.
+        print(f"[RANKED DEBUG] Game {code} has < 2 participants, updating stats without MMR calc")
+        for p in participants:
+            uid = p.get('auth_user_id')
+            if not uid:
+                continue
+            user = get_user_by_id(uid)
+            if not user:
+                continue
+            u_stats = get_user_stats(user)
+            u_stats['ranked_games'] = int(u_stats.get('ranked_games', 0) or 0) + 1
+            pid = p.get('id')
+            if pid and pid == winner_pid:
+                u_stats['ranked_wins'] = int(u_stats.get('ranked_wins', 0) or 0) + 1
+            else:
+                u_stats['ranked_losses'] = int(u_stats.get('ranked_losses', 0) or 0) + 1
+            user['stats'] = u_stats
+            save_user(user)
             
+            # Also update leaderboard zset so player appears after placement
             try:
-                # Double-check all players are still in queue
-                for p in match_players:
-                    pid = p.get("player_id")
-                    if redis.zrank(queue_key, pid) is None:
-                        # Player already matched, abort
-                        return None
-                
-                return _create_match_from_queue(redis, "quick_play", match_players, ai_fill=0)
-            finally:
-                # Release lock
-                redis.delete(lock_key)
-    
-    return None
+                current_mmr = int(u_stats.get('mmr', RANKED_INITIAL_MMR) or RANKED_INITIAL_MMR)
+                redis.zadd("leaderboard:mmr", {uid: current_mmr})
+            except Exception as e:
+                print(f"Failed to update ranked leaderboard for {uid}: {e}")
+        game['ranked_processed'] = True
+        return
 
+    elim_at = _ranked_elimination_index(game)
+    history_len = len(game.get('history', []) or [])
 
-def _try_ranked_match(redis, queue_key: str, requesting_player_id: str, wait_time: float, now: float) -> Optional[dict]:
-    """
-    Try to create a ranked match.
-    
-    - Groups players by MMR range
-    - Expands range over time
-    - Always requires exactly 4 players
-    - Never adds AI - waits until 4 humans found
-    """
-    players = _get_queue_players(redis, queue_key, "ranked")
-    
-    if len(players) < QUEUE_MATCH_SIZE:
-        return None
-    
-    # Find the requesting player
-    requesting_player = next((p for p in players if p.get("player_id") == requesting_player_id), None)
-    if not requesting_player:
-        return None
-    
-    player_mmr = requesting_player.get("mmr", 1000)
-    player_wait = now - requesting_player.get("joined_at", now)
-    mmr_range = get_mmr_range_for_wait_time(player_wait)
-    
-    # Find players within MMR range of the requesting player
-    candidates = []
-    for p in players:
-        p_mmr = p.get("mmr", 1000)
-        if abs(p_mmr - player_mmr) <= mmr_range:
-            candidates.append(p)
-    
-    if len(candidates) < QUEUE_MATCH_SIZE:
-        return None
-    
-    # Find the best group of 4 with tightest MMR spread
-    best_group = None
-    best_spread = float('inf')
-    
-    # Sort by MMR and take consecutive groups
-    candidates.sort(key=lambda p: p.get("mmr", 1000))
-    
-    for i in range(len(candidates) - QUEUE_MATCH_SIZE + 1):
-        group = candidates[i:i + QUEUE_MATCH_SIZE]
-        mmrs = [p.get("mmr", 1000) for p in group]
-        spread = max(mmrs) - min(mmrs)
-        
-        # Check if requesting player is in this group
-        if requesting_player_id not in [p.get("player_id") for p in group]:
+    # Ranking value: later elimination is better; winner gets a large value
+    rank_value = {}
+    for p in participants:
+        pid = p.get('id')
+        if pid == winner_pid:
+            rank_value[pid] = history_len + 10_000
+        else:
+            rank_value[pid] = elim_at.get(pid, history_len + 9_000)
+
+    # Load users and current ratings
+    user_map = {}
+    rating = {}
+    pre_game_ranked_games = {}  # Track ranked_games BEFORE this match for placement K-factor
+    for p in participants:
+        uid = p.get('auth_user_id')
+        user = get_user_by_id(uid)
+        if not user:
             continue
-        
-        # Check if all players in group are within each other's expanded range
-        all_compatible = True
-        for p in group:
-            p_wait = now - p.get("joined_at", now)
-            p_range = get_mmr_range_for_wait_time(p_wait)
-            for other in group:
-                if abs(p.get("mmr", 1000) - other.get("mmr", 1000)) > p_range:
-                    all_compatible = False
+        stats = get_user_stats(user)
+        try:
+            mmr = int(stats.get('mmr', RANKED_INITIAL_MMR) or RANKED_INITIAL_MMR)
+        except Exception:
+            mmr = RANKED_INITIAL_MMR
+        user_map[uid] = user
+        rating[uid] = float(mmr)
+        # Store ranked_games count before this match (used for placement K-factor)
+        try:
+            pre_game_ranked_games[uid] = int(stats.get('ranked_games', 0) or 0)
+        except Exception:
+            pre_game_ranked_games[uid] = 0
+
+    # If we couldn't load at least 2 users, still update stats for loaded users
+    if len(rating) < 2:
+        print(f"[RANKED DEBUG] Game {code} couldn't load 2+ users (loaded {len(rating)}), updating stats without MMR calc")
+        # Update ranked_games for any users we did load
+        for uid, user in user_map.items():
+            u_stats = get_user_stats(user)
+            u_stats['ranked_games'] = int(u_stats.get('ranked_games', 0) or 0) + 1
+            # Find pid from participants
+            pid = None
+            for p in participants:
+                if p.get('auth_user_id') == uid:
+                    pid = p.get('id')
                     break
-            if not all_compatible:
-                break
-        
-        if all_compatible and spread < best_spread:
-            best_spread = spread
-            best_group = group
+            if pid and pid == winner_pid:
+                u_stats['ranked_wins'] = int(u_stats.get('ranked_wins', 0) or 0) + 1
+            else:
+                u_stats['ranked_losses'] = int(u_stats.get('ranked_losses', 0) or 0) + 1
+            user['stats'] = u_stats
+            save_user(user)
+            
+            # Also update leaderboard zset so player appears after placement
+            try:
+                current_mmr = int(u_stats.get('mmr', RANKED_INITIAL_MMR) or RANKED_INITIAL_MMR)
+                redis.zadd("leaderboard:mmr", {uid: current_mmr})
+            except Exception as e:
+                print(f"Failed to update ranked leaderboard for {uid}: {e}")
+        game['ranked_processed'] = True
+        return
+
+    # Map uid -> pid for rank comparisons
+    uid_to_pid = {p.get('auth_user_id'): p.get('id') for p in participants if p.get('auth_user_id') in rating}
+    uids = list(uid_to_pid.keys())
+    n = len(uids)
+    if n < 2:
+        print(f"[RANKED DEBUG] Game {code} has < 2 uids after mapping ({n}), returning early")
+        game['ranked_processed'] = True
+        return
     
-    if best_group:
-        # Use distributed lock to prevent race conditions
-        lock_key = f"queue_lock:ranked:{':'.join(sorted(p.get('player_id', '') for p in best_group))}"
+    print(f"[RANKED DEBUG] Game {code} processing MMR for {n} players")
+
+    deltas = {uid: 0.0 for uid in uids}
+
+    def expected(ra: float, rb: float) -> float:
+        return 1.0 / (1.0 + (10.0 ** ((rb - ra) / 400.0)))
+
+    # Pairwise accumulation
+    for i in range(n):
+        for j in range(i + 1, n):
+            ui = uids[i]
+            uj = uids[j]
+            pi = uid_to_pid[ui]
+            pj = uid_to_pid[uj]
+            ri = rating[ui]
+            rj = rating[uj]
+
+            ei = expected(ri, rj)
+            ej = 1.0 - ei
+
+            vi = rank_value.get(pi, 0)
+            vj = rank_value.get(pj, 0)
+            if vi > vj:
+                si, sj = 1.0, 0.0
+            elif vi < vj:
+                si, sj = 0.0, 1.0
+            else:
+                si, sj = 0.5, 0.5
+
+            deltas[ui] += (si - ei)
+            deltas[uj] += (sj - ej)
+
+    # Apply updates + persist
+    # Also record per-game deltas so the frontend can show MMR change on the game-over screen.
+    # Use per-player K-factor: higher for placement players (< RANKED_PLACEMENT_GAMES)
+    mmr_result_by_pid = {}
+    for uid in uids:
+        user = user_map.get(uid)
+        if not user:
+            continue
         
-        # Try to acquire lock (SET NX with expiry)
-        lock_acquired = redis.set(lock_key, "1", nx=True, ex=10)  # 10 second lock
-        if not lock_acquired:
-            # Another process is creating this match
-            return None
+        # Determine K-factor based on games played (before this match)
+        # Placement (0-4 games): highest K-factor for fast calibration
+        # Provisional (5-19 games): medium K-factor as rating stabilizes
+        # Established (20+ games): K decays over time but never below minimum
+        games_before = pre_game_ranked_games.get(uid, 0)
+        if games_before < RANKED_PLACEMENT_GAMES:
+            k_factor = RANKED_PLACEMENT_K_FACTOR
+        elif games_before < RANKED_PROVISIONAL_GAMES:
+            k_factor = RANKED_PROVISIONAL_K_FACTOR
+        else:
+            # K decays from base K factor, losing decay_rate per game after provisional
+            games_after_provisional = games_before - RANKED_PROVISIONAL_GAMES
+            k_factor = max(
+                RANKED_K_FACTOR_MIN,
+                RANKED_K_FACTOR - (games_after_provisional * RANKED_K_FACTOR_DECAY_RATE)
+            )
+        scale = float(k_factor) / float(max(1, n - 1))
         
+        old = rating[uid]
+        new = old + (scale * deltas.get(uid, 0.0)) + RANKED_PARTICIPATION_BONUS
         try:
-            # Double-check all players are still in queue (they might have been matched by another group)
-            for p in best_group:
-                pid = p.get("player_id")
-                if redis.zrank(queue_key, pid) is None:
-                    # Player already matched, abort
-                    return None
-            
-            return _create_match_from_queue(redis, "ranked", best_group, ai_fill=0)
-        finally:
-            # Release lock
-            redis.delete(lock_key)
-    
-    return None
+            new_int = int(round(new))
+        except Exception:
+            new_int = int(old)
+        if new_int < 0:
+            new_int = 0
+
+        try:
+            old_int = int(round(old))
+        except Exception:
+            old_int = int(new_int)
+        delta_int = int(new_int - old_int)
+
+        u_stats = get_user_stats(user)
+        u_stats['mmr'] = new_int
+        try:
+            prev_peak = int(u_stats.get('peak_mmr', new_int) or new_int)
+        except Exception:
+            prev_peak = new_int
+        u_stats['peak_mmr'] = max(prev_peak, new_int)
 
+        u_stats['ranked_games'] = int(u_stats.get('ranked_games', 0) or 0) + 1
 
-def _create_match_from_queue(redis, mode: str, players: list, ai_fill: int = 0) -> Optional[dict]:
-    """
-    Create a game from matched queue players.
+        pid = uid_to_pid.get(uid)
+        if pid and pid == winner_pid:
+            u_stats['ranked_wins'] = int(u_stats.get('ranked_wins', 0) or 0) + 1
+        else:
+            u_stats['ranked_losses'] = int(u_stats.get('ranked_losses', 0) or 0) + 1
+
+        user['stats'] = u_stats
+        save_user(user)
+        print(f"[RANKED DEBUG] Updated user {uid}: ranked_games={u_stats.get('ranked_games')}, mmr={u_stats.get('mmr')}, delta={delta_int}")
+
+        # Update ranked leaderboard zset
+        try:
+            redis.zadd("leaderboard:mmr", {uid: new_int})
+        except Exception as e:
+            print(f"Failed to update ranked leaderboard for {uid}: {e}")
+
+        pid = uid_to_pid.get(uid)
+        if pid:
+            mmr_result_by_pid[str(pid)] = {
+                "uid": str(uid),
+                "old": int(old_int),
+                "new": int(new_int),
+                "delta": int(delta_int),
+            }
+
+    game['ranked_processed'] = True
+    if mmr_result_by_pid:
+        game['ranked_mmr'] = mmr_result_by_pid
+        print(f"[RANKED DEBUG] Game {code} finished processing, mmr_result_by_pid={mmr_result_by_pid}")
+        # Persist results in Redis so concurrent finish requests can attach them reliably.
+        try:
+            redis.setex(result_key, GAME_EXPIRY_SECONDS, json.dumps(mmr_result_by_pid))
+        except Exception:
+            try:
+                redis.set(result_key, json.dumps(mmr_result_by_pid))
+            except Exception:
+                pass
+    else:
+        print(f"[RANKED DEBUG] Game {code} finished processing but no mmr_result_by_pid")
+
+
+def update_game_stats(game: dict):
+    """Update stats for all players after a game ends."""
+    winner_id = game.get('winner')
+    is_multiplayer = not bool(game.get('is_singleplayer'))
+    is_ranked = bool(game.get('is_ranked', False)) and is_multiplayer
     
-    Args:
-        redis: Redis client
-        mode: 'quick_play' or 'ranked'
-        players: List of player data dicts
-        ai_fill: Number of AI players to add (quick_play only)
-    """
-    import random
+    print(f"[RANKED DEBUG] update_game_stats called: is_ranked={is_ranked}, is_multiplayer={is_multiplayer}, winner={winner_id}")
     
-    try:
-        # Generate game code
-        code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(6))
-        
-        # Select random themes for voting
-        available_themes = list(PREGENERATED_THEMES.keys())
-        theme_options = random.sample(available_themes, min(3, len(available_themes)))
-        
-        # Determine time control
-        is_ranked = mode == "ranked"
-        is_quickplay = mode == "quick_play"
-        time_control = get_time_control(is_ranked, "rapid", is_quickplay)
-        
-        # Word count: 50 for quickplay, 100 for ranked
-        word_count = 100 if is_ranked else 50
-        
-        # Create game
-        game = {
-            "code": code,
-            "status": "waiting",
-            "visibility": "public",
-            "is_ranked": is_ranked,
-            "is_singleplayer": False,
-            "players": [],
-            "current_turn": 0,
-            "history": [],
-            "theme": None,
-            "theme_options": theme_options,
-            "theme_votes": {},
-            "host_id": None,
-            "created_at": time.time(),
-            "time_control": time_control,
-            "word_selection_time": get_word_selection_time(is_ranked),
-            "from_matchmaking": True,
-            "matchmaking_mode": mode,
-            "word_count": word_count,
-        }
+    # Count eliminations per player
+    eliminations_by_player = {}
+    eliminated_players = set()
+    forfeited_players = set()  # Track forfeits separately - they shouldn't count towards games played
+    
+    for entry in game.get('history', []):
+        if entry.get('type') == 'word_change':
+            continue
+        if entry.get('type') == 'forfeit':
+            pid = entry.get('player_id')
+            if pid:
+                eliminated_players.add(pid)
+                forfeited_players.add(pid)
+            continue
+        guesser_id = entry.get('guesser_id')
+        if guesser_id and entry.get('eliminations'):
+            eliminations_by_player[guesser_id] = eliminations_by_player.get(guesser_id, 0) + len(entry['eliminations'])
+            eliminated_players.update(entry['eliminations'])
+    
+    # Casual leaderboard stats: read all in one mget, write all in one pipeline
+    casual_players = [
+        p for p in game['players']
+        if not p.get('is_ai') and p.get('auth_user_id')
+        and is_multiplayer and not is_ranked and p['id'] not in forfeited_players
+    ]
+    casual_stats = dict(zip(
+        [p['id'] for p in casual_players],
+        get_many_player_stats([p['name'] for p in casual_players]),
+    ))
+    stats_batch = redis_batch()
+    
+    for player in game['players']:
+        # Skip bots and guest players - they shouldn't appear on leaderboards
+        if player.get('is_ai'):
+            continue
+        if not player.get('auth_user_id'):
+            continue
         
-        # Add human players
-        for i, p_data in enumerate(players):
-            player_id = p_data.get("player_id")
-            session_token = generate_session_token(player_id, code)
-            
-            player = {
-                "id": player_id,
-                "name": p_data.get("player_name", f"Player{i+1}"),
-                "secret_word": None,
-                "is_alive": True,
-                "is_ai": False,
-                "is_ready": False,
-                "cosmetics": p_data.get("cosmetics", {}),
-                "time_remaining": time_control.get("initial_time", 0),
-                "session_token": session_token,
-            }
+        # Only update casual leaderboard stats for multiplayer CASUAL games (not solo, not ranked)
+        # Ranked games have their own separate stats tracked via apply_ranked_mmr_updates
+        # Skip forfeited players - they shouldn't get credit for games they quit
+        if player['id'] in casual_stats:
+            stats = casual_stats[player['id']]
+            stats['games_played'] += 1
             
-            # Add auth user ID if present
-            if p_data.get("auth_user_id"):
-                player["auth_user_id"] = p_data["auth_user_id"]
+            # Track eliminations
+            stats['eliminations'] = stats.get('eliminations', 0) + eliminations_by_player.get(player['id'], 0)
             
-            game["players"].append(player)
+            # Track times eliminated
+            if player['id'] in eliminated_players:
+                stats['times_eliminated'] = stats.get('times_eliminated', 0) + 1
             
-            # First player is host
-            if i == 0:
-                game["host_id"] = player_id
-        
-        # Add AI players if needed (quick_play only, always rookie difficulty)
-        if ai_fill > 0 and mode == "quick_play":
-            for i in range(ai_fill):
-                difficulty = "rookie"
-                ai_id = f"ai_{difficulty}_{secrets.token_hex(4)}"
-                ai_config = AI_DIFFICULTY_CONFIG.get(difficulty, {})
-                ai_name = f"{ai_config.get('name_prefix', 'Rookie')} {secrets.token_hex(2).upper()}"
-                
-                ai_player = {
-                    "id": ai_id,
-                    "name": ai_name,
-                    "secret_word": None,
-                    "is_alive": True,
-                    "is_ai": True,
-                    "ai_difficulty": difficulty,
-                    "is_ready": False,
-                    "cosmetics": {},
-                    "time_remaining": time_control.get("initial_time", 0),
-                }
-                game["players"].append(ai_player)
-        
-        # Save game
-        save_game(code, game)
-        
-        # Notify all players of the match
-        queue_key = _queue_key(mode)
-        for p_data in players:
-            player_id = p_data.get("player_id")
-            match_key = _queue_match_key(player_id)
+            if player['id'] == winner_id:
+                stats['wins'] += 1
+                # Update win streak
+                stats['win_streak'] = stats.get('win_streak', 0) + 1
+                if stats['win_streak'] > stats.get('best_streak', 0):
+                    stats['best_streak'] = stats['win_streak']
+            else:
+                # Reset win streak on loss
+                stats['win_streak'] = 0
             
-            # Find player's session token
-            player_in_game = next((p for p in game["players"] if p["id"] == player_id), None)
-            session_token = player_in_game.get("session_token", "") if player_in_game else ""
+            # Calculate average closeness from this player's guesses
+            for entry in game.get('history', []):
+                # Skip word_change entries which don't have guesser_id
+                if entry.get('type') == 'word_change':
+                    continue
+                if entry.get('guesser_id') == player['id']:
+                    stats['total_guesses'] += 1
+                    # Get the max similarity to other players (not self)
+                    similarities = entry.get('similarities', {})
+                    other_sims = [
+                        sim for pid, sim in similarities.items() 
+                        if pid != player['id']
+                    ]
+                    if other_sims:
+                        stats['total_similarity'] += max(other_sims)
             
-            match_info = {
-                "game_code": code,
-                "player_id": player_id,
-                "session_token": session_token,
-            }
-            redis.setex(match_key, 60, json.dumps(match_info))
+            # Link player stats to their Google account if authenticated
+            auth_user_id = player.get('auth_user_id')
+            if auth_user_id:
+                stats['auth_user_id'] = auth_user_id
             
-            # Remove from queue
-            redis.zrem(queue_key, player_id)
-            data_key = _queue_data_key(mode, player_id)
-            redis.delete(data_key)
-        
-        print(f"[QUEUE] Created {mode} match {code} with {len(players)} players + {ai_fill} AI")
-        
-        return {"game_code": code}
-    
-    except Exception as e:
-        print(f"[QUEUE] Error creating match: {e}")
-        import traceback
-        print(f"[QUEUE] Traceback: {traceback.format_exc()}")
-        return None
-
-
-def check_ranked_eligibility(user: dict) -> tuple[bool, str]:
-    """
-    Check if a user is eligible for ranked matchmaking.
-    
-    Returns:
-        (is_eligible, error_message)
-    """
-    if not user:
-        return False, "Sign in with Google to play ranked"
-    
-    stats = get_user_stats(user)
-    mp_games = stats.get("mp_games_played", 0)
-    
-    if mp_games < QUEUE_MIN_CASUAL_GAMES_FOR_RANKED:
-        remaining = QUEUE_MIN_CASUAL_GAMES_FOR_RANKED - mp_games
-        return False, f"Play {remaining} more casual game{'s' if remaining != 1 else ''} to unlock ranked"
-    
-    return True, ""
+            save_player_stats(player['name'], stats, stats_batch)
 
+        # Update authenticated user's mp_* stats for cosmetics unlocks (for ALL multiplayer games)
+        # Skip forfeited players - they shouldn't get credit towards games played (prevents ranked unlock abuse)
+        if is_multiplayer and player['id'] not in forfeited_players:
+            auth_user_id = player.get('auth_user_id')
+            if auth_user_id:
+                auth_user = get_user_by_id(auth_user_id)
+                if auth_user:
+                    u_stats = get_user_stats(auth_user)
+                    u_stats['mp_games_played'] = u_stats.get('mp_games_played', 0) + 1
+                    elim_count = eliminations_by_player.get(player['id'], 0) or 0
+                    u_stats['mp_eliminations'] = u_stats.get('mp_eliminations', 0) + elim_count
+                    if player['id'] == winner_id:
+                        u_stats['mp_wins'] = u_stats.get('mp_wins', 0) + 1
+                    if player['id'] in eliminated_players:
+                        u_stats['mp_times_eliminated'] = u_stats.get('mp_times_eliminated', 0) + 1
+                    auth_user['stats'] = u_stats
 
-# ============== HANDLER ==============
+                    # Daily quests progress (credits awarded on claim).
+                    deltas = {
+                        "mp_games": 1,
+                        "mp_elims": int(elim_count or 0),
+                    }
+                    if player['id'] == winner_id:
+                        deltas["mp_wins"] = 1
+                    if is_ranked:
+                        deltas["ranked_games"] = 1
+                        if player['id'] == winner_id:
+                            deltas["ranked_wins"] = 1
+                    apply_daily_quest_progress(auth_user, deltas, persist=False)
+                    apply_weekly_quest_progress(auth_user, deltas, persist=False)
 
-# Allowed origins for CORS
-ALLOWED_ORIGINS = [
-    'https://embeddle.vercel.app',
-    'https://www.embeddle.com',
-]
+                    save_user(auth_user)
 
-# Allow localhost in development
-DEV_MODE = os.getenv('VERCEL_ENV', 'development') == 'development'
-# When enabled, include extra debug context in some error responses.
-DEBUG_ERRORS = env_bool("DEBUG_ERRORS", (CONFIG.get("debug", {}) or {}).get("errors", False))
-DEBUG_ERROR_TTL_SECONDS = int(os.getenv("DEBUG_ERROR_TTL_SECONDS", "3600"))
+    stats_batch.execute()
 
+    # Ranked: update MMR once per finished game (best-effort + idempotent flag)
+    if is_ranked:
+        try:
+            apply_ranked_mmr_updates(game)
+        except Exception as e:
+            import traceback
+            print(f"Ranked MMR update error: {e}")
+            print(f"Ranked MMR update traceback: {traceback.format_exc()}")
 
-class handler(BaseHTTPRequestHandler):
-    def _get_auth_payload(self) -> Optional[dict]:
-        """Return decoded JWT payload for the request, or None if not authenticated."""
-        auth_header = self.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return None
-        token = auth_header[7:]
-        return verify_jwt_token(token)
 
-    def _get_auth_user_id(self) -> Optional[str]:
-        """Convenience wrapper to get the authenticated user id (JWT sub)."""
-        payload = self._get_auth_payload()
-        if payload and isinstance(payload, dict):
-            return payload.get('sub')
-        return None
+def get_leaderboard(leaderboard_type: str = 'alltime') -> list:
+    """Get all players sorted by wins.
+    
+    Args:
+        leaderboard_type: 'alltime' or 'weekly'
+    """
+    redis = get_redis()
+    
+    if leaderboard_type == 'weekly':
+        # Get weekly leaderboard from sorted set
+        week_key = get_weekly_leaderboard_key()
+        weekly_data = redis.zrevrange(f"leaderboard:weekly:{week_key}", 0, 99, withscores=True)
+        
+        if not weekly_data:
+            return []
+        
+        players = []
+        weekly_stats = get_many_player_stats([name for name, _ in weekly_data])
+        for (name, wins), stats in zip(weekly_data, weekly_stats):
+            if stats['games_played'] > 0:
+                stats['weekly_wins'] = int(wins)
+                stats['avg_closeness'] = (
+                    stats['total_similarity'] / stats['total_guesses'] 
+                    if stats['total_guesses'] > 0 else 0
+                )
+                stats['win_rate'] = stats['wins'] / stats['games_played'] if stats['games_played'] > 0 else 0
+                players.append(stats)
+        return players
+    
+    # All-time leaderboard
+    player_names = redis.smembers("leaderboard:players")
+    
+    if not player_names:
+        return []
+    
+    players = []
+    for stats in get_many_player_stats(list(player_names)):
+        if stats['games_played'] > 0:
+            stats['avg_closeness'] = (
+                stats['total_similarity'] / stats['total_guesses'] 
+                if stats['total_guesses'] > 0 else 0
+            )
+            stats['win_rate'] = stats['wins'] / stats['games_played'] if stats['games_played'] > 0 else 0
+            players.append(stats)
+    
+    # Sort by wins (desc), then win rate (desc), then games played (desc)
+    players.sort(key=lambda p: (
+        p['wins'], 
+        p['win_rate'],
+        p['games_played']
+    ), reverse=True)
+    
+    return players[:100]  # Limit to top 100
 
-    def _is_admin_request(self) -> bool:
-        """Best-effort check if the request is from an admin user (by email)."""
-        try:
-            payload = self._get_auth_payload()
-            if not payload or not isinstance(payload, dict):
-                return False
-            email = str(payload.get('email') or '').strip().lower()
-            if not email:
-                return False
-            admin_emails = [str(e).strip().lower() for e in (ADMIN_EMAILS or [])]
-            return email in admin_emails
-        except Exception:
-            return False
 
-    def _debug_allowed(self) -> bool:
-        """Return True if we can safely return debug details to this client."""
-        # SECURITY: In production, only admins can see debug info to prevent information leakage
-        if os.getenv('VERCEL_ENV') == 'production':
-            return self._is_admin_request()
-        # In development, respect DEBUG_ERRORS setting or admin status
-        return bool(DEBUG_ERRORS or self._is_admin_request())
+# ============== MATCHMAKING QUEUE SYSTEM ==============
 
-    def _validate_player_session(self, body: dict, game_code: str) -> tuple:
-        """
-        Validate player session token from request body.
-        
-        Returns:
-            (player_id, None) if valid
-            (None, error_message) if invalid
-        """
-        player_id = body.get('player_id', '')
-        session_token = body.get('session_token', '')
-        
-        # Validate player ID format (human or AI)
-        if player_id.startswith('ai_'):
-            validated_id = sanitize_ai_player_id(player_id)
-            # AI players don't need session tokens - they're server-controlled
-            if not validated_id:
-                return None, "Invalid AI player ID format"
-            return validated_id, None
-        else:
-            validated_id = sanitize_player_id(player_id)
-            if not validated_id:
-                return None, "Invalid player ID format"
-        
-        # SECURITY: Require valid session token for human players
-        if not session_token:
-            return None, "Session token required"
-        
-        if not verify_session_token(session_token, validated_id, game_code):
-            return None, "Invalid or expired session token"
-        
-        return validated_id, None
+# Queue configuration
+QUEUE_EXPIRY_SECONDS = 300  # 5 minutes max in queue
+QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT = 45  # 45 seconds before filling with rookie bots
+QUEUE_MATCH_SIZE_MIN = 2  # Minimum players for a quick play match
+QUEUE_MATCH_SIZE_MAX = 4  # Maximum players for matches
+QUEUE_MATCH_SIZE = 4  # Fixed match size for ranked
+QUEUE_MIN_CASUAL_GAMES_FOR_RANKED = 3  # Minimum casual games before ranked (lowered for accessibility)
 
-    def _get_cors_origin(self):
-        """Get the appropriate CORS origin header value."""
-        origin = self.headers.get('Origin', '')
-        if origin in ALLOWED_ORIGINS:
-            return origin
-        # Allow localhost in development
-        if DEV_MODE and origin.startswith('http://localhost:'):
-            return origin
-        # SECURITY: Don't set CORS header for unknown origins (prevents confused deputy attacks)
-        return ''
+# MMR range expansion for ranked matchmaking
+# More aggressive expansion to find matches faster
+RANKED_MMR_RANGE_INITIAL = 150  # Start wider for faster initial matches
+RANKED_MMR_RANGE_EXPANSIONS = [
+    (15, 250),   # After 15s: +/- 250 (expand quickly)
+    (30, 400),   # After 30s: +/- 400
+    (45, 600),   # After 45s: +/- 600
+    (60, 800),   # After 60s: +/- 800
+    (90, 1000),  # After 90s: +/- 1000 (match anyone)
+]
+RANKED_MMR_RANGE_MAX = 1000
 
-    def _send_json(self, data, status=200):
-        self.send_response(status)
-        self.send_header('Content-Type', 'application/json')
-        # CORS headers - restricted to allowed origins
-        cors_origin = self._get_cors_origin()
-        if cors_origin:
-            self.send_header('Access-Control-Allow-Origin', cors_origin)
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.send_header('Access-Control-Allow-Credentials', 'true')
-        # Security headers
-        self.send_header('X-Content-Type-Options', 'nosniff')
-        self.send_header('X-Frame-Options', 'DENY')
-        self.send_header('X-XSS-Protection', '1; mode=block')
-        self.send_header('Referrer-Policy', 'strict-origin-when-cross-origin')
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+# Match size reduction based on wait time (for quick play only)
+# After waiting long enough, accept smaller matches
+QUICK_PLAY_MATCH_SIZE_REDUCTIONS = [
+    (30, 3),   # After 30s: accept 3-player matches
+    (60, 2),   # After 60s: accept 2-player matches
+]
 
-    def _send_error(self, message, status=400):
-        self._send_json({"detail": message}, status)
 
-    def _get_body(self):
-        """
-        Best-effort JSON body parser.
+def _queue_key(mode: str) -> str:
+    """Get Redis key for a queue mode."""
+    return f"queue:{mode}"
 
-        IMPORTANT: Always returns a dict to avoid attribute errors (many handlers do body.get(...)).
-        If parsing fails (invalid JSON / unexpected content-type), returns {} instead of crashing.
-        """
-        try:
-            content_length = int(self.headers.get('Content-Length', 0))
-        except Exception:
-            content_length = 0
-        if not content_length:
-            return {}
 
-        try:
-            raw = self.rfile.read(content_length)
-        except Exception:
-            return {}
-        if not raw:
-            return {}
+def _queue_data_key(mode: str, player_id: str) -> str:
+    """Get Redis key for player queue data."""
+    return f"queue_data:{mode}:{player_id}"
 
-        content_type = (self.headers.get('Content-Type', '') or '').lower()
 
-        # Support form-encoded bodies as a fallback (prevents serverless crashes on accidental form submits)
-        if 'application/x-www-form-urlencoded' in content_type:
-            try:
-                parsed = urllib.parse.parse_qs(raw.decode('utf-8', errors='ignore'))
-                return {k: (v[0] if isinstance(v, list) and len(v) == 1 else v) for k, v in parsed.items()}
-            except Exception:
-                return {}
+def _queue_match_key(player_id: str) -> str:
+    """Get Redis key for match notification."""
+    return f"queue_match:{player_id}"
 
-        # Default: JSON
-        try:
-            data = json.loads(raw)
-        except Exception:
-            return {}
-        return data if isinstance(data, dict) else {}
 
-    def _build_game_response(self, game: dict, player_id: str, code: str) -> dict:
-        """Build a standard game response for a player. Used by GET /api/games/{code} and POST endpoints."""
-        try:
-            game_finished = game['status'] == 'finished'
-            all_words_set = all(p.get('secret_word') for p in game['players']) if game['players'] else False
-            
-            current_player_id = None
-            if game['status'] == 'playing' and game['players'] and all_words_set:
-                current_player_id = game['players'][game['current_turn']]['id']
-            
-            theme_data = game.get('theme') or {}
-            theme_votes = game.get('theme_votes', {})
-            theme_votes_with_names = {}
-            for theme, voter_ids in theme_votes.items():
-                voters = []
-                for vid in voter_ids:
-                    voter = next((p for p in game['players'] if p['id'] == vid), None)
-                    if voter:
-                        voters.append({"id": vid, "name": voter['name']})
-                theme_votes_with_names[theme] = voters
-            
-            ready_count = sum(1 for p in game['players'] if p.get('is_ready', False))
-            spectator_count = get_spectator_count(code)
-            
-            # Time control (chess clock model)
-            time_control = game.get('time_control', {})
-            initial_time = int(time_control.get('initial_time', 0) or 0)
-            increment = int(time_control.get('increment', 0) or 0)
-            
-            # Calculate current player's time remaining
-            current_player_time = None
-            turn_started_at = game.get('turn_started_at')
-            if initial_time > 0 and game['status'] == 'playing' and not game.get('waiting_for_word_change'):
-                current_player = game['players'][game['current_turn']] if game['players'] else None
-                if current_player and turn_started_at:
-                    stored_time = current_player.get('time_remaining', initial_time)
-                    elapsed = time.time() - turn_started_at
-                    current_player_time = max(0, stored_time - elapsed)
-            
-            # Calculate word selection time remaining
-            word_selection_time_remaining = None
-            word_selection_started_at = game.get('word_selection_started_at')
-            word_selection_time = game.get('word_selection_time', 0)
-            if game['status'] == 'word_selection' and word_selection_started_at and word_selection_time > 0:
-                elapsed = time.time() - word_selection_started_at
-                word_selection_time_remaining = max(0, word_selection_time - elapsed)
-            
-            # Calculate word change time remaining (15 seconds to pick a new word after elimination)
-            WORD_CHANGE_TIME_LIMIT = 30
-            word_change_time_remaining = None
-            word_change_started_at = game.get('word_change_started_at')
-            if game.get('waiting_for_word_change') and word_change_started_at:
-                elapsed = time.time() - word_change_started_at
-                word_change_time_remaining = max(0, WORD_CHANGE_TIME_LIMIT - elapsed)
-            
-            response = {
-                "code": game['code'],
-                "host_id": game['host_id'],
-                "players": [],
-                "current_turn": game['current_turn'],
-                "current_player_id": current_player_id,
-                "status": game['status'],
-                "winner": game.get('winner'),
-                "history": game.get('history', []),
-                "visibility": game.get('visibility', 'public'),
-                "is_ranked": bool(game.get('is_ranked', False)),
-                "spectator_count": spectator_count,
-                "theme": {
-                    "name": theme_data.get('name', ''),
-                    "words": theme_data.get('words', []),
-                },
-                "waiting_for_word_change": game.get('waiting_for_word_change'),
-                "theme_options": game.get('theme_options', []),
-                "theme_votes": theme_votes_with_names,
-                "all_words_set": all_words_set,
-                "ready_count": ready_count,
-                "is_singleplayer": game.get('is_singleplayer', False),
-                "time_control": {
-                    "initial_time": initial_time,
-                    "increment": increment,
-                },
-                "current_player_time": current_player_time,
-                "turn_started_at": turn_started_at,
-                "word_selection_time": word_selection_time,
-                "word_selection_time_remaining": word_selection_time_remaining,
-                "word_change_time_remaining": word_change_time_remaining,
-                "word_count": game.get('word_count', 100),
+def get_mmr_range_for_wait_time(wait_seconds: float) -> int:
+    """Get the MMR range based on how long the player has been waiting."""
+    mmr_range = RANKED_MMR_RANGE_INITIAL
+    for threshold_seconds, expanded_range in RANKED_MMR_RANGE_EXPANSIONS:
+        if wait_seconds >= threshold_seconds:
+            mmr_range = expanded_range
+    return min(mmr_range, RANKED_MMR_RANGE_MAX)
+
+
+def get_min_match_size_for_quick_play(wait_seconds: float) -> int:
+    """Get the minimum acceptable match size for quick play based on wait time."""
+    min_size = QUEUE_MATCH_SIZE_MAX
+    for threshold_seconds, reduced_size in QUICK_PLAY_MATCH_SIZE_REDUCTIONS:
+        if wait_seconds >= threshold_seconds:
+            min_size = reduced_size
+    return max(min_size, QUEUE_MATCH_SIZE_MIN)
+
+
+def join_matchmaking_queue(
+    mode: str,
+    player_id: str,
+    player_name: str,
+    auth_user_id: Optional[str] = None,
+    mmr: int = 1000,
+    cosmetics: Optional[dict] = None,
+) -> dict:
+    """
+    Add a player to the matchmaking queue.
+    
+    Args:
+        mode: 'quick_play' or 'ranked'
+        player_id: Unique player ID for this session
+        player_name: Display name
+        auth_user_id: Authenticated user ID (required for ranked)
+        mmr: Player's MMR (used for ranked matching)
+        cosmetics: Player's equipped cosmetics
+    
+    Returns:
+        dict with queue status
+    """
+    redis = get_redis()
+    now = time.time()
+    
+    queue_key = _queue_key(mode)
+    data_key = _queue_data_key(mode, player_id)
+    
+    # Remove any existing queue entries for the same player name to prevent duplicates
+    # This handles the case where a player joins queue, navigates away without leaving,
+    # and then joins again - we don't want two entries with the same name
+    try:
+        existing_players = _get_queue_players(redis, queue_key, mode)
+        for existing in existing_players:
+            if existing.get("player_name") == player_name and existing.get("player_id") != player_id:
+                old_pid = existing.get("player_id")
+                leave_matchmaking_queue(mode, old_pid)
+                print(f"[QUEUE] Removed duplicate entry for {player_name} (old: {old_pid}, new: {player_id})")
+    except Exception as e:
+        print(f"[QUEUE] Error cleaning up duplicate entries: {e}")
+    
+    # Store player data
+    player_data = {
+        "player_id": player_id,
+        "player_name": player_name,
+        "auth_user_id": auth_user_id,
+        "mmr": mmr,
+        "cosmetics": cosmetics or {},
+        "joined_at": now,
+    }
+    
+    # For quick_play, sort by join time (FIFO)
+    # For ranked, sort by MMR for skill-based matching
+    score = now if mode == "quick_play" else mmr
+    
+    try:
+        batch = redis_batch()
+        # Add to sorted set
+        batch.zadd(queue_key, {player_id: score})
+        # Store player data
+        batch.setex(data_key, QUEUE_EXPIRY_SECONDS, json.dumps(player_data))
+        # Set queue expiry
+        batch.expire(queue_key, QUEUE_EXPIRY_SECONDS)
+        position = batch.zrank(queue_key, player_id)
+        queue_size = batch.zcard(queue_key)
+        batch.execute()
+        
+        return {
+            "status": "queued",
+            "mode": mode,
+            "position": position.result() or 0,
+            "queue_size": queue_size.result() or 0,
+        }
+    except Exception as e:
+        print(f"[QUEUE] Error joining queue: {e}")
+        return {"status": "error", "message": "Failed to join queue"}
+
+
+def leave_matchmaking_queue(mode: str, player_id: str) -> bool:
+    """Remove a player from the matchmaking queue."""
+    try:
+        queue_key = _queue_key(mode)
+        data_key = _queue_data_key(mode, player_id)
+        match_key = _queue_match_key(player_id)
+        
+        batch = redis_batch()
+        batch.zrem(queue_key, player_id)
+        batch.delete(data_key, match_key)
+        batch.execute()
+        return True
+    except Exception as e:
+        print(f"[QUEUE] Error leaving queue: {e}")
+        return False
+
+
+def get_queue_status(mode: str, player_id: str) -> dict:
+    """
+    Get a player's queue status and check for matches.
+    
+    This is called on poll and triggers the matching logic.
+    """
+    redis = get_redis()
+    now = time.time()
+    
+    queue_key = _queue_key(mode)
+    data_key = _queue_data_key(mode, player_id)
+    match_key = _queue_match_key(player_id)
+    
+    # Match notification, queue rank, player data and queue size in one round trip
+    batch = redis_batch()
+    pending_match = batch.get(match_key)
+    pending_rank = batch.zrank(queue_key, player_id)
+    pending_data = batch.get(data_key)
+    pending_size = batch.zcard(queue_key)
+    batch.flush()
+    
+    # Check if player was matched
+    try:
+        match_data = pending_match.result()
+        if match_data:
+            if isinstance(match_data, bytes):
+                match_data = match_data.decode()
+            match_info = json.loads(match_data)
+            # Clear the match notification
+            redis.delete(match_key)
+            return {
+                "status": "matched",
+                "game_code": match_info.get("game_code"),
+                "player_id": match_info.get("player_id"),
+                "session_token": match_info.get("session_token"),
+                "mode": mode,
             }
+    except Exception as e:
+        print(f"[QUEUE] Error checking match: {e}")
+    
+    # Check if still in queue
+    try:
+        rank = pending_rank.result()
+        if rank is None:
+            return {"status": "not_in_queue", "mode": mode}
+    except Exception:
+        return {"status": "not_in_queue", "mode": mode}
+    
+    # Get player data
+    try:
+        raw_data = pending_data.result()
+        if not raw_data:
+            return {"status": "not_in_queue", "mode": mode}
+        if isinstance(raw_data, bytes):
+            raw_data = raw_data.decode()
+        player_data = json.loads(raw_data)
+    except Exception:
+        return {"status": "not_in_queue", "mode": mode}
+    
+    joined_at = player_data.get("joined_at", now)
+    wait_time = now - joined_at
+    try:
+        queue_size = pending_size.result() or 0
+    except Exception:
+        queue_size = 0
+    
+    # Try to find a match
+    match_result = try_create_match(mode, player_id, wait_time)
+    if match_result:
+        # Get our session token from the match notification
+        match_key = _queue_match_key(player_id)
+        try:
+            match_data = redis.get(match_key)
+            if match_data:
+                if isinstance(match_data, bytes):
+                    match_data = match_data.decode()
+                match_info = json.loads(match_data)
+                redis.delete(match_key)
+                return {
+                    "status": "matched",
+                    "game_code": match_info.get("game_code"),
+                    "player_id": match_info.get("player_id"),
+                    "session_token": match_info.get("session_token"),
+                    "mode": mode,
+                }
+        except Exception:
+            pass
+        # Fallback if notification not found
+        return {
+            "status": "matched",
+            "game_code": match_result.get("game_code"),
+            "mode": mode,
+        }
+    
+    # Still waiting
+    response = {
+        "status": "waiting",
+        "mode": mode,
+        "position": rank,
+        "queue_size": queue_size,
+        "wait_time": int(wait_time),
+    }
+    
+    # Add mode-specific info
+    if mode == "ranked":
+        # Ranked: show MMR range, always 4 players
+        response["mmr_range"] = get_mmr_range_for_wait_time(wait_time)
+        response["player_mmr"] = player_data.get("mmr", 1000)
+        response["match_size"] = QUEUE_MATCH_SIZE  # Always 4
+    elif mode == "quick_play":
+        # Quick play: show flexible match size
+        min_size = get_min_match_size_for_quick_play(wait_time)
+        response["min_match_size"] = min_size
+        response["max_match_size"] = QUEUE_MATCH_SIZE_MAX
+        # Show when bots will fill remaining slots
+        response["bot_fill_timeout"] = QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT
+        time_until_bots = max(0, QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT - wait_time)
+        response["time_until_bot_fill"] = int(time_until_bots)
+    
+    return response
+
+
+def try_create_match(mode: str, requesting_player_id: str, wait_time: float) -> Optional[dict]:
+    """
+    Attempt to create a match from the queue.
+    
+    For quick_play: FIFO matching, fills with AI after timeout
+    For ranked: MMR-based matching, never adds AI
+    
+    Returns match info if created, None otherwise.
+    """
+    redis = get_redis()
+    now = time.time()
+    
+    queue_key = _queue_key(mode)
+    
+    if mode == "quick_play":
+        return _try_quick_play_match(redis, queue_key, requesting_player_id, wait_time, now)
+    elif mode == "ranked":
+        return _try_ranked_match(redis, queue_key, requesting_player_id, wait_time, now)
+    
+    return None
+
+
+def _get_queue_players(redis, queue_key: str, mode: str) -> list:
+    """Get all players in queue with their data."""
+    try:
+        # Get all player IDs from queue
+        if mode == "quick_play":
+            player_ids = redis.zrange(queue_key, 0, -1)
+        else:
+            # For ranked, get with scores (MMR)
+            player_ids = redis.zrange(queue_key, 0, -1)
+        
+        if not player_ids:
+            return []
+        
+        player_ids = [pid.decode() if isinstance(pid, bytes) else pid for pid in player_ids]
+        raw_values = redis.mget(*[_queue_data_key(mode, pid) for pid in player_ids])
+        
+        players = []
+        for pid, raw in zip(player_ids, raw_values):
+            if raw:
+                if isinstance(raw, bytes):
+                    raw = raw.decode()
+                try:
+                    data = json.loads(raw)
+                    data["player_id"] = pid
+                    players.append(data)
+                except Exception:
+                    pass
+        
+        return players
+    except Exception as e:
+        print(f"[QUEUE] Error getting queue players: {e}")
+        return []
 
-            ranked_mmr = game.get('ranked_mmr') if isinstance(game.get('ranked_mmr'), dict) else None
-            is_ranked_game = bool(game.get('is_ranked', False))
+
+def _try_quick_play_match(redis, queue_key: str, requesting_player_id: str, wait_time: float, now: float) -> Optional[dict]:
+    """
+    Try to create a quick play match.
+    
+    - If 4 players: create match immediately (FIFO)
+    - After 30s: accept 3-player matches
+    - After 60s: accept 2-player matches
+    - After 45s: fill remaining slots with rookie bots
+    """
+    players = _get_queue_players(redis, queue_key, "quick_play")
+    
+    # Get minimum match size based on wait time
+    min_match_size = get_min_match_size_for_quick_play(wait_time)
+    
+    # Check if we should fill with bots (after timeout and at least 1 player)
+    should_fill_with_bots = wait_time >= QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT and len(players) >= 1
+    
+    if len(players) < min_match_size and not should_fill_with_bots:
+        return None
+    
+    # Sort by join time (FIFO)
+    players.sort(key=lambda p: p.get("joined_at", now))
+    
+    # Find the requesting player's position
+    requesting_idx = next((i for i, p in enumerate(players) if p.get("player_id") == requesting_player_id), None)
+    if requesting_idx is None:
+        return None
+    
+    # Check if all players ahead of us (and us) have waited long enough for this match size
+    # We need at least min_match_size players who all accept this size
+    eligible_players = []
+    for p in players:
+        p_wait = now - p.get("joined_at", now)
+        p_min_size = get_min_match_size_for_quick_play(p_wait)
+        # This player accepts matches of size >= p_min_size
+        # We need players who accept our current min_match_size
+        if len(eligible_players) < QUEUE_MATCH_SIZE_MAX:
+            eligible_players.append((p, p_min_size, p_wait))
+    
+    # Find the best group we can form
+    # Start with max size and reduce
+    for target_size in range(QUEUE_MATCH_SIZE_MAX, min_match_size - 1, -1):
+        if len(eligible_players) < target_size:
+            # Not enough players for this size - check if we can fill with bots
+            if should_fill_with_bots and len(eligible_players) >= 1:
+                # Check if requesting player is in eligible players
+                eligible_player_ids = [p.get("player_id") for p, _, _ in eligible_players]
+                if requesting_player_id not in eligible_player_ids:
+                    continue
+                
+                # Check if all eligible players have waited long enough for bot fill
+                all_ready_for_bots = all(
+                    p_wait >= QUEUE_QUICK_PLAY_BOT_FILL_TIMEOUT 
+                    for _, _, p_wait in eligible_players
+                )
+                if not all_ready_for_bots:
+                    continue
+                
+                match_players = [p for p, _, _ in eligible_players]
+                bots_needed = QUEUE_MATCH_SIZE_MAX - len(match_players)
+                
+                # Use distributed lock to prevent race conditions
+                lock_key = f"queue_lock:quick_play:{':'.join(sorted(p.get('player_id', '') for p in match_players))}"
+                
+                # Try to acquire lock (SET NX with expiry)
+                lock_acquired = redis.set(lock_key, "1", nx=True, ex=10)  # 10 second lock
+                if not lock_acquired:
+                    # Another process is creating this match
+                    return None
+                
+                try:
+                    # Double-check all players are still in queue
+                    for p in match_players:
+                        pid = p.get("player_id")
+                        if redis.zrank(queue_key, pid) is None:
+                            # Player already matched, abort
+                            return None
+                    
+                    return _create_match_from_queue(redis, "quick_play", match_players, ai_fill=bots_needed)
+                finally:
+                    # Release lock
+                    redis.delete(lock_key)
+            continue
+        
+        # Take the first target_size players
+        group_candidates = eligible_players[:target_size]
+        
+        # Check if requesting player is in this group
+        group_player_ids = [p.get("player_id") for p, _, _ in group_candidates]
+        if requesting_player_id not in group_player_ids:
+            continue
+        
+        # Check if all players in the group accept this match size
+        all_accept = all(p_min_size <= target_size for _, p_min_size, _ in group_candidates)
+        if all_accept:
+            match_players = [p for p, _, _ in group_candidates]
             
-            for p in game['players']:
-                # Calculate this player's time remaining
-                player_time = p.get('time_remaining')
-                if player_time is not None and p['id'] == current_player_id and turn_started_at:
-                    # Current player's time is ticking
-                    elapsed = time.time() - turn_started_at
-                    player_time = max(0, player_time - elapsed)
+            # Use distributed lock to prevent race conditions
+            lock_key = f"queue_lock:quick_play:{':'.join(sorted(p.get('player_id', '') for p in match_players))}"
+            
+            # Try to acquire lock (SET NX with expiry)
+            lock_acquired = redis.set(lock_key, "1", nx=True, ex=10)  # 10 second lock
+            if not lock_acquired:
+                # Another process is creating this match
+                return None
+            
+            try:
+                # Double-check all players are still in queue
+                for p in match_players:
+                    pid = p.get("player_id")
+                    if redis.zrank(queue_key, pid) is None:
+                        # Player already matched, abort
+                        return None
                 
-                player_data = {
-                    "id": p['id'],
-                    "name": p['name'],
-                    "secret_word": p['secret_word'] if (p['id'] == player_id or game_finished) else None,
-                    "has_word": bool(p.get('secret_word')),
-                    "is_alive": p['is_alive'],
-                    "can_change_word": p.get('can_change_word', False) if p['id'] == player_id else None,
-                    "is_ready": p.get('is_ready', False),
-                    "cosmetics": p.get('cosmetics', {}),
-                    "is_ai": p.get('is_ai', False),
-                    "difficulty": p.get('difficulty'),
-                    "time_remaining": player_time,
-                }
-                if game_finished and is_ranked_game and ranked_mmr:
-                    mmr_entry = ranked_mmr.get(str(p.get('id')))
-                    if isinstance(mmr_entry, dict):
-                        player_data['mmr_before'] = mmr_entry.get('old')
-                        player_data['mmr'] = mmr_entry.get('new')
-                        player_data['mmr_delta'] = mmr_entry.get('delta')
-                # Include MMR display info for ranked games (during game, not just at end)
-                if is_ranked_game and not p.get('is_ai'):
-                    auth_uid = p.get('auth_user_id')
-                    if auth_uid:
-                        try:
-                            u = get_user_by_id(auth_uid)
-                            if u:
-                                u_stats = get_user_stats(u)
-                                player_data['mmr_display'] = {
-                                    'mmr': int(u_stats.get('mmr', 1000) or 1000),
-                                    'ranked_games': int(u_stats.get('ranked_games', 0) or 0),
-                                }
-                        except Exception:
-                            pass
-                if p['id'] == player_id:
-                    player_data['word_pool'] = p.get('word_pool', [])
-                    if p.get('word_change_options') is not None:
-                        player_data['word_change_options'] = p.get('word_change_options', [])
-                response['players'].append(player_data)
+                return _create_match_from_queue(redis, "quick_play", match_players, ai_fill=0)
+            finally:
+                # Release lock
+                redis.delete(lock_key)
+    
+    return None
+
+
+def _try_ranked_match(redis, queue_key: str, requesting_player_id: str, wait_time: float, now: float) -> Optional[dict]:
+    """
+    Try to create a ranked match.
+    
+    - Groups players by MMR range
+    - Expands range over time
+    - Always requires exactly 4 players
+    - Never adds AI - waits until 4 humans found
+    """
+    players = _get_queue_players(redis, queue_key, "ranked")
+    
+    if len(players) < QUEUE_MATCH_SIZE:
+        return None
+    
+    # Find the requesting player
+    requesting_player = next((p for p in players if p.get("player_id") == requesting_player_id), None)
+    if not requesting_player:
+        return None
+    
+    player_mmr = requesting_player.get("mmr", 1000)
+    player_wait = now - requesting_player.get("joined_at", now)
+    mmr_range = get_mmr_range_for_wait_time(player_wait)
+    
+    # Find players within MMR range of the requesting player
+    candidates = []
+    for p in players:
+        p_mmr = p.get("mmr", 1000)
+        if abs(p_mmr - player_mmr) <= mmr_range:
+            candidates.append(p)
+    
+    if len(candidates) < QUEUE_MATCH_SIZE:
+        return None
+    
+    # Find the best group of 4 with tightest MMR spread
+    best_group = None
+    best_spread = float('inf')
+    
+    # Sort by MMR and take consecutive groups
+    candidates.sort(key=lambda p: p.get("mmr", 1000))
+    
+    for i in range(len(candidates) - QUEUE_MATCH_SIZE + 1):
+        group = candidates[i:i + QUEUE_MATCH_SIZE]
+        mmrs = [p.get("mmr", 1000) for p in group]
+        spread = max(mmrs) - min(mmrs)
+        
+        # Check if requesting player is in this group
+        if requesting_player_id not in [p.get("player_id") for p in group]:
+            continue
+        
+        # Check if all players in group are within each other's expanded range
+        all_compatible = True
+        for p in group:
+            p_wait = now - p.get("joined_at", now)
+            p_range = get_mmr_range_for_wait_time(p_wait)
+            for other in group:
+                if abs(p.get("mmr", 1000) - other.get("mmr", 1000)) > p_range:
+                    all_compatible = False
+                    break
+            if not all_compatible:
+                break
+        
+        if all_compatible and spread < best_spread:
+            best_spread = spread
+            best_group = group
+    
+    if best_group:
+        # Use distributed lock to prevent race conditions
+        lock_key = f"queue_lock:ranked:{':'.join(sorted(p.get('player_id', '') for p in best_group))}"
+        
+        # Try to acquire lock (SET NX with expiry)
+        lock_acquired = redis.set(lock_key, "1", nx=True, ex=10)  # 10 second lock
+        if not lock_acquired:
+            # Another process is creating this match
+            return None
+        
+        try:
+            # Double-check all players are still in queue (they might have been matched by another group)
+            for p in best_group:
+                pid = p.get("player_id")
+                if redis.zrank(queue_key, pid) is None:
+                    # Player already matched, abort
+                    return None
             
-            return response
-        except Exception as e:
-            print(f"Error building game response: {e}")
-            return None
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        cors_origin = self._get_cors_origin()
-        if cors_origin:
-            self.send_header('Access-Control-Allow-Origin', cors_origin)
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        # Allow Authorization so authenticated requests work cross-origin if needed.
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.send_header('Access-Control-Allow-Credentials', 'true')
-        self.send_header('Access-Control-Max-Age', '86400')
-        self.end_headers()
-
-    def do_GET(self):
-        path = self.path.split('?', 1)[0]
-        query = {}
-        if '?' in self.path:
-            query_string = self.path.split('?', 1)[1]
-            # Properly URL-decode query params (important for OAuth `code` param)
-            query = dict(urllib.parse.parse_qsl(query_string, keep_blank_values=True))
-
-        # Get client IP for rate limiting
-        client_ip = get_client_ip(self.headers)
-
-        # ============== CLIENT CONFIG ==============
-        # GET /api/client-config - Lightweight config the frontend can use (audio, etc.)
-        if path == '/api/client-config':
-            bgm_cfg = (CONFIG.get('audio', {}) or {}).get('background_music', {}) or {}
-            sfx_cfg = (CONFIG.get('audio', {}) or {}).get('sfx', {}) or {}
-            enabled = bool(bgm_cfg.get('enabled', True))
-            track = str(bgm_cfg.get('track', '/manwithaplan.mp3') or '/manwithaplan.mp3')
-            volume_raw = bgm_cfg.get('volume', 0.12)
-            try:
-                volume = float(volume_raw)
-            except Exception:
-                volume = 0.12
-            volume = max(0.0, min(1.0, volume))
-            return self._send_json({
-                "audio": {
-                    "background_music": {
-                        "enabled": enabled,
-                        "track": track,
-                        "volume": volume,
-                    },
-                    # Placeholder for future asset-based SFX (frontend currently uses WebAudio tones).
-                    "sfx": sfx_cfg,
-                }
-            })
-
-        # ============== DEBUG (ADMIN ONLY) ==============
-        # GET /api/debug/chat-error?id=cd8a9e33
-        if path == '/api/debug/chat-error':
-            if not self._debug_allowed():
-                return self._send_error("Not authorized", 403)
-            error_id = str(query.get('id', '') or query.get('error_id', '') or '').strip().lower()
-            if not re.match(r'^[a-f0-9]{8}$', error_id):
-                return self._send_error("Invalid error id", 400)
-            try:
-                redis = get_redis()
-                raw = redis.get(f"debug:chat_error:{error_id}")
-            except Exception:
-                raw = None
-            if not raw:
-                return self._send_error("Not found", 404)
-            if isinstance(raw, bytes):
-                try:
-                    raw = raw.decode()
-                except Exception:
-                    raw = str(raw)
-            try:
-                data = json.loads(raw)
-            except Exception:
-                data = {"raw": str(raw)}
-            return self._send_json({
-                "error_id": error_id,
-                "debug": data,
-            })
+            return _create_match_from_queue(redis, "ranked", best_group, ai_fill=0)
+        finally:
+            # Release lock
+            redis.delete(lock_key)
+    
+    return None
 
-        # ============== AUTH ENDPOINTS ==============
 
-        # GET /api/auth/google - Redirect to Google OAuth
-        if path == '/api/auth/google':
-            if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
-                return self._send_error("OAuth not configured", 500)
+def _create_match_from_queue(redis, mode: str, players: list, ai_fill: int = 0) -> Optional[dict]:
+    """
+    Create a game from matched queue players.
+    
+    Args:
+        redis: Redis client
+        mode: 'quick_play' or 'ranked'
+        players: List of player data dicts
+        ai_fill: Number of AI players to add (quick_play only)
+    """
+    import random
+    
+    try:
+        # Generate game code
+        code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(6))
+        
+        # Select random themes for voting
+        available_themes = list(PREGENERATED_THEMES.keys())
+        theme_options = random.sample(available_themes, min(3, len(available_themes)))
+        
+        # Determine time control
+        is_ranked = mode == "ranked"
+        is_quickplay = mode == "quick_play"
+        time_control = get_time_control(is_ranked, "rapid", is_quickplay)
+        
+        # Word count: 50 for quickplay, 100 for ranked
+        word_count = 100 if is_ranked else 50
+        
+        # Create game
+        game = {
+            "code": code,
+            "status": "waiting",
+            "visibility": "public",
+            "is_ranked": is_ranked,
+            "is_singleplayer": False,
+            "players": [],
+            "current_turn": 0,
+            "history": [],
+            "theme": None,
+            "theme_options": theme_options,
+            "theme_votes": {},
+            "host_id": None,
+            "created_at": time.time(),
+            "time_control": time_control,
+            "word_selection_time": get_word_selection_time(is_ranked),
+            "from_matchmaking": True,
+            "matchmaking_mode": mode,
+            "word_count": word_count,
+        }
+        
+        # Add human players
+        for i, p_data in enumerate(players):
+            player_id = p_data.get("player_id")
+            session_token = generate_session_token(player_id, code)
             
-            # Compute redirect URI for THIS request origin and persist it in a short-lived state
-            request_base = get_request_base_url(self.headers)
-            redirect_uri = os.getenv('OAUTH_REDIRECT_URI') or f"{request_base}/api/auth/callback"
-
-            state = None
-            try:
-                state = secrets.token_urlsafe(24)
-                get_redis().setex(
-                    f"oauth_state:{state}",
-                    OAUTH_STATE_TTL_SECONDS,
-                    json.dumps({
-                        "redirect_uri": redirect_uri,
-                        "return_to": request_base,
-                        "created_at": int(time.time()),
-                    }),
-                )
-            except Exception as e:
-                print(f"OAuth state store failed: {e}")
-                state = None
-
-            params = {
-                'client_id': GOOGLE_CLIENT_ID,
-                'redirect_uri': redirect_uri,
-                'response_type': 'code',
-                'scope': 'openid email profile',
-                'access_type': 'offline',
-                'prompt': 'consent',
+            player = {
+                "id": player_id,
+                "name": p_data.get("player_name", f"Player{i+1}"),
+                "secret_word": None,
+                "is_alive": True,
+                "is_ai": False,
+                "is_ready": False,
+                "cosmetics": p_data.get("cosmetics", {}),
+                "time_remaining": time_control.get("initial_time", 0),
+                "session_token": session_token,
             }
-            if state:
-                params['state'] = state
-            auth_url = f"{GOOGLE_AUTH_URL}?{urllib.parse.urlencode(params)}"
-            
-            self.send_response(302)
-            self.send_header('Location', auth_url)
-            self.end_headers()
-            return
-
-        # GET /api/auth/callback - Handle OAuth callback
-        if path == '/api/auth/callback':
-            code = query.get('code', '')
-            error = query.get('error', '')
-            state = query.get('state', '')
-
-            # Helper to redirect back to frontend with error/success params
-            def _redirect_frontend(params: dict, return_to: str = ''):
-                qs = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None and v != ''})
-                # SECURITY: Validate return_to against allowed origins to prevent open redirect
-                if return_to:
-                    valid_return = False
-                    for allowed in ALLOWED_ORIGINS:
-                        if return_to.startswith(allowed):
-                            valid_return = True
-                            break
-                    # Also allow localhost in dev mode
-                    if DEV_MODE and return_to.startswith('http://localhost:'):
-                        valid_return = True
-                    if not valid_return:
-                        print(f"[SECURITY] OAuth callback: rejecting untrusted return_to URL: {return_to[:100]}")
-                        return_to = ''  # Fall back to relative redirect
-                
-                if return_to:
-                    target = return_to.rstrip('/') + '/?' + qs
-                else:
-                    target = '/?' + qs
-                self.send_response(302)
-                self.send_header('Location', target)
-                self.end_headers()
-
-            # SECURITY: State parameter is MANDATORY to prevent CSRF attacks
-            if not state:
-                print("[SECURITY] OAuth callback: missing state parameter")
-                return _redirect_frontend({'auth_error': 'missing_state'})
-
-            # Validate and consume the state token (single-use)
-            redirect_uri = get_oauth_redirect_uri()
-            return_to = ''
-            try:
-                redis = get_redis()
-                raw = redis.get(f"oauth_state:{state}")
-                if not raw:
-                    print(f"[SECURITY] OAuth callback: invalid or expired state token")
-                    return _redirect_frontend({'auth_error': 'invalid_state'})
-                data = json.loads(raw)
-                redirect_uri = data.get('redirect_uri') or redirect_uri
-                return_to = data.get('return_to') or ''
-                # SECURITY: Delete state immediately (single-use token)
-                redis.delete(f"oauth_state:{state}")
-            except Exception as e:
-                print(f"[SECURITY] OAuth state validation failed: {e}")
-                return _redirect_frontend({'auth_error': 'state_validation_failed'})
             
-            if error:
-                return _redirect_frontend({
-                    'auth_error': error,
-                    'auth_error_description': query.get('error_description', ''),
-                }, return_to)
+            # Add auth user ID if present
+            if p_data.get("auth_user_id"):
+                player["auth_user_id"] = p_data["auth_user_id"]
             
-            if not code:
-                return _redirect_frontend({'auth_error': 'no_code'}, return_to)
+            game["players"].append(player)
             
-            try:
-                if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
-                    return _redirect_frontend({'auth_error': 'oauth_not_configured'}, return_to)
-
-                # Exchange code for tokens
-                token_response = requests.post(GOOGLE_TOKEN_URL, data={
-                    'client_id': GOOGLE_CLIENT_ID,
-                    'client_secret': GOOGLE_CLIENT_SECRET,
-                    'code': code,
-                    'grant_type': 'authorization_code',
-                    'redirect_uri': redirect_uri,
-                }, timeout=10)
-                
-                if not token_response.ok:
-                    print(f"Token exchange failed: {token_response.status_code} - {token_response.text}")
-                    print(f"Redirect URI used: {redirect_uri}")
-                    google_error = ''
-                    google_error_description = ''
-                    try:
-                        err = token_response.json()
-                        google_error = err.get('error', '')
-                        google_error_description = err.get('error_description', '')
-                    except Exception:
-                        pass
-                    return _redirect_frontend({
-                        'auth_error': 'token_exchange_failed',
-                        'auth_error_status': str(token_response.status_code),
-                        'google_error': google_error,
-                        'google_error_description': google_error_description,
-                    }, return_to)
-                
-                tokens = token_response.json()
-                access_token = tokens.get('access_token')
-                
-                # Get user info from Google
-                userinfo_response = requests.get(
-                    GOOGLE_USERINFO_URL,
-                    headers={'Authorization': f'Bearer {access_token}'}
-                    , timeout=10
-                )
-                
-                if not userinfo_response.ok:
-                    print(f"User info failed: {userinfo_response.text}")
-                    return _redirect_frontend({
-                        'auth_error': 'userinfo_failed',
-                        'auth_error_status': str(userinfo_response.status_code),
-                    }, return_to)
-                
-                google_user = userinfo_response.json()
-                
-                # Create or get user
-                user = get_or_create_user(google_user)
-                
-                # Create JWT token
-                jwt_token = create_jwt_token(user)
-                
-                # Redirect to frontend with token
-                return _redirect_frontend({'auth_token': jwt_token}, return_to)
+            # First player is host
+            if i == 0:
+                game["host_id"] = player_id
+        
+        # Add AI players if needed (quick_play only, always rookie difficulty)
+        if ai_fill > 0 and mode == "quick_play":
+            for i in range(ai_fill):
+                difficulty = "rookie"
+                ai_id = f"ai_{difficulty}_{secrets.token_hex(4)}"
+                ai_config = AI_DIFFICULTY_CONFIG.get(difficulty, {})
+                ai_name = f"{ai_config.get('name_prefix', 'Rookie')} {secrets.token_hex(2).upper()}"
                 
-            except Exception as e:
-                print(f"OAuth callback error: {e}")
-                return _redirect_frontend({'auth_error': 'callback_failed'}, return_to)
-
-        # GET /api/auth/me - Get current user info
-        if path == '/api/auth/me':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
-            
-            token = auth_header[7:]  # Remove 'Bearer ' prefix
-            payload = verify_jwt_token(token)
-            
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
+                ai_player = {
+                    "id": ai_id,
+                    "name": ai_name,
+                    "secret_word": None,
+                    "is_alive": True,
+                    "is_ai": True,
+                    "ai_difficulty": difficulty,
+                    "is_ready": False,
+                    "cosmetics": {},
+                    "time_remaining": time_control.get("initial_time", 0),
+                }
+                game["players"].append(ai_player)
+        
+        # Save game
+        save_game(code, game)
+        
+        # Notify all players of the match (3 commands per player, one round trip)
+        queue_key = _queue_key(mode)
+        batch = redis_batch()
+        for p_data in players:
+            player_id = p_data.get("player_id")
+            match_key = _queue_match_key(player_id)
             
-            user = get_user_by_id(payload['sub'])
-            if not user:
-                return self._send_error("User not found", 404)
+            # Find player's session token
+            player_in_game = next((p for p in game["players"] if p["id"] == player_id), None)
+            session_token = player_in_game.get("session_token", "") if player_in_game else ""
             
-            username = user.get('username')
+            match_info = {
+                "game_code": code,
+                "player_id": player_id,
+                "session_token": session_token,
+            }
+            batch.setex(match_key, 60, json.dumps(match_info))
             
-            return self._send_json({
-                'id': user['id'],
-                'name': user['name'],
-                'username': username,
-                'needs_username': username is None,  # True if user hasn't set a username yet
-                'email': user.get('email', ''),
-                'stats': get_user_stats(user),
-                'is_donor': user.get('is_donor', False),
-                'is_admin': user.get('is_admin', False),
-                'cosmetics': get_user_cosmetics(user),
-            })
+            # Remove from queue
+            batch.zrem(queue_key, player_id)
+            data_key = _queue_data_key(mode, player_id)
+            batch.delete(data_key)
+        batch.execute()
+        
+        METRICS.inc("matchmaking_matches_total", mode=mode)
+        matched_at = time.time()
+        for p_data in players:
+            wait = matched_at - float(p_data.get("joined_at", matched_at) or matched_at)
+            METRICS.observe("matchmaking_wait_seconds", max(0.0, wait), mode=mode)
+        
+        print(f"[QUEUE] Created {mode} match {code} with {len(players)} players + {ai_fill} AI")
+        
+        return {"game_code": code}
+    
+    except Exception as e:
+        print(f"[QUEUE] Error creating match: {e}")
+        import traceback
+        print(f"[QUEUE] Traceback: {traceback.format_exc()}")
+        return None
 
-        # GET /api/cosmetics - Get cosmetics catalog
-        if path == '/api/cosmetics':
-            return self._send_json({
-                "catalog": COSMETICS_CATALOG,
-                "paywall_enabled": COSMETICS_PAYWALL_ENABLED,
-                "unlock_all": COSMETICS_UNLOCK_ALL,
-            })
 
-        # GET /api/user/cosmetics - Get current user's cosmetics
-        if path == '/api/user/cosmetics':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
-            
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
-            
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
-            
-            user = get_user_by_id(payload['sub'])
-            if not user:
-                return self._send_error("User not found", 404)
-            
-            econ = ensure_user_economy(user, persist=False)
-            
-            return self._send_json({
-                'is_donor': user.get('is_donor', False),
-                'is_admin': user.get('is_admin', False),
-                'cosmetics': get_user_cosmetics(user, persist_changes=False),
-                'owned_cosmetics': econ.get('owned_cosmetics') or {},
-                'paywall_enabled': COSMETICS_PAYWALL_ENABLED,
-                'unlock_all': COSMETICS_UNLOCK_ALL,
-            })
+def check_ranked_eligibility(user: dict) -> tuple[bool, str]:
+    """
+    Check if a user is eligible for ranked matchmaking.
+    
+    Returns:
+        (is_eligible, error_message)
+    """
+    if not user:
+        return False, "Sign in with Google to play ranked"
+    
+    stats = get_user_stats(user)
+    mp_games = stats.get("mp_games_played", 0)
+    
+    if mp_games < QUEUE_MIN_CASUAL_GAMES_FOR_RANKED:
+        remaining = QUEUE_MIN_CASUAL_GAMES_FOR_RANKED - mp_games
+        return False, f"Play {remaining} more casual game{'s' if remaining != 1 else ''} to unlock ranked"
+    
+    return True, ""
 
-        # GET /api/user/daily - Get daily quests + weekly quests + currency + owned cosmetics + streak
-        if path == '/api/user/daily':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
 
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
+# ============== HANDLER ==============
+
+# Allowed origins for CORS
+ALLOWED_ORIGINS = [
+    'https://embeddle.vercel.app',
+    'https://www.embeddle.com',
+]
 
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
+# Allow localhost in development
+DEV_MODE = os.getenv('VERCEL_ENV', 'development') == 'development'
+# When enabled, include extra debug context in some error responses.
+DEBUG_ERRORS = env_bool("DEBUG_ERRORS", (CONFIG.get("debug", {}) or {}).get("errors", False))
+DEBUG_ERROR_TTL_SECONDS = int(os.getenv("DEBUG_ERROR_TTL_SECONDS", "3600"))
 
-            user = get_user_by_id(payload.get('sub', ''))
-            if not user:
-                return self._send_error("User not found", 404)
+# Method + path pattern -> handler method (registered with @ROUTES.get/.post below)
+ROUTES = RouteTable()
 
-            econ = ensure_user_economy(user, persist=True)
-            daily_state = ensure_daily_quests_today(user, persist=True)
-            weekly_quests = ensure_weekly_quests(user, persist=True)
-            # Check/update streak
-            streak_result = check_and_update_streak(user, persist=True)
-            streak_info = get_next_streak_info(streak_result['streak'].get('streak_count', 0))
+# Request metrics: Server-Timing on JSON responses, rolling per-route stats
+# (admin status), and the Prometheus counters (admin metrics)
+ROUTE_STATS = RouteStats(METRICS_CONFIG.get("route_window", DEFAULT_WINDOW))
+METRICS_FLUSHER = MetricsFlusher(METRICS, get_redis, secrets.token_hex(6),
+                                 METRICS_FLUSH_SECONDS, METRICS_FLUSH_TTL_SECONDS)
 
-            return self._send_json({
-                "date": daily_state.get("date", ""),
-                "quests": daily_state.get("quests", []),
-                "weekly_quests": weekly_quests,
-                "wallet": user.get('wallet') or {"credits": 0},  # Use updated wallet with streak credits
-                "owned_cosmetics": econ.get("owned_cosmetics") or {},
-                "streak": streak_result['streak'],
-                "streak_credits_earned": streak_result['credits_earned'],
-                "streak_milestone_bonus": streak_result['milestone_bonus'],
-                "streak_broken": streak_result['streak_broken'],
-                "streak_info": streak_info,
-            })
 
-        # GET /api/queue/counts - Get current queue sizes (no auth required)
-        if path == '/api/queue/counts':
-            try:
-                redis = get_redis()
-                quick_play_count = redis.zcard(_queue_key("quick_play")) or 0
-                ranked_count = redis.zcard(_queue_key("ranked")) or 0
-                return self._send_json({
-                    "quick_play": int(quick_play_count),
-                    "ranked": int(ranked_count),
-                })
-            except Exception as e:
-                print(f"[QUEUE] Error getting counts: {e}")
-                return self._send_json({"quick_play": 0, "ranked": 0})
+def _record_route_stats(route, target, seconds):
+    trace = end_request_trace()
+    status = str(getattr(trace, 'status', None) or 500)
+    METRICS.inc("http_requests_total", method=route.method, route=route.pattern, status=status)
+    if route.options.get('stream'):
+        # Held open for minutes by design; kept out of the request latency figures
+        METRICS.observe("http_stream_duration_seconds", seconds, method=route.method, route=route.pattern)
+    else:
+        ROUTE_STATS.record(route.name, seconds, trace)
+        METRICS.observe("http_request_duration_seconds", seconds,
+                        method=route.method, route=route.pattern, status=status)
+    METRICS_FLUSHER.maybe_flush()
 
-        # GET /api/queue/status - Get queue status and check for matches
-        if path == '/api/queue/status':
-            mode = (query.get('mode', '') or '').strip().lower()
-            player_id = (query.get('player_id', '') or '').strip()
-            
-            if mode not in ('quick_play', 'ranked'):
-                return self._send_error("Invalid mode. Use 'quick_play' or 'ranked'", 400)
-            
-            if not player_id:
-                return self._send_error("player_id required", 400)
-            
-            # Validate player_id format
-            validated_id = sanitize_player_id(player_id)
-            if not validated_id:
-                return self._send_error("Invalid player_id format", 400)
-            
-            status = get_queue_status(mode, validated_id)
-            return self._send_json(status)
 
-        # GET /api/lobbies - List open lobbies
-        if path == '/api/lobbies':
-            # Rate limit: 30/min for lobby listing
-            if not check_rate_limit(get_ratelimit_general(), f"lobbies:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
-            try:
-                redis = get_redis()
-                keys = redis.keys("game:*")
-                lobbies = []
-                current_time = time.time()
-
-                # Optional filter: ?mode=ranked|unranked
-                mode = (query.get('mode', '') or '').strip().lower()
-                want_ranked = None
-                if mode == 'ranked':
-                    want_ranked = True
-                elif mode == 'unranked':
-                    want_ranked = False
-                
-                for key in keys:
-                    game_data = redis.get(key)
-                    if game_data:
-                        game = json.loads(game_data)
-                        # Never list singleplayer lobbies
-                        if game.get('is_singleplayer'):
-                            continue
+def _collect_process_metrics(registry: MetricsRegistry):
+    """Copy counters kept elsewhere (Redis command totals, embedding store tiers) into the registry."""
+    for name, totals in redis_command_totals().items():
+        registry.set("redis_commands_total", totals["calls"], command=name)
+    for tier, counts in get_embedding_store().stats().items():
+        if "hits" in counts:
+            registry.set("embedding_cache_lookups_total", counts["hits"], tier=tier, result="hit")
+            registry.set("embedding_cache_lookups_total", counts["misses"], tier=tier, result="miss")
 
-                        visibility = game.get('visibility', 'public')
-                        is_ranked = bool(game.get('is_ranked', False))
 
-                        # Public listing only
-                        if visibility != 'public':
-                            continue
+METRICS.add_collector(_collect_process_metrics)
 
-                        # Optional ranked/unranked filter
-                        if want_ranked is not None and is_ranked != want_ranked:
-                            continue
 
-                        # Only show waiting lobbies that aren't full and not expired
-                        if game.get('status') == 'waiting' and len(game.get('players', [])) < MAX_PLAYERS:
-                            # Check if lobby has expired
-                            created_at = game.get('created_at', current_time)
-                            if current_time - created_at > LOBBY_EXPIRY_SECONDS:
-                                # Delete expired lobby
-                                redis.delete(key)
-                                continue
-                            
-                            # Get winning theme from votes
-                            votes = game.get('theme_votes', {})
-                            winning_theme = max(votes.keys(), key=lambda k: len(votes[k])) if votes else None
-                            lobbies.append({
-                                "code": game['code'],
-                                "player_count": len(game.get('players', [])),
-                                "max_players": MAX_PLAYERS,
-                                "theme_options": game.get('theme_options', []),
-                                "winning_theme": winning_theme,
-                                "visibility": visibility,
-                                "is_ranked": is_ranked,
-                            })
-                return self._send_json({"lobbies": lobbies})
-            except Exception as e:
-                print(f"Error loading lobbies: {e}")  # Log server-side only
-                return self._send_error("Failed to load lobbies. Please try again.", 500)
+def live_metrics(snapshot: dict) -> dict:
+    """
+    Cluster-wide gauges read at scrape time (never flushed or summed):
+    queue depth, games by status, and cache hit ratios of a (merged) snapshot.
+    """
+    live = MetricsRegistry()
+    live.gauge("matchmaking_queue_depth", "Players waiting in the matchmaking queue, by mode")
+    live.gauge("games_active", "Unexpired games, by status and mode")
+    live.gauge("embedding_cache_hit_ratio", "Share of embedding lookups each tier answered, by tier")
+    live.gauge("similarity_matrix_cache_hit_ratio", "Share of similarity matrix lookups served without computing")
 
-        # GET /api/spectateable - List public, non-finished multiplayer games that can be spectated
-        if path == '/api/spectateable':
-            # Rate limit: 30/min for listing
-            if not check_rate_limit(get_ratelimit_general(), f"spectateable:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
-            try:
-                redis = get_redis()
-                keys = redis.keys("game:*")
-                games = []
-                now = float(time.time())
+    try:
+        batch = redis_batch()
+        depths = {mode: batch.zcard(_queue_key(mode)) for mode in ("quick_play", "ranked")}
+        batch.flush()
+        for mode, depth in depths.items():
+            live.set("matchmaking_queue_depth", depth.result() or 0, mode=mode)
+    except Exception as e:
+        print(f"Metrics queue depth error: {e}")
+    try:
+        for (status, mode), count in count_games_by_status().items():
+            live.set("games_active", count, status=status, mode=mode)
+    except Exception as e:
+        print(f"Metrics game count error: {e}")
 
-                for key in keys:
-                    game_data = redis.get(key)
-                    if not game_data:
-                        continue
-                    game = json.loads(game_data)
+    tiers = {}
+    for labels, value in (snapshot.get("embedding_cache_lookups_total") or {}).get("samples", []):
+        tiers.setdefault(labels.get("tier"), {})[labels.get("result")] = value
+    for tier, counts in tiers.items():
+        lookups = counts.get("hit", 0) + counts.get("miss", 0)
+        if lookups:
+            live.set("embedding_cache_hit_ratio", counts.get("hit", 0) / lookups, tier=tier)
+    sources = {labels.get("source"): value
+               for labels, value in (snapshot.get("similarity_matrix_lookups_total") or {}).get("samples", [])}
+    lookups = sum(value for source, value in sources.items() if source != "computed")
+    if lookups:
+        live.set("similarity_matrix_cache_hit_ratio", (lookups - sources.get("miss", 0)) / lookups)
+    return live.snapshot()
 
-                    # Only list public multiplayer games (never leak private codes or solo games)
-                    if game.get('visibility', 'public') != 'public':
-                        continue
-                    if game.get('is_singleplayer'):
-                        continue
 
-                    status = game.get('status', '')
-                    if status == 'finished':
-                        continue
+ROUTES.add_timing_hook(_record_route_stats)
 
-                    # Apply lobby expiry to waiting games, same as /api/lobbies
-                    if status == 'waiting':
-                        created_at = float(game.get('created_at', now) or now)
-                        if now - created_at > float(LOBBY_EXPIRY_SECONDS):
-                            try:
-                                delete_game(game.get('code', ''))
-                            except Exception:
-                                pass
-                            continue
 
-                    code = game.get('code', '')
-                    if not code:
-                        continue
+def load_route_module(name: str):
+    """
+    Import a module of the api/routes package, or None if it can't load.
 
-                    games.append({
-                        "code": code,
-                        "status": status,
-                        "player_count": len(game.get('players', []) or []),
-                        "max_players": MAX_PLAYERS,
-                        "is_ranked": bool(game.get('is_ranked', False)),
-                        "spectator_count": get_spectator_count(code),
-                    })
+    Imported as routes.{name}, beside data, security and services, so the
+    modules share this process's Redis client, request traces and caches.
+    """
+    try:
+        return importlib.import_module(f"routes.{name}")
+    except Exception as e:
+        print(f"Route module {name} unavailable: {e}")
+        return None
 
-                # Sort: playing first, then word_selection, then waiting; then by player count desc
-                order = {"playing": 0, "word_selection": 1, "waiting": 2}
-                games.sort(key=lambda g: (order.get(g.get("status", ""), 9), -(g.get("player_count", 0) or 0), g.get("code", "")))
 
-                return self._send_json({"games": games[:100]})
-            except Exception as e:
-                print(f"Error loading spectateable games: {e}")
-                return self._send_error("Failed to load games. Please try again.", 500)
+class handler(BaseHTTPRequestHandler):
+    def _get_auth_payload(self) -> Optional[dict]:
+        """Return decoded JWT payload for the request, or None if not authenticated."""
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+        token = auth_header[7:]
+        return verify_jwt_token(token)
 
-        # GET /api/leaderboard
-        if path == '/api/leaderboard':
-            # Rate limit: 30/min for leaderboard
-            if not check_rate_limit(get_ratelimit_general(), f"leaderboard:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
-            
-            # Support ?type=weekly or ?type=alltime (default)
-            leaderboard_type = query.get('type', 'alltime')
-            if leaderboard_type not in ('alltime', 'weekly'):
-                leaderboard_type = 'alltime'
-            
-            players = get_leaderboard(leaderboard_type)
-            return self._send_json({
-                "players": players,
-                "type": leaderboard_type,
-                "week": get_weekly_leaderboard_key() if leaderboard_type == 'weekly' else None,
-            })
+    def _get_auth_user_id(self) -> Optional[str]:
+        """Convenience wrapper to get the authenticated user id (JWT sub)."""
+        payload = self._get_auth_payload()
+        if payload and isinstance(payload, dict):
+            return payload.get('sub')
+        return None
 
-        # GET /api/leaderboard/ranked - Ranked MMR leaderboard (Google users)
-        if path == '/api/leaderboard/ranked':
-            # Rate limit: 30/min for leaderboard
-            if not check_rate_limit(get_ratelimit_general(), f"leaderboard_ranked:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
+    def _is_admin_request(self) -> bool:
+        """Best-effort check if the request is from an admin user (by email)."""
+        try:
+            payload = self._get_auth_payload()
+            if not payload or not isinstance(payload, dict):
+                return False
+            email = str(payload.get('email') or '').strip().lower()
+            if not email:
+                return False
+            admin_emails = [str(e).strip().lower() for e in (ADMIN_EMAILS or [])]
+            return email in admin_emails
+        except Exception:
+            return False
 
-            redis = get_redis()
-            try:
-                data = redis.zrevrange("leaderboard:mmr", 0, 99, withscores=True) or []
-            except Exception:
-                data = []
+    def _debug_allowed(self) -> bool:
+        """Return True if we can safely return debug details to this client."""
+        # SECURITY: In production, only admins can see debug info to prevent information leakage
+        if os.getenv('VERCEL_ENV') == 'production':
+            return self._is_admin_request()
+        # In development, respect DEBUG_ERRORS setting or admin status
+        return bool(DEBUG_ERRORS or self._is_admin_request())
 
-            players = []
-            rank = 1
-            for uid, score in data:
-                if isinstance(uid, bytes):
-                    try:
-                        uid = uid.decode()
-                    except Exception:
-                        continue
-                
-                # Skip non-Google authenticated users (bots, etc.)
-                if not uid.startswith('google_'):
-                    continue
-                
-                try:
-                    mmr = int(score)
-                except Exception:
-                    try:
-                        mmr = int(float(score))
-                    except Exception:
-                        mmr = 0
+    def _validate_player_session(self, body: dict, game_code: str) -> tuple:
+        """
+        Validate player session token from request body.
+        
+        Returns:
+            (player_id, None) if valid
+            (None, error_message) if invalid
+        """
+        player_id = body.get('player_id', '')
+        session_token = body.get('session_token', '')
+        
+        # Validate player ID format (human or AI)
+        if player_id.startswith('ai_'):
+            validated_id = sanitize_ai_player_id(player_id)
+            # AI players don't need session tokens - they're server-controlled
+            if not validated_id:
+                return None, "Invalid AI player ID format"
+            return validated_id, None
+        else:
+            validated_id = sanitize_player_id(player_id)
+            if not validated_id:
+                return None, "Invalid player ID format"
+        
+        # SECURITY: Require valid session token for human players
+        if not session_token:
+            return None, "Session token required"
+        
+        if not verify_session_token(session_token, validated_id, game_code):
+            return None, "Invalid or expired session token"
+        
+        return validated_id, None
 
-                user = get_user_by_id(uid)
-                if not user:
-                    continue
-                stats = get_user_stats(user)
-                
-                # Filter out unplaced players (must complete placement games to appear on leaderboard)
-                ranked_games = int(stats.get('ranked_games', 0) or 0)
-                if ranked_games < RANKED_PLACEMENT_GAMES:
-                    continue
-                
-                players.append({
-                    "rank": rank,
-                    "id": user.get('id'),
-                    "name": get_user_display_name(user),
-                    "mmr": int(stats.get('mmr', mmr) or mmr),
-                    "peak_mmr": int(stats.get('peak_mmr', mmr) or mmr),
-                    "ranked_games": ranked_games,
-                    "ranked_wins": int(stats.get('ranked_wins', 0) or 0),
-                    "ranked_losses": int(stats.get('ranked_losses', 0) or 0),
-                })
-                rank += 1
+    def _get_cors_origin(self):
+        """Get the appropriate CORS origin header value."""
+        origin = self.headers.get('Origin', '')
+        if origin in ALLOWED_ORIGINS:
+            return origin
+        # Allow localhost in development
+        if DEV_MODE and origin.startswith('http://localhost:'):
+            return origin
+        # SECURITY: Don't set CORS header for unknown origins (prevents confused deputy attacks)
+        return ''
 
-            return self._send_json({
-                "players": players,
-                "type": "ranked",
-            })
+    def send_response(self, code, message=None):
+        trace = current_request_trace()
+        if trace is not None:
+            trace.status = code
+        super().send_response(code, message)
 
-        # GET /api/profile/:name - Get player profile and stats
-        if path.startswith('/api/profile/'):
-            # Rate limit: 30/min for profile lookups
-            if not check_rate_limit(get_ratelimit_general(), f"profile:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
-            
-            player_name = path[len('/api/profile/'):]
-            if not player_name:
-                return self._send_error("Player name required", 400)
-            
-            # URL decode the name
-            player_name = urllib.parse.unquote(player_name)
-            
-            # Get casual stats by name
-            stats = get_player_stats(player_name)
-            
-            # Check if this player has a linked Google account
-            redis = get_redis()
-            user_data = None
-            ranked_stats = None
-            created_at = None
-            
-            # If the requester is authenticated, check if they're viewing their own profile
-            auth_header = self.headers.get('Authorization', '')
-            requesting_user_id = None
-            if auth_header.startswith('Bearer '):
-                token = auth_header[7:]
-                payload = verify_jwt_token(token)
-                if payload:
-                    requesting_user_id = payload.get('sub')
-                    # Check if the authenticated user's name matches the profile being viewed
-                    auth_user = get_user_by_id(requesting_user_id)
-                    if auth_user and auth_user.get('name', '').lower() == player_name.lower():
-                        user_data = auth_user
-            
-            # If not found via auth name match, check player stats for linked auth_user_id
-            if not user_data:
-                auth_user_id = stats.get('auth_user_id')
-                if auth_user_id:
-                    user_data = get_user_by_id(auth_user_id)
-            
-            # Fallback: search for a Google user with matching name
-            if not user_data:
-                all_user_ids = redis.smembers('users:all') or []
-                for uid in all_user_ids:
-                    if isinstance(uid, bytes):
-                        try:
-                            uid = uid.decode()
-                        except Exception:
-                            continue
-                    user = get_user_by_id(uid)
-                    if user and user.get('name', '').lower() == player_name.lower():
-                        user_data = user
-                        break
-            
-            # Get created_at and ranked stats from user if found
-            if user_data:
-                created_at = user_data.get('created_at')
-                u_stats = get_user_stats(user_data)
-                if u_stats.get('ranked_games', 0) > 0:
-                    ranked_stats = {
-                        "mmr": int(u_stats.get('mmr', 1000) or 1000),
-                        "peak_mmr": int(u_stats.get('peak_mmr', 1000) or 1000),
-                        "ranked_games": int(u_stats.get('ranked_games', 0) or 0),
-                        "ranked_wins": int(u_stats.get('ranked_wins', 0) or 0),
-                        "ranked_losses": int(u_stats.get('ranked_losses', 0) or 0),
-                    }
-            
-            # Calculate win rate
-            games = stats.get('games_played', 0)
-            wins = stats.get('wins', 0)
-            win_rate = round((wins / games * 100), 1) if games > 0 else 0
-            
-            # Get cosmetics from user if available
-            cosmetics = None
-            badge = None
-            custom_avatar = None
-            if user_data:
-                cosmetics = user_data.get('cosmetics', {})
-                badge = cosmetics.get('badge') if cosmetics.get('badge') != 'none' else None
-                # Check for custom emoji avatar
-                profile_avatar = cosmetics.get('profile_avatar', 'default')
-                if profile_avatar and profile_avatar != 'default':
-                    # Load avatar icon from cosmetics catalog
-                    try:
-                        with open(os.path.join(os.path.dirname(__file__), 'cosmetics.json'), 'r') as f:
-                            catalog = json.load(f)
-                        avatar_data = catalog.get('profile_avatars', {}).get(profile_avatar, {})
-                        custom_avatar = avatar_data.get('icon', '')
-                    except Exception:
-                        pass
-            
-            return self._send_json({
-                "name": stats.get('name', player_name),
-                "wins": wins,
-                "games_played": games,
-                "win_rate": win_rate,
-                "eliminations": stats.get('eliminations', 0),
-                "times_eliminated": stats.get('times_eliminated', 0),
-                "best_streak": stats.get('best_streak', 0),
-                "created_at": created_at,  # None if not a Google user
-                "has_google_account": user_data is not None,
-                "custom_avatar": custom_avatar,  # Emoji avatar
-                "badge": badge,
-                "cosmetics": cosmetics,
-                "ranked": ranked_stats,
-            })
+    def _send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self._send_server_timing(len(body))
+        self._send_standard_headers()
+        self.wfile.write(body)
+
+    def _send_not_modified(self, etag):
+        """304 for a conditional GET (no body)."""
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self._send_server_timing(0)
+        self._send_standard_headers()
+
+    def _send_server_timing(self, body_bytes: int):
+        """Server-Timing header (Redis time and round trips so far) for a traced request."""
+        trace = current_request_trace()
+        if trace is None:
+            return
+        trace.response_bytes = body_bytes
+        if SERVER_TIMING_ENABLED:
+            self.send_header('Server-Timing', trace.server_timing())
 
-        # GET /api/games/{code}/theme - Get theme for a game (before joining)
-        if path.endswith('/theme') and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-            
-            import random
-            
-            # Get all theme words and ALL words already in any player's pool
-            all_theme_words = game.get('theme', {}).get('words', [])
-            assigned_words = set()
-            for p in game['players']:
-                # Exclude ALL words from existing players' pools
-                assigned_words.update(w.lower() for w in p.get('word_pool', []))
-            
-            # Available words = all words not yet in any player's pool
-            available_words = [w for w in all_theme_words if w.lower() not in assigned_words]
-            
-            # Give the next player a random pool from available (unassigned) words
-            if len(available_words) >= WORDS_PER_PLAYER:
-                next_player_pool = random.sample(available_words, WORDS_PER_PLAYER)
-            else:
-                next_player_pool = available_words
-            
-            return self._send_json({
-                "theme": {
-                    "name": game.get('theme', {}).get('name', ''),
-                    "words": all_theme_words,  # Full list for reference during game
-                },
-                "word_pool": sorted(next_player_pool),  # This player's available words (sorted for display)
-            })
+    def request_metrics(self) -> dict:
+        """This process's rolling per-route stats, Redis command totals and embedding cache counts."""
+        return {
+            "routes": ROUTE_STATS.snapshot(),
+            "redis_commands": redis_command_totals(),
+            "embedding_cache": get_embedding_store().stats(),
+        }
 
-        # GET /api/games/{code}/spectate - Spectator view (no player_id required)
-        if path.endswith('/spectate') and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
+    def end_game(self, code: str) -> Optional[dict]:
+        """
+        Force a game to finish (admin moderation) through the guarded save,
+        re-run on conflict, so pollers, waiters and event streams see it.
+        No stats are applied. Returns the game, or None if it doesn't exist.
+        """
+        def end():
             game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-
-            # Spectator presence heartbeat (best-effort)
-            spectator_id = sanitize_player_id(query.get('spectator_id', ''))
-            if spectator_id:
-                touch_presence(code, "spectators", spectator_id)
-            spectator_count = get_spectator_count(code)
-            
-            try:
-                game_finished = game['status'] == 'finished'
-                all_words_set = all(p.get('secret_word') for p in game.get('players', [])) if game.get('players') else False
-                
-                current_player_id = None
-                if game['status'] == 'playing' and game.get('players') and all_words_set:
-                    current_player_id = game['players'][game['current_turn']]['id']
-                
-                theme_data = game.get('theme') or {}
-                
-                # Build vote info with player names (for lobbies)
-                theme_votes = game.get('theme_votes', {})
-                theme_votes_with_names = {}
-                for theme, voter_ids in theme_votes.items():
-                    voters = []
-                    for vid in voter_ids:
-                        voter = next((p for p in game.get('players', []) if p['id'] == vid), None)
-                        if voter:
-                            voters.append({"id": vid, "name": voter['name']})
-                    theme_votes_with_names[theme] = voters
-                
-                # Time control (chess clock model) for spectators
-                time_control = game.get('time_control', {})
-                initial_time = int(time_control.get('initial_time', 0) or 0)
-                increment = int(time_control.get('increment', 0) or 0)
-                
-                current_player_time = None
-                turn_started_at = game.get('turn_started_at')
-                if initial_time > 0 and game['status'] == 'playing' and not game.get('waiting_for_word_change'):
-                    current_p = game['players'][game['current_turn']] if game.get('players') else None
-                    if current_p and turn_started_at:
-                        stored_time = current_p.get('time_remaining', initial_time)
-                        elapsed = time.time() - turn_started_at
-                        current_player_time = max(0, stored_time - elapsed)
-                
-                # Calculate word selection time remaining
-                word_selection_time_remaining = None
-                word_selection_started_at = game.get('word_selection_started_at')
-                word_selection_time = game.get('word_selection_time', 0)
-                if game['status'] == 'word_selection' and word_selection_started_at and word_selection_time > 0:
-                    elapsed = time.time() - word_selection_started_at
-                    word_selection_time_remaining = max(0, word_selection_time - elapsed)
-                
-                # Calculate word change time remaining (15 seconds to pick a new word after elimination)
-                WORD_CHANGE_TIME_LIMIT = 30
-                word_change_time_remaining = None
-                word_change_started_at = game.get('word_change_started_at')
-                if game.get('waiting_for_word_change') and word_change_started_at:
-                    elapsed = time.time() - word_change_started_at
-                    word_change_time_remaining = max(0, WORD_CHANGE_TIME_LIMIT - elapsed)
-                
-                response = {
-                    "code": game['code'],
-                    "host_id": game.get('host_id', ''),
-                    "players": [],
-                    "current_turn": game.get('current_turn', 0),
-                    "current_player_id": current_player_id,
-                    "status": game.get('status', ''),
-                    "winner": game.get('winner'),
-                    "history": game.get('history', []),
-                    "visibility": game.get('visibility', 'public'),
-                    "is_ranked": bool(game.get('is_ranked', False)),
-                    "spectator_count": spectator_count,
-                    "theme": {
-                        "name": theme_data.get('name', ''),
-                        "words": theme_data.get('words', []),
-                    },
-                    "waiting_for_word_change": game.get('waiting_for_word_change'),
-                    "theme_options": game.get('theme_options', []),
-                    "theme_votes": theme_votes_with_names,
-                    "all_words_set": all_words_set,
-                    "ready_count": sum(1 for p in game.get('players', []) if p.get('is_ready', False)),
-                    "is_singleplayer": game.get('is_singleplayer', False),
-                    "is_spectator": True,
-                    "time_control": {
-                        "initial_time": initial_time,
-                        "increment": increment,
-                    },
-                    "current_player_time": current_player_time,
-                    "turn_started_at": turn_started_at,
-                    "word_selection_time": word_selection_time,
-                    "word_selection_time_remaining": word_selection_time_remaining,
-                    "word_change_time_remaining": word_change_time_remaining,
-                    "word_count": game.get('word_count', 100),
-                }
-                
-                for p in game.get('players', []):
-                    # Calculate this player's time remaining
-                    player_time = p.get('time_remaining')
-                    if player_time is not None and p.get('id') == current_player_id and turn_started_at:
-                        elapsed = time.time() - turn_started_at
-                        player_time = max(0, player_time - elapsed)
-                    
-                    response['players'].append({
-                        "id": p.get('id'),
-                        "name": p.get('name'),
-                        "secret_word": p.get('secret_word') if game_finished else None,
-                        "has_word": bool(p.get('secret_word')),
-                        "is_alive": p.get('is_alive', True),
-                        "is_ready": p.get('is_ready', False),
-                        "cosmetics": p.get('cosmetics', {}),
-                        "is_ai": p.get('is_ai', False),
-                        "difficulty": p.get('difficulty'),
-                        "time_remaining": player_time,
-                    })
-                
-                return self._send_json(response)
-            except Exception as e:
-                print(f"Error building spectate response: {e}")
-                return self._send_error("Failed to load game. Please try again.", 500)
+            if game and game.get('status') != 'finished':
+                game['status'] = 'finished'
+                game['ended_by_admin'] = True
+                game['waiting_for_word_change'] = None
+                save_game(code, game)
+            return game
 
-        # GET /api/games/{code}/chat - Fetch chat messages after a message id
-        if path.endswith('/chat') and path.startswith('/api/games/'):
-            try:
-                # Rate limit: 60/min (general)
-                if not check_rate_limit(get_ratelimit_general(), f"chat_get:{client_ip}"):
-                    return self._send_error("Too many requests. Please wait.", 429)
+        code = sanitize_game_code(code)
+        return with_game_retry(end) if code else None
 
-                code = sanitize_game_code(path.split('/')[3])
-                if not code:
-                    return self._send_error("Invalid game code format", 400)
+    def _send_standard_headers(self):
+        """CORS, security and cache headers shared by every response; ends the headers."""
+        # CORS headers - restricted to allowed origins
+        cors_origin = self._get_cors_origin()
+        if cors_origin:
+            self.send_header('Access-Control-Allow-Origin', cors_origin)
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.send_header('Access-Control-Allow-Credentials', 'true')
+        # Security headers
+        self.send_header('X-Content-Type-Options', 'nosniff')
+        self.send_header('X-Frame-Options', 'DENY')
+        self.send_header('X-XSS-Protection', '1; mode=block')
+        self.send_header('Referrer-Policy', 'strict-origin-when-cross-origin')
+        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
+        self.end_headers()
 
-                # Game must exist (chat is scoped to the game)
-                game = load_game(code)
-                if not game:
-                    return self._send_error("Game not found", 404)
+    def _send_error(self, message, status=400):
+        self._send_json({"detail": message}, status)
 
-                after_raw = query.get('after', '0')
-                try:
-                    after_id = int(after_raw)
-                except Exception:
-                    after_id = 0
-                if after_id < 0:
-                    after_id = 0
+    def _requested_state_version(self, query):
+        """
+        State version the client already has, from If-None-Match or ?since_version=.
 
-                limit_raw = query.get('limit', '50')
-                try:
-                    limit = int(limit_raw)
-                except Exception:
-                    limit = 50
-                limit = max(1, min(200, limit))
+        Returns:
+            (version, via_etag) - version is None if the client sent neither
+        """
+        for tag in (self.headers.get('If-None-Match', '') or '').split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag.startswith('v') and tag[1:].isdigit():
+                return int(tag[1:]), True
+        since = str(query.get('since_version', '') or '')
+        if since.isdigit():
+            return int(since), False
+        return None, False
+
+    def _send_game_unchanged(self, version, via_etag, spectator_count, chat=None):
+        """Answer a poll whose client already has the current state version (plus any new chat)."""
+        etag = game_state_etag(version)
+        if via_etag and not (chat and chat['messages']):
+            return self._send_not_modified(etag)
+        response = {
+            "unchanged": True,
+            "state_version": version,
+            "spectator_count": spectator_count,
+        }
+        if chat is not None:
+            response['chat'] = chat
+        return self._send_json(response, headers={'ETag': etag})
 
-                redis = get_redis()
-                key = f"chat:{code}"
+    def _cursor_param(self, value) -> Optional[int]:
+        """Parse a non-negative integer cursor (history_since, chat_after); None if absent or invalid."""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return value if value >= 0 else None
+        value = str(value or '').strip()
+        return int(value) if value.isdigit() else None
 
-                # Primary storage: sorted-set `chat:{code}` (atomic appends).
-                zset_messages = []
-                try:
-                    raw = redis.zrange(key, 0, -1) or []
-                except Exception:
-                    raw = []
+    def _get_body(self):
+        """
+        Best-effort JSON body parser.
 
-                for item in raw:
-                    if not item:
-                        continue
-                    # Some clients may return (member, score) pairs
-                    if isinstance(item, (list, tuple)) and len(item) == 2:
-                        item = item[0]
-                    if isinstance(item, bytes):
-                        try:
-                            item = item.decode()
-                        except Exception:
-                            continue
-                    msg = None
-                    # Some Upstash clients may already deserialize JSON into dicts
-                    if isinstance(item, dict):
-                        # If this looks like our payload, accept directly.
-                        if 'text' in item and ('sender_id' in item or 'sender_name' in item):
-                            msg = item
-                        # Or if wrapped, unwrap common shapes
-                        elif 'member' in item:
-                            item = item.get('member')
-                        elif 'value' in item:
-                            item = item.get('value')
-                    if msg is None:
-                        try:
-                            if isinstance(item, bytes):
-                                item = item.decode()
-                            if isinstance(item, str):
-                                msg = json.loads(item)
-                            else:
-                                # Last resort: stringify and attempt JSON parse
-                                msg = json.loads(str(item))
-                        except Exception:
-                            msg = None
-                    if isinstance(msg, dict):
-                        zset_messages.append(msg)
+        IMPORTANT: Always returns a dict to avoid attribute errors (many handlers do body.get(...)).
+        If parsing fails (invalid JSON / unexpected content-type), returns {} instead of crashing.
+        """
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+        except Exception:
+            content_length = 0
+        if not content_length:
+            return {}
 
-                # Fallback storage: messages stored on the game object (when zadd fails in some envs).
-                game_messages = []
-                try:
-                    gm = game.get('chat_messages', [])
-                    if isinstance(gm, list):
-                        for m in gm:
-                            if isinstance(m, dict):
-                                game_messages.append(m)
-                except Exception:
-                    game_messages = []
+        try:
+            raw = self.rfile.read(content_length)
+        except Exception:
+            return {}
+        if not raw:
+            return {}
 
-                # Merge + dedupe by id (and keep order by id/ts).
-                merged = []
-                seen_ids = set()
-                for msg in (zset_messages + game_messages):
-                    try:
-                        mid = int(msg.get('id', 0) or 0)
-                    except Exception:
-                        mid = 0
-                    # If id is missing, fall back to a tuple key; but normally all messages have ids.
-                    key_id = mid if mid else (msg.get('ts'), msg.get('sender_id'), msg.get('text'))
-                    if key_id in seen_ids:
-                        continue
-                    seen_ids.add(key_id)
-                    merged.append(msg)
+        content_type = (self.headers.get('Content-Type', '') or '').lower()
 
-                def _sort_key(m):
-                    try:
-                        mid = int(m.get('id', 0) or 0)
-                    except Exception:
-                        mid = 0
-                    try:
-                        ts = int(m.get('ts', 0) or 0)
-                    except Exception:
-                        ts = 0
-                    return (mid, ts)
+        # Support form-encoded bodies as a fallback (prevents serverless crashes on accidental form submits)
+        if 'application/x-www-form-urlencoded' in content_type:
+            try:
+                parsed = urllib.parse.parse_qs(raw.decode('utf-8', errors='ignore'))
+                return {k: (v[0] if isinstance(v, list) and len(v) == 1 else v) for k, v in parsed.items()}
+            except Exception:
+                return {}
 
-                merged.sort(key=_sort_key)
+        # Default: JSON
+        try:
+            data = json.loads(raw)
+        except Exception:
+            return {}
+        return data if isinstance(data, dict) else {}
 
-                messages = []
-                last_id = after_id
-                for msg in merged:
-                    try:
-                        mid = int(msg.get('id', 0) or 0)
-                    except Exception:
-                        mid = 0
-                    if mid <= after_id:
-                        continue
-                    messages.append(msg)
-                    if mid > last_id:
-                        last_id = mid
-                    if len(messages) >= limit:
-                        break
+    def _advance_bots_on_poll(self, code: str, game: dict) -> dict:
+        """
+        Run server-side bot work for a multiplayer game being polled: bot turns
+        until a human is up (or the game ends), and bot word picks during
+        word_selection.
 
-                return self._send_json({"messages": messages, "last_id": last_id})
-            except Exception as e:
-                print(f"Chat fetch error: {e}")
-                return self._send_error("Failed to load chat. Please try again.", 500)
-
-        # GET /api/games/{code}/replay - Get full replay data for a finished game
-        if path.endswith('/replay') and path.startswith('/api/games/'):
-            parts = path.split('/')
-            if len(parts) != 5:
-                return self._send_error("Invalid path", 400)
-            
-            code = sanitize_game_code(parts[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-            
-            # Only allow replay for finished games
-            if game.get('status') != 'finished':
-                return self._send_error("Game is not finished yet", 400)
-            
-            # Get theme info
-            theme_data = game.get('theme') or {}
-            
-            # Build player info (with revealed words for finished games)
-            players = []
-            for p in game.get('players', []):
-                players.append({
-                    "id": p.get('id'),
-                    "name": p.get('name'),
-                    "secret_word": p.get('secret_word'),
-                    "is_alive": p.get('is_alive', True),
-                    "is_ai": p.get('is_ai', False),
-                    "cosmetics": p.get('cosmetics', {}),
-                })
-            
-            # Build replay data
-            replay_data = {
-                "code": game['code'],
-                "theme": {
-                    "name": theme_data.get('name', ''),
-                },
-                "players": players,
-                "winner": game.get('winner'),
-                "history": game.get('history', []),
-                "is_ranked": bool(game.get('is_ranked', False)),
-                "created_at": game.get('created_at'),
-                "finished_at": game.get('finished_at', game.get('created_at')),
-            }
-            
-            return self._send_json(replay_data)
+        Only the request holding the game's bot lease does the work; the
+        others serve the state they loaded. The lease holder works on the
+        latest saved state (reloading it in full if the game was loaded
+        without its history); if a human's save lands first, the bot work is
+        dropped and the newer state served (the next poll redoes it).
 
-        # GET /api/games/{code}
-        if path.startswith('/api/games/') and path.count('/') == 3:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            player_id = sanitize_player_id(query.get('player_id', ''))
-            if not player_id:
-                return self._send_error("Invalid player ID format", 400)
-            
-            game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-            
-            # Check player exists
-            player = None
-            for p in game['players']:
-                if p['id'] == player_id:
-                    player = p
-                    break
-            
-            if not player:
-                return self._send_error("You are not in this game", 403)
+        Returns:
+            The game to serve (reloaded if it was stale or another save won)
+        """
+        if not _game_needs_poll_tick(game):
+            return game
+        lease = acquire_bot_lease(code)
+        if not lease:
+            return game
+        try:
+            version = get_saved_game_version(code)
+            if version is None:
+                return game
+            if version != int(game.get('state_version', 0) or 0) or 'history' not in game:
+                # Someone saved since this request loaded the game, or it was
+                # loaded without history (and can't be saved as is)
+                latest = load_game(code)
+                if not latest:
+                    return game
+                game = latest
+            if self._run_bot_work(code, game):
+                try:
+                    if game.get('status') == 'finished':
+                        save_finished_game(code, game)
+                    else:
+                        save_game(code, game)
+                except VersionConflict:
+                    game = load_game(code) or game
+            return game
+        finally:
+            release_bot_lease(code, lease)
 
-            # Player presence heartbeat (best-effort)
-            touch_presence(code, "players", player_id)
-            spectator_count = get_spectator_count(code)
-            
-            # Auto-process AI turns for multiplayer games with bots (not singleplayer - that has its own flow)
-            # This ensures quick play games with bot fills work smoothly
-            if (game['status'] == 'playing' 
-                and not game.get('is_singleplayer') 
-                and not game.get('waiting_for_word_change')
-                and all(p.get('secret_word') for p in game['players'])):
+    def _load_game_view(self, code: str, history_since: Optional[int]) -> tuple:
+        """
+        Load a game to build a player view from: with a history cursor, only
+        the entries past it. A stale cursor gets the full game, and so does
+        a game with pending bot work (it will be saved).
+
+        Returns:
+            (game, history) - history is None if the full game was loaded
+        """
+        if history_since is not None:
+            game, history = load_game_since(code, history_since)
+            if not game or (history_since <= _history_length(game) and not _game_needs_poll_tick(game)):
+                return game, history
+        return load_game(code), None
+
+    def _run_bot_work(self, code: str, game: dict) -> bool:
+        """Bot turns and bot word picks for a polled game. Returns True if the game changed."""
+        modified = False
+        # Auto-process AI turns for multiplayer games with bots (not singleplayer - that has its own flow)
+        # This ensures quick play games with bot fills work smoothly
+        if (game['status'] == 'playing' 
+            and not game.get('is_singleplayer') 
+            and not game.get('waiting_for_word_change')
+            and all(p.get('secret_word') for p in game['players'])):
+            
+            current_player = game['players'][game['current_turn']] if game['players'] else None
+            if current_player and current_player.get('is_ai') and current_player.get('is_alive'):
+                load_ai_state(code, game)
+                # Process AI turns until it's a human's turn or game over
+                max_ai_turns = len(game['players']) * 2  # Safety limit
+                turns_processed = 0
+                game_modified = False
                 
-                current_player = game['players'][game['current_turn']] if game['players'] else None
-                if current_player and current_player.get('is_ai') and current_player.get('is_alive'):
-                    # Process AI turns until it's a human's turn or game over
-                    max_ai_turns = len(game['players']) * 2  # Safety limit
-                    turns_processed = 0
-                    game_modified = False
+                while turns_processed < max_ai_turns:
+                    current_ai = game['players'][game['current_turn']]
                     
-                    while turns_processed < max_ai_turns:
-                        current_ai = game['players'][game['current_turn']]
-                        
-                        # Stop if not AI turn
-                        if not current_ai.get('is_ai'):
-                            break
-                        
-                        # Skip dead AI
-                        if not current_ai.get('is_alive'):
-                            num_players = len(game['players'])
-                            next_turn = (game['current_turn'] + 1) % num_players
-                            while not game['players'][next_turn].get('is_alive'):
-                                next_turn = (next_turn + 1) % num_players
-                            game['current_turn'] = next_turn
-                            game_modified = True
-                            continue
-                        
-                        # Process AI turn
-                        ai_result = process_ai_turn(game, current_ai)
-                        if not ai_result:
-                            break
-                        
-                        turns_processed += 1
-                        game_modified = True
-                        
-                        # If AI eliminated someone, auto-handle its word change immediately
-                        if ai_result.get('eliminations') and current_ai.get('can_change_word'):
-                            process_ai_word_change(game, current_ai)
-                        
-                        # Check for game over
-                        alive_players = [p for p in game['players'] if p.get('is_alive')]
-                        if len(alive_players) <= 1:
-                            game['status'] = 'finished'
-                            if alive_players:
-                                game['winner'] = alive_players[0]['id']
-                            update_game_stats(game)
-                            break
-                        
-                        # Advance turn
+                    # Stop if not AI turn
+                    if not current_ai.get('is_ai'):
+                        break
+                    
+                    # Skip dead AI
+                    if not current_ai.get('is_alive'):
                         num_players = len(game['players'])
                         next_turn = (game['current_turn'] + 1) % num_players
                         while not game['players'][next_turn].get('is_alive'):
                             next_turn = (next_turn + 1) % num_players
                         game['current_turn'] = next_turn
-                        game['turn_started_at'] = time.time()
-                    
-                    if game_modified:
-                        save_game(code, game)
-            
-            # Auto-select words for AI players during word_selection phase (multiplayer with bots)
-            if (game['status'] == 'word_selection' 
-                and not game.get('is_singleplayer')):
-                
-                ai_words_picked = False
-                for p in game['players']:
-                    if not p.get('is_ai'):
+                        game_modified = True
                         continue
-                    if p.get('secret_word'):
-                        continue  # Already has a word
                     
-                    pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
-                    if not pool:
-                        continue
+                    # Process AI turn
+                    ai_result = process_ai_turn(game, current_ai)
+                    if not ai_result:
+                        break
                     
-                    selected_word = ai_select_secret_word(p, pool)
-                    if selected_word:
-                        try:
-                            get_embedding(selected_word)  # Ensure cached
-                            p['secret_word'] = selected_word.lower()
-                            ai_words_picked = True
-                        except Exception as e:
-                            print(f"AI word selection error (multiplayer poll): {e}")
-                
-                if ai_words_picked:
-                    save_game(code, game)
-            
-            try:
-                # Reveal all words if game is finished
-                game_finished = game['status'] == 'finished'
-                
-                # Check if all players have set their words (for playing status)
-                all_words_set = all(p.get('secret_word') for p in game['players']) if game['players'] else False
-                
-                # Determine current player (only if all words are set)
-                current_player_id = None
-                if game['status'] == 'playing' and game['players'] and all_words_set:
-                    current_player_id = game['players'][game['current_turn']]['id']
-                
-                # Safely get theme data
-                theme_data = game.get('theme') or {}
-                
-                # Build vote info with player names
-                theme_votes = game.get('theme_votes', {})
-                theme_votes_with_names = {}
-                for theme, voter_ids in theme_votes.items():
-                    voters = []
-                    for vid in voter_ids:
-                        voter = next((p for p in game['players'] if p['id'] == vid), None)
-                        if voter:
-                            voters.append({"id": vid, "name": voter['name']})
-                    theme_votes_with_names[theme] = voters
-                
-                # Count ready players
-                ready_count = sum(1 for p in game['players'] if p.get('is_ready', False))
-                
-                # Time control (chess clock model)
-                time_control = game.get('time_control', {})
-                initial_time = int(time_control.get('initial_time', 0) or 0)
-                increment = int(time_control.get('increment', 0) or 0)
-                
-                # Calculate current player's time remaining
-                current_player_time = None
-                turn_started_at = game.get('turn_started_at')
-                if initial_time > 0 and game['status'] == 'playing' and not game.get('waiting_for_word_change'):
-                    current_p = game['players'][game['current_turn']] if game['players'] else None
-                    if current_p and turn_started_at:
-                        stored_time = current_p.get('time_remaining', initial_time)
-                        elapsed = time.time() - turn_started_at
-                        current_player_time = max(0, stored_time - elapsed)
-                
-                # Calculate word selection time remaining
-                word_selection_time_remaining = None
-                word_selection_started_at = game.get('word_selection_started_at')
-                word_selection_time = game.get('word_selection_time', 0)
-                if game['status'] == 'word_selection' and word_selection_started_at and word_selection_time > 0:
-                    elapsed = time.time() - word_selection_started_at
-                    word_selection_time_remaining = max(0, word_selection_time - elapsed)
-                
-                # Calculate word change time remaining (15 seconds to pick a new word after elimination)
-                WORD_CHANGE_TIME_LIMIT = 30
-                word_change_time_remaining = None
-                word_change_started_at = game.get('word_change_started_at')
-                if game.get('waiting_for_word_change') and word_change_started_at:
-                    elapsed = time.time() - word_change_started_at
-                    word_change_time_remaining = max(0, WORD_CHANGE_TIME_LIMIT - elapsed)
-                
-                # Build response with hidden words
-                response = {
-                    "code": game['code'],
-                    "host_id": game['host_id'],
-                    "players": [],
-                    "current_turn": game['current_turn'],
-                    "current_player_id": current_player_id,
-                    "status": game['status'],
-                    "winner": game.get('winner'),
-                    "history": game.get('history', []),
-                    "visibility": game.get('visibility', 'public'),
-                    "is_ranked": bool(game.get('is_ranked', False)),
-                    "spectator_count": spectator_count,
-                    "theme": {
-                        "name": theme_data.get('name', ''),
-                        "words": theme_data.get('words', []),
-                    },
-                    "waiting_for_word_change": game.get('waiting_for_word_change'),
-                    "theme_options": game.get('theme_options', []),
-                    "theme_votes": theme_votes_with_names,
-                    "all_words_set": all_words_set,
-                    "ready_count": ready_count,
-                    "is_singleplayer": game.get('is_singleplayer', False),
-                    "time_control": {
-                        "initial_time": initial_time,
-                        "increment": increment,
-                    },
-                    "current_player_time": current_player_time,
-                    "turn_started_at": turn_started_at,
-                    "word_selection_time": word_selection_time,
-                    "word_selection_time_remaining": word_selection_time_remaining,
-                    "word_change_time_remaining": word_change_time_remaining,
-                    "word_count": game.get('word_count', 100),
-                }
-
-                # Ranked: include per-game MMR results on finished games (so clients can display deltas).
-                ranked_mmr = game.get('ranked_mmr') if isinstance(game.get('ranked_mmr'), dict) else None
-                is_ranked_game = bool(game.get('is_ranked', False))
-                
-                for p in game['players']:
-                    # Calculate this player's time remaining
-                    player_time = p.get('time_remaining')
-                    if player_time is not None and p['id'] == current_player_id and turn_started_at:
-                        # Current player's time is ticking
-                        elapsed = time.time() - turn_started_at
-                        player_time = max(0, player_time - elapsed)
+                    turns_processed += 1
+                    game_modified = True
                     
-                    player_data = {
-                        "id": p['id'],
-                        "name": p['name'],
-                        # Reveal all words when game is finished, otherwise only show your own
-                        "secret_word": p['secret_word'] if (p['id'] == player_id or game_finished) else None,
-                        "has_word": bool(p.get('secret_word')),  # Show if they've picked a word
-                        "is_alive": p['is_alive'],
-                        "can_change_word": p.get('can_change_word', False) if p['id'] == player_id else None,
-                        "is_ready": p.get('is_ready', False),
-                        "cosmetics": p.get('cosmetics', {}),  # Include cosmetics for all players
-                        "is_ai": p.get('is_ai', False),  # Include AI flag
-                        "difficulty": p.get('difficulty'),  # Include AI difficulty
-                        "time_remaining": player_time,
-                    }
-                    if game_finished and is_ranked_game and ranked_mmr:
-                        mmr_entry = ranked_mmr.get(str(p.get('id')))
-                        if isinstance(mmr_entry, dict):
-                            player_data['mmr_before'] = mmr_entry.get('old')
-                            player_data['mmr'] = mmr_entry.get('new')
-                            player_data['mmr_delta'] = mmr_entry.get('delta')
-                    # Include MMR display info for ranked games (during game, not just at end)
-                    if is_ranked_game and not p.get('is_ai'):
-                        auth_uid = p.get('auth_user_id')
-                        if auth_uid:
-                            try:
-                                u = get_user_by_id(auth_uid)
-                                if u:
-                                    u_stats = get_user_stats(u)
-                                    player_data['mmr_display'] = {
-                                        'mmr': int(u_stats.get('mmr', 1000) or 1000),
-                                        'ranked_games': int(u_stats.get('ranked_games', 0) or 0),
-                                    }
-                            except Exception:
-                                pass
-                    # Include this player's word pool if it's them
-                    if p['id'] == player_id:
-                        player_data['word_pool'] = p.get('word_pool', [])
-                        if p.get('word_change_options') is not None:
-                            player_data['word_change_options'] = p.get('word_change_options', [])
-                    response['players'].append(player_data)
-                
-                return self._send_json(response)
-            except Exception as e:
-                print(f"Error building game response: {e}")  # Log server-side only
-                return self._send_error("Failed to load game. Please try again.", 500)
-
-        self._send_error("Not found", 404)
-
-    def do_POST(self):
-        path = self.path.split('?')[0]
-        body = self._get_body()
-
-        # Get client IP for rate limiting
-        client_ip = get_client_ip(self.headers)
-
-        # POST /api/queue/join - Join matchmaking queue
-        if path == '/api/queue/join':
-            # Rate limit: 10/min for queue joins
-            if not check_rate_limit(get_ratelimit_general(), f"queue_join:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
-            
-            mode = (body.get('mode', '') or '').strip().lower()
-            player_name = (body.get('player_name', '') or '').strip()
-            
-            if mode not in ('quick_play', 'ranked'):
-                return self._send_error("Invalid mode. Use 'quick_play' or 'ranked'", 400)
-            
-            if not player_name:
-                return self._send_error("player_name required", 400)
-            
-            # Sanitize player name
-            sanitized_name = sanitize_player_name(player_name)
-            if not sanitized_name:
-                return self._send_error("Invalid player name", 400)
-            
-            # Generate a player ID for this queue session
-            player_id = secrets.token_hex(16)
-            
-            # Get auth info
-            auth_user_id = self._get_auth_user_id()
-            auth_user = None
-            mmr = RANKED_INITIAL_MMR
-            cosmetics = {}
-            
-            if auth_user_id:
-                auth_user = get_user_by_id(auth_user_id)
-                if auth_user:
-                    stats = get_user_stats(auth_user)
-                    mmr = stats.get('mmr', RANKED_INITIAL_MMR)
-                    cosmetics = get_user_cosmetics(auth_user)
-            
-            # Ranked eligibility check
-            if mode == 'ranked':
-                if not auth_user_id:
-                    return self._send_error("Sign in with Google to play ranked", 401)
-                
-                if not auth_user:
-                    return self._send_error("User not found", 404)
-                
-                is_eligible, error_msg = check_ranked_eligibility(auth_user)
-                if not is_eligible:
-                    return self._send_json({
-                        "status": "ineligible",
-                        "message": error_msg,
-                        "games_required": QUEUE_MIN_CASUAL_GAMES_FOR_RANKED,
-                        "games_played": get_user_stats(auth_user).get('mp_games_played', 0),
-                    }, 403)
-            
-            # Join queue
-            result = join_matchmaking_queue(
-                mode=mode,
-                player_id=player_id,
-                player_name=sanitized_name,
-                auth_user_id=auth_user_id,
-                mmr=mmr,
-                cosmetics=cosmetics,
-            )
-            
-            # Include player_id in response so client can poll status
-            result["player_id"] = player_id
-            
-            return self._send_json(result)
-
-        # POST /api/queue/leave - Leave matchmaking queue
-        if path == '/api/queue/leave':
-            mode = (body.get('mode', '') or '').strip().lower()
-            player_id = (body.get('player_id', '') or '').strip()
-            
-            if mode not in ('quick_play', 'ranked'):
-                return self._send_error("Invalid mode", 400)
-            
-            if not player_id:
-                return self._send_error("player_id required", 400)
-            
-            validated_id = sanitize_player_id(player_id)
-            if not validated_id:
-                return self._send_error("Invalid player_id format", 400)
-            
-            success = leave_matchmaking_queue(mode, validated_id)
-            return self._send_json({"status": "left" if success else "error"})
-
-        # POST /api/games - Create lobby with theme voting
-        if path == '/api/games':
-            # Rate limit: 5 games/min per IP
-            if not check_rate_limit(get_ratelimit_game_create(), client_ip):
-                return self._send_error("Too many game creations. Please wait.", 429)
-            
-            import random
-
-            # Lobby metadata (defaults tuned for friend-code flow)
-            requested_visibility = sanitize_visibility(body.get('visibility', 'private'), default='private')
-            requested_ranked = parse_bool(body.get('is_ranked', False), default=False)
-            
-            # Time control preset for casual games (ignored for ranked)
-            time_control_preset = str(body.get('time_control', 'rapid') or 'rapid').lower()
-            if time_control_preset not in CASUAL_TIME_PRESETS:
-                time_control_preset = 'rapid'
-            
-            # Word count: 50 or 100 (default 100 for custom games, can be overridden)
-            requested_word_count = int(body.get('word_count', 100) or 100)
-            if requested_word_count not in (50, 100):
-                requested_word_count = 100
-
-            # Ranked requires Google auth; also force public visibility
-            auth_user_id = self._get_auth_user_id()
-            if requested_ranked:
-                if not auth_user_id:
-                    return self._send_error("Ranked games require Google sign-in", 401)
-                requested_visibility = 'public'
-                requested_word_count = 100  # Ranked always uses 100 words
-            
-            code = generate_game_code()
-            
-            # Make sure code is unique
-            while load_game(code):
-                code = generate_game_code()
-            
-            # Pick 3 random theme categories for voting
-            theme_options = random.sample(THEME_CATEGORIES, min(3, len(THEME_CATEGORIES)))
-            
-            # Get time control settings
-            time_control = get_time_control(requested_ranked, time_control_preset)
-            
-            # Create lobby with theme voting
-            game = {
-                "code": code,
-                "host_id": "",
-                "players": [],
-                "current_turn": 0,
-                "status": "waiting",  # Directly in waiting state
-                "winner": None,
-                "history": [],
-                "theme": None,  # Will be set when game starts based on votes
-                "theme_options": theme_options,
-                "theme_votes": {opt: [] for opt in theme_options},  # Track votes per theme
-                "created_at": time.time(),  # For lobby expiry
-                "visibility": requested_visibility,
-                "is_ranked": bool(requested_ranked),
-                "created_by_user_id": auth_user_id if requested_ranked else (auth_user_id or None),
-                "time_control": time_control,
-                "turn_started_at": None,  # Set when game starts playing
-                "word_count": requested_word_count,
-            }
-            save_game(code, game)
-            return self._send_json({
-                "code": code,
-                "theme_options": theme_options,
-                "visibility": requested_visibility,
-                "is_ranked": bool(requested_ranked),
-                "time_control": time_control,
-                "word_count": requested_word_count,
-            })
-
-        # POST /api/challenge/create - Create a challenge link with pre-configured settings
-        if path == '/api/challenge/create':
-            # Rate limit: 10 challenges/min per IP
-            if not check_rate_limit(get_ratelimit_game_create(), client_ip):
-                return self._send_error("Too many challenge creations. Please wait.", 429)
-            
-            import random
-            
-            # Get challenger info
-            auth_user_id = self._get_auth_user_id()
-            challenger_name = body.get('challenger_name', 'Anonymous')
-            if not isinstance(challenger_name, str):
-                challenger_name = 'Anonymous'
-            challenger_name = challenger_name.strip()[:20] or 'Anonymous'
-            
-            # Challenge settings
-            theme = body.get('theme', None)
-            if theme and theme not in THEME_CATEGORIES:
-                theme = None
-            
-            # Generate challenge ID
-            challenge_id = ''.join(random.choices('ABCDEFGHJKLMNPQRSTUVWXYZ23456789', k=8))
-            
-            # Store challenge in Redis
-            redis = get_redis()
-            challenge_data = {
-                "id": challenge_id,
-                "challenger_name": challenger_name,
-                "challenger_user_id": auth_user_id,
-                "theme": theme,  # Pre-selected theme (or None for voting)
-                "created_at": time.time(),
-            }
-            
-            # Challenges expire after 7 days
-            redis.set(f"challenge:{challenge_id}", json.dumps(challenge_data), ex=604800)
-            
-            return self._send_json({
-                "challenge_id": challenge_id,
-                "challenge_url": f"/challenge/{challenge_id}",
-            })
-        
-        # GET /api/challenge/{id} - Get challenge details
-        if path.startswith('/api/challenge/') and len(path.split('/')) == 4:
-            challenge_id = path.split('/')[3].upper()
-            
-            redis = get_redis()
-            challenge_data = redis.get(f"challenge:{challenge_id}")
-            
-            if not challenge_data:
-                return self._send_error("Challenge not found or expired", 404)
-            
-            challenge = json.loads(challenge_data)
-            
-            return self._send_json({
-                "id": challenge['id'],
-                "challenger_name": challenge['challenger_name'],
-                "theme": challenge.get('theme'),
-                "created_at": challenge.get('created_at'),
-            })
-        
-        # POST /api/challenge/{id}/accept - Accept a challenge and create a game
-        if path.startswith('/api/challenge/') and path.endswith('/accept'):
-            parts = path.split('/')
-            if len(parts) != 5:
-                return self._send_error("Invalid challenge path", 400)
-            
-            challenge_id = parts[3].upper()
-            
-            # Rate limit
-            if not check_rate_limit(get_ratelimit_game_create(), client_ip):
-                return self._send_error("Too many requests. Please wait.", 429)
-            
-            redis = get_redis()
-            challenge_data = redis.get(f"challenge:{challenge_id}")
-            
-            if not challenge_data:
-                return self._send_error("Challenge not found or expired", 404)
-            
-            challenge = json.loads(challenge_data)
-            
-            import random
-            
-            # Create a new game for this challenge
-            code = generate_game_code()
-            while load_game(code):
-                code = generate_game_code()
-            
-            # If theme is pre-selected, use it; otherwise use voting
-            theme = challenge.get('theme')
-            if theme and theme in THEME_CATEGORIES:
-                theme_options = [theme]
-                theme_votes = {theme: []}
-            else:
-                theme_options = random.sample(THEME_CATEGORIES, min(3, len(THEME_CATEGORIES)))
-                theme_votes = {opt: [] for opt in theme_options}
+                    # If AI eliminated someone, auto-handle its word change immediately
+                    if ai_result.get('eliminations') and current_ai.get('can_change_word'):
+                        process_ai_word_change(game, current_ai)
+                    
+                    # Check for game over
+                    alive_players = [p for p in game['players'] if p.get('is_alive')]
+                    if len(alive_players) <= 1:
+                        game['status'] = 'finished'
+                        if alive_players:
+                            game['winner'] = alive_players[0]['id']
+                        break
+                    
+                    # Advance turn
+                    num_players = len(game['players'])
+                    next_turn = (game['current_turn'] + 1) % num_players
+                    while not game['players'][next_turn].get('is_alive'):
+                        next_turn = (next_turn + 1) % num_players
+                    game['current_turn'] = next_turn
+                    game['turn_started_at'] = time.time()
+                
+                if game_modified:
+                    modified = True
+        
+        # Auto-select words for AI players during word_selection phase (multiplayer with bots)
+        if (game['status'] == 'word_selection' 
+            and not game.get('is_singleplayer')):
             
-            game = {
-                "code": code,
-                "host_id": "",
-                "players": [],
-                "current_turn": 0,
-                "status": "waiting",
-                "winner": None,
-                "history": [],
-                "theme": theme if theme else None,
-                "theme_options": theme_options,
-                "theme_votes": theme_votes,
-                "created_at": time.time(),
-                "visibility": "private",
-                "is_ranked": False,
-                "challenge_id": challenge_id,
-                "challenger_name": challenge.get('challenger_name'),
-                "time_control": get_time_control(False, "default"),
-                "turn_started_at": None,
-            }
-            save_game(code, game)
+            ai_words_picked = False
+            for p in game['players']:
+                if not p.get('is_ai'):
+                    continue
+                if p.get('secret_word'):
+                    continue  # Already has a word
+                
+                pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
+                if not pool:
+                    continue
+                
+                selected_word = ai_select_secret_word(p, pool, game)
+                if selected_word:
+                    try:
+                        get_embedding(selected_word)  # Ensure cached
+                        p['secret_word'] = selected_word.lower()
+                        ai_words_picked = True
+                    except Exception as e:
+                        print(f"AI word selection error (multiplayer poll): {e}")
             
-            return self._send_json({
-                "code": code,
-                "theme_options": theme_options,
-                "challenger_name": challenge.get('challenger_name'),
-            })
+            if ai_words_picked:
+                modified = True
+        
+        return modified
 
-        # POST /api/singleplayer - Create singleplayer lobby
-        if path == '/api/singleplayer':
-            # Rate limit: 5 games/min per IP
-            if not check_rate_limit(get_ratelimit_game_create(), client_ip):
-                return self._send_error("Too many game creations. Please wait.", 429)
-            
-            import random
+    def _stream_game_events(self, code: str, player_id: Optional[str],
+                            spectator_id: Optional[str], last_id: Optional[str]):
+        """
+        Serve a game's event log as Server-Sent Events.
+
+        New connections (and ones whose Last-Event-ID has been trimmed from the
+        log) first get a `snapshot` event with the full player or spectator
+        view. After that, logged events are relayed in order with their
+        stream ids. `presence` events (spectator count changes) are
+        synthesized here from the presence sets, and the stream doubles as
+        the viewer's presence heartbeat. Player streams also run pending bot
+        work, as GET /api/games/{code} does.
+
+        The stream ends when the game finishes or disappears, at the duration
+        limit, or (serverless) after the first batch of events.
+        """
+        redis = get_redis()
+        kind, member = ("players", player_id) if player_id else ("spectators", spectator_id)
+        deadline = time.time() + (EVENTS_SERVERLESS_MAX_SECONDS if SERVERLESS else EVENTS_MAX_SECONDS)
+        presence_every = max(1.0, PRESENCE_TTL_SECONDS / 3)
+        bot_tick_every = 2.0
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('X-Accel-Buffering', 'no')
+        self._send_standard_headers()
+        
+        def write(text: str):
+            self.wfile.write(text.encode())
+            self.wfile.flush()
+        
+        try:
+            write(f"retry: {EVENTS_RETRY_MS}\n\n")
             
-            code = generate_game_code()
+            presence = redis_batch()
+            touch_presence(code, kind, member, presence)
+            spectator_count = get_spectator_count(code, presence)
+            next_presence = time.time() + presence_every
             
-            # Make sure code is unique
-            while load_game(code):
-                code = generate_game_code()
+            oldest = oldest_event_id(redis, code) if last_id else None
+            if last_id is None or (oldest and event_id_before(last_id, oldest)):
+                last_id = latest_event_id(redis, code) or last_id
+                game = load_game(code)
+                if not game:
+                    return
+                if player_id:
+                    game = self._advance_bots_on_poll(code, game)
+                    view = self._build_game_response(game, player_id, code, spectator_count)
+                else:
+                    view = self._build_spectator_response(game, spectator_count)
+                if view is not None:
+                    write(format_sse("snapshot", view, last_id))
+            last_write = time.time()
+            next_bot_tick = time.time() + bot_tick_every
+            
+            while time.time() < deadline:
+                now = time.time()
+                batch = redis_batch()
+                entries = batch.xrange(events_key(code), f"({last_id}" if last_id else "-", "+", count=100)
+                version = batch.get(_game_version_key(code))
+                if now >= next_presence:
+                    touch_presence(code, kind, member, batch)
+                    count = get_spectator_count(code, batch)
+                    next_presence = now + presence_every
+                    if count != spectator_count:
+                        spectator_count = count
+                        write(format_sse("presence", {"spectator_count": count}))
+                        last_write = now
+                try:
+                    events = parse_stream_entries(entries.result())
+                    version_value = version.result()
+                except Exception as e:
+                    print(f"Event stream read error: {e}")
+                    time.sleep(EVENTS_CHECK_SECONDS)
+                    continue
+                
+                finished = False
+                for event in events:
+                    write(format_sse(event['type'], event['data'], event['id']))
+                    last_id = event['id']
+                    if event['type'] == 'status' and event['data'].get('status') == 'finished':
+                        finished = True
+                if events:
+                    last_write = now
+                if finished or version_value is None:
+                    return
+                if SERVERLESS and events:
+                    return
+                
+                if player_id and str(version_value).endswith(':tick') and now >= next_bot_tick:
+                    next_bot_tick = now + bot_tick_every
+                    # The lease holder reloads the full game before saving
+                    current = load_game(code, with_history=False)
+                    if current:
+                        self._advance_bots_on_poll(code, current)
+                
+                if now - last_write >= EVENTS_KEEPALIVE_SECONDS:
+                    write(": keep-alive\n\n")
+                    last_write = now
+                time.sleep(EVENTS_CHECK_SECONDS)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away
+            return
 
-            # Offer 3 theme options to choose from (host picks via "vote" UI)
-            theme_options = random.sample(THEME_CATEGORIES, min(3, len(THEME_CATEGORIES)))
-            
-            # Word count: 50 or 100 (default 50 for singleplayer)
-            requested_word_count = int(body.get('word_count', 50) or 50)
-            if requested_word_count not in (50, 100):
-                requested_word_count = 50
-            
-            # Create singleplayer lobby
-            game = {
-                "code": code,
-                "host_id": "",
-                "players": [],
-                "current_turn": 0,
-                "status": "waiting",
-                "winner": None,
-                "history": [],
-                "theme": None,  # Set on start based on selection
-                "theme_options": theme_options,
-                "theme_votes": {opt: [] for opt in theme_options},
-                "created_at": time.time(),
-                "is_singleplayer": True,  # Mark as singleplayer game
-                "visibility": "private",
-                "is_ranked": False,
-                "time_control": get_time_control(False, "none"),  # No time limit in singleplayer
-                "turn_started_at": None,
-                "word_count": requested_word_count,
-            }
-            save_game(code, game)
-            return self._send_json({
-                "code": code,
-                "theme_options": theme_options,
-                "is_singleplayer": True,
-                "visibility": "private",
-                "is_ranked": False,
-                "word_count": requested_word_count,
-            })
+    def _build_spectator_response(self, game: dict, spectator_count: int,
+                                  history_since: int = None, history: list = None) -> Optional[dict]:
+        """
+        Build the spectator view of a game (no secret words until it's finished). Returns None on error.
 
-        # POST /api/games/{code}/add-ai - Add AI player to singleplayer lobby
-        if '/add-ai' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
+        history_since/history: see _apply_history_cursor.
+        """
+        try:
+            game_finished = game['status'] == 'finished'
+            all_words_set = all(p.get('secret_word') for p in game.get('players', [])) if game.get('players') else False
             
-            game = load_game(code)
+            current_player_id = None
+            if game['status'] == 'playing' and game.get('players') and all_words_set:
+                current_player_id = game['players'][game['current_turn']]['id']
             
-            if not game:
-                return self._send_error("Game not found", 404)
-            if not game.get('is_singleplayer'):
-                return self._send_error("Can only add AI to singleplayer games", 400)
-            if game['status'] != 'waiting':
-                return self._send_error("Game has already started", 400)
-            if len(game['players']) >= MAX_PLAYERS:
-                return self._send_error("Game is full", 400)
+            theme_data = game.get('theme') or {}
             
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
+            # Build vote info with player names (for lobbies)
+            theme_votes = game.get('theme_votes', {})
+            theme_votes_with_names = {}
+            for theme, voter_ids in theme_votes.items():
+                voters = []
+                for vid in voter_ids:
+                    voter = next((p for p in game.get('players', []) if p['id'] == vid), None)
+                    if voter:
+                        voters.append({"id": vid, "name": voter['name']})
+                theme_votes_with_names[theme] = voters
             
-            # Verify requester is the host
-            if game['host_id'] != player_id:
-                return self._send_error("Only the host can add AI players", 403)
+            # Time control (chess clock model) for spectators
+            time_control = game.get('time_control', {})
+            initial_time = int(time_control.get('initial_time', 0) or 0)
+            increment = int(time_control.get('increment', 0) or 0)
             
-            difficulty = body.get('difficulty', 'rookie')
-            if difficulty not in AI_DIFFICULTY_CONFIG:
-                allowed = ", ".join(["rookie", "analyst", "field-agent", "spymaster", "ghost"])
-                return self._send_error(f"Invalid difficulty. Choose: {allowed}", 400)
+            current_player_time = None
+            turn_started_at = game.get('turn_started_at')
+            if initial_time > 0 and game['status'] == 'playing' and not game.get('waiting_for_word_change'):
+                current_p = game['players'][game['current_turn']] if game.get('players') else None
+                if current_p and turn_started_at:
+                    stored_time = current_p.get('time_remaining', initial_time)
+                    elapsed = time.time() - turn_started_at
+                    current_player_time = max(0, stored_time - elapsed)
             
-            # Create AI player
-            existing_names = [p['name'] for p in game['players']]
-            ai_player = create_ai_player(difficulty, existing_names)
+            # Calculate word selection time remaining
+            word_selection_time_remaining = None
+            word_selection_started_at = game.get('word_selection_started_at')
+            word_selection_time = game.get('word_selection_time', 0)
+            if game['status'] == 'word_selection' and word_selection_started_at and word_selection_time > 0:
+                elapsed = time.time() - word_selection_started_at
+                word_selection_time_remaining = max(0, word_selection_time - elapsed)
             
-            game['players'].append(ai_player)
-            save_game(code, game)
+            # Calculate word change time remaining (15 seconds to pick a new word after elimination)
+            WORD_CHANGE_TIME_LIMIT = 30
+            word_change_time_remaining = None
+            word_change_started_at = game.get('word_change_started_at')
+            if game.get('waiting_for_word_change') and word_change_started_at:
+                elapsed = time.time() - word_change_started_at
+                word_change_time_remaining = max(0, WORD_CHANGE_TIME_LIMIT - elapsed)
             
-            return self._send_json({
-                "status": "ai_added",
-                "ai_player": {
-                    "id": ai_player["id"],
-                    "name": ai_player["name"],
-                    "difficulty": ai_player["difficulty"],
-                    "is_ai": True,
+            response = {
+                "code": game['code'],
+                "host_id": game.get('host_id', ''),
+                "players": [],
+                "current_turn": game.get('current_turn', 0),
+                "current_player_id": current_player_id,
+                "status": game.get('status', ''),
+                "winner": game.get('winner'),
+                "history": game.get('history', []) if history is None else history,
+                "visibility": game.get('visibility', 'public'),
+                "is_ranked": bool(game.get('is_ranked', False)),
+                "spectator_count": spectator_count,
+                "theme": {
+                    "name": theme_data.get('name', ''),
+                    "words": theme_data.get('words', []),
                 },
-            })
-
-        # POST /api/games/{code}/remove-ai - Remove AI player from singleplayer lobby
-        if '/remove-ai' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if not game.get('is_singleplayer'):
-                return self._send_error("Can only remove AI from singleplayer games", 400)
-            if game['status'] != 'waiting':
-                return self._send_error("Game has already started", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            # Verify requester is the host
-            if game['host_id'] != player_id:
-                return self._send_error("Only the host can remove AI players", 403)
-            
-            ai_id = sanitize_ai_player_id(body.get('ai_id', ''))
-            if not ai_id:
-                return self._send_error("Invalid AI player ID", 400)
-            
-            # Find and remove AI player
-            ai_player = next((p for p in game['players'] if p['id'] == ai_id), None)
-            if not ai_player:
-                return self._send_error("AI player not found", 404)
-            if not ai_player.get('is_ai'):
-                return self._send_error("Cannot remove human players", 400)
+                "waiting_for_word_change": game.get('waiting_for_word_change'),
+                "theme_options": game.get('theme_options', []),
+                "theme_votes": theme_votes_with_names,
+                "all_words_set": all_words_set,
+                "ready_count": sum(1 for p in game.get('players', []) if p.get('is_ready', False)),
+                "is_singleplayer": game.get('is_singleplayer', False),
+                "is_spectator": True,
+                "time_control": {
+                    "initial_time": initial_time,
+                    "increment": increment,
+                },
+                "current_player_time": current_player_time,
+                "turn_started_at": turn_started_at,
+                "word_selection_time": word_selection_time,
+                "word_selection_time_remaining": word_selection_time_remaining,
+                "word_change_time_remaining": word_change_time_remaining,
+                "word_count": game.get('word_count', 100),
+                "state_version": game.get('state_version', 0),
+            }
             
-            game['players'] = [p for p in game['players'] if p['id'] != ai_id]
-            save_game(code, game)
+            for p in game.get('players', []):
+                # Calculate this player's time remaining
+                player_time = p.get('time_remaining')
+                if player_time is not None and p.get('id') == current_player_id and turn_started_at:
+                    elapsed = time.time() - turn_started_at
+                    player_time = max(0, player_time - elapsed)
+                
+                response['players'].append({
+                    "id": p.get('id'),
+                    "name": p.get('name'),
+                    "secret_word": p.get('secret_word') if game_finished else None,
+                    "has_word": bool(p.get('secret_word')),
+                    "is_alive": p.get('is_alive', True),
+                    "is_ready": p.get('is_ready', False),
+                    "cosmetics": p.get('cosmetics', {}),
+                    "is_ai": p.get('is_ai', False),
+                    "difficulty": p.get('difficulty'),
+                    "time_remaining": player_time,
+                })
             
-            return self._send_json({
-                "status": "ai_removed",
-                "removed_id": ai_id,
-            })
+            return self._apply_history_cursor(response, game, history_since, history)
+        except Exception as e:
+            print(f"Error building spectate response: {e}")
+            return None
 
-        # POST /api/games/{code}/vote - Vote for a theme
-        if '/vote' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
+    def _build_game_response(self, game: dict, player_id: str, code: str, spectator_count: int = None,
+                             history_since: int = None, history: list = None) -> dict:
+        """
+        Build a standard game response for a player. Used by GET /api/games/{code} (and /wait) and POST endpoints.
+
+        history_since/history: see _apply_history_cursor.
+        """
+        try:
+            game_finished = game['status'] == 'finished'
+            all_words_set = all(p.get('secret_word') for p in game['players']) if game['players'] else False
             
-            game = load_game(code)
+            current_player_id = None
+            if game['status'] == 'playing' and game['players'] and all_words_set:
+                current_player_id = game['players'][game['current_turn']]['id']
             
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'waiting':
-                return self._send_error("Voting is closed", 400)
+            theme_data = game.get('theme') or {}
+            theme_votes = game.get('theme_votes', {})
+            theme_votes_with_names = {}
+            for theme, voter_ids in theme_votes.items():
+                voters = []
+                for vid in voter_ids:
+                    voter = next((p for p in game['players'] if p['id'] == vid), None)
+                    if voter:
+                        voters.append({"id": vid, "name": voter['name']})
+                theme_votes_with_names[theme] = voters
             
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
+            ready_count = sum(1 for p in game['players'] if p.get('is_ready', False))
+            if spectator_count is None:
+                spectator_count = get_spectator_count(code)
             
-            theme = body.get('theme', '').strip()
+            # Time control (chess clock model)
+            time_control = game.get('time_control', {})
+            initial_time = int(time_control.get('initial_time', 0) or 0)
+            increment = int(time_control.get('increment', 0) or 0)
             
-            if theme not in game.get('theme_options', []):
-                return self._send_error("Invalid theme", 400)
+            # Calculate current player's time remaining
+            current_player_time = None
+            turn_started_at = game.get('turn_started_at')
+            if initial_time > 0 and game['status'] == 'playing' and not game.get('waiting_for_word_change'):
+                current_player = game['players'][game['current_turn']] if game['players'] else None
+                if current_player and turn_started_at:
+                    stored_time = current_player.get('time_remaining', initial_time)
+                    elapsed = time.time() - turn_started_at
+                    current_player_time = max(0, stored_time - elapsed)
             
-            # Remove player's previous vote (if any)
-            for t in game.get('theme_votes', {}):
-                if player_id in game['theme_votes'][t]:
-                    game['theme_votes'][t].remove(player_id)
+            # Calculate word selection time remaining
+            word_selection_time_remaining = None
+            word_selection_started_at = game.get('word_selection_started_at')
+            word_selection_time = game.get('word_selection_time', 0)
+            if game['status'] == 'word_selection' and word_selection_started_at and word_selection_time > 0:
+                elapsed = time.time() - word_selection_started_at
+                word_selection_time_remaining = max(0, word_selection_time - elapsed)
             
-            # Add new vote
-            if theme not in game['theme_votes']:
-                game['theme_votes'][theme] = []
-            game['theme_votes'][theme].append(player_id)
+            # Calculate word change time remaining (15 seconds to pick a new word after elimination)
+            WORD_CHANGE_TIME_LIMIT = 30
+            word_change_time_remaining = None
+            word_change_started_at = game.get('word_change_started_at')
+            if game.get('waiting_for_word_change') and word_change_started_at:
+                elapsed = time.time() - word_change_started_at
+                word_change_time_remaining = max(0, WORD_CHANGE_TIME_LIMIT - elapsed)
             
-            save_game(code, game)
-            return self._send_json({"status": "voted", "theme_votes": game['theme_votes']})
+            response = {
+                "code": game['code'],
+                "host_id": game['host_id'],
+                "players": [],
+                "current_turn": game['current_turn'],
+                "current_player_id": current_player_id,
+                "status": game['status'],
+                "winner": game.get('winner'),
+                "history": game.get('history', []) if history is None else history,
+                "visibility": game.get('visibility', 'public'),
+                "is_ranked": bool(game.get('is_ranked', False)),
+                "spectator_count": spectator_count,
+                "theme": {
+                    "name": theme_data.get('name', ''),
+                    "words": theme_data.get('words', []),
+                },
+                "waiting_for_word_change": game.get('waiting_for_word_change'),
+                "theme_options": game.get('theme_options', []),
+                "theme_votes": theme_votes_with_names,
+                "all_words_set": all_words_set,
+                "ready_count": ready_count,
+                "is_singleplayer": game.get('is_singleplayer', False),
+                "time_control": {
+                    "initial_time": initial_time,
+                    "increment": increment,
+                },
+                "current_player_time": current_player_time,
+                "turn_started_at": turn_started_at,
+                "word_selection_time": word_selection_time,
+                "word_selection_time_remaining": word_selection_time_remaining,
+                "word_change_time_remaining": word_change_time_remaining,
+                "word_count": game.get('word_count', 100),
+                "state_version": game.get('state_version', 0),
+            }
 
-        # POST /api/games/{code}/theme - Set the theme (creator chooses)
-        if '/theme' in path and path.startswith('/api/games/') and path.count('/') == 4:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'choosing_theme':
-                return self._send_error("Theme already chosen", 400)
-            
-            chosen_theme = body.get('theme', '').strip()
-            
-            # Validate the chosen theme is one of the options
-            if chosen_theme not in game.get('theme_options', []):
-                return self._send_error("Invalid theme choice", 400)
-            
-            # Get pre-generated words for the chosen theme
-            theme = get_theme_words(chosen_theme)
+            ranked_mmr = game.get('ranked_mmr') if isinstance(game.get('ranked_mmr'), dict) else None
+            is_ranked_game = bool(game.get('is_ranked', False))
             
-            game['theme'] = {
-                "name": theme.get("name", chosen_theme),
-                "words": theme.get("words", []),
-            }
-            game['status'] = 'waiting'  # Now waiting for players
-            del game['theme_options']  # Clean up
+            for p in game['players']:
+                # Calculate this player's time remaining
+                player_time = p.get('time_remaining')
+                if player_time is not None and p['id'] == current_player_id and turn_started_at:
+                    # Current player's time is ticking
+                    elapsed = time.time() - turn_started_at
+                    player_time = max(0, player_time - elapsed)
+                
+                player_data = {
+                    "id": p['id'],
+                    "name": p['name'],
+                    "secret_word": p['secret_word'] if (p['id'] == player_id or game_finished) else None,
+                    "has_word": bool(p.get('secret_word')),
+                    "is_alive": p['is_alive'],
+                    "can_change_word": p.get('can_change_word', False) if p['id'] == player_id else None,
+                    "is_ready": p.get('is_ready', False),
+                    "cosmetics": p.get('cosmetics', {}),
+                    "is_ai": p.get('is_ai', False),
+                    "difficulty": p.get('difficulty'),
+                    "time_remaining": player_time,
+                }
+                if game_finished and is_ranked_game and ranked_mmr:
+                    mmr_entry = ranked_mmr.get(str(p.get('id')))
+                    if isinstance(mmr_entry, dict):
+                        player_data['mmr_before'] = mmr_entry.get('old')
+                        player_data['mmr'] = mmr_entry.get('new')
+                        player_data['mmr_delta'] = mmr_entry.get('delta')
+                # Include MMR display info for ranked games (during game, not just at end)
+                if is_ranked_game and not p.get('is_ai'):
+                    auth_uid = p.get('auth_user_id')
+                    if auth_uid:
+                        try:
+                            u = get_user_by_id(auth_uid)
+                            if u:
+                                u_stats = get_user_stats(u)
+                                player_data['mmr_display'] = {
+                                    'mmr': int(u_stats.get('mmr', 1000) or 1000),
+                                    'ranked_games': int(u_stats.get('ranked_games', 0) or 0),
+                                }
+                        except Exception:
+                            pass
+                if p['id'] == player_id:
+                    player_data['word_pool'] = p.get('word_pool', [])
+                    if p.get('word_change_options') is not None:
+                        player_data['word_change_options'] = p.get('word_change_options', [])
+                response['players'].append(player_data)
             
-            save_game(code, game)
-            return self._send_json({
-                "theme": game['theme'],
-            })
-
-        # POST /api/games/{code}/leave - Leave lobby / forfeit in-game
-        if '/leave' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-
-            game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-
-            player = next((p for p in game.get('players', []) if p.get('id') == player_id), None)
-            if not player:
-                return self._send_error("You are not in this game", 403)
-
-            is_ranked = bool(game.get('is_ranked', False))
-            if is_ranked:
-                token_user_id = self._get_auth_user_id()
-                if not token_user_id:
-                    return self._send_error("Ranked games require Google sign-in", 401)
-                if (player.get('auth_user_id') or '') != token_user_id:
-                    return self._send_error("Not authorized for this player", 403)
-
-            status = game.get('status')
-            is_singleplayer = bool(game.get('is_singleplayer', False))
-
-            # Singleplayer QoL: allow "soft leave" so players can go join other games and later resume.
-            # By default, leaving a singleplayer game does NOT forfeit. If the client explicitly passes
-            # {"forfeit": true}, we treat it as an intentional solo forfeit and delete the run.
-            if is_singleplayer:
-                wants_forfeit = False
-                try:
-                    if isinstance(body, dict) and 'forfeit' in body:
-                        wants_forfeit = parse_bool(body.get('forfeit', False), default=False)
-                except Exception:
-                    wants_forfeit = False
-
-                if wants_forfeit:
-                    try:
-                        delete_game(code)
-                    except Exception:
-                        pass
-                    return self._send_json({
-                        "status": "left",
-                        "forfeit": True,
-                        "deleted": True,
-                        "is_singleplayer": True,
-                        "game_status": status,
-                    })
-
-                # Soft leave: keep the game and player state intact.
-                # Best-effort refresh expiry so it survives the hop.
-                try:
-                    save_game(code, game)
-                except Exception:
-                    pass
-                return self._send_json({
-                    "status": "left",
-                    "forfeit": False,
-                    "preserved": True,
-                    "is_singleplayer": True,
-                    "game_status": status,
-                })
-
-            # Lobby / word selection: remove the player from the game
-            if status in ('waiting', 'word_selection'):
-                # Ranked fairness: once the match has progressed to word selection, leaving counts as a forfeit
-                # for MMR purposes (so remaining players' Elo/MMR still reflects the full lobby).
-                if is_ranked and status == 'word_selection':
-                    game.setdefault('history', []).append({
-                        "type": "forfeit",
-                        "player_id": player.get('id'),
-                        "player_name": player.get('name'),
-                        "word": player.get('secret_word'),
-                    })
+            return self._apply_history_cursor(response, game, history_since, history)
+        except Exception as e:
+            print(f"Error building game response: {e}")
+            return None
 
-                game['players'] = [p for p in game.get('players', []) if p.get('id') != player_id]
+    def _apply_history_cursor(self, response: dict, game: dict, history_since: int = None,
+                              history: list = None) -> dict:
+        """
+        Add history_len to a view and, for a client that already holds the
+        first history_since history entries, cut the view down to what changed.
 
-                # Clear any pause flags just in case
-                if game.get('waiting_for_word_change') == player_id:
-                    game['waiting_for_word_change'] = None
+        Incremental views ("delta": true) carry only the entries from
+        history_since on - history, if given, is that tail already (see
+        load_game_since). Once there is any history the theme word list,
+        theme votes and word pools are settled, so those are left out as
+        well and the client keeps its copies. Turn, clocks, alive flags and
+        the other per-player fields are always sent.
 
-                # Reassign host if needed
-                if game.get('host_id') == player_id:
-                    game['host_id'] = game['players'][0]['id'] if game.get('players') else ''
+        A cursor past the end of the history (stale client) gets the full view.
+        """
+        history_len = _history_length(game)
+        response['history_len'] = history_len
+        if history_since is None or history_since > history_len:
+            return response
+        if history is None:
+            response['history'] = response['history'][history_since:]
+        response['delta'] = True
+        response['history_since'] = history_since
+        if history_since > 0:
+            response['theme'].pop('words', None)
+            response.pop('theme_options', None)
+            response.pop('theme_votes', None)
+            for player_data in response['players']:
+                player_data.pop('word_pool', None)
+        return response
 
-                if not game.get('players'):
-                    # Delete empty game
-                    try:
-                        delete_game(code)
-                    except Exception:
-                        pass
-                    return self._send_json({"status": "left", "deleted": True})
+    def do_OPTIONS(self):
+        self.send_response(200)
+        cors_origin = self._get_cors_origin()
+        if cors_origin:
+            self.send_header('Access-Control-Allow-Origin', cors_origin)
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        # Allow Authorization so authenticated requests work cross-origin if needed,
+        # and If-None-Match for conditional game polls.
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, If-None-Match')
+        self.send_header('Access-Control-Allow-Credentials', 'true')
+        self.send_header('Access-Control-Max-Age', '86400')
+        self.end_headers()
 
-                # Ranked: if someone forfeits during word selection and only one player remains,
-                # finish immediately so the remaining player still gets the win/MMR.
-                if is_ranked and status == 'word_selection':
-                    alive_players = [p for p in game.get('players', []) if p.get('is_alive', True)]
-                    if len(alive_players) <= 1:
-                        game['status'] = 'finished'
-                        game['waiting_for_word_change'] = None
-                        game['winner'] = alive_players[0]['id'] if alive_players else None
-                        update_game_stats(game)
-                        save_game(code, game)
-                        return self._send_json({
-                            "status": "left",
-                            "forfeit": True,
-                            "game_over": True,
-                            "winner": game.get('winner'),
-                        })
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        query = {}
+        if '?' in self.path:
+            query_string = self.path.split('?', 1)[1]
+            # Properly URL-decode query params (important for OAuth `code` param)
+            query = dict(urllib.parse.parse_qsl(query_string, keep_blank_values=True))
+        return self._dispatch('GET', path, query)
+
+    # ============== CLIENT CONFIG ==============
+    # GET /api/client-config - Lightweight config the frontend can use (audio, etc.)
+    @ROUTES.get('/api/client-config')
+    def _handle_get_client_config(self, query: dict, client_ip: str):
+        bgm_cfg = (CONFIG.get('audio', {}) or {}).get('background_music', {}) or {}
+        sfx_cfg = (CONFIG.get('audio', {}) or {}).get('sfx', {}) or {}
+        enabled = bool(bgm_cfg.get('enabled', True))
+        track = str(bgm_cfg.get('track', '/manwithaplan.mp3') or '/manwithaplan.mp3')
+        volume_raw = bgm_cfg.get('volume', 0.12)
+        try:
+            volume = float(volume_raw)
+        except Exception:
+            volume = 0.12
+        volume = max(0.0, min(1.0, volume))
+        return self._send_json({
+            "audio": {
+                "background_music": {
+                    "enabled": enabled,
+                    "track": track,
+                    "volume": volume,
+                },
+                # Placeholder for future asset-based SFX (frontend currently uses WebAudio tones).
+                "sfx": sfx_cfg,
+            }
+        })
+
+    # ============== DEBUG (ADMIN ONLY) ==============
+    # GET /api/debug/chat-error?id=cd8a9e33
+    @ROUTES.get('/api/debug/chat-error')
+    def _handle_get_debug_chat_error(self, query: dict, client_ip: str):
+        if not self._debug_allowed():
+            return self._send_error("Not authorized", 403)
+        error_id = str(query.get('id', '') or query.get('error_id', '') or '').strip().lower()
+        if not re.match(r'^[a-f0-9]{8}$', error_id):
+            return self._send_error("Invalid error id", 400)
+        try:
+            redis = get_redis()
+            raw = redis.get(f"debug:chat_error:{error_id}")
+        except Exception:
+            raw = None
+        if not raw:
+            return self._send_error("Not found", 404)
+        if isinstance(raw, bytes):
+            try:
+                raw = raw.decode()
+            except Exception:
+                raw = str(raw)
+        try:
+            data = json.loads(raw)
+        except Exception:
+            data = {"raw": str(raw)}
+        return self._send_json({
+            "error_id": error_id,
+            "debug": data,
+        })
+
+    # ============== AUTH ENDPOINTS ==============
+
+    # GET /api/auth/google - Redirect to Google OAuth
+    @ROUTES.get('/api/auth/google')
+    def _handle_get_auth_google(self, query: dict, client_ip: str):
+        if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
+            return self._send_error("OAuth not configured", 500)
+        
+        # Compute redirect URI for THIS request origin and persist it in a short-lived state
+        request_base = get_request_base_url(self.headers)
+        redirect_uri = os.getenv('OAUTH_REDIRECT_URI') or f"{request_base}/api/auth/callback"
 
-                save_game(code, game)
-                resp = {"status": "left", "deleted": False, "host_id": game.get('host_id')}
-                if is_ranked and status == 'word_selection':
-                    resp["forfeit"] = True
-                return self._send_json(resp)
+        state = None
+        try:
+            state = secrets.token_urlsafe(24)
+            get_redis().setex(
+                f"oauth_state:{state}",
+                OAUTH_STATE_TTL_SECONDS,
+                json.dumps({
+                    "redirect_uri": redirect_uri,
+                    "return_to": request_base,
+                    "created_at": int(time.time()),
+                }),
+            )
+        except Exception as e:
+            print(f"OAuth state store failed: {e}")
+            state = None
 
-            # In-game: forfeit => mark eliminated, advance turn if needed
-            if status == 'playing':
-                if not player.get('is_alive', True):
-                    return self._send_json({"status": "left", "forfeit": True, "already_eliminated": True})
+        params = {
+            'client_id': GOOGLE_CLIENT_ID,
+            'redirect_uri': redirect_uri,
+            'response_type': 'code',
+            'scope': 'openid email profile',
+            'access_type': 'offline',
+            'prompt': 'consent',
+        }
+        if state:
+            params['state'] = state
+        auth_url = f"{GOOGLE_AUTH_URL}?{urllib.parse.urlencode(params)}"
+        
+        self.send_response(302)
+        self.send_header('Location', auth_url)
+        self.end_headers()
+        return
 
-                player['is_alive'] = False
+    # GET /api/auth/callback - Handle OAuth callback
+    @ROUTES.get('/api/auth/callback')
+    def _handle_get_auth_callback(self, query: dict, client_ip: str):
+        import requests  # only this route talks to Google directly
+        code = query.get('code', '')
+        error = query.get('error', '')
+        state = query.get('state', '')
+
+        # Helper to redirect back to frontend with error/success params
+        def _redirect_frontend(params: dict, return_to: str = ''):
+            qs = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None and v != ''})
+            # SECURITY: Validate return_to against allowed origins to prevent open redirect
+            if return_to:
+                valid_return = False
+                for allowed in ALLOWED_ORIGINS:
+                    if return_to.startswith(allowed):
+                        valid_return = True
+                        break
+                # Also allow localhost in dev mode
+                if DEV_MODE and return_to.startswith('http://localhost:'):
+                    valid_return = True
+                if not valid_return:
+                    print(f"[SECURITY] OAuth callback: rejecting untrusted return_to URL: {return_to[:100]}")
+                    return_to = ''  # Fall back to relative redirect
+            
+            if return_to:
+                target = return_to.rstrip('/') + '/?' + qs
+            else:
+                target = '/?' + qs
+            self.send_response(302)
+            self.send_header('Location', target)
+            self.end_headers()
 
-                # If they were the blocker for word change, unblock the game.
-                if game.get('waiting_for_word_change') == player_id:
-                    game['waiting_for_word_change'] = None
-                    # They can no longer change word (they left)
-                    player['can_change_word'] = False
-                    player.pop('word_change_options', None)
+        # SECURITY: State parameter is MANDATORY to prevent CSRF attacks
+        if not state:
+            print("[SECURITY] OAuth callback: missing state parameter")
+            return _redirect_frontend({'auth_error': 'missing_state'})
 
-                # Record forfeit in history (used for ranked placement ordering)
-                game.setdefault('history', []).append({
-                    "type": "forfeit",
-                    "player_id": player.get('id'),
-                    "player_name": player.get('name'),
-                    # Reveal the forfeiter's word so other players can see it immediately.
-                    # (Normal eliminations already reveal via the guessed word in history.)
-                    "word": player.get('secret_word'),
-                })
+        # Validate and consume the state token (single-use)
+        redirect_uri = get_oauth_redirect_uri()
+        return_to = ''
+        try:
+            redis = get_redis()
+            raw = redis.get(f"oauth_state:{state}")
+            if not raw:
+                print(f"[SECURITY] OAuth callback: invalid or expired state token")
+                return _redirect_frontend({'auth_error': 'invalid_state'})
+            data = json.loads(raw)
+            redirect_uri = data.get('redirect_uri') or redirect_uri
+            return_to = data.get('return_to') or ''
+            # SECURITY: Delete state immediately (single-use token)
+            redis.delete(f"oauth_state:{state}")
+        except Exception as e:
+            print(f"[SECURITY] OAuth state validation failed: {e}")
+            return _redirect_frontend({'auth_error': 'state_validation_failed'})
+        
+        if error:
+            return _redirect_frontend({
+                'auth_error': error,
+                'auth_error_description': query.get('error_description', ''),
+            }, return_to)
+        
+        if not code:
+            return _redirect_frontend({'auth_error': 'no_code'}, return_to)
+        
+        try:
+            if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
+                return _redirect_frontend({'auth_error': 'oauth_not_configured'}, return_to)
 
-                # If it was their turn, advance to next alive player
+            # Exchange code for tokens
+            token_response = requests.post(GOOGLE_TOKEN_URL, data={
+                'client_id': GOOGLE_CLIENT_ID,
+                'client_secret': GOOGLE_CLIENT_SECRET,
+                'code': code,
+                'grant_type': 'authorization_code',
+                'redirect_uri': redirect_uri,
+            }, timeout=10)
+            
+            if not token_response.ok:
+                print(f"Token exchange failed: {token_response.status_code} - {token_response.text}")
+                print(f"Redirect URI used: {redirect_uri}")
+                google_error = ''
+                google_error_description = ''
                 try:
-                    current = game.get('players', [])[game.get('current_turn', 0)]
+                    err = token_response.json()
+                    google_error = err.get('error', '')
+                    google_error_description = err.get('error_description', '')
                 except Exception:
-                    current = None
-
-                alive_players = [p for p in game.get('players', []) if p.get('is_alive')]
-                if len(alive_players) <= 1:
-                    game['status'] = 'finished'
-                    game['waiting_for_word_change'] = None
-                    game['winner'] = alive_players[0]['id'] if alive_players else None
-                    update_game_stats(game)
-                    save_game(code, game)
-                    return self._send_json({
-                        "status": "left",
-                        "forfeit": True,
-                        "game_over": True,
-                        "winner": game.get('winner'),
-                    })
+                    pass
+                return _redirect_frontend({
+                    'auth_error': 'token_exchange_failed',
+                    'auth_error_status': str(token_response.status_code),
+                    'google_error': google_error,
+                    'google_error_description': google_error_description,
+                }, return_to)
+            
+            tokens = token_response.json()
+            access_token = tokens.get('access_token')
+            
+            # Get user info from Google
+            userinfo_response = requests.get(
+                GOOGLE_USERINFO_URL,
+                headers={'Authorization': f'Bearer {access_token}'}
+                , timeout=10
+            )
+            
+            if not userinfo_response.ok:
+                print(f"User info failed: {userinfo_response.text}")
+                return _redirect_frontend({
+                    'auth_error': 'userinfo_failed',
+                    'auth_error_status': str(userinfo_response.status_code),
+                }, return_to)
+            
+            google_user = userinfo_response.json()
+            
+            # Create or get user
+            user = get_or_create_user(google_user)
+            
+            # Create JWT token
+            jwt_token = create_jwt_token(user)
+            
+            # Redirect to frontend with token
+            return _redirect_frontend({'auth_token': jwt_token}, return_to)
+            
+        except Exception as e:
+            print(f"OAuth callback error: {e}")
+            return _redirect_frontend({'auth_error': 'callback_failed'}, return_to)
 
-                if current and current.get('id') == player_id:
-                    num_players = len(game.get('players', []))
-                    next_turn = (int(game.get('current_turn', 0)) + 1) % max(1, num_players)
-                    # Skip eliminated players
-                    while num_players > 0 and not game['players'][next_turn].get('is_alive'):
-                        next_turn = (next_turn + 1) % num_players
-                    game['current_turn'] = next_turn
+    # GET /api/auth/me - Get current user info
+    @ROUTES.get('/api/auth/me')
+    def _handle_get_auth_me(self, query: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
+        
+        token = auth_header[7:]  # Remove 'Bearer ' prefix
+        payload = verify_jwt_token(token)
+        
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
+        
+        user = get_user_by_id(payload['sub'])
+        if not user:
+            return self._send_error("User not found", 404)
+        
+        username = user.get('username')
+        
+        return self._send_json({
+            'id': user['id'],
+            'name': user['name'],
+            'username': username,
+            'needs_username': username is None,  # True if user hasn't set a username yet
+            'email': user.get('email', ''),
+            'stats': get_user_stats(user),
+            'is_donor': user.get('is_donor', False),
+            'is_admin': user.get('is_admin', False),
+            'cosmetics': get_user_cosmetics(user),
+        })
+
+    # GET /api/cosmetics - Get cosmetics catalog
+    @ROUTES.get('/api/cosmetics')
+    def _handle_get_cosmetics(self, query: dict, client_ip: str):
+        return self._send_json({
+            "catalog": COSMETICS_CATALOG,
+            "paywall_enabled": COSMETICS_PAYWALL_ENABLED,
+            "unlock_all": COSMETICS_UNLOCK_ALL,
+        })
+
+    # GET /api/user/cosmetics - Get current user's cosmetics
+    @ROUTES.get('/api/user/cosmetics')
+    def _handle_get_user_cosmetics(self, query: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
+        
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
+        
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
+        
+        user = get_user_by_id(payload['sub'])
+        if not user:
+            return self._send_error("User not found", 404)
+        
+        econ = ensure_user_economy(user, persist=False)
+        
+        return self._send_json({
+            'is_donor': user.get('is_donor', False),
+            'is_admin': user.get('is_admin', False),
+            'cosmetics': get_user_cosmetics(user, persist_changes=False),
+            'owned_cosmetics': econ.get('owned_cosmetics') or {},
+            'paywall_enabled': COSMETICS_PAYWALL_ENABLED,
+            'unlock_all': COSMETICS_UNLOCK_ALL,
+        })
+
+    # GET /api/user/daily - Get daily quests + weekly quests + currency + owned cosmetics + streak
+    @ROUTES.get('/api/user/daily')
+    def _handle_get_user_daily(self, query: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
 
-                save_game(code, game)
-                return self._send_json({
-                    "status": "left",
-                    "forfeit": True,
-                    "game_over": False,
-                })
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
 
-            # Finished/unknown status: just acknowledge
-            return self._send_json({"status": "left", "forfeit": False, "game_status": status})
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
 
-        # POST /api/games/{code}/chat - Send a chat message (lobby or in-game)
-        if '/chat' in path and path.startswith('/api/games/'):
-            try:
-                code = sanitize_game_code(path.split('/')[3])
-                if not code:
-                    return self._send_error("Invalid game code format", 400)
+        user = get_user_by_id(payload.get('sub', ''))
+        if not user:
+            return self._send_error("User not found", 404)
+
+        econ = ensure_user_economy(user, persist=True)
+        daily_state = ensure_daily_quests_today(user, persist=True)
+        weekly_quests = ensure_weekly_quests(user, persist=True)
+        # Check/update streak
+        streak_result = check_and_update_streak(user, persist=True)
+        streak_info = get_next_streak_info(streak_result['streak'].get('streak_count', 0))
+
+        return self._send_json({
+            "date": daily_state.get("date", ""),
+            "quests": daily_state.get("quests", []),
+            "weekly_quests": weekly_quests,
+            "wallet": user.get('wallet') or {"credits": 0},  # Use updated wallet with streak credits
+            "owned_cosmetics": econ.get("owned_cosmetics") or {},
+            "streak": streak_result['streak'],
+            "streak_credits_earned": streak_result['credits_earned'],
+            "streak_milestone_bonus": streak_result['milestone_bonus'],
+            "streak_broken": streak_result['streak_broken'],
+            "streak_info": streak_info,
+        })
+
+    # GET /api/queue/counts - Get current queue sizes (no auth required)
+    @ROUTES.get('/api/queue/counts')
+    def _handle_get_queue_counts(self, query: dict, client_ip: str):
+        try:
+            redis = get_redis()
+            quick_play_count = redis.zcard(_queue_key("quick_play")) or 0
+            ranked_count = redis.zcard(_queue_key("ranked")) or 0
+            return self._send_json({
+                "quick_play": int(quick_play_count),
+                "ranked": int(ranked_count),
+            })
+        except Exception as e:
+            print(f"[QUEUE] Error getting counts: {e}")
+            return self._send_json({"quick_play": 0, "ranked": 0})
+
+    # GET /api/queue/status - Get queue status and check for matches
+    @ROUTES.get('/api/queue/status')
+    def _handle_get_queue_status(self, query: dict, client_ip: str):
+        mode = (query.get('mode', '') or '').strip().lower()
+        player_id = (query.get('player_id', '') or '').strip()
+        
+        if mode not in ('quick_play', 'ranked'):
+            return self._send_error("Invalid mode. Use 'quick_play' or 'ranked'", 400)
+        
+        if not player_id:
+            return self._send_error("player_id required", 400)
+        
+        # Validate player_id format
+        validated_id = sanitize_player_id(player_id)
+        if not validated_id:
+            return self._send_error("Invalid player_id format", 400)
+        
+        status = get_queue_status(mode, validated_id)
+        return self._send_json(status)
+
+    # GET /api/lobbies - List open lobbies
+    @ROUTES.get('/api/lobbies')
+    def _handle_get_lobbies(self, query: dict, client_ip: str):
+        # Rate limit: 30/min for lobby listing
+        if not check_rate_limit(get_ratelimit_general(), f"lobbies:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
+        try:
+            lobbies = []
 
-                # SECURITY: Validate player session token
-                player_id, session_error = self._validate_player_session(body, code)
-                if session_error:
-                    return self._send_error(session_error, 403)
+            # Optional filter: ?mode=ranked|unranked
+            mode = (query.get('mode', '') or '').strip().lower()
+            want_ranked = None
+            if mode == 'ranked':
+                want_ranked = True
+            elif mode == 'unranked':
+                want_ranked = False
+            
+            # Index only holds public, non-singleplayer, unexpired games
+            for summary in get_indexed_games():
+                is_ranked = bool(summary.get('is_ranked', False))
 
-                # Rate limit: 20 messages/min per player (best-effort)
-                if not check_rate_limit(get_ratelimit_chat(), f"{code}:{player_id}"):
-                    return self._send_error("Too many messages. Please wait.", 429)
+                # Optional ranked/unranked filter
+                if want_ranked is not None and is_ranked != want_ranked:
+                    continue
 
-                game = load_game(code)
-                if not game:
-                    return self._send_error("Game not found", 404)
-
-                # Must be a participant (no spectator chat for now)
-                player = next((p for p in game.get('players', []) if p.get('id') == player_id), None)
-                if not player:
-                    return self._send_error("You are not in this game", 403)
-
-                message = body.get('message', body.get('text', ''))
-                if not isinstance(message, str):
-                    return self._send_error("Invalid message", 400)
-                # Normalize and bound
-                message = message.strip()
-                if not message:
-                    return self._send_error("Message cannot be empty", 400)
-                message = message[:200]
-                # Drop control chars
-                message = re.sub(r"[\x00-\x1F\x7F]", "", message)
-                # Profanity filter (mask)
-                message = filter_profanity(message)
+                # Only show waiting lobbies that aren't full
+                if summary.get('status') == 'waiting' and summary.get('player_count', 0) < MAX_PLAYERS:
+                    lobbies.append({
+                        "code": summary['code'],
+                        "player_count": summary.get('player_count', 0),
+                        "max_players": MAX_PLAYERS,
+                        "theme_options": summary.get('theme_options', []),
+                        "winning_theme": summary.get('winning_theme'),
+                        "visibility": 'public',
+                        "is_ranked": is_ranked,
+                    })
+            return self._send_json({"lobbies": lobbies})
+        except Exception as e:
+            print(f"Error loading lobbies: {e}")  # Log server-side only
+            return self._send_error("Failed to load lobbies. Please try again.", 500)
+
+    # GET /api/spectateable - List public, non-finished multiplayer games that can be spectated
+    @ROUTES.get('/api/spectateable')
+    def _handle_get_spectateable(self, query: dict, client_ip: str):
+        # Rate limit: 30/min for listing
+        if not check_rate_limit(get_ratelimit_general(), f"spectateable:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
+        try:
+            # Index only holds public, non-singleplayer, unfinished, unexpired games
+            summaries = [g for g in get_indexed_games() if g.get('code')]
+
+            # Sort: playing first, then word_selection, then waiting; then by player count desc
+            order = {"playing": 0, "word_selection": 1, "waiting": 2}
+            summaries.sort(key=lambda g: (order.get(g.get("status", ""), 9), -(g.get("player_count", 0) or 0), g.get("code", "")))
+            summaries = summaries[:100]
+
+            spectator_counts = get_active_spectator_counts([g['code'] for g in summaries])
+            games = [{
+                "code": g['code'],
+                "status": g.get('status', ''),
+                "player_count": g.get('player_count', 0),
+                "max_players": MAX_PLAYERS,
+                "is_ranked": bool(g.get('is_ranked', False)),
+                "spectator_count": spectator_counts.get(g['code'], 0),
+            } for g in summaries]
+
+            return self._send_json({"games": games})
+        except Exception as e:
+            print(f"Error loading spectateable games: {e}")
+            return self._send_error("Failed to load games. Please try again.", 500)
+
+    # GET /api/leaderboard
+    @ROUTES.get('/api/leaderboard')
+    def _handle_get_leaderboard(self, query: dict, client_ip: str):
+        # Rate limit: 30/min for leaderboard
+        if not check_rate_limit(get_ratelimit_general(), f"leaderboard:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
+        
+        # Support ?type=weekly or ?type=alltime (default)
+        leaderboard_type = query.get('type', 'alltime')
+        if leaderboard_type not in ('alltime', 'weekly'):
+            leaderboard_type = 'alltime'
+        
+        players = get_leaderboard(leaderboard_type)
+        return self._send_json({
+            "players": players,
+            "type": leaderboard_type,
+            "week": get_weekly_leaderboard_key() if leaderboard_type == 'weekly' else None,
+        })
+
+    # GET /api/leaderboard/ranked - Ranked MMR leaderboard (Google users)
+    @ROUTES.get('/api/leaderboard/ranked')
+    def _handle_get_leaderboard_ranked(self, query: dict, client_ip: str):
+        # Rate limit: 30/min for leaderboard
+        if not check_rate_limit(get_ratelimit_general(), f"leaderboard_ranked:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
 
-                redis = get_redis()
-                chat_key = f"chat:{code}"
+        redis = get_redis()
+        try:
+            data = redis.zrevrange("leaderboard:mmr", 0, 99, withscores=True) or []
+        except Exception:
+            data = []
 
-                # Monotonic message id (fallback to timestamp if INCR unavailable)
-                msg_id = None
+        players = []
+        rank = 1
+        for uid, score in data:
+            if isinstance(uid, bytes):
                 try:
-                    msg_id = int(redis.incr(f"chat:{code}:id"))
+                    uid = uid.decode()
                 except Exception:
-                    msg_id = int(time.time() * 1000)
-                # Ensure monotonic vs any fallback-stored messages on the game object
+                    continue
+            
+            # Skip non-Google authenticated users (bots, etc.)
+            if not uid.startswith('google_'):
+                continue
+            
+            try:
+                mmr = int(score)
+            except Exception:
                 try:
-                    last_game_id = int(game.get('chat_last_id', 0) or 0)
+                    mmr = int(float(score))
                 except Exception:
-                    last_game_id = 0
-                if msg_id <= last_game_id:
-                    msg_id = last_game_id + 1
-
-                payload = {
-                    "id": msg_id,
-                    "ts": int(time.time() * 1000),
-                    "sender_id": player_id,
-                    "sender_name": player.get('name', ''),
-                    "text": message,
-                }
+                    mmr = 0
 
-                try:
-                    redis.zadd(chat_key, {json.dumps(payload): msg_id})
-                    # Best-effort trim to last 200 messages
-                    try:
-                        redis.zremrangebyrank(chat_key, 0, -201)
-                    except Exception:
-                        pass
-                    # Best-effort keep chat aligned with game expiry
+            user = get_user_by_id(uid)
+            if not user:
+                continue
+            stats = get_user_stats(user)
+            
+            # Filter out unplaced players (must complete placement games to appear on leaderboard)
+            ranked_games = int(stats.get('ranked_games', 0) or 0)
+            if ranked_games < RANKED_PLACEMENT_GAMES:
+                continue
+            
+            players.append({
+                "rank": rank,
+                "id": user.get('id'),
+                "name": get_user_display_name(user),
+                "mmr": int(stats.get('mmr', mmr) or mmr),
+                "peak_mmr": int(stats.get('peak_mmr', mmr) or mmr),
+                "ranked_games": ranked_games,
+                "ranked_wins": int(stats.get('ranked_wins', 0) or 0),
+                "ranked_losses": int(stats.get('ranked_losses', 0) or 0),
+            })
+            rank += 1
+
+        return self._send_json({
+            "players": players,
+            "type": "ranked",
+        })
+
+    # GET /api/profile/:name - Get player profile and stats
+    @ROUTES.get('/api/profile/{player_name}')
+    def _handle_get_profile(self, query: dict, client_ip: str, player_name: str):
+        # Rate limit: 30/min for profile lookups
+        if not check_rate_limit(get_ratelimit_general(), f"profile:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
+        
+        if not player_name:
+            return self._send_error("Player name required", 400)
+        
+        # URL decode the name
+        player_name = urllib.parse.unquote(player_name)
+        
+        # Get casual stats by name
+        stats = get_player_stats(player_name)
+        
+        # Check if this player has a linked Google account
+        redis = get_redis()
+        user_data = None
+        ranked_stats = None
+        created_at = None
+        
+        # If the requester is authenticated, check if they're viewing their own profile
+        auth_header = self.headers.get('Authorization', '')
+        requesting_user_id = None
+        if auth_header.startswith('Bearer '):
+            token = auth_header[7:]
+            payload = verify_jwt_token(token)
+            if payload:
+                requesting_user_id = payload.get('sub')
+                # Check if the authenticated user's name matches the profile being viewed
+                auth_user = get_user_by_id(requesting_user_id)
+                if auth_user and auth_user.get('name', '').lower() == player_name.lower():
+                    user_data = auth_user
+        
+        # If not found via auth name match, check player stats for linked auth_user_id
+        if not user_data:
+            auth_user_id = stats.get('auth_user_id')
+            if auth_user_id:
+                user_data = get_user_by_id(auth_user_id)
+        
+        # Fallback: search for a Google user with matching name
+        if not user_data:
+            all_user_ids = redis.smembers('users:all') or []
+            for uid in all_user_ids:
+                if isinstance(uid, bytes):
                     try:
-                        redis.expire(chat_key, GAME_EXPIRY_SECONDS)
+                        uid = uid.decode()
                     except Exception:
-                        pass
-                except Exception as e:
-                    err_id = secrets.token_hex(4)
-                    print(f"Chat write error [{err_id}]: {e}")
-                    # Fallback: store chat messages on the game object (uses setex, which is already used everywhere).
-                    try:
-                        msgs = game.get('chat_messages', [])
-                        if not isinstance(msgs, list):
-                            msgs = []
-                        msgs.append(payload)
-                        if len(msgs) > 200:
-                            msgs = msgs[-200:]
-                        game['chat_messages'] = msgs
-                        # Track last id for monotonicity on subsequent fallback writes
-                        try:
-                            prev = int(game.get('chat_last_id', 0) or 0)
-                        except Exception:
-                            prev = 0
-                        game['chat_last_id'] = max(prev, msg_id)
-                        save_game(code, game)
-                    except Exception as e2:
-                        err2_id = secrets.token_hex(4)
-                        print(f"Chat fallback write error [{err2_id}]: {e2}")
-                        resp = {
-                            "detail": "Failed to send message. Please try again.",
-                            "error_id": err2_id,
-                            "error_code": "CHAT_FALLBACK_WRITE_ERROR",
-                        }
-                        debug_payload = {
-                            "where": "chat_fallback_write",
-                            "type": type(e2).__name__,
-                            "error": str(e2)[:500],
-                        }
-                        # Always store server-side so we can retrieve by error_id later (admin/debug endpoint).
-                        try:
-                            redis.setex(
-                                f"debug:chat_error:{err2_id}",
-                                DEBUG_ERROR_TTL_SECONDS,
-                                json.dumps(debug_payload),
-                            )
-                        except Exception:
-                            pass
-                        # Optionally attach debug to response for admin/debug clients
-                        if self._debug_allowed():
-                            resp["debug"] = debug_payload
-                        return self._send_json(resp, 500)
-
-                return self._send_json({"message": payload})
-            except Exception as e:
-                err_id = secrets.token_hex(4)
-                print(f"Chat handler error [{err_id}]: {e}")
-                resp = {
-                    "detail": "Failed to send message. Please try again.",
-                    "error_id": err_id,
-                    "error_code": "CHAT_HANDLER_ERROR",
-                }
-                import traceback
-                debug_payload = {
-                    "where": "chat_handler",
-                    "type": type(e).__name__,
-                    "error": str(e)[:500],
-                    "trace": traceback.format_exc(limit=8),
+                        continue
+                user = get_user_by_id(uid)
+                if user and user.get('name', '').lower() == player_name.lower():
+                    user_data = user
+                    break
+        
+        # Get created_at and ranked stats from user if found
+        if user_data:
+            created_at = user_data.get('created_at')
+            u_stats = get_user_stats(user_data)
+            if u_stats.get('ranked_games', 0) > 0:
+                ranked_stats = {
+                    "mmr": int(u_stats.get('mmr', 1000) or 1000),
+                    "peak_mmr": int(u_stats.get('peak_mmr', 1000) or 1000),
+                    "ranked_games": int(u_stats.get('ranked_games', 0) or 0),
+                    "ranked_wins": int(u_stats.get('ranked_wins', 0) or 0),
+                    "ranked_losses": int(u_stats.get('ranked_losses', 0) or 0),
                 }
-                # Always store server-side so we can retrieve by error_id later (admin/debug endpoint).
+        
+        # Calculate win rate
+        games = stats.get('games_played', 0)
+        wins = stats.get('wins', 0)
+        win_rate = round((wins / games * 100), 1) if games > 0 else 0
+        
+        # Get cosmetics from user if available
+        cosmetics = None
+        badge = None
+        custom_avatar = None
+        if user_data:
+            cosmetics = user_data.get('cosmetics', {})
+            badge = cosmetics.get('badge') if cosmetics.get('badge') != 'none' else None
+            # Check for custom emoji avatar
+            profile_avatar = cosmetics.get('profile_avatar', 'default')
+            if profile_avatar and profile_avatar != 'default':
+                # Load avatar icon from cosmetics catalog
                 try:
-                    redis = get_redis()
-                    redis.setex(
-                        f"debug:chat_error:{err_id}",
-                        DEBUG_ERROR_TTL_SECONDS,
-                        json.dumps(debug_payload),
-                    )
+                    with open(os.path.join(os.path.dirname(__file__), 'cosmetics.json'), 'r') as f:
+                        catalog = json.load(f)
+                    avatar_data = catalog.get('profile_avatars', {}).get(profile_avatar, {})
+                    custom_avatar = avatar_data.get('icon', '')
                 except Exception:
                     pass
-                # Optionally attach debug to response for admin/debug clients
-                if self._debug_allowed():
-                    resp["debug"] = debug_payload
-                return self._send_json(resp, 500)
-
-        # POST /api/games/{code}/join - Join lobby (just name, no word yet)
-        if '/join' in path and '/set-word' not in path:
-            # Rate limit: 10 joins/min per IP
-            if not check_rate_limit(get_ratelimit_join(), client_ip):
-                return self._send_error("Too many join attempts. Please wait.", 429)
-            
-            code = sanitize_game_code(path.split('/')[3])
+        
+        return self._send_json({
+            "name": stats.get('name', player_name),
+            "wins": wins,
+            "games_played": games,
+            "win_rate": win_rate,
+            "eliminations": stats.get('eliminations', 0),
+            "times_eliminated": stats.get('times_eliminated', 0),
+            "best_streak": stats.get('best_streak', 0),
+            "created_at": created_at,  # None if not a Google user
+            "has_google_account": user_data is not None,
+            "custom_avatar": custom_avatar,  # Emoji avatar
+            "badge": badge,
+            "cosmetics": cosmetics,
+            "ranked": ranked_stats,
+        })
+
+    # GET /api/games/{code}/theme - Get theme for a game (before joining)
+    @ROUTES.get('/api/games/{code}/theme')
+    def _handle_get_game_theme(self, query: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code, with_history=False)
+        if not game:
+            return self._send_error("Game not found", 404)
+        
+        import random
+        
+        # Get all theme words and ALL words already in any player's pool
+        all_theme_words = game.get('theme', {}).get('words', [])
+        assigned_words = set()
+        for p in game['players']:
+            # Exclude ALL words from existing players' pools
+            assigned_words.update(w.lower() for w in p.get('word_pool', []))
+        
+        # Available words = all words not yet in any player's pool
+        available_words = [w for w in all_theme_words if w.lower() not in assigned_words]
+        
+        # Give the next player a random pool from available (unassigned) words
+        if len(available_words) >= WORDS_PER_PLAYER:
+            next_player_pool = random.sample(available_words, WORDS_PER_PLAYER)
+        else:
+            next_player_pool = available_words
+        
+        return self._send_json({
+            "theme": {
+                "name": game.get('theme', {}).get('name', ''),
+                "words": all_theme_words,  # Full list for reference during game
+            },
+            "word_pool": sorted(next_player_pool),  # This player's available words (sorted for display)
+        })
+
+    # GET /api/games/{code}/wait - Long-poll: hold until the state version moves
+    @ROUTES.get('/api/games/{code}/wait')
+    def _handle_get_game_wait(self, query: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        player_id = sanitize_player_id(query.get('player_id', ''))
+        if not player_id:
+            return self._send_error("Invalid player ID format", 400)
+        
+        since = str(query.get('since_version', '') or '')
+        since_version = int(since) if since.isdigit() else None
+        try:
+            timeout = float(query.get('timeout', LONG_POLL_MAX_SECONDS))
+        except (TypeError, ValueError):
+            return self._send_error("Invalid timeout", 400)
+        timeout = max(0.0, min(LONG_POLL_MAX_SECONDS, timeout))
+        history_since = self._cursor_param(query.get('history_since'))
+        
+        # Membership and the version check don't need the history
+        game = load_game(code, with_history=False)
+        if not game:
+            return self._send_error("Game not found", 404)
+        if not any(p['id'] == player_id for p in game['players']):
+            return self._send_error("You are not in this game", 403)
+        
+        touch_presence(code, "players", player_id)
+        game = self._advance_bots_on_poll(code, game)
+        
+        # Only wait if the client is already up to date
+        if since_version is not None and game.get('state_version', 0) == since_version:
+            if not wait_for_game_version(code, since_version, timeout):
+                return self._send_json(
+                    {"unchanged": True, "state_version": since_version},
+                    headers={'ETag': game_state_etag(since_version)},
+                )
+        
+        game, history = self._load_game_view(code, history_since)
+        if not game:
+            return self._send_error("Game not found", 404)
+        if history is None:
+            game = self._advance_bots_on_poll(code, game)
+        
+        response = self._build_game_response(game, player_id, code,
+                                             history_since=history_since, history=history)
+        if response is None:
+            return self._send_error("Failed to load game. Please try again.", 500)
+        return self._send_json(response, headers={'ETag': game_state_etag(response['state_version'])})
+
+    # GET /api/games/{code}/events - Server-Sent Events stream (players or spectators)
+    @ROUTES.get('/api/games/{code}/events', stream=True)
+    def _handle_get_game_events(self, query: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        player_id = None
+        if query.get('player_id'):
+            player_id = sanitize_player_id(query.get('player_id', ''))
+            if not player_id:
+                return self._send_error("Invalid player ID format", 400)
+        spectator_id = None if player_id else sanitize_player_id(query.get('spectator_id', ''))
+        
+        game = load_game(code, with_history=False)
+        if not game:
+            return self._send_error("Game not found", 404)
+        if player_id and not any(p['id'] == player_id for p in game['players']):
+            return self._send_error("You are not in this game", 403)
+        
+        # EventSource resends the last id as a header; ?last_event_id= is for manual reconnects
+        last_id = self.headers.get('Last-Event-ID') or query.get('last_event_id')
+        return self._stream_game_events(code, player_id, spectator_id,
+                                        last_id if is_event_id(last_id) else None)
+
+    # GET /api/games/{code}/spectate - Spectator view (no player_id required)
+    @ROUTES.get('/api/games/{code}/spectate')
+    def _handle_get_game_spectate(self, query: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        # Spectator presence heartbeat + count (best-effort), plus the version
+        # side key for conditional polls - one round trip
+        presence = redis_batch()
+        spectator_id = sanitize_player_id(query.get('spectator_id', ''))
+        if spectator_id:
+            touch_presence(code, "spectators", spectator_id, presence)
+        since_version, via_etag = self._requested_state_version(query)
+        current_version = presence.get(_game_version_key(code)) if since_version is not None else None
+        spectator_count = get_spectator_count(code, presence)
+        if current_version is not None:
+            try:
+                # Spectator polls never advance the game, so pending bot work is irrelevant
+                value = str(current_version.result() or '').partition(':')[0]
+                unchanged = _game_unchanged_since(value, since_version)
+            except Exception:
+                unchanged = False
+            if unchanged:
+                return self._send_game_unchanged(since_version, via_etag, spectator_count)
+
+        history_since = self._cursor_param(query.get('history_since'))
+        history = None
+        if history_since is not None:
+            game, history = load_game_since(code, history_since)
+            if game and history_since > _history_length(game):
+                game, history = load_game(code), None
+        else:
+            game = load_game(code)
+        if not game:
+            return self._send_error("Game not found", 404)
+        
+        response = self._build_spectator_response(game, spectator_count, history_since, history)
+        if response is None:
+            return self._send_error("Failed to load game. Please try again.", 500)
+        return self._send_json(response, headers={'ETag': game_state_etag(response['state_version'])})
+
+    # GET /api/games/{code}/chat - Fetch chat messages after a message id
+    @ROUTES.get('/api/games/{code}/chat')
+    def _handle_get_game_chat(self, query: dict, client_ip: str, code: str):
+        try:
+            # Rate limit: 60/min (general)
+            if not check_rate_limit(get_ratelimit_general(), f"chat_get:{client_ip}"):
+                return self._send_error("Too many requests. Please wait.", 429)
+
+            code = sanitize_game_code(code)
             if not code:
                 return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
+
+            # Game must exist (chat is scoped to the game)
+            game = load_game(code, with_history=False)
             if not game:
                 return self._send_error("Game not found", 404)
 
-            is_ranked = bool(game.get('is_ranked', False))
+            after_raw = query.get('after', '0')
+            try:
+                after_id = int(after_raw)
+            except Exception:
+                after_id = 0
+            if after_id < 0:
+                after_id = 0
+
+            limit_raw = query.get('limit', '50')
+            try:
+                limit = int(limit_raw)
+            except Exception:
+                limit = 50
+            limit = max(1, min(200, limit))
+
+            return self._send_json(get_chat_messages(code, after_id, limit, game=game))
+        except Exception as e:
+            print(f"Chat fetch error: {e}")
+            return self._send_error("Failed to load chat. Please try again.", 500)
+
+    # GET /api/games/{code}/replay - Get full replay data for a finished game
+    @ROUTES.get('/api/games/{code}/replay')
+    def _handle_get_game_replay(self, query: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code, with_history=False)
+        if not game:
+            return self._send_error("Game not found", 404)
+        
+        # Only allow replay for finished games
+        if game.get('status') != 'finished':
+            return self._send_error("Game is not finished yet", 400)
+        
+        # Get theme info
+        theme_data = game.get('theme') or {}
+        
+        # Build player info (with revealed words for finished games)
+        players = []
+        for p in game.get('players', []):
+            players.append({
+                "id": p.get('id'),
+                "name": p.get('name'),
+                "secret_word": p.get('secret_word'),
+                "is_alive": p.get('is_alive', True),
+                "is_ai": p.get('is_ai', False),
+                "cosmetics": p.get('cosmetics', {}),
+            })
+        
+        # Build replay data
+        replay_data = {
+            "code": game['code'],
+            "theme": {
+                "name": theme_data.get('name', ''),
+            },
+            "players": players,
+            "winner": game.get('winner'),
+            "history": get_game_history(code, 0, game),
+            "is_ranked": bool(game.get('is_ranked', False)),
+            "created_at": game.get('created_at'),
+            "finished_at": game.get('finished_at', game.get('created_at')),
+        }
+        
+        return self._send_json(replay_data)
+
+    # GET /api/games/{code}
+    # Optional cursors: since_version (or If-None-Match) for conditional polls,
+    # history_since=N for an incremental view, chat_after=M to fold new chat
+    # messages into the response.
+    @ROUTES.get('/api/games/{code}')
+    def _handle_get_game(self, query: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        player_id = sanitize_player_id(query.get('player_id', ''))
+        if not player_id:
+            return self._send_error("Invalid player ID format", 400)
+        
+        history_since = self._cursor_param(query.get('history_since'))
+        chat_after = self._cursor_param(query.get('chat_after'))
+        
+        # Conditional poll: the membership-checked heartbeat, spectator count,
+        # version side key and chat read share one round trip, and the game
+        # blob is only read if it changed. Non-members (and games without the
+        # player hash yet) fall through to the full load, which checks
+        # membership before touching presence.
+        spectator_count = None
+        chat_read = None
+        touched = False
+        since_version, via_etag = self._requested_state_version(query)
+        if since_version is not None:
+            presence = redis_batch()
+            member = touch_player_presence(code, player_id, presence)
+            current_version = presence.get(_game_version_key(code))
+            spectator_count = get_spectator_count(code, presence)
+            if chat_after is not None:
+                chat_read = queue_chat_read(presence, code, chat_after, CHAT_POLL_LIMIT)
+            try:
+                touched = bool(member.result())
+                unchanged = touched and _game_unchanged_since(current_version.result(), since_version)
+            except Exception:
+                unchanged = False
+            if unchanged:
+                chat = None
+                if chat_read is not None:
+                    chat = get_chat_messages(code, chat_after, CHAT_POLL_LIMIT, pending=chat_read)
+                return self._send_game_unchanged(since_version, via_etag, spectator_count, chat)
+        
+        game, history = self._load_game_view(code, history_since)
+        if not game:
+            return self._send_error("Game not found", 404)
+        
+        if not any(p['id'] == player_id for p in game['players']):
+            return self._send_error("You are not in this game", 403)
+
+        # Player presence heartbeat + spectator count (best-effort, one round trip)
+        if spectator_count is None:
+            presence = redis_batch()
+            touch_presence(code, "players", player_id, presence)
+            if chat_after is not None:
+                chat_read = queue_chat_read(presence, code, chat_after, CHAT_POLL_LIMIT)
+            spectator_count = get_spectator_count(code, presence)
+        elif not touched:
+            # The conditional heartbeat didn't land (no player hash yet)
+            touch_presence(code, "players", player_id)
+        
+        if history is None:
+            game = self._advance_bots_on_poll(code, game)
+        
+        response = self._build_game_response(game, player_id, code, spectator_count,
+                                             history_since=history_since, history=history)
+        if response is None:
+            return self._send_error("Failed to load game. Please try again.", 500)
+        if chat_after is not None:
+            response['chat'] = get_chat_messages(code, chat_after, CHAT_POLL_LIMIT,
+                                                 game=game, pending=chat_read)
+        return self._send_json(response, headers={'ETag': game_state_etag(response['state_version'])})
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        body = self._get_body()
+        return self._dispatch('POST', path, body)
+
+    def _dispatch(self, method: str, path: str, payload: dict):
+        """
+        Serve a request from the route table. Route functions take the query
+        (GET) or body (POST), the client IP and the pattern's path parameters.
+        """
+        found = ROUTES.match(method, path)
+        if found is None:
+            return self._send_error("Not found", 404)
+        route, params = found
+
+        # Get client IP for rate limiting
+        client_ip = get_client_ip(self.headers)
+
+        start_request_trace()
+        with ROUTES.timed(route, self):
+            try:
+                if route.options.get('retry'):
+                    # The route only loads, mutates and saves; a save that loses a race re-runs it
+                    return with_game_retry(lambda: route.handler(self, payload, client_ip, **params))
+                return route.handler(self, payload, client_ip, **params)
+            except VersionConflict:
+                return self._send_error("The game changed while saving. Please try again.", 409)
+
+    # POST /api/queue/join - Join matchmaking queue
+    @ROUTES.post('/api/queue/join')
+    def _handle_post_queue_join(self, body: dict, client_ip: str):
+        # Rate limit: 10/min for queue joins
+        if not check_rate_limit(get_ratelimit_general(), f"queue_join:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
+        
+        mode = (body.get('mode', '') or '').strip().lower()
+        player_name = (body.get('player_name', '') or '').strip()
+        
+        if mode not in ('quick_play', 'ranked'):
+            return self._send_error("Invalid mode. Use 'quick_play' or 'ranked'", 400)
+        
+        if not player_name:
+            return self._send_error("player_name required", 400)
+        
+        # Sanitize player name
+        sanitized_name = sanitize_player_name(player_name)
+        if not sanitized_name:
+            return self._send_error("Invalid player name", 400)
+        
+        # Generate a player ID for this queue session
+        player_id = secrets.token_hex(16)
+        
+        # Get auth info
+        auth_user_id = self._get_auth_user_id()
+        auth_user = None
+        mmr = RANKED_INITIAL_MMR
+        cosmetics = {}
+        
+        if auth_user_id:
+            auth_user = get_user_by_id(auth_user_id)
+            if auth_user:
+                stats = get_user_stats(auth_user)
+                mmr = stats.get('mmr', RANKED_INITIAL_MMR)
+                cosmetics = get_user_cosmetics(auth_user)
+        
+        # Ranked eligibility check
+        if mode == 'ranked':
+            if not auth_user_id:
+                return self._send_error("Sign in with Google to play ranked", 401)
+            
+            if not auth_user:
+                return self._send_error("User not found", 404)
+            
+            is_eligible, error_msg = check_ranked_eligibility(auth_user)
+            if not is_eligible:
+                return self._send_json({
+                    "status": "ineligible",
+                    "message": error_msg,
+                    "games_required": QUEUE_MIN_CASUAL_GAMES_FOR_RANKED,
+                    "games_played": get_user_stats(auth_user).get('mp_games_played', 0),
+                }, 403)
+        
+        # Join queue
+        result = join_matchmaking_queue(
+            mode=mode,
+            player_id=player_id,
+            player_name=sanitized_name,
+            auth_user_id=auth_user_id,
+            mmr=mmr,
+            cosmetics=cosmetics,
+        )
+        
+        # Include player_id in response so client can poll status
+        result["player_id"] = player_id
+        
+        return self._send_json(result)
+
+    # POST /api/queue/leave - Leave matchmaking queue
+    @ROUTES.post('/api/queue/leave')
+    def _handle_post_queue_leave(self, body: dict, client_ip: str):
+        mode = (body.get('mode', '') or '').strip().lower()
+        player_id = (body.get('player_id', '') or '').strip()
+        
+        if mode not in ('quick_play', 'ranked'):
+            return self._send_error("Invalid mode", 400)
+        
+        if not player_id:
+            return self._send_error("player_id required", 400)
+        
+        validated_id = sanitize_player_id(player_id)
+        if not validated_id:
+            return self._send_error("Invalid player_id format", 400)
+        
+        success = leave_matchmaking_queue(mode, validated_id)
+        return self._send_json({"status": "left" if success else "error"})
+
+    # POST /api/games - Create lobby with theme voting
+    @ROUTES.post('/api/games')
+    def _handle_post_create_game(self, body: dict, client_ip: str):
+        # Rate limit: 5 games/min per IP
+        if not check_rate_limit(get_ratelimit_game_create(), client_ip):
+            return self._send_error("Too many game creations. Please wait.", 429)
+        
+        import random
+
+        # Lobby metadata (defaults tuned for friend-code flow)
+        requested_visibility = sanitize_visibility(body.get('visibility', 'private'), default='private')
+        requested_ranked = parse_bool(body.get('is_ranked', False), default=False)
+        
+        # Time control preset for casual games (ignored for ranked)
+        time_control_preset = str(body.get('time_control', 'rapid') or 'rapid').lower()
+        if time_control_preset not in CASUAL_TIME_PRESETS:
+            time_control_preset = 'rapid'
+        
+        # Word count: 50 or 100 (default 100 for custom games, can be overridden)
+        requested_word_count = int(body.get('word_count', 100) or 100)
+        if requested_word_count not in (50, 100):
+            requested_word_count = 100
+
+        # Ranked requires Google auth; also force public visibility
+        auth_user_id = self._get_auth_user_id()
+        if requested_ranked:
+            if not auth_user_id:
+                return self._send_error("Ranked games require Google sign-in", 401)
+            requested_visibility = 'public'
+            requested_word_count = 100  # Ranked always uses 100 words
+        
+        code = generate_game_code()
+        
+        # Make sure code is unique
+        while load_game(code):
+            code = generate_game_code()
+        
+        # Pick 3 random theme categories for voting
+        theme_options = random.sample(THEME_CATEGORIES, min(3, len(THEME_CATEGORIES)))
+        
+        # Get time control settings
+        time_control = get_time_control(requested_ranked, time_control_preset)
+        
+        # Create lobby with theme voting
+        game = {
+            "code": code,
+            "host_id": "",
+            "players": [],
+            "current_turn": 0,
+            "status": "waiting",  # Directly in waiting state
+            "winner": None,
+            "history": [],
+            "theme": None,  # Will be set when game starts based on votes
+            "theme_options": theme_options,
+            "theme_votes": {opt: [] for opt in theme_options},  # Track votes per theme
+            "created_at": time.time(),  # For lobby expiry
+            "visibility": requested_visibility,
+            "is_ranked": bool(requested_ranked),
+            "created_by_user_id": auth_user_id if requested_ranked else (auth_user_id or None),
+            "time_control": time_control,
+            "turn_started_at": None,  # Set when game starts playing
+            "word_count": requested_word_count,
+        }
+        save_game(code, game)
+        return self._send_json({
+            "code": code,
+            "theme_options": theme_options,
+            "visibility": requested_visibility,
+            "is_ranked": bool(requested_ranked),
+            "time_control": time_control,
+            "word_count": requested_word_count,
+        })
+
+    # POST /api/challenge/create - Create a challenge link with pre-configured settings
+    @ROUTES.post('/api/challenge/create')
+    def _handle_post_challenge_create(self, body: dict, client_ip: str):
+        # Rate limit: 10 challenges/min per IP
+        if not check_rate_limit(get_ratelimit_game_create(), client_ip):
+            return self._send_error("Too many challenge creations. Please wait.", 429)
+        
+        import random
+        
+        # Get challenger info
+        auth_user_id = self._get_auth_user_id()
+        challenger_name = body.get('challenger_name', 'Anonymous')
+        if not isinstance(challenger_name, str):
+            challenger_name = 'Anonymous'
+        challenger_name = challenger_name.strip()[:20] or 'Anonymous'
+        
+        # Challenge settings
+        theme = body.get('theme', None)
+        if theme and theme not in THEME_CATEGORIES:
+            theme = None
+        
+        # Generate challenge ID
+        challenge_id = ''.join(random.choices('ABCDEFGHJKLMNPQRSTUVWXYZ23456789', k=8))
+        
+        # Store challenge in Redis
+        redis = get_redis()
+        challenge_data = {
+            "id": challenge_id,
+            "challenger_name": challenger_name,
+            "challenger_user_id": auth_user_id,
+            "theme": theme,  # Pre-selected theme (or None for voting)
+            "created_at": time.time(),
+        }
+        
+        # Challenges expire after 7 days
+        redis.set(f"challenge:{challenge_id}", json.dumps(challenge_data), ex=604800)
+        
+        return self._send_json({
+            "challenge_id": challenge_id,
+            "challenge_url": f"/challenge/{challenge_id}",
+        })
+
+    # POST /api/challenge/{id} - Get challenge details
+    @ROUTES.post('/api/challenge/{challenge_id}')
+    def _handle_get_challenge(self, query: dict, client_ip: str, challenge_id: str):
+        challenge_id = challenge_id.upper()
+        
+        redis = get_redis()
+        challenge_data = redis.get(f"challenge:{challenge_id}")
+        
+        if not challenge_data:
+            return self._send_error("Challenge not found or expired", 404)
+        
+        challenge = json.loads(challenge_data)
+        
+        return self._send_json({
+            "id": challenge['id'],
+            "challenger_name": challenge['challenger_name'],
+            "theme": challenge.get('theme'),
+            "created_at": challenge.get('created_at'),
+        })
+
+    # POST /api/challenge/{id}/accept - Accept a challenge and create a game
+    @ROUTES.post('/api/challenge/{challenge_id}/accept')
+    def _handle_post_challenge_accept(self, body: dict, client_ip: str, challenge_id: str):
+        challenge_id = challenge_id.upper()
+        
+        # Rate limit
+        if not check_rate_limit(get_ratelimit_game_create(), client_ip):
+            return self._send_error("Too many requests. Please wait.", 429)
+        
+        redis = get_redis()
+        challenge_data = redis.get(f"challenge:{challenge_id}")
+        
+        if not challenge_data:
+            return self._send_error("Challenge not found or expired", 404)
+        
+        challenge = json.loads(challenge_data)
+        
+        import random
+        
+        # Create a new game for this challenge
+        code = generate_game_code()
+        while load_game(code):
+            code = generate_game_code()
+        
+        # If theme is pre-selected, use it; otherwise use voting
+        theme = challenge.get('theme')
+        if theme and theme in THEME_CATEGORIES:
+            theme_options = [theme]
+            theme_votes = {theme: []}
+        else:
+            theme_options = random.sample(THEME_CATEGORIES, min(3, len(THEME_CATEGORIES)))
+            theme_votes = {opt: [] for opt in theme_options}
+        
+        game = {
+            "code": code,
+            "host_id": "",
+            "players": [],
+            "current_turn": 0,
+            "status": "waiting",
+            "winner": None,
+            "history": [],
+            "theme": theme if theme else None,
+            "theme_options": theme_options,
+            "theme_votes": theme_votes,
+            "created_at": time.time(),
+            "visibility": "private",
+            "is_ranked": False,
+            "challenge_id": challenge_id,
+            "challenger_name": challenge.get('challenger_name'),
+            "time_control": get_time_control(False, "default"),
+            "turn_started_at": None,
+        }
+        save_game(code, game)
+        
+        return self._send_json({
+            "code": code,
+            "theme_options": theme_options,
+            "challenger_name": challenge.get('challenger_name'),
+        })
+
+    # POST /api/singleplayer - Create singleplayer lobby
+    @ROUTES.post('/api/singleplayer')
+    def _handle_post_singleplayer(self, body: dict, client_ip: str):
+        # Rate limit: 5 games/min per IP
+        if not check_rate_limit(get_ratelimit_game_create(), client_ip):
+            return self._send_error("Too many game creations. Please wait.", 429)
+        
+        import random
+        
+        code = generate_game_code()
+        
+        # Make sure code is unique
+        while load_game(code):
+            code = generate_game_code()
 
-            # SECURITY: Determine authenticated user from JWT only (no body fallback to prevent identity spoofing)
+        # Offer 3 theme options to choose from (host picks via "vote" UI)
+        theme_options = random.sample(THEME_CATEGORIES, min(3, len(THEME_CATEGORIES)))
+        
+        # Word count: 50 or 100 (default 50 for singleplayer)
+        requested_word_count = int(body.get('word_count', 50) or 50)
+        if requested_word_count not in (50, 100):
+            requested_word_count = 50
+        
+        # Create singleplayer lobby
+        game = {
+            "code": code,
+            "host_id": "",
+            "players": [],
+            "current_turn": 0,
+            "status": "waiting",
+            "winner": None,
+            "history": [],
+            "theme": None,  # Set on start based on selection
+            "theme_options": theme_options,
+            "theme_votes": {opt: [] for opt in theme_options},
+            "created_at": time.time(),
+            "is_singleplayer": True,  # Mark as singleplayer game
+            "visibility": "private",
+            "is_ranked": False,
+            "time_control": get_time_control(False, "none"),  # No time limit in singleplayer
+            "turn_started_at": None,
+            "word_count": requested_word_count,
+        }
+        save_game(code, game)
+        return self._send_json({
+            "code": code,
+            "theme_options": theme_options,
+            "is_singleplayer": True,
+            "visibility": "private",
+            "is_ranked": False,
+            "word_count": requested_word_count,
+        })
+
+    # POST /api/games/{code}/add-ai - Add AI player to singleplayer lobby
+    @ROUTES.post('/api/games/{code}/add-ai', retry=True)
+    def _handle_post_game_add_ai(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if not game.get('is_singleplayer'):
+            return self._send_error("Can only add AI to singleplayer games", 400)
+        if game['status'] != 'waiting':
+            return self._send_error("Game has already started", 400)
+        if len(game['players']) >= MAX_PLAYERS:
+            return self._send_error("Game is full", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        # Verify requester is the host
+        if game['host_id'] != player_id:
+            return self._send_error("Only the host can add AI players", 403)
+        
+        difficulty = body.get('difficulty', 'rookie')
+        if difficulty not in AI_DIFFICULTY_CONFIG:
+            allowed = ", ".join(["rookie", "analyst", "field-agent", "spymaster", "ghost"])
+            return self._send_error(f"Invalid difficulty. Choose: {allowed}", 400)
+        
+        # Create AI player
+        existing_names = [p['name'] for p in game['players']]
+        ai_player = create_ai_player(difficulty, existing_names)
+        
+        game['players'].append(ai_player)
+        save_game(code, game)
+        
+        return self._send_json({
+            "status": "ai_added",
+            "ai_player": {
+                "id": ai_player["id"],
+                "name": ai_player["name"],
+                "difficulty": ai_player["difficulty"],
+                "is_ai": True,
+            },
+        })
+
+    # POST /api/games/{code}/remove-ai - Remove AI player from singleplayer lobby
+    @ROUTES.post('/api/games/{code}/remove-ai', retry=True)
+    def _handle_post_game_remove_ai(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if not game.get('is_singleplayer'):
+            return self._send_error("Can only remove AI from singleplayer games", 400)
+        if game['status'] != 'waiting':
+            return self._send_error("Game has already started", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        # Verify requester is the host
+        if game['host_id'] != player_id:
+            return self._send_error("Only the host can remove AI players", 403)
+        
+        ai_id = sanitize_ai_player_id(body.get('ai_id', ''))
+        if not ai_id:
+            return self._send_error("Invalid AI player ID", 400)
+        
+        # Find and remove AI player
+        ai_player = next((p for p in game['players'] if p['id'] == ai_id), None)
+        if not ai_player:
+            return self._send_error("AI player not found", 404)
+        if not ai_player.get('is_ai'):
+            return self._send_error("Cannot remove human players", 400)
+        
+        game['players'] = [p for p in game['players'] if p['id'] != ai_id]
+        save_game(code, game)
+        
+        return self._send_json({
+            "status": "ai_removed",
+            "removed_id": ai_id,
+        })
+
+    # POST /api/games/{code}/vote - Vote for a theme
+    @ROUTES.post('/api/games/{code}/vote', retry=True)
+    def _handle_post_game_vote(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'waiting':
+            return self._send_error("Voting is closed", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        theme = body.get('theme', '').strip()
+        
+        if theme not in game.get('theme_options', []):
+            return self._send_error("Invalid theme", 400)
+        
+        # Remove player's previous vote (if any)
+        for t in game.get('theme_votes', {}):
+            if player_id in game['theme_votes'][t]:
+                game['theme_votes'][t].remove(player_id)
+        
+        # Add new vote
+        if theme not in game['theme_votes']:
+            game['theme_votes'][theme] = []
+        game['theme_votes'][theme].append(player_id)
+        
+        save_game(code, game)
+        return self._send_json({"status": "voted", "theme_votes": game['theme_votes']})
+
+    # POST /api/games/{code}/theme - Set the theme (creator chooses)
+    @ROUTES.post('/api/games/{code}/theme', retry=True)
+    def _handle_post_game_theme(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'choosing_theme':
+            return self._send_error("Theme already chosen", 400)
+        
+        chosen_theme = body.get('theme', '').strip()
+        
+        # Validate the chosen theme is one of the options
+        if chosen_theme not in game.get('theme_options', []):
+            return self._send_error("Invalid theme choice", 400)
+        
+        # Get pre-generated words for the chosen theme
+        theme = get_theme_words(chosen_theme)
+        
+        game['theme'] = {
+            "name": theme.get("name", chosen_theme),
+            "words": theme.get("words", []),
+        }
+        game['status'] = 'waiting'  # Now waiting for players
+        del game['theme_options']  # Clean up
+        
+        save_game(code, game)
+        return self._send_json({
+            "theme": game['theme'],
+        })
+
+    # POST /api/games/{code}/leave - Leave lobby / forfeit in-game
+    @ROUTES.post('/api/games/{code}/leave', retry=True)
+    def _handle_post_game_leave(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+
+        game = load_game(code)
+        if not game:
+            return self._send_error("Game not found", 404)
+
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+
+        player = next((p for p in game.get('players', []) if p.get('id') == player_id), None)
+        if not player:
+            return self._send_error("You are not in this game", 403)
+
+        is_ranked = bool(game.get('is_ranked', False))
+        if is_ranked:
             token_user_id = self._get_auth_user_id()
-            auth_user_id = token_user_id
-
-            # Ranked games require JWT-authenticated identity
-            if is_ranked and not token_user_id:
+            if not token_user_id:
                 return self._send_error("Ranked games require Google sign-in", 401)
-            if is_ranked:
-                auth_user_id = token_user_id  # Never trust body for ranked
-            
-            name = sanitize_player_name(body.get('name', ''))
-            if not name:
-                return self._send_error("Invalid name. Use only letters, numbers, underscores, and spaces (1-20 chars)", 400)
-            
-            # Get user cosmetics if authenticated
-            user_cosmetics = None
-            if auth_user_id:
-                auth_user = get_user_by_id(auth_user_id)
-                if auth_user:
-                    user_cosmetics = get_visible_cosmetics(auth_user)
-            
-            # Check if player is trying to rejoin
-            existing_player = None
-            if is_ranked and auth_user_id:
-                existing_player = next((p for p in game.get('players', []) if p.get('auth_user_id') == auth_user_id), None)
-            else:
-                existing_player = next((p for p in game.get('players', []) if p.get('name', '').lower() == name.lower()), None)
-            if existing_player:
-                # Update cosmetics if provided
-                if user_cosmetics:
-                    existing_player['cosmetics'] = user_cosmetics
-                # Allow renaming on rejoin when authenticated
-                if auth_user_id:
-                    existing_player['auth_user_id'] = auth_user_id
-                existing_player['name'] = name
-                save_game(code, game)
-                # Generate new session token for rejoin
-                session_token = generate_session_token(existing_player['id'], code)
-                # Allow rejoin - return their player_id
-                return self._send_json({
-                    "player_id": existing_player['id'],
-                    "session_token": session_token,
-                    "game_code": code,
-                    "is_host": existing_player['id'] == game['host_id'],
-                    "rejoined": True,
-                    "theme_options": game.get('theme_options', []),
-                    "theme_votes": game.get('theme_votes', {}),
-                    "visibility": game.get('visibility', 'public'),
-                    "is_ranked": bool(game.get('is_ranked', False)),
-                })
-            
-            if game['status'] != 'waiting':
-                return self._send_error("Game has already started", 400)
-            if len(game['players']) >= MAX_PLAYERS:
-                return self._send_error("Game is full", 400)
-
-            # For ranked: keep display names unique (auth identity is what matters, but UI clarity helps)
-            if is_ranked:
-                existing_names = {str(p.get('name', '')).lower() for p in game.get('players', [])}
-                if name.lower() in existing_names:
-                    base = name
-                    # Try _2.._99 suffixes while staying within 20 chars
-                    found = None
-                    for n in range(2, 100):
-                        suffix = f"_{n}"
-                        keep = max(1, 20 - len(suffix))
-                        candidate = (base[:keep] + suffix)
-                        if candidate.lower() not in existing_names and PLAYER_NAME_PATTERN.match(candidate):
-                            found = html.escape(candidate)
-                            break
-                    if not found:
-                        return self._send_error("Name already taken in this ranked lobby", 409)
-                    name = found
-            
-            player_id = generate_player_id()
-            player = {
-                "id": player_id,
-                "name": name,
-                "secret_word": None,  # Will be set later
-                "secret_embedding": None,
-                "is_alive": True,
-                "can_change_word": False,
-                "word_pool": [],  # Will be assigned when game starts
-                "is_ready": False,  # Ready status for lobby
-                "cosmetics": user_cosmetics or {},  # Player's visible cosmetics
-                "auth_user_id": auth_user_id or None,  # Ranked identity / cosmetics linkage
-            }
-            game['players'].append(player)
-            
-            if len(game['players']) == 1:
-                game['host_id'] = player_id
-            
-            save_game(code, game)
-            # Generate session token for new player
-            session_token = generate_session_token(player_id, code)
-            return self._send_json({
-                "player_id": player_id,
-                "session_token": session_token,
-                "game_code": code,
-                "is_host": player_id == game['host_id'],
-                "theme_options": game.get('theme_options', []),
-                "theme_votes": game.get('theme_votes', {}),
-                "visibility": game.get('visibility', 'public'),
-                "is_ranked": bool(game.get('is_ranked', False)),
-            })
+            if (player.get('auth_user_id') or '') != token_user_id:
+                return self._send_error("Not authorized for this player", 403)
 
-        # POST /api/games/{code}/ready - Toggle ready status
-        if '/ready' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'waiting':
-                return self._send_error("Game has already started", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            player = next((p for p in game['players'] if p['id'] == player_id), None)
-            if not player:
-                return self._send_error("You are not in this game", 403)
-            
-            # Toggle ready status
-            player['is_ready'] = not player.get('is_ready', False)
-            
-            save_game(code, game)
-            return self._send_json({
-                "is_ready": player['is_ready'],
-            })
+        status = game.get('status')
+        is_singleplayer = bool(game.get('is_singleplayer', False))
 
-        # POST /api/games/{code}/set-word - Set secret word (during word selection)
-        if '/set-word' in path:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] not in ['word_selection', 'playing']:
-                return self._send_error("Not in word selection phase", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            secret_word = sanitize_word(body.get('secret_word', ''))
-            if not secret_word:
-                return self._send_error("Invalid word. Use only letters (2-30 chars)", 400)
-            
-            player = next((p for p in game['players'] if p['id'] == player_id), None)
-            if not player:
-                return self._send_error("You are not in this game", 403)
-            if player.get('secret_word'):
-                return self._send_error("You already set your word", 400)
-            
-            # Validate against player's assigned word pool
-            player_word_pool = player.get('word_pool', [])
-            if player_word_pool and secret_word.lower() not in [w.lower() for w in player_word_pool]:
-                return self._send_error("Please choose a word from your word pool", 400)
-            
-            # Word is from player's pool, which came from theme words pre-cached in /start
-            # No need to verify embedding exists - it's guaranteed to be in cache
-            
-            player['secret_word'] = secret_word.lower()
-            # NOTE: We don't store secret_embedding anymore - it's in Redis cache as emb:{word}
-            
-            save_game(code, game)
-            return self._send_json({
-                "status": "word_set",
-                "word_pool": player['word_pool'],
-            })
+        # Singleplayer QoL: allow "soft leave" so players can go join other games and later resume.
+        # By default, leaving a singleplayer game does NOT forfeit. If the client explicitly passes
+        # {"forfeit": true}, we treat it as an intentional solo forfeit and delete the run.
+        if is_singleplayer:
+            wants_forfeit = False
+            try:
+                if isinstance(body, dict) and 'forfeit' in body:
+                    wants_forfeit = parse_bool(body.get('forfeit', False), default=False)
+            except Exception:
+                wants_forfeit = False
 
-        # POST /api/games/{code}/start - Move from lobby to word selection
-        if '/start' in path and '/begin' not in path:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            if game['host_id'] != player_id:
-                return self._send_error("Only the host can start", 403)
-            if game['status'] != 'waiting':
-                return self._send_error("Game already started", 400)
-            
-            # Check if it's singleplayer
-            is_singleplayer = game.get('is_singleplayer', False)
-            
-            # Singleplayer needs at least 2 players (1 human + 1 AI)
-            if is_singleplayer:
-                if len(game['players']) < 2:
-                    return self._send_error("Add at least 1 AI opponent", 400)
-            elif len(game['players']) < MIN_PLAYERS:
-                return self._send_error(f"Need at least {MIN_PLAYERS} players", 400)
-
-            # Ranked: snapshot participants at match start so later forfeits/leaves don't shrink the rating pool.
-            # This lets remaining players gain/lose MMR as if the forfeiter stayed in the match.
-            if bool(game.get('is_ranked', False)) and not bool(game.get('is_singleplayer', False)):
+            if wants_forfeit:
                 try:
-                    existing = game.get('ranked_participants')
-                    if not isinstance(existing, list) or not existing:
-                        rp = []
-                        for p in (game.get('players', []) or []):
-                            if not isinstance(p, dict):
-                                continue
-                            if p.get('is_ai'):
-                                continue
-                            uid = p.get('auth_user_id')
-                            if not uid:
-                                continue
-                            rp.append({
-                                "id": p.get('id'),
-                                "name": p.get('name'),
-                                "auth_user_id": uid,
-                            })
-                        if rp:
-                            game['ranked_participants'] = rp
+                    delete_game(code)
                 except Exception:
                     pass
-            
-            import random
-            
-            # Determine word count (50 for quickplay, 100 for ranked/custom)
-            # Default to 100 for backwards compatibility
-            word_count = game.get('word_count', 100)
-            
-            # Words per player: halve for 50-word games (8 instead of 16)
-            words_per_player = WORDS_PER_PLAYER // 2 if word_count == 50 else WORDS_PER_PLAYER
-            
-            # Determine theme from votes/options if available (singleplayer now also uses this).
-            votes = game.get('theme_votes', {}) or {}
-            theme_options = game.get('theme_options', []) or []
-
-            if theme_options:
-                # Build weighted list: each theme appears once per vote
-                weighted_themes = []
-                for theme_name in theme_options:
-                    vote_count = len(votes.get(theme_name, []))
-                    weighted_themes.extend([theme_name] * max(vote_count, 0))
+                return self._send_json({
+                    "status": "left",
+                    "forfeit": True,
+                    "deleted": True,
+                    "is_singleplayer": True,
+                    "game_status": status,
+                })
 
-                if not weighted_themes:
-                    weighted_themes = theme_options.copy()
+            # Soft leave: keep the game and player state intact.
+            # Best-effort refresh expiry so it survives the hop.
+            try:
+                save_game(code, game)
+            except Exception:
+                pass
+            return self._send_json({
+                "status": "left",
+                "forfeit": False,
+                "preserved": True,
+                "is_singleplayer": True,
+                "game_status": status,
+            })
 
-                winning_theme = random.choice(weighted_themes)
-                theme = get_theme_words(winning_theme, word_count)
-                game['theme'] = {
-                    "name": theme.get("name", winning_theme),
-                    "words": theme.get("words", []),
-                }
-            else:
-                # Backwards-compatible fallback: singleplayer games created before theme options existed already have a theme.
-                if not game.get('theme') or not game['theme'].get('words'):
-                    winning_theme = random.choice(THEME_CATEGORIES) if THEME_CATEGORIES else 'Animals'
-                    theme = get_theme_words(winning_theme, word_count)
-                    game['theme'] = {
-                        "name": theme.get("name", winning_theme),
-                        "words": theme.get("words", []),
-                    }
+        # Lobby / word selection: remove the player from the game
+        if status in ('waiting', 'word_selection'):
+            # Ranked fairness: once the match has progressed to word selection, leaving counts as a forfeit
+            # for MMR purposes (so remaining players' Elo/MMR still reflects the full lobby).
+            if is_ranked and status == 'word_selection':
+                game.setdefault('history', []).append({
+                    "type": "forfeit",
+                    "player_id": player.get('id'),
+                    "player_name": player.get('name'),
+                    "word": player.get('secret_word'),
+                })
 
-            all_words = game['theme'].get('words', [])
-            
-            # Assign distinct word pools to each player (words_per_player words each, no overlap)
-            # NOTE: We intentionally fail closed if the theme is too small, because overlaps are not allowed.
-            unique_words = []
-            seen_words = set()
-            for w in (all_words or []):
-                token = str(w or "").strip().lower()
-                if not token:
-                    continue
-                if token in seen_words:
-                    continue
-                seen_words.add(token)
-                unique_words.append(token)
-            all_words = unique_words
+            game['players'] = [p for p in game.get('players', []) if p.get('id') != player_id]
 
-            required = words_per_player * len(game.get('players', []) or [])
-            if required and len(all_words) < required:
-                theme_name = (game.get('theme', {}) or {}).get('name', 'Unknown')
-                return self._send_error(
-                    f"Theme '{theme_name}' does not have enough words for this lobby. "
-                    f"Need {required} unique words ({words_per_player} per player), but only have {len(all_words)}.",
-                    400,
-                )
+            # Clear any pause flags just in case
+            if game.get('waiting_for_word_change') == player_id:
+                game['waiting_for_word_change'] = None
 
-            shuffled_words = all_words.copy()
-            random.shuffle(shuffled_words)
+            # Reassign host if needed
+            if game.get('host_id') == player_id:
+                game['host_id'] = game['players'][0]['id'] if game.get('players') else ''
 
-            for i, p in enumerate(game.get('players', []) or []):
-                start_idx = i * words_per_player
-                end_idx = start_idx + words_per_player
-                pool = shuffled_words[start_idx:end_idx]
-                p['word_pool'] = sorted(pool)
-            
-            # Move to word selection phase (not playing yet)
-            game['status'] = 'word_selection'
-            game['current_turn'] = 0
-            game['word_selection_started_at'] = time.time()  # Start word selection timer
-            game['word_selection_time'] = get_word_selection_time(bool(game.get('is_ranked', False)))
-            
-            # Pre-cache theme embeddings in Redis BLOCKING
-            # This ensures word selection is instant (cache hits only)
-            theme_words = game.get('theme', {}).get('words', [])
-            if theme_words:
-                try:
-                    batch_get_embeddings(theme_words)
-                except Exception as e:
-                    print(f"Theme embedding pre-cache error (start): {e}")
-            
-            # Save game state (fire-and-forget to reduce latency)
-            theme_name = game['theme']['name']
-            import threading
-            def save_async():
+            if not game.get('players'):
+                # Delete empty game
                 try:
-                    save_game(code, game)
-                except Exception as e:
-                    print(f"Async start save error: {e}")
-            threading.Thread(target=save_async, daemon=True).start()
-            
-            return self._send_json({"status": "word_selection", "theme": theme_name})
+                    delete_game(code)
+                except Exception:
+                    pass
+                return self._send_json({"status": "left", "deleted": True})
 
-        # POST /api/games/{code}/begin - Start the actual game after word selection
-        if '/begin' in path:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            if game['host_id'] != player_id:
-                return self._send_error("Only the host can begin", 403)
-            if game['status'] != 'word_selection':
-                return self._send_error(f"Game not in word selection phase (status={game['status']})", 400)
-
-            # Singleplayer safety: if AIs haven't picked yet, pick them now (fallback for slow clients / many AIs)
-            if game.get('is_singleplayer'):
-                for p in game.get('players', []):
-                    if not p.get('is_ai'):
-                        continue
-                    if p.get('secret_word'):
-                        continue
-                    pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
-                    if not pool:
-                        continue
-                    selected_word = ai_select_secret_word(p, pool)
-                    if not selected_word:
-                        continue
-                    try:
-                        get_embedding(selected_word)  # Ensure it's cached
-                        p['secret_word'] = selected_word.lower()
-                    except Exception as e:
-                        print(f"AI word selection error (begin): {e}")
-            
-            # Check all players have set their words
-            not_ready = [p['name'] for p in game['players'] if not p.get('secret_word')]
-            if not_ready:
-                print(f"[BEGIN DEBUG] Game {code} not ready - waiting for: {not_ready}")
-                print(f"[BEGIN DEBUG] Players: {[(p['name'], bool(p.get('secret_word'))) for p in game['players']]}")
-                return self._send_error(f"Waiting for: {', '.join(not_ready)}", 400)
-            
-            # Randomize turn order for multiplayer so the host doesn't always go first.
-            # (Singleplayer stays deterministic: the human host starts.)
-            if not game.get('is_singleplayer'):
-                import random
-                random.shuffle(game['players'])
-                game['current_turn'] = 0
-
-            # Initialize time_remaining for all players (chess clock model)
-            time_control = game.get('time_control', {})
-            initial_time = int(time_control.get('initial_time', 0) or 0)
-            for p in game['players']:
-                p['time_remaining'] = initial_time
-
-            # Load pre-computed similarity matrix from cache (fast path)
-            # or compute in background if not cached (fallback)
-            theme_name = game.get('theme', {}).get('name', '')
-            theme_words = game.get('theme', {}).get('words', [])
-            if theme_words and not game.get('theme_similarity_matrix'):
-                # Try to load pre-computed matrix from Redis cache
-                cached_matrix = get_cached_theme_similarity_matrix(theme_name) if theme_name else None
-                if cached_matrix:
-                    game['theme_similarity_matrix'] = cached_matrix
-                else:
-                    # Fallback: compute in background thread (slower, ~100ms)
-                    import threading
-                    def compute_similarity_matrix():
-                        try:
-                            theme_embeddings = batch_get_embeddings(theme_words)
-                            if theme_embeddings:
-                                matrix = precompute_theme_similarities(game, theme_embeddings)
-                                # Update game state with matrix (need to reload/save)
-                                g = load_game(code)
-                                if g and not g.get('theme_similarity_matrix'):
-                                    g['theme_similarity_matrix'] = matrix
-                                    save_game(code, g)
-                        except Exception as e:
-                            print(f"Theme similarity matrix error: {e}")
-                    threading.Thread(target=compute_similarity_matrix, daemon=True).start()
+            # Ranked: if someone forfeits during word selection and only one player remains,
+            # finish immediately so the remaining player still gets the win/MMR.
+            if is_ranked and status == 'word_selection':
+                alive_players = [p for p in game.get('players', []) if p.get('is_alive', True)]
+                if len(alive_players) <= 1:
+                    game['status'] = 'finished'
+                    game['waiting_for_word_change'] = None
+                    game['winner'] = alive_players[0]['id'] if alive_players else None
+                    save_finished_game(code, game)
+                    return self._send_json({
+                        "status": "left",
+                        "forfeit": True,
+                        "game_over": True,
+                        "winner": game.get('winner'),
+                    })
 
-            game['status'] = 'playing'
-            game['turn_started_at'] = time.time()  # Start the turn timer
             save_game(code, game)
-            return self._send_json({"status": "playing"})
+            resp = {"status": "left", "deleted": False, "host_id": game.get('host_id')}
+            if is_ranked and status == 'word_selection':
+                resp["forfeit"] = True
+            return self._send_json(resp)
 
-        # POST /api/games/{code}/word-selection-timeout - Auto-assign random words when time expires
-        if '/word-selection-timeout' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'word_selection':
-                return self._send_error("Game not in word selection phase", 400)
-            
-            # Verify the word selection time has actually expired (server-authoritative)
-            word_selection_started_at = game.get('word_selection_started_at')
-            word_selection_time = game.get('word_selection_time', 0)
-            
-            if not word_selection_started_at or word_selection_time <= 0:
-                return self._send_error("No word selection timer for this game", 400)
-            
-            elapsed = time.time() - word_selection_started_at
-            # Allow 2 second grace period for network latency
-            if elapsed < word_selection_time - 2:
-                return self._send_json({
-                    "timeout": False,
-                    "time_remaining": word_selection_time - elapsed,
-                    "message": "Word selection time has not expired yet",
-                })
-            
-            import random
-            
-            # Auto-assign random words to players who haven't picked
-            auto_assigned = []
-            for p in game['players']:
-                if p.get('secret_word'):
-                    continue  # Already has a word
-                
-                # For AI players, use their AI selection logic
-                if p.get('is_ai'):
-                    pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
-                    if pool:
-                        selected_word = ai_select_secret_word(p, pool)
-                        if selected_word:
-                            try:
-                                get_embedding(selected_word)  # Ensure cached
-                                p['secret_word'] = selected_word.lower()
-                                auto_assigned.append({"id": p['id'], "name": p['name'], "is_ai": True})
-                            except Exception as e:
-                                print(f"AI word selection error (timeout): {e}")
-                    continue
-                
-                # For human players, pick a random word from their pool
-                pool = p.get('word_pool', [])
-                if pool:
-                    selected_word = random.choice(pool)
-                    try:
-                        get_embedding(selected_word)  # Ensure cached
-                        p['secret_word'] = selected_word.lower()
-                        auto_assigned.append({"id": p['id'], "name": p['name'], "is_ai": False})
-                    except Exception as e:
-                        print(f"Auto-assign word error (timeout): {e}")
-            
-            save_game(code, game)
-            
-            # Check if all players now have words
-            all_ready = all(p.get('secret_word') for p in game['players'])
-            
-            return self._send_json({
-                "timeout": True,
-                "auto_assigned": auto_assigned,
-                "all_ready": all_ready,
-            })
+        # In-game: forfeit => mark eliminated, advance turn if needed
+        if status == 'playing':
+            if not player.get('is_alive', True):
+                return self._send_json({"status": "left", "forfeit": True, "already_eliminated": True})
 
-        # POST /api/games/{code}/ai-pick-words - Singleplayer: have AIs pick their secret words
-        if '/ai-pick-words' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-            if not game.get('is_singleplayer'):
-                return self._send_error("Not a singleplayer game", 400)
-            if game.get('status') != 'word_selection':
-                return self._send_error("AI can only pick words during word selection", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            if game.get('host_id') != player_id:
-                return self._send_error("Only the host can trigger AI word selection", 403)
+            player['is_alive'] = False
+
+            # If they were the blocker for word change, unblock the game.
+            if game.get('waiting_for_word_change') == player_id:
+                game['waiting_for_word_change'] = None
+                # They can no longer change word (they left)
+                player['can_change_word'] = False
+                player.pop('word_change_options', None)
+
+            # Record forfeit in history (used for ranked placement ordering)
+            game.setdefault('history', []).append({
+                "type": "forfeit",
+                "player_id": player.get('id'),
+                "player_name": player.get('name'),
+                # Reveal the forfeiter's word so other players can see it immediately.
+                # (Normal eliminations already reveal via the guessed word in history.)
+                "word": player.get('secret_word'),
+            })
 
-            max_to_pick = body.get('max_to_pick', 3)
+            # If it was their turn, advance to next alive player
             try:
-                max_to_pick = int(max_to_pick)
+                current = game.get('players', [])[game.get('current_turn', 0)]
             except Exception:
-                max_to_pick = 3
-            max_to_pick = max(1, min(max_to_pick, 10))
-            
-            picked = 0
-            errors = 0
-            for p in game.get('players', []):
-                if picked >= max_to_pick:
-                    break
-                if not p.get('is_ai'):
-                    continue
-                if p.get('secret_word'):
-                    continue
-                pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
-                if not pool:
-                    continue
-                selected_word = ai_select_secret_word(p, pool)
-                if not selected_word:
-                    continue
-                try:
-                    get_embedding(selected_word)  # Ensure cached
-                    p['secret_word'] = selected_word.lower()
-                    picked += 1
-                except Exception as e:
-                    errors += 1
-                    print(f"AI word selection error: {e}")
-            
+                current = None
+
+            alive_players = [p for p in game.get('players', []) if p.get('is_alive')]
+            if len(alive_players) <= 1:
+                game['status'] = 'finished'
+                game['waiting_for_word_change'] = None
+                game['winner'] = alive_players[0]['id'] if alive_players else None
+                save_finished_game(code, game)
+                return self._send_json({
+                    "status": "left",
+                    "forfeit": True,
+                    "game_over": True,
+                    "winner": game.get('winner'),
+                })
+
+            if current and current.get('id') == player_id:
+                num_players = len(game.get('players', []))
+                next_turn = (int(game.get('current_turn', 0)) + 1) % max(1, num_players)
+                # Skip eliminated players
+                while num_players > 0 and not game['players'][next_turn].get('is_alive'):
+                    next_turn = (next_turn + 1) % num_players
+                game['current_turn'] = next_turn
+
             save_game(code, game)
             return self._send_json({
-                "status": "ai_words_picked",
-                "picked": picked,
-                "errors": errors,
+                "status": "left",
+                "forfeit": True,
+                "game_over": False,
             })
 
-        # POST /api/games/{code}/ai-step - Singleplayer: process ALL AI turns until human turn or game over
-        if '/ai-step' in path and path.startswith('/api/games/'):
-            # Rate limit: reuse guess limiter (AI can only act when it's their turn)
-            if not check_rate_limit(get_ratelimit_guess(), f"ai_step:{client_ip}"):
-                return self._send_error("Too many requests. Please wait.", 429)
-            
-            code = sanitize_game_code(path.split('/')[3])
+        # Finished/unknown status: just acknowledge
+        return self._send_json({"status": "left", "forfeit": False, "game_status": status})
+
+    # POST /api/games/{code}/chat - Send a chat message (lobby or in-game)
+    @ROUTES.post('/api/games/{code}/chat')
+    def _handle_post_game_chat(self, body: dict, client_ip: str, code: str):
+        try:
+            code = sanitize_game_code(code)
             if not code:
                 return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            if not game:
-                return self._send_error("Game not found", 404)
-            if not game.get('is_singleplayer'):
-                return self._send_error("Not a singleplayer game", 400)
-            if game.get('status') != 'playing':
-                return self._send_error("Game not in progress", 400)
-            
-            # Respect word-change pauses
-            if game.get('waiting_for_word_change'):
-                waiting_player = next((p for p in game['players'] if p['id'] == game['waiting_for_word_change']), None)
-                waiting_name = waiting_player['name'] if waiting_player else 'Someone'
-                return self._send_error(f"Waiting for {waiting_name} to change their word", 400)
-            
+
             # SECURITY: Validate player session token
             player_id, session_error = self._validate_player_session(body, code)
             if session_error:
                 return self._send_error(session_error, 403)
-            if game.get('host_id') != player_id:
-                return self._send_error("Only the host can trigger AI turns", 403)
-            
-            # Ensure it's actually an AI's turn
-            if not game.get('players'):
-                return self._send_error("No players in game", 400)
-            
-            current_player = game['players'][game['current_turn']]
-            if not current_player.get('is_ai'):
-                return self._send_error("Not an AI turn", 400)
-            
-            # Process ALL AI turns until it's human's turn or game over
-            max_ai_turns = len(game['players']) * 2  # Safety limit
-            turns_processed = 0
-            
-            while turns_processed < max_ai_turns:
-                current_ai = game['players'][game['current_turn']]
-                
-                # Stop if not AI turn
-                if not current_ai.get('is_ai'):
-                    break
-                
-                # Skip dead AI
-                if not current_ai.get('is_alive'):
-                    num_players = len(game['players'])
-                    next_turn = (game['current_turn'] + 1) % num_players
-                    while not game['players'][next_turn].get('is_alive'):
-                        next_turn = (next_turn + 1) % num_players
-                    game['current_turn'] = next_turn
-                    continue
-                
-                # Process AI turn
-                ai_result = process_ai_turn(game, current_ai)
-                if not ai_result:
-                    break
-                
-                turns_processed += 1
-                
-                # If AI eliminated someone, auto-handle its word change immediately
-                if ai_result.get('eliminations') and current_ai.get('can_change_word'):
-                    process_ai_word_change(game, current_ai)
-                
-                # Check for game over
-                alive_players = [p for p in game['players'] if p.get('is_alive')]
-                if len(alive_players) <= 1:
-                    game['status'] = 'finished'
-                    if alive_players:
-                        game['winner'] = alive_players[0]['id']
-                    update_game_stats(game)
-                    break
-                
-                # Advance turn
-                num_players = len(game['players'])
-                next_turn = (game['current_turn'] + 1) % num_players
-                while not game['players'][next_turn].get('is_alive'):
-                    next_turn = (next_turn + 1) % num_players
-                game['current_turn'] = next_turn
-                game['turn_started_at'] = time.time()
-            
-            save_game(code, game)
-            
-            # Return full game state
-            game_response = self._build_game_response(game, player_id, code)
-            if game_response:
-                return self._send_json(game_response)
-            
-            return self._send_json({"status": "ai_step_batch", "turns_processed": turns_processed})
 
-        # POST /api/games/{code}/guess
-        if '/guess' in path:
-            # Rate limit: 30 guesses/min per IP
-            if not check_rate_limit(get_ratelimit_guess(), client_ip):
-                return self._send_error("Too many guesses. Please wait.", 429)
-            
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
+            # Rate limit: 20 messages/min per player (best-effort)
+            if not check_rate_limit(get_ratelimit_chat(), f"{code}:{player_id}"):
+                return self._send_error("Too many messages. Please wait.", 429)
+
             game = load_game(code)
-            
             if not game:
                 return self._send_error("Game not found", 404)
-            if game['status'] != 'playing':
-                return self._send_error("Game not in progress", 400)
-            
-            # Check if game is paused waiting for word change
-            if game.get('waiting_for_word_change'):
-                waiting_player = next((p for p in game['players'] if p['id'] == game['waiting_for_word_change']), None)
-                waiting_name = waiting_player['name'] if waiting_player else 'Someone'
-                return self._send_error(f"Waiting for {waiting_name} to change their word", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            word = sanitize_word(body.get('word', ''))
-            if not word:
-                return self._send_error("Invalid word. Use only letters (2-30 chars)", 400)
-            
-            player = None
-            player_idx = -1
-            for i, p in enumerate(game['players']):
-                if p['id'] == player_id:
-                    player = p
-                    player_idx = i
-                    break
-            
+
+            # Must be a participant (no spectator chat for now)
+            player = next((p for p in game.get('players', []) if p.get('id') == player_id), None)
             if not player:
                 return self._send_error("You are not in this game", 403)
-            if not player['is_alive']:
-                return self._send_error("You have been eliminated", 400)
-            
-            current_player = game['players'][game['current_turn']]
-            if current_player['id'] != player_id:
-                return self._send_error("It's not your turn", 400)
-            
-            # Validate word is in theme (required - all guesses must be theme words)
-            word_lower = word.lower()
-            theme_words = game.get('theme', {}).get('words', [])
-            theme_words_lower = {w.lower() for w in theme_words}
-            if word_lower not in theme_words_lower:
-                return self._send_error("Please select a word from the theme", 400)
-            
-            # Calculate similarities using pre-computed matrix
-            similarities = {}
-            matrix = game.get('theme_similarity_matrix')
-            
-            if not matrix:
-                return self._send_error("Game not properly initialized", 500)
-            
-            for p in game['players']:
-                secret_word = p.get('secret_word')
-                if not secret_word:
-                    continue
-                secret_lower = secret_word.lower()
-                
-                # Use pre-computed similarity matrix (guaranteed to have all theme words)
-                sim = matrix.get(word_lower, {}).get(secret_lower)
-                if sim is not None:
-                    similarities[p['id']] = round(sim, 4)
-            
-            # Eliminate players whose exact word was guessed
-            eliminations = []
-            for p in game['players']:
-                if p['id'] != player_id and p['is_alive']:
-                    if word.lower() == p['secret_word'].lower():
-                        p['is_alive'] = False
-                        eliminations.append(p['id'])
-            
-            if eliminations:
-                player['can_change_word'] = True
-                game['waiting_for_word_change'] = player_id  # Pause game until word is changed
-                game['word_change_started_at'] = time.time()  # Start 30-second word change timer
-            
-            # Record history
-            history_entry = {
-                "guesser_id": player['id'],
-                "guesser_name": player['name'],
-                "word": word.lower(),
-                "similarities": similarities,
-                "eliminations": eliminations,
+
+            message = body.get('message', body.get('text', ''))
+            if not isinstance(message, str):
+                return self._send_error("Invalid message", 400)
+            # Normalize and bound
+            message = message.strip()
+            if not message:
+                return self._send_error("Message cannot be empty", 400)
+            message = message[:200]
+            # Drop control chars
+            message = re.sub(r"[\x00-\x1F\x7F]", "", message)
+            # Profanity filter (mask)
+            message = filter_profanity(message)
+
+            redis = get_redis()
+            chat_key = f"chat:{code}"
+
+            # Monotonic message id (fallback to timestamp if INCR unavailable)
+            msg_id = None
+            try:
+                msg_id = int(redis.incr(f"chat:{code}:id"))
+            except Exception:
+                msg_id = int(time.time() * 1000)
+            # Ensure monotonic vs any fallback-stored messages on the game object
+            try:
+                last_game_id = int(game.get('chat_last_id', 0) or 0)
+            except Exception:
+                last_game_id = 0
+            if msg_id <= last_game_id:
+                msg_id = last_game_id + 1
+
+            payload = {
+                "id": msg_id,
+                "ts": int(time.time() * 1000),
+                "sender_id": player_id,
+                "sender_name": player.get('name', ''),
+                "text": message,
             }
-            game['history'].append(history_entry)
 
-            # If the player earned a word change, offer a random sample of allowed words (including their current
-            # word only if it happens to be in the sample). Store on the player so it persists across refresh.
-            if eliminations:
+            try:
+                # One round trip: append, best-effort trim to the last 200
+                # messages and expiry, and the chat event for SSE clients.
+                batch = redis_batch()
+                added = batch.zadd(chat_key, {json.dumps(payload): msg_id})
+                batch.zremrangebyrank(chat_key, 0, -201)
+                batch.expire(chat_key, GAME_EXPIRY_SECONDS)
+                if not game.get('is_singleplayer'):
+                    queue_game_event(batch, code, "chat", payload, GAME_EXPIRY_SECONDS)
+                batch.flush()
+                added.result()
+            except Exception as e:
+                err_id = secrets.token_hex(4)
+                print(f"Chat write error [{err_id}]: {e}")
+                # Fallback: store chat messages on the game object (uses setex, which is already used everywhere).
                 try:
-                    player['word_change_options'] = build_word_change_options(player, game)
-                except Exception as e:
-                    print(f"Error building word change options: {e}")
-            
-            # Update AI memories and reactions with this guess (for singleplayer games)
-            ai_reactions = []
-            if game.get('is_singleplayer'):
-                for p in game['players']:
-                    if p.get('is_ai'):
-                        ai_update_memory(p, word, similarities, game)
-                        
-                        # Track grudges against the guesser
-                        their_sim = similarities.get(p['id'], 0)
-                        if their_sim > 0.5:
-                            _ai_update_grudge(p, player_id, their_sim)
-                            _ai_update_confidence(p, "got_targeted", their_sim)
-                        
-                        # Generate AI reactions
-                        if p['id'] in eliminations:
-                            # AI got eliminated - generate reaction
-                            _ai_update_streak(p, "got_eliminated")
-                            chat_msg = _ai_generate_chat_message(p, "got_eliminated")
-                            if chat_msg:
-                                ai_reactions.append({
-                                    "ai_name": p.get('name', 'AI'),
-                                    "message": chat_msg,
-                                })
-                        elif their_sim > 0.65:
-                            # Near miss - AI might react
-                            chat_msg = _ai_generate_chat_message(p, "near_miss")
-                            if chat_msg:
-                                ai_reactions.append({
-                                    "ai_name": p.get('name', 'AI'),
-                                    "message": chat_msg,
-                                })
-            
-            # Advance turn (but game is paused if waiting for word change)
-            alive_players = [p for p in game['players'] if p['is_alive']]
-            game_over = False
-            
-            # Deduct elapsed time from current player and add increment (chess clock)
-            time_control = game.get('time_control', {})
-            increment = int(time_control.get('increment', 0) or 0)
-            turn_started_at = game.get('turn_started_at')
-            if turn_started_at and player.get('time_remaining') is not None:
-                elapsed = time.time() - turn_started_at
-                player['time_remaining'] = max(0, player['time_remaining'] - elapsed + increment)
-            
-            if len(alive_players) <= 1:
-                game['status'] = 'finished'
-                game['waiting_for_word_change'] = None  # Clear pause
-                game_over = True
-                if alive_players:
-                    game['winner'] = alive_players[0]['id']
-                # Update leaderboard stats
-                update_game_stats(game)
-            else:
-                num_players = len(game['players'])
-                next_turn = (game['current_turn'] + 1) % num_players
-                while not game['players'][next_turn]['is_alive']:
-                    next_turn = (next_turn + 1) % num_players
-                game['current_turn'] = next_turn
-                # Reset turn timer for new player (unless waiting for word change)
-                if not game.get('waiting_for_word_change'):
-                    game['turn_started_at'] = time.time()
-            
-            save_game(code, game)
-            
-            # Return full game state to avoid client needing a second fetch
-            game_response = self._build_game_response(game, player_id, code)
-            if game_response:
-                # Include AI reactions if any (singleplayer only)
-                if ai_reactions:
-                    game_response['ai_reactions'] = ai_reactions
-                return self._send_json(game_response)
-            
-            # Fallback to minimal response if helper fails
-            response = {
-                "similarities": similarities,
-                "eliminations": eliminations,
-                "game_over": game_over,
-                "winner": game.get('winner'),
-                "waiting_for_word_change": game.get('waiting_for_word_change'),
+                    msgs = game.get('chat_messages', [])
+                    if not isinstance(msgs, list):
+                        msgs = []
+                    msgs.append(payload)
+                    if len(msgs) > 200:
+                        msgs = msgs[-200:]
+                    game['chat_messages'] = msgs
+                    # Track last id for monotonicity on subsequent fallback writes
+                    try:
+                        prev = int(game.get('chat_last_id', 0) or 0)
+                    except Exception:
+                        prev = 0
+                    game['chat_last_id'] = max(prev, msg_id)
+                    save_game(code, game)
+                except VersionConflict:
+                    raise
+                except Exception as e2:
+                    err2_id = secrets.token_hex(4)
+                    print(f"Chat fallback write error [{err2_id}]: {e2}")
+                    resp = {
+                        "detail": "Failed to send message. Please try again.",
+                        "error_id": err2_id,
+                        "error_code": "CHAT_FALLBACK_WRITE_ERROR",
+                    }
+                    debug_payload = {
+                        "where": "chat_fallback_write",
+                        "type": type(e2).__name__,
+                        "error": str(e2)[:500],
+                    }
+                    # Always store server-side so we can retrieve by error_id later (admin/debug endpoint).
+                    try:
+                        redis.setex(
+                            f"debug:chat_error:{err2_id}",
+                            DEBUG_ERROR_TTL_SECONDS,
+                            json.dumps(debug_payload),
+                        )
+                    except Exception:
+                        pass
+                    # Optionally attach debug to response for admin/debug clients
+                    if self._debug_allowed():
+                        resp["debug"] = debug_payload
+                    return self._send_json(resp, 500)
+
+            return self._send_json({"message": payload})
+        except Exception as e:
+            err_id = secrets.token_hex(4)
+            print(f"Chat handler error [{err_id}]: {e}")
+            resp = {
+                "detail": "Failed to send message. Please try again.",
+                "error_id": err_id,
+                "error_code": "CHAT_HANDLER_ERROR",
             }
-            if ai_reactions:
-                response['ai_reactions'] = ai_reactions
-            
-            return self._send_json(response)
+            import traceback
+            debug_payload = {
+                "where": "chat_handler",
+                "type": type(e).__name__,
+                "error": str(e)[:500],
+                "trace": traceback.format_exc(limit=8),
+            }
+            # Always store server-side so we can retrieve by error_id later (admin/debug endpoint).
+            try:
+                redis = get_redis()
+                redis.setex(
+                    f"debug:chat_error:{err_id}",
+                    DEBUG_ERROR_TTL_SECONDS,
+                    json.dumps(debug_payload),
+                )
+            except Exception:
+                pass
+            # Optionally attach debug to response for admin/debug clients
+            if self._debug_allowed():
+                resp["debug"] = debug_payload
+            return self._send_json(resp, 500)
+
+    # POST /api/games/{code}/join - Join lobby (just name, no word yet)
+    @ROUTES.post('/api/games/{code}/join', retry=True)
+    def _handle_post_game_join(self, body: dict, client_ip: str, code: str):
+        # Rate limit: 10 joins/min per IP
+        if not check_rate_limit(get_ratelimit_join(), client_ip):
+            return self._send_error("Too many join attempts. Please wait.", 429)
+        
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
 
-        # POST /api/games/{code}/change-word
-        if '/change-word' in path:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'playing':
-                return self._send_error("Game not in progress", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            new_word = sanitize_word(body.get('new_word', ''))
-            if not new_word:
-                return self._send_error("Invalid word. Use only letters (2-30 chars)", 400)
-            
-            player = None
-            for p in game['players']:
-                if p['id'] == player_id:
-                    player = p
-                    break
-            
-            if not player:
-                return self._send_error("You are not in this game", 403)
-            if not player.get('can_change_word', False):
-                return self._send_error("You don't have a word change", 400)
-            
-            # Validate the word is a real English word
-            if not is_valid_word(new_word):
-                return self._send_error("Please enter a valid English word", 400)
-            
-            # If we offered a random sample for this word change, enforce it (takes priority over word pool).
-            offered = player.get('word_change_options')
-            if offered:
-                offered_lower = [str(w).lower() for w in offered]
-                if new_word.lower() not in offered_lower:
-                    return self._send_error("Please choose a word from the offered sample", 400)
-            else:
-                # No word_change_options - fall back to checking the player's word pool
-                player_pool = player.get('word_pool', [])
-                if player_pool and new_word.lower() not in [w.lower() for w in player_pool]:
-                    return self._send_error("Please choose a word from your word pool", 400)
-            
-            # Check if word has been guessed before
-            guessed_words = set()
-            for entry in game.get('history', []):
-                guessed_words.add(entry.get('word', '').lower())
-            if new_word.lower() in guessed_words:
-                return self._send_error("That word has already been guessed! Pick a different one.", 400)
-            
+        is_ranked = bool(game.get('is_ranked', False))
+
+        # SECURITY: Determine authenticated user from JWT only (no body fallback to prevent identity spoofing)
+        token_user_id = self._get_auth_user_id()
+        auth_user_id = token_user_id
+
+        # Ranked games require JWT-authenticated identity
+        if is_ranked and not token_user_id:
+            return self._send_error("Ranked games require Google sign-in", 401)
+        if is_ranked:
+            auth_user_id = token_user_id  # Never trust body for ranked
+        
+        name = sanitize_player_name(body.get('name', ''))
+        if not name:
+            return self._send_error("Invalid name. Use only letters, numbers, underscores, and spaces (1-20 chars)", 400)
+        
+        # Get user cosmetics if authenticated
+        user_cosmetics = None
+        if auth_user_id:
+            auth_user = get_user_by_id(auth_user_id)
+            if auth_user:
+                user_cosmetics = get_visible_cosmetics(auth_user)
+        
+        # Check if player is trying to rejoin
+        existing_player = None
+        if is_ranked and auth_user_id:
+            existing_player = next((p for p in game.get('players', []) if p.get('auth_user_id') == auth_user_id), None)
+        else:
+            existing_player = next((p for p in game.get('players', []) if p.get('name', '').lower() == name.lower()), None)
+        if existing_player:
+            # Update cosmetics if provided
+            if user_cosmetics:
+                existing_player['cosmetics'] = user_cosmetics
+            # Allow renaming on rejoin when authenticated
+            if auth_user_id:
+                existing_player['auth_user_id'] = auth_user_id
+            existing_player['name'] = name
+            save_game(code, game)
+            # Generate new session token for rejoin
+            session_token = generate_session_token(existing_player['id'], code)
+            # Allow rejoin - return their player_id
+            return self._send_json({
+                "player_id": existing_player['id'],
+                "session_token": session_token,
+                "game_code": code,
+                "is_host": existing_player['id'] == game['host_id'],
+                "rejoined": True,
+                "theme_options": game.get('theme_options', []),
+                "theme_votes": game.get('theme_votes', {}),
+                "visibility": game.get('visibility', 'public'),
+                "is_ranked": bool(game.get('is_ranked', False)),
+            })
+        
+        if game['status'] != 'waiting':
+            return self._send_error("Game has already started", 400)
+        if len(game['players']) >= MAX_PLAYERS:
+            return self._send_error("Game is full", 400)
+
+        # For ranked: keep display names unique (auth identity is what matters, but UI clarity helps)
+        if is_ranked:
+            existing_names = {str(p.get('name', '')).lower() for p in game.get('players', [])}
+            if name.lower() in existing_names:
+                base = name
+                # Try _2.._99 suffixes while staying within 20 chars
+                found = None
+                for n in range(2, 100):
+                    suffix = f"_{n}"
+                    keep = max(1, 20 - len(suffix))
+                    candidate = (base[:keep] + suffix)
+                    if candidate.lower() not in existing_names and PLAYER_NAME_PATTERN.match(candidate):
+                        found = html.escape(candidate)
+                        break
+                if not found:
+                    return self._send_error("Name already taken in this ranked lobby", 409)
+                name = found
+        
+        player_id = generate_player_id()
+        player = {
+            "id": player_id,
+            "name": name,
+            "secret_word": None,  # Will be set later
+            "secret_embedding": None,
+            "is_alive": True,
+            "can_change_word": False,
+            "word_pool": [],  # Will be assigned when game starts
+            "is_ready": False,  # Ready status for lobby
+            "cosmetics": user_cosmetics or {},  # Player's visible cosmetics
+            "auth_user_id": auth_user_id or None,  # Ranked identity / cosmetics linkage
+        }
+        game['players'].append(player)
+        
+        if len(game['players']) == 1:
+            game['host_id'] = player_id
+        
+        save_game(code, game)
+        # Generate session token for new player
+        session_token = generate_session_token(player_id, code)
+        return self._send_json({
+            "player_id": player_id,
+            "session_token": session_token,
+            "game_code": code,
+            "is_host": player_id == game['host_id'],
+            "theme_options": game.get('theme_options', []),
+            "theme_votes": game.get('theme_votes', {}),
+            "visibility": game.get('visibility', 'public'),
+            "is_ranked": bool(game.get('is_ranked', False)),
+        })
+
+    # POST /api/games/{code}/ready - Toggle ready status
+    @ROUTES.post('/api/games/{code}/ready', retry=True)
+    def _handle_post_game_ready(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'waiting':
+            return self._send_error("Game has already started", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        player = next((p for p in game['players'] if p['id'] == player_id), None)
+        if not player:
+            return self._send_error("You are not in this game", 403)
+        
+        # Toggle ready status
+        player['is_ready'] = not player.get('is_ready', False)
+        
+        save_game(code, game)
+        return self._send_json({
+            "is_ready": player['is_ready'],
+        })
+
+    # POST /api/games/{code}/set-word - Set secret word (during word selection)
+    @ROUTES.post('/api/games/{code}/set-word', retry=True)
+    def _handle_post_game_set_word(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] not in ['word_selection', 'playing']:
+            return self._send_error("Not in word selection phase", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        secret_word = sanitize_word(body.get('secret_word', ''))
+        if not secret_word:
+            return self._send_error("Invalid word. Use only letters (2-30 chars)", 400)
+        
+        player = next((p for p in game['players'] if p['id'] == player_id), None)
+        if not player:
+            return self._send_error("You are not in this game", 403)
+        if player.get('secret_word'):
+            return self._send_error("You already set your word", 400)
+        
+        # Validate against player's assigned word pool
+        player_word_pool = player.get('word_pool', [])
+        if player_word_pool and secret_word.lower() not in [w.lower() for w in player_word_pool]:
+            return self._send_error("Please choose a word from your word pool", 400)
+        
+        # Word is from player's pool, which came from theme words pre-cached in /start
+        # No need to verify embedding exists - it's guaranteed to be in cache
+        
+        player['secret_word'] = secret_word.lower()
+        # NOTE: We don't store secret_embedding anymore - it's in Redis cache as emb:{word}
+        
+        save_game(code, game)
+        return self._send_json({
+            "status": "word_set",
+            "word_pool": player['word_pool'],
+        })
+
+    # POST /api/games/{code}/start - Move from lobby to word selection
+    @ROUTES.post('/api/games/{code}/start', retry=True)
+    def _handle_post_game_start(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        if game['host_id'] != player_id:
+            return self._send_error("Only the host can start", 403)
+        if game['status'] != 'waiting':
+            return self._send_error("Game already started", 400)
+        
+        # Check if it's singleplayer
+        is_singleplayer = game.get('is_singleplayer', False)
+        
+        # Singleplayer needs at least 2 players (1 human + 1 AI)
+        if is_singleplayer:
+            if len(game['players']) < 2:
+                return self._send_error("Add at least 1 AI opponent", 400)
+        elif len(game['players']) < MIN_PLAYERS:
+            return self._send_error(f"Need at least {MIN_PLAYERS} players", 400)
+
+        # Ranked: snapshot participants at match start so later forfeits/leaves don't shrink the rating pool.
+        # This lets remaining players gain/lose MMR as if the forfeiter stayed in the match.
+        if bool(game.get('is_ranked', False)) and not bool(game.get('is_singleplayer', False)):
+            try:
+                existing = game.get('ranked_participants')
+                if not isinstance(existing, list) or not existing:
+                    rp = []
+                    for p in (game.get('players', []) or []):
+                        if not isinstance(p, dict):
+                            continue
+                        if p.get('is_ai'):
+                            continue
+                        uid = p.get('auth_user_id')
+                        if not uid:
+                            continue
+                        rp.append({
+                            "id": p.get('id'),
+                            "name": p.get('name'),
+                            "auth_user_id": uid,
+                        })
+                    if rp:
+                        game['ranked_participants'] = rp
+            except Exception:
+                pass
+        
+        import random
+        
+        # Determine word count (50 for quickplay, 100 for ranked/custom)
+        # Default to 100 for backwards compatibility
+        word_count = game.get('word_count', 100)
+        
+        # Words per player: halve for 50-word games (8 instead of 16)
+        words_per_player = WORDS_PER_PLAYER // 2 if word_count == 50 else WORDS_PER_PLAYER
+        
+        # Determine theme from votes/options if available (singleplayer now also uses this).
+        votes = game.get('theme_votes', {}) or {}
+        theme_options = game.get('theme_options', []) or []
+
+        if theme_options:
+            # Build weighted list: each theme appears once per vote
+            weighted_themes = []
+            for theme_name in theme_options:
+                vote_count = len(votes.get(theme_name, []))
+                weighted_themes.extend([theme_name] * max(vote_count, 0))
+
+            if not weighted_themes:
+                weighted_themes = theme_options.copy()
+
+            winning_theme = random.choice(weighted_themes)
+            theme = get_theme_words(winning_theme, word_count)
+            game['theme'] = {
+                "name": theme.get("name", winning_theme),
+                "words": theme.get("words", []),
+            }
+        else:
+            # Backwards-compatible fallback: singleplayer games created before theme options existed already have a theme.
+            if not game.get('theme') or not game['theme'].get('words'):
+                winning_theme = random.choice(THEME_CATEGORIES) if THEME_CATEGORIES else 'Animals'
+                theme = get_theme_words(winning_theme, word_count)
+                game['theme'] = {
+                    "name": theme.get("name", winning_theme),
+                    "words": theme.get("words", []),
+                }
+
+        all_words = game['theme'].get('words', [])
+        
+        # Assign distinct word pools to each player (words_per_player words each, no overlap)
+        # NOTE: We intentionally fail closed if the theme is too small, because overlaps are not allowed.
+        unique_words = []
+        seen_words = set()
+        for w in (all_words or []):
+            token = str(w or "").strip().lower()
+            if not token:
+                continue
+            if token in seen_words:
+                continue
+            seen_words.add(token)
+            unique_words.append(token)
+        all_words = unique_words
+
+        required = words_per_player * len(game.get('players', []) or [])
+        if required and len(all_words) < required:
+            theme_name = (game.get('theme', {}) or {}).get('name', 'Unknown')
+            return self._send_error(
+                f"Theme '{theme_name}' does not have enough words for this lobby. "
+                f"Need {required} unique words ({words_per_player} per player), but only have {len(all_words)}.",
+                400,
+            )
+
+        shuffled_words = all_words.copy()
+        random.shuffle(shuffled_words)
+
+        for i, p in enumerate(game.get('players', []) or []):
+            start_idx = i * words_per_player
+            end_idx = start_idx + words_per_player
+            pool = shuffled_words[start_idx:end_idx]
+            p['word_pool'] = sorted(pool)
+        
+        # Move to word selection phase (not playing yet)
+        game['status'] = 'word_selection'
+        game['current_turn'] = 0
+        game['word_selection_started_at'] = time.time()  # Start word selection timer
+        game['word_selection_time'] = get_word_selection_time(bool(game.get('is_ranked', False)))
+        
+        # Pre-cache theme embeddings in Redis BLOCKING
+        # This ensures word selection is instant (cache hits only)
+        theme_words = game.get('theme', {}).get('words', [])
+        if theme_words:
             try:
-                get_embedding(new_word)  # Ensure cached
+                batch_get_embeddings(theme_words)
             except Exception as e:
-                print(f"Embedding error for change-word: {e}")  # Log server-side only
-                return self._send_error("Word processing service unavailable. Please try again.", 503)
-            
-            player['secret_word'] = new_word.lower()
-            player['can_change_word'] = False
-            player.pop('word_change_options', None)
-            
-            # Clear the waiting state - game can continue
-            game['waiting_for_word_change'] = None
-            game.pop('word_change_started_at', None)  # Clear word change timer
-            # Reset turn timer since the game was paused for word change
-            game['turn_started_at'] = time.time()
-            
-            # Add a history entry noting the word change
-            history_entry = {
-                "type": "word_change",
-                "player_id": player['id'],
-                "player_name": player['name'],
-            }
-            game['history'].append(history_entry)
-            
-            save_game(code, game)
-            
-            # Return full game state to avoid client needing a second fetch
-            game_response = self._build_game_response(game, player_id, code)
-            if game_response:
-                return self._send_json(game_response)
-            return self._send_json({"status": "word_changed"})
-
-        # POST /api/games/{code}/skip-word-change - Skip changing word
-        if '/skip-word-change' in path:
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'playing':
-                return self._send_error("Game not in progress", 400)
-            
-            # SECURITY: Validate player session token
-            player_id, session_error = self._validate_player_session(body, code)
-            if session_error:
-                return self._send_error(session_error, 403)
-            
-            player = None
-            for p in game['players']:
-                if p['id'] == player_id:
-                    player = p
-                    break
-            
-            if not player:
-                return self._send_error("You are not in this game", 403)
-            if not player.get('can_change_word', False):
-                return self._send_error("You don't have a word change to skip", 400)
-
-            # If we offered a random sample, allow keeping the current word only if it's in the sample.
-            offered = player.get('word_change_options')
-            if offered:
-                current_word = (player.get('secret_word') or '').lower()
-                offered_lower = [str(w).lower() for w in offered]
-                if current_word not in offered_lower:
-                    return self._send_error("You must pick a new word from the offered sample", 400)
-            
-            # Clear the ability and waiting state
-            player['can_change_word'] = False
-            game['waiting_for_word_change'] = None
-            player.pop('word_change_options', None)
-            game.pop('word_change_started_at', None)  # Clear word change timer
-            # Reset turn timer since the game was paused for word change
-            game['turn_started_at'] = time.time()
+                print(f"Theme embedding pre-cache error (start): {e}")
+        
+        # Save before answering: a start that loses a race is re-run, not dropped
+        theme_name = game['theme']['name']
+        save_game(code, game)
+        
+        return self._send_json({"status": "word_selection", "theme": theme_name})
+
+    # POST /api/games/{code}/begin - Start the actual game after word selection
+    @ROUTES.post('/api/games/{code}/begin', retry=True)
+    def _handle_post_game_begin(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        if game['host_id'] != player_id:
+            return self._send_error("Only the host can begin", 403)
+        if game['status'] != 'word_selection':
+            return self._send_error(f"Game not in word selection phase (status={game['status']})", 400)
 
-            # Record a word-change event even if the player keeps the same word, so it behaves like a re-encryption
-            game['history'].append({
-                "type": "word_change",
-                "player_id": player['id'],
-                "player_name": player['name'],
-            })
-            
-            save_game(code, game)
-            
-            # Return full game state to avoid client needing a second fetch
-            game_response = self._build_game_response(game, player_id, code)
-            if game_response:
-                return self._send_json(game_response)
-            return self._send_json({"status": "skipped"})
-
-        # POST /api/games/{code}/word-change-timeout - Auto-select random word when 15 seconds expires
-        if '/word-change-timeout' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'playing':
-                return self._send_error("Game not in progress", 400)
-            
-            waiting_player_id = game.get('waiting_for_word_change')
-            if not waiting_player_id:
-                return self._send_error("No word change in progress", 400)
-            
-            # Verify the word change time has actually expired (server-authoritative)
-            WORD_CHANGE_TIME_LIMIT = 30
-            word_change_started_at = game.get('word_change_started_at')
-            
-            if not word_change_started_at:
-                return self._send_error("No word change timer for this game", 400)
-            
-            elapsed = time.time() - word_change_started_at
-            # Allow 2 second grace period for network latency
-            if elapsed < WORD_CHANGE_TIME_LIMIT - 2:
-                return self._send_json({
-                    "timeout": False,
-                    "time_remaining": WORD_CHANGE_TIME_LIMIT - elapsed,
-                    "message": "Word change time has not expired yet",
-                })
-            
-            import random
-            
-            # Find the player who needs to change their word
-            player = None
-            for p in game['players']:
-                if p['id'] == waiting_player_id:
-                    player = p
-                    break
-            
-            if not player:
-                return self._send_error("Waiting player not found", 400)
-            
-            if not player.get('can_change_word'):
-                # Already changed or skipped - clear state and continue
-                game['waiting_for_word_change'] = None
-                game.pop('word_change_started_at', None)
-                game['turn_started_at'] = time.time()
-                save_game(code, game)
-                return self._send_json({"status": "already_changed"})
-            
-            # Get the offered options (or fall back to word pool)
-            offered = player.get('word_change_options')
-            if offered:
-                available = [str(w) for w in offered]
-            else:
-                available = player.get('word_pool', [])
-            
-            # Filter out guessed words
-            guessed_words = set()
-            for entry in game.get('history', []):
-                guessed_words.add(entry.get('word', '').lower())
-            available = [w for w in available if w.lower() not in guessed_words]
-            
-            if not available:
-                # Fallback: keep current word
-                new_word = player.get('secret_word', '')
-            else:
-                new_word = random.choice(available)
-            
-            # Update the player's word
-            if new_word and new_word.lower() != (player.get('secret_word') or '').lower():
+        # Singleplayer safety: if AIs haven't picked yet, pick them now (fallback for slow clients / many AIs)
+        if game.get('is_singleplayer'):
+            for p in game.get('players', []):
+                if not p.get('is_ai'):
+                    continue
+                if p.get('secret_word'):
+                    continue
+                pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
+                if not pool:
+                    continue
+                selected_word = ai_select_secret_word(p, pool, game)
+                if not selected_word:
+                    continue
                 try:
-                    get_embedding(new_word)  # Ensure cached
-                    player['secret_word'] = new_word.lower()
+                    get_embedding(selected_word)  # Ensure it's cached
+                    p['secret_word'] = selected_word.lower()
                 except Exception as e:
-                    print(f"Embedding error for word-change-timeout: {e}")
-                    # Keep current word on error
-            
-            player['can_change_word'] = False
-            player.pop('word_change_options', None)
-            
-            # Clear the waiting state - game can continue
-            game['waiting_for_word_change'] = None
-            game.pop('word_change_started_at', None)
-            game['turn_started_at'] = time.time()
-            
-            # Record a word-change event
-            game['history'].append({
-                "type": "word_change",
-                "player_id": player['id'],
-                "player_name": player['name'],
-                "auto_selected": True,  # Mark as auto-selected due to timeout
-            })
-            
-            save_game(code, game)
-            
+                    print(f"AI word selection error (begin): {e}")
+        
+        # Check all players have set their words
+        not_ready = [p['name'] for p in game['players'] if not p.get('secret_word')]
+        if not_ready:
+            print(f"[BEGIN DEBUG] Game {code} not ready - waiting for: {not_ready}")
+            print(f"[BEGIN DEBUG] Players: {[(p['name'], bool(p.get('secret_word'))) for p in game['players']]}")
+            return self._send_error(f"Waiting for: {', '.join(not_ready)}", 400)
+        
+        # Randomize turn order for multiplayer so the host doesn't always go first.
+        # (Singleplayer stays deterministic: the human host starts.)
+        if not game.get('is_singleplayer'):
+            import random
+            random.shuffle(game['players'])
+            game['current_turn'] = 0
+
+        # Initialize time_remaining for all players (chess clock model)
+        time_control = game.get('time_control', {})
+        initial_time = int(time_control.get('initial_time', 0) or 0)
+        for p in game['players']:
+            p['time_remaining'] = initial_time
+
+        # The game only stores a reference to its theme's similarity matrix.
+        # Resolve it now (artifact/Redis, or compute via OpenAI as a last
+        # resort) so guesses never see a started game without one.
+        if game.get('theme', {}).get('words'):
+            game['theme_matrix'] = theme_matrix_ref(game)
+            if not ensure_game_similarity_matrix(game):
+                return self._send_error("Failed to prepare theme. Please try again.", 503)
+
+        game['status'] = 'playing'
+        game['turn_started_at'] = time.time()  # Start the turn timer
+        save_game(code, game)
+        return self._send_json({"status": "playing"})
+
+    # POST /api/games/{code}/word-selection-timeout - Auto-assign random words when time expires
+    @ROUTES.post('/api/games/{code}/word-selection-timeout', retry=True)
+    def _handle_post_game_word_selection_timeout(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'word_selection':
+            return self._send_error("Game not in word selection phase", 400)
+        
+        # Verify the word selection time has actually expired (server-authoritative)
+        word_selection_started_at = game.get('word_selection_started_at')
+        word_selection_time = game.get('word_selection_time', 0)
+        
+        if not word_selection_started_at or word_selection_time <= 0:
+            return self._send_error("No word selection timer for this game", 400)
+        
+        elapsed = time.time() - word_selection_started_at
+        # Allow 2 second grace period for network latency
+        if elapsed < word_selection_time - 2:
             return self._send_json({
-                "status": "auto_selected",
-                "timeout": True,
+                "timeout": False,
+                "time_remaining": word_selection_time - elapsed,
+                "message": "Word selection time has not expired yet",
             })
-
-        # POST /api/games/{code}/timeout - Handle turn timeout (chess clock - always eliminates)
-        if '/timeout' in path and path.startswith('/api/games/'):
-            code = sanitize_game_code(path.split('/')[3])
-            if not code:
-                return self._send_error("Invalid game code format", 400)
-            
-            game = load_game(code)
-            
-            if not game:
-                return self._send_error("Game not found", 404)
-            if game['status'] != 'playing':
-                return self._send_error("Game not in progress", 400)
-            if game.get('waiting_for_word_change'):
-                return self._send_error("Game paused for word change", 400)
-            
-            # Check time control settings
-            time_control = game.get('time_control', {})
-            initial_time = int(time_control.get('initial_time', 0) or 0)
-            
-            if initial_time <= 0:
-                return self._send_error("No time limit for this game", 400)
-            
-            # Get the current player
-            current_turn_idx = game.get('current_turn', 0)
-            if current_turn_idx >= len(game['players']):
-                return self._send_error("Invalid turn index", 400)
+        
+        import random
+        
+        # Auto-assign random words to players who haven't picked
+        auto_assigned = []
+        for p in game['players']:
+            if p.get('secret_word'):
+                continue  # Already has a word
+            
+            # For AI players, use their AI selection logic
+            if p.get('is_ai'):
+                pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
+                if pool:
+                    selected_word = ai_select_secret_word(p, pool, game)
+                    if selected_word:
+                        try:
+                            get_embedding(selected_word)  # Ensure cached
+                            p['secret_word'] = selected_word.lower()
+                            auto_assigned.append({"id": p['id'], "name": p['name'], "is_ai": True})
+                        except Exception as e:
+                            print(f"AI word selection error (timeout): {e}")
+                continue
             
-            timed_out_player = game['players'][current_turn_idx]
-            if not timed_out_player.get('is_alive'):
-                return self._send_error("Current player is not alive", 400)
+            # For human players, pick a random word from their pool
+            pool = p.get('word_pool', [])
+            if pool:
+                selected_word = random.choice(pool)
+                try:
+                    get_embedding(selected_word)  # Ensure cached
+                    p['secret_word'] = selected_word.lower()
+                    auto_assigned.append({"id": p['id'], "name": p['name'], "is_ai": False})
+                except Exception as e:
+                    print(f"Auto-assign word error (timeout): {e}")
+        
+        save_game(code, game)
+        
+        # Check if all players now have words
+        all_ready = all(p.get('secret_word') for p in game['players'])
+        
+        return self._send_json({
+            "timeout": True,
+            "auto_assigned": auto_assigned,
+            "all_ready": all_ready,
+        })
+
+    # POST /api/games/{code}/ai-pick-words - Singleplayer: have AIs pick their secret words
+    @ROUTES.post('/api/games/{code}/ai-pick-words', retry=True)
+    def _handle_post_game_ai_pick_words(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        if not game:
+            return self._send_error("Game not found", 404)
+        if not game.get('is_singleplayer'):
+            return self._send_error("Not a singleplayer game", 400)
+        if game.get('status') != 'word_selection':
+            return self._send_error("AI can only pick words during word selection", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        if game.get('host_id') != player_id:
+            return self._send_error("Only the host can trigger AI word selection", 403)
+
+        max_to_pick = body.get('max_to_pick', 3)
+        try:
+            max_to_pick = int(max_to_pick)
+        except Exception:
+            max_to_pick = 3
+        max_to_pick = max(1, min(max_to_pick, 10))
+        
+        picked = 0
+        errors = 0
+        for p in game.get('players', []):
+            if picked >= max_to_pick:
+                break
+            if not p.get('is_ai'):
+                continue
+            if p.get('secret_word'):
+                continue
+            pool = p.get('word_pool', []) or game.get('theme', {}).get('words', [])
+            if not pool:
+                continue
+            selected_word = ai_select_secret_word(p, pool, game)
+            if not selected_word:
+                continue
+            try:
+                get_embedding(selected_word)  # Ensure cached
+                p['secret_word'] = selected_word.lower()
+                picked += 1
+            except Exception as e:
+                errors += 1
+                print(f"AI word selection error: {e}")
+        
+        save_game(code, game)
+        return self._send_json({
+            "status": "ai_words_picked",
+            "picked": picked,
+            "errors": errors,
+        })
+
+    # POST /api/games/{code}/ai-step - Singleplayer: process ALL AI turns until human turn or game over
+    @ROUTES.post('/api/games/{code}/ai-step', retry=True)
+    def _handle_post_game_ai_step(self, body: dict, client_ip: str, code: str):
+        # Rate limit: reuse guess limiter (AI can only act when it's their turn)
+        if not check_rate_limit(get_ratelimit_guess(), f"ai_step:{client_ip}"):
+            return self._send_error("Too many requests. Please wait.", 429)
+        
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code, with_ai=True)
+        if not game:
+            return self._send_error("Game not found", 404)
+        if not game.get('is_singleplayer'):
+            return self._send_error("Not a singleplayer game", 400)
+        if game.get('status') != 'playing':
+            return self._send_error("Game not in progress", 400)
+        
+        # Respect word-change pauses
+        if game.get('waiting_for_word_change'):
+            waiting_player = next((p for p in game['players'] if p['id'] == game['waiting_for_word_change']), None)
+            waiting_name = waiting_player['name'] if waiting_player else 'Someone'
+            return self._send_error(f"Waiting for {waiting_name} to change their word", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        if game.get('host_id') != player_id:
+            return self._send_error("Only the host can trigger AI turns", 403)
+        
+        # Ensure it's actually an AI's turn
+        if not game.get('players'):
+            return self._send_error("No players in game", 400)
+        
+        current_player = game['players'][game['current_turn']]
+        if not current_player.get('is_ai'):
+            return self._send_error("Not an AI turn", 400)
+        
+        # Process ALL AI turns until it's human's turn or game over
+        max_ai_turns = len(game['players']) * 2  # Safety limit
+        turns_processed = 0
+        
+        while turns_processed < max_ai_turns:
+            current_ai = game['players'][game['current_turn']]
             
-            # Calculate actual time remaining (chess clock model)
-            turn_started_at = game.get('turn_started_at')
-            player_time = timed_out_player.get('time_remaining', 0)
-            if turn_started_at:
-                elapsed = time.time() - turn_started_at
-                player_time = player_time - elapsed
+            # Stop if not AI turn
+            if not current_ai.get('is_ai'):
+                break
             
-            # Allow 2 second grace period for network latency
-            if player_time > 2:
-                return self._send_json({
-                    "timeout": False,
-                    "time_remaining": player_time,
-                    "message": "Turn has not expired yet",
-                })
+            # Skip dead AI
+            if not current_ai.get('is_alive'):
+                num_players = len(game['players'])
+                next_turn = (game['current_turn'] + 1) % num_players
+                while not game['players'][next_turn].get('is_alive'):
+                    next_turn = (next_turn + 1) % num_players
+                game['current_turn'] = next_turn
+                continue
             
-            # Set time to 0 (they ran out)
-            timed_out_player['time_remaining'] = 0
+            # Process AI turn
+            ai_result = process_ai_turn(game, current_ai)
+            if not ai_result:
+                break
             
-            # Record timeout in history
-            history_entry = {
-                "type": "timeout",
-                "player_id": timed_out_player['id'],
-                "player_name": timed_out_player['name'],
-                "penalty": "eliminate",
-            }
-            game['history'].append(history_entry)
+            turns_processed += 1
             
-            # Always eliminate on timeout (chess clock rules)
-            timed_out_player['is_alive'] = False
+            # If AI eliminated someone, auto-handle its word change immediately
+            if ai_result.get('eliminations') and current_ai.get('can_change_word'):
+                process_ai_word_change(game, current_ai)
             
             # Check for game over
             alive_players = [p for p in game['players'] if p.get('is_alive')]
-            game_over = False
             if len(alive_players) <= 1:
                 game['status'] = 'finished'
-                game_over = True
                 if alive_players:
                     game['winner'] = alive_players[0]['id']
-                update_game_stats(game)
-            else:
-                # Advance to next alive player
-                num_players = len(game['players'])
-                next_turn = (current_turn_idx + 1) % num_players
-                while not game['players'][next_turn].get('is_alive'):
-                    next_turn = (next_turn + 1) % num_players
-                game['current_turn'] = next_turn
-                game['turn_started_at'] = time.time()
+                break
+            
+            # Advance turn
+            num_players = len(game['players'])
+            next_turn = (game['current_turn'] + 1) % num_players
+            while not game['players'][next_turn].get('is_alive'):
+                next_turn = (next_turn + 1) % num_players
+            game['current_turn'] = next_turn
+            game['turn_started_at'] = time.time()
+        
+        if game['status'] == 'finished':
+            save_finished_game(code, game)
+        else:
+            save_game(code, game)
+        
+        # Return full game state
+        game_response = self._build_game_response(
+            game, player_id, code, history_since=self._cursor_param(body.get('history_since')))
+        if game_response:
+            return self._send_json(game_response)
+        
+        return self._send_json({"status": "ai_step_batch", "turns_processed": turns_processed})
+
+    # POST /api/games/{code}/guess
+    @ROUTES.post('/api/games/{code}/guess', retry=True)
+    def _handle_post_game_guess(self, body: dict, client_ip: str, code: str):
+        # Rate limit: 30 guesses/min per IP
+        if not check_rate_limit(get_ratelimit_guess(), client_ip):
+            return self._send_error("Too many guesses. Please wait.", 429)
+        
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code, with_ai=True)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'playing':
+            return self._send_error("Game not in progress", 400)
+        
+        # Check if game is paused waiting for word change
+        if game.get('waiting_for_word_change'):
+            waiting_player = next((p for p in game['players'] if p['id'] == game['waiting_for_word_change']), None)
+            waiting_name = waiting_player['name'] if waiting_player else 'Someone'
+            return self._send_error(f"Waiting for {waiting_name} to change their word", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        word = sanitize_word(body.get('word', ''))
+        if not word:
+            return self._send_error("Invalid word. Use only letters (2-30 chars)", 400)
+        
+        player = None
+        player_idx = -1
+        for i, p in enumerate(game['players']):
+            if p['id'] == player_id:
+                player = p
+                player_idx = i
+                break
+        
+        if not player:
+            return self._send_error("You are not in this game", 403)
+        if not player['is_alive']:
+            return self._send_error("You have been eliminated", 400)
+        
+        current_player = game['players'][game['current_turn']]
+        if current_player['id'] != player_id:
+            return self._send_error("It's not your turn", 400)
+        
+        # Validate word is in theme (required - all guesses must be theme words)
+        word_lower = word.lower()
+        theme_words = game.get('theme', {}).get('words', [])
+        theme_words_lower = {w.lower() for w in theme_words}
+        if word_lower not in theme_words_lower:
+            return self._send_error("Please select a word from the theme", 400)
+        
+        # Calculate similarities using pre-computed matrix
+        similarities = {}
+        matrix = ensure_game_similarity_matrix(game)
+        
+        if not matrix:
+            return self._send_error("Game not properly initialized", 500)
+        
+        for p in game['players']:
+            secret_word = p.get('secret_word')
+            if not secret_word:
+                continue
+            secret_lower = secret_word.lower()
             
+            # Use pre-computed similarity matrix (guaranteed to have all theme words)
+            sim = matrix.sim(word_lower, secret_lower)
+            if sim is not None:
+                similarities[p['id']] = round(sim, 4)
+        
+        # Eliminate players whose exact word was guessed
+        eliminations = []
+        for p in game['players']:
+            if p['id'] != player_id and p['is_alive']:
+                if word.lower() == p['secret_word'].lower():
+                    p['is_alive'] = False
+                    eliminations.append(p['id'])
+        
+        if eliminations:
+            player['can_change_word'] = True
+            game['waiting_for_word_change'] = player_id  # Pause game until word is changed
+            game['word_change_started_at'] = time.time()  # Start 30-second word change timer
+        
+        # Record history
+        history_entry = {
+            "guesser_id": player['id'],
+            "guesser_name": player['name'],
+            "word": word.lower(),
+            "similarities": similarities,
+            "eliminations": eliminations,
+        }
+        game['history'].append(history_entry)
+
+        # If the player earned a word change, offer a random sample of allowed words (including their current
+        # word only if it happens to be in the sample). Store on the player so it persists across refresh.
+        if eliminations:
+            try:
+                player['word_change_options'] = build_word_change_options(player, game)
+            except Exception as e:
+                print(f"Error building word change options: {e}")
+        
+        # Update AI memories and reactions with this guess (for singleplayer games)
+        ai_reactions = []
+        if game.get('is_singleplayer'):
+            for p in game['players']:
+                if p.get('is_ai'):
+                    ai_update_memory(p, word, similarities, game)
+                    
+                    # Track grudges against the guesser
+                    their_sim = similarities.get(p['id'], 0)
+                    if their_sim > 0.5:
+                        _ai_update_grudge(p, player_id, their_sim)
+                        _ai_update_confidence(p, "got_targeted", their_sim)
+                    
+                    # Generate AI reactions
+                    if p['id'] in eliminations:
+                        # AI got eliminated - generate reaction
+                        _ai_update_streak(p, "got_eliminated")
+                        chat_msg = _ai_generate_chat_message(p, "got_eliminated")
+                        if chat_msg:
+                            ai_reactions.append({
+                                "ai_name": p.get('name', 'AI'),
+                                "message": chat_msg,
+                            })
+                    elif their_sim > 0.65:
+                        # Near miss - AI might react
+                        chat_msg = _ai_generate_chat_message(p, "near_miss")
+                        if chat_msg:
+                            ai_reactions.append({
+                                "ai_name": p.get('name', 'AI'),
+                                "message": chat_msg,
+                            })
+        
+        # Advance turn (but game is paused if waiting for word change)
+        alive_players = [p for p in game['players'] if p['is_alive']]
+        game_over = False
+        
+        # Deduct elapsed time from current player and add increment (chess clock)
+        time_control = game.get('time_control', {})
+        increment = int(time_control.get('increment', 0) or 0)
+        turn_started_at = game.get('turn_started_at')
+        if turn_started_at and player.get('time_remaining') is not None:
+            elapsed = time.time() - turn_started_at
+            player['time_remaining'] = max(0, player['time_remaining'] - elapsed + increment)
+        
+        if len(alive_players) <= 1:
+            game['status'] = 'finished'
+            game['waiting_for_word_change'] = None  # Clear pause
+            game_over = True
+            if alive_players:
+                game['winner'] = alive_players[0]['id']
+        else:
+            num_players = len(game['players'])
+            next_turn = (game['current_turn'] + 1) % num_players
+            while not game['players'][next_turn]['is_alive']:
+                next_turn = (next_turn + 1) % num_players
+            game['current_turn'] = next_turn
+            # Reset turn timer for new player (unless waiting for word change)
+            if not game.get('waiting_for_word_change'):
+                game['turn_started_at'] = time.time()
+        
+        # Leaderboard stats are applied once the finishing save has won
+        if game_over:
+            save_finished_game(code, game)
+        else:
+            save_game(code, game)
+        
+        # Return full game state to avoid client needing a second fetch
+        game_response = self._build_game_response(
+            game, player_id, code, history_since=self._cursor_param(body.get('history_since')))
+        if game_response:
+            # Include AI reactions if any (singleplayer only)
+            if ai_reactions:
+                game_response['ai_reactions'] = ai_reactions
+            return self._send_json(game_response)
+        
+        # Fallback to minimal response if helper fails
+        response = {
+            "similarities": similarities,
+            "eliminations": eliminations,
+            "game_over": game_over,
+            "winner": game.get('winner'),
+            "waiting_for_word_change": game.get('waiting_for_word_change'),
+        }
+        if ai_reactions:
+            response['ai_reactions'] = ai_reactions
+        
+        return self._send_json(response)
+
+    # POST /api/games/{code}/change-word
+    @ROUTES.post('/api/games/{code}/change-word', retry=True)
+    def _handle_post_game_change_word(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'playing':
+            return self._send_error("Game not in progress", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        new_word = sanitize_word(body.get('new_word', ''))
+        if not new_word:
+            return self._send_error("Invalid word. Use only letters (2-30 chars)", 400)
+        
+        player = None
+        for p in game['players']:
+            if p['id'] == player_id:
+                player = p
+                break
+        
+        if not player:
+            return self._send_error("You are not in this game", 403)
+        if not player.get('can_change_word', False):
+            return self._send_error("You don't have a word change", 400)
+        
+        # Validate the word is a real English word
+        if not is_valid_word(new_word):
+            return self._send_error("Please enter a valid English word", 400)
+        
+        # If we offered a random sample for this word change, enforce it (takes priority over word pool).
+        offered = player.get('word_change_options')
+        if offered:
+            offered_lower = [str(w).lower() for w in offered]
+            if new_word.lower() not in offered_lower:
+                return self._send_error("Please choose a word from the offered sample", 400)
+        else:
+            # No word_change_options - fall back to checking the player's word pool
+            player_pool = player.get('word_pool', [])
+            if player_pool and new_word.lower() not in [w.lower() for w in player_pool]:
+                return self._send_error("Please choose a word from your word pool", 400)
+        
+        # Check if word has been guessed before
+        guessed_words = set()
+        for entry in game.get('history', []):
+            guessed_words.add(entry.get('word', '').lower())
+        if new_word.lower() in guessed_words:
+            return self._send_error("That word has already been guessed! Pick a different one.", 400)
+        
+        try:
+            get_embedding(new_word)  # Ensure cached
+        except Exception as e:
+            print(f"Embedding error for change-word: {e}")  # Log server-side only
+            return self._send_error("Word processing service unavailable. Please try again.", 503)
+        
+        player['secret_word'] = new_word.lower()
+        player['can_change_word'] = False
+        player.pop('word_change_options', None)
+        
+        # Clear the waiting state - game can continue
+        game['waiting_for_word_change'] = None
+        game.pop('word_change_started_at', None)  # Clear word change timer
+        # Reset turn timer since the game was paused for word change
+        game['turn_started_at'] = time.time()
+        
+        # Add a history entry noting the word change
+        history_entry = {
+            "type": "word_change",
+            "player_id": player['id'],
+            "player_name": player['name'],
+        }
+        game['history'].append(history_entry)
+        
+        save_game(code, game)
+        
+        # Return full game state to avoid client needing a second fetch
+        game_response = self._build_game_response(
+            game, player_id, code, history_since=self._cursor_param(body.get('history_since')))
+        if game_response:
+            return self._send_json(game_response)
+        return self._send_json({"status": "word_changed"})
+
+    # POST /api/games/{code}/skip-word-change - Skip changing word
+    @ROUTES.post('/api/games/{code}/skip-word-change', retry=True)
+    def _handle_post_game_skip_word_change(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'playing':
+            return self._send_error("Game not in progress", 400)
+        
+        # SECURITY: Validate player session token
+        player_id, session_error = self._validate_player_session(body, code)
+        if session_error:
+            return self._send_error(session_error, 403)
+        
+        player = None
+        for p in game['players']:
+            if p['id'] == player_id:
+                player = p
+                break
+        
+        if not player:
+            return self._send_error("You are not in this game", 403)
+        if not player.get('can_change_word', False):
+            return self._send_error("You don't have a word change to skip", 400)
+
+        # If we offered a random sample, allow keeping the current word only if it's in the sample.
+        offered = player.get('word_change_options')
+        if offered:
+            current_word = (player.get('secret_word') or '').lower()
+            offered_lower = [str(w).lower() for w in offered]
+            if current_word not in offered_lower:
+                return self._send_error("You must pick a new word from the offered sample", 400)
+        
+        # Clear the ability and waiting state
+        player['can_change_word'] = False
+        game['waiting_for_word_change'] = None
+        player.pop('word_change_options', None)
+        game.pop('word_change_started_at', None)  # Clear word change timer
+        # Reset turn timer since the game was paused for word change
+        game['turn_started_at'] = time.time()
+
+        # Record a word-change event even if the player keeps the same word, so it behaves like a re-encryption
+        game['history'].append({
+            "type": "word_change",
+            "player_id": player['id'],
+            "player_name": player['name'],
+        })
+        
+        save_game(code, game)
+        
+        # Return full game state to avoid client needing a second fetch
+        game_response = self._build_game_response(
+            game, player_id, code, history_since=self._cursor_param(body.get('history_since')))
+        if game_response:
+            return self._send_json(game_response)
+        return self._send_json({"status": "skipped"})
+
+    # POST /api/games/{code}/word-change-timeout - Auto-select random word when 15 seconds expires
+    @ROUTES.post('/api/games/{code}/word-change-timeout', retry=True)
+    def _handle_post_game_word_change_timeout(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'playing':
+            return self._send_error("Game not in progress", 400)
+        
+        waiting_player_id = game.get('waiting_for_word_change')
+        if not waiting_player_id:
+            return self._send_error("No word change in progress", 400)
+        
+        # Verify the word change time has actually expired (server-authoritative)
+        WORD_CHANGE_TIME_LIMIT = 30
+        word_change_started_at = game.get('word_change_started_at')
+        
+        if not word_change_started_at:
+            return self._send_error("No word change timer for this game", 400)
+        
+        elapsed = time.time() - word_change_started_at
+        # Allow 2 second grace period for network latency
+        if elapsed < WORD_CHANGE_TIME_LIMIT - 2:
+            return self._send_json({
+                "timeout": False,
+                "time_remaining": WORD_CHANGE_TIME_LIMIT - elapsed,
+                "message": "Word change time has not expired yet",
+            })
+        
+        import random
+        
+        # Find the player who needs to change their word
+        player = None
+        for p in game['players']:
+            if p['id'] == waiting_player_id:
+                player = p
+                break
+        
+        if not player:
+            return self._send_error("Waiting player not found", 400)
+        
+        if not player.get('can_change_word'):
+            # Already changed or skipped - clear state and continue
+            game['waiting_for_word_change'] = None
+            game.pop('word_change_started_at', None)
+            game['turn_started_at'] = time.time()
             save_game(code, game)
-            
-            # Return full game state
-            player_id = sanitize_player_id(body.get('player_id', ''))
-            game_response = self._build_game_response(game, player_id or timed_out_player['id'], code)
-            if game_response:
-                game_response['timeout'] = True
-                game_response['timed_out_player'] = {
-                    "id": timed_out_player['id'],
-                    "name": timed_out_player['name'],
-                }
-                return self._send_json(game_response)
-            
+            return self._send_json({"status": "already_changed"})
+        
+        # Get the offered options (or fall back to word pool)
+        offered = player.get('word_change_options')
+        if offered:
+            available = [str(w) for w in offered]
+        else:
+            available = player.get('word_pool', [])
+        
+        # Filter out guessed words
+        guessed_words = set()
+        for entry in game.get('history', []):
+            guessed_words.add(entry.get('word', '').lower())
+        available = [w for w in available if w.lower() not in guessed_words]
+        
+        if not available:
+            # Fallback: keep current word
+            new_word = player.get('secret_word', '')
+        else:
+            new_word = random.choice(available)
+        
+        # Update the player's word
+        if new_word and new_word.lower() != (player.get('secret_word') or '').lower():
+            try:
+                get_embedding(new_word)  # Ensure cached
+                player['secret_word'] = new_word.lower()
+            except Exception as e:
+                print(f"Embedding error for word-change-timeout: {e}")
+                # Keep current word on error
+        
+        player['can_change_word'] = False
+        player.pop('word_change_options', None)
+        
+        # Clear the waiting state - game can continue
+        game['waiting_for_word_change'] = None
+        game.pop('word_change_started_at', None)
+        game['turn_started_at'] = time.time()
+        
+        # Record a word-change event
+        game['history'].append({
+            "type": "word_change",
+            "player_id": player['id'],
+            "player_name": player['name'],
+            "auto_selected": True,  # Mark as auto-selected due to timeout
+        })
+        
+        save_game(code, game)
+        
+        return self._send_json({
+            "status": "auto_selected",
+            "timeout": True,
+        })
+
+    # POST /api/games/{code}/timeout - Handle turn timeout (chess clock - always eliminates)
+    @ROUTES.post('/api/games/{code}/timeout', retry=True)
+    def _handle_post_game_timeout(self, body: dict, client_ip: str, code: str):
+        code = sanitize_game_code(code)
+        if not code:
+            return self._send_error("Invalid game code format", 400)
+        
+        game = load_game(code)
+        
+        if not game:
+            return self._send_error("Game not found", 404)
+        if game['status'] != 'playing':
+            return self._send_error("Game not in progress", 400)
+        if game.get('waiting_for_word_change'):
+            return self._send_error("Game paused for word change", 400)
+        
+        # Check time control settings
+        time_control = game.get('time_control', {})
+        initial_time = int(time_control.get('initial_time', 0) or 0)
+        
+        if initial_time <= 0:
+            return self._send_error("No time limit for this game", 400)
+        
+        # Get the current player
+        current_turn_idx = game.get('current_turn', 0)
+        if current_turn_idx >= len(game['players']):
+            return self._send_error("Invalid turn index", 400)
+        
+        timed_out_player = game['players'][current_turn_idx]
+        if not timed_out_player.get('is_alive'):
+            return self._send_error("Current player is not alive", 400)
+        
+        # Calculate actual time remaining (chess clock model)
+        turn_started_at = game.get('turn_started_at')
+        player_time = timed_out_player.get('time_remaining', 0)
+        if turn_started_at:
+            elapsed = time.time() - turn_started_at
+            player_time = player_time - elapsed
+        
+        # Allow 2 second grace period for network latency
+        if player_time > 2:
             return self._send_json({
-                "timeout": True,
-                "timed_out_player": {
-                    "id": timed_out_player['id'],
-                    "name": timed_out_player['name'],
-                },
-                "game_over": game_over,
+                "timeout": False,
+                "time_remaining": player_time,
+                "message": "Turn has not expired yet",
             })
+        
+        # Set time to 0 (they ran out)
+        timed_out_player['time_remaining'] = 0
+        
+        # Record timeout in history
+        history_entry = {
+            "type": "timeout",
+            "player_id": timed_out_player['id'],
+            "player_name": timed_out_player['name'],
+            "penalty": "eliminate",
+        }
+        game['history'].append(history_entry)
+        
+        # Always eliminate on timeout (chess clock rules)
+        timed_out_player['is_alive'] = False
+        
+        # Check for game over
+        alive_players = [p for p in game['players'] if p.get('is_alive')]
+        game_over = False
+        if len(alive_players) <= 1:
+            game['status'] = 'finished'
+            game_over = True
+            if alive_players:
+                game['winner'] = alive_players[0]['id']
+        else:
+            # Advance to next alive player
+            num_players = len(game['players'])
+            next_turn = (current_turn_idx + 1) % num_players
+            while not game['players'][next_turn].get('is_alive'):
+                next_turn = (next_turn + 1) % num_players
+            game['current_turn'] = next_turn
+            game['turn_started_at'] = time.time()
+        
+        if game_over:
+            save_finished_game(code, game)
+        else:
+            save_game(code, game)
+        
+        # Return full game state
+        player_id = sanitize_player_id(body.get('player_id', ''))
+        game_response = self._build_game_response(
+            game, player_id or timed_out_player['id'], code,
+            history_since=self._cursor_param(body.get('history_since')))
+        if game_response:
+            game_response['timeout'] = True
+            game_response['timed_out_player'] = {
+                "id": timed_out_player['id'],
+                "name": timed_out_player['name'],
+            }
+            return self._send_json(game_response)
+        
+        return self._send_json({
+            "timeout": True,
+            "timed_out_player": {
+                "id": timed_out_player['id'],
+                "name": timed_out_player['name'],
+            },
+            "game_over": game_over,
+        })
+
+    # POST /api/user/username - Set or update username
+    @ROUTES.post('/api/user/username')
+    def _handle_post_user_username(self, body: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
 
-        # POST /api/user/username - Set or update username
-        if path == '/api/user/username':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
-
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
 
-            user = get_user_by_id(payload.get('sub', ''))
-            if not user:
-                return self._send_error("User not found", 404)
+        user = get_user_by_id(payload.get('sub', ''))
+        if not user:
+            return self._send_error("User not found", 404)
 
-            new_username = body.get('username', '')
-            if not isinstance(new_username, str):
-                return self._send_error("Username must be a string", 400)
-            
-            new_username = new_username.strip()
-            
-            # Validate username
-            is_valid, error_msg = validate_username(new_username)
-            if not is_valid:
-                return self._send_error(error_msg, 400)
-            
-            # Check if user already has this username (case-insensitive)
-            current_username = user.get('username')
-            if current_username and current_username.lower() == new_username.lower():
-                return self._send_json({
-                    "success": True,
-                    "username": current_username,
-                    "message": "Username unchanged"
-                })
-            
-            # Check availability
-            if not is_username_available(new_username):
-                return self._send_error("This username is already taken", 409)
-            
-            # Release old username if exists
-            if current_username:
-                release_username(current_username, user['id'])
-            
-            # Reserve new username
-            if not reserve_username(new_username, user['id']):
-                return self._send_error("Failed to reserve username. Please try again.", 500)
-            
-            # Update user record
-            user['username'] = new_username
-            save_user(user)
-            
+        new_username = body.get('username', '')
+        if not isinstance(new_username, str):
+            return self._send_error("Username must be a string", 400)
+        
+        new_username = new_username.strip()
+        
+        # Validate username
+        is_valid, error_msg = validate_username(new_username)
+        if not is_valid:
+            return self._send_error(error_msg, 400)
+        
+        # Check if user already has this username (case-insensitive)
+        current_username = user.get('username')
+        if current_username and current_username.lower() == new_username.lower():
             return self._send_json({
                 "success": True,
-                "username": new_username,
+                "username": current_username,
+                "message": "Username unchanged"
             })
+        
+        # Check availability
+        if not is_username_available(new_username):
+            return self._send_error("This username is already taken", 409)
+        
+        # Release old username if exists
+        if current_username:
+            release_username(current_username, user['id'])
+        
+        # Reserve new username
+        if not reserve_username(new_username, user['id']):
+            return self._send_error("Failed to reserve username. Please try again.", 500)
+        
+        # Update user record
+        user['username'] = new_username
+        save_user(user)
+        
+        return self._send_json({
+            "success": True,
+            "username": new_username,
+        })
+
+    # POST /api/user/daily/claim - Claim a completed daily or weekly quest for credits
+    @ROUTES.post('/api/user/daily/claim')
+    def _handle_post_user_daily_claim(self, body: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
 
-        # POST /api/user/daily/claim - Claim a completed daily or weekly quest for credits
-        if path == '/api/user/daily/claim':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
-
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
-
-            quest_id = body.get('quest_id', '')
-            if not isinstance(quest_id, str) or not quest_id.strip():
-                return self._send_error("quest_id required", 400)
-            quest_id = quest_id.strip()
-            
-            quest_type = body.get('quest_type', 'daily')
-            if quest_type not in ('daily', 'weekly'):
-                quest_type = 'daily'
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
+
+        quest_id = body.get('quest_id', '')
+        if not isinstance(quest_id, str) or not quest_id.strip():
+            return self._send_error("quest_id required", 400)
+        quest_id = quest_id.strip()
+        
+        quest_type = body.get('quest_type', 'daily')
+        if quest_type not in ('daily', 'weekly'):
+            quest_type = 'daily'
 
-            user = get_user_by_id(payload.get('sub', ''))
-            if not user:
-                return self._send_error("User not found", 404)
+        user = get_user_by_id(payload.get('sub', ''))
+        if not user:
+            return self._send_error("User not found", 404)
 
-            ensure_user_economy(user, persist=False)
-            
-            if quest_type == 'weekly':
-                weekly_quests = ensure_weekly_quests(user, persist=False)
-                quests = weekly_quests
-            else:
-                daily_state = ensure_daily_quests_today(user, persist=False)
-                quests = daily_state.get('quests', [])
-            
-            if not isinstance(quests, list):
-                quests = []
+        ensure_user_economy(user, persist=False)
+        
+        if quest_type == 'weekly':
+            weekly_quests = ensure_weekly_quests(user, persist=False)
+            quests = weekly_quests
+        else:
+            daily_state = ensure_daily_quests_today(user, persist=False)
+            quests = daily_state.get('quests', [])
+        
+        if not isinstance(quests, list):
+            quests = []
 
-            quest = next((q for q in quests if isinstance(q, dict) and q.get('id') == quest_id), None)
-            if not quest:
-                return self._send_error("Quest not found", 404)
+        quest = next((q for q in quests if isinstance(q, dict) and q.get('id') == quest_id), None)
+        if not quest:
+            return self._send_error("Quest not found", 404)
 
-            try:
-                progress = int(quest.get('progress', 0) or 0)
-                target = int(quest.get('target', 0) or 0)
-                reward = int(quest.get('reward_credits', 0) or 0)
-            except Exception:
-                progress, target, reward = 0, 0, 0
+        try:
+            progress = int(quest.get('progress', 0) or 0)
+            target = int(quest.get('target', 0) or 0)
+            reward = int(quest.get('reward_credits', 0) or 0)
+        except Exception:
+            progress, target, reward = 0, 0, 0
 
-            if target <= 0 or progress < target:
-                return self._send_error("Quest not completed yet", 400)
-            if bool(quest.get('claimed', False)):
-                return self._send_error("Quest already claimed", 400)
+        if target <= 0 or progress < target:
+            return self._send_error("Quest not completed yet", 400)
+        if bool(quest.get('claimed', False)):
+            return self._send_error("Quest already claimed", 400)
 
-            quest['claimed'] = True
-            add_user_credits(user, reward, persist=False)
+        quest['claimed'] = True
+        add_user_credits(user, reward, persist=False)
+        
+        if quest_type == 'weekly':
+            user['weekly_quests'] = {"week_start": get_week_start_str(), "quests": quests}
+        else:
+            user['daily_quests'] = daily_state
             
-            if quest_type == 'weekly':
-                user['weekly_quests'] = {"week_start": get_week_start_str(), "quests": quests}
-            else:
-                user['daily_quests'] = daily_state
-                
-            save_user(user)
-            econ = ensure_user_economy(user, persist=False)
-            return self._send_json({
-                "status": "claimed",
-                "reward_credits": reward,
-                "wallet": econ.get("wallet") or {"credits": 0},
-            })
-
-        # POST /api/shop/purchase - Purchase a cosmetic with credits (shop exclusives)
-        if path == '/api/shop/purchase':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
-
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
-
-            category = body.get('category', '')
-            cosmetic_id = body.get('cosmetic_id', '')
-            if not isinstance(category, str) or not isinstance(cosmetic_id, str):
-                return self._send_error("category and cosmetic_id required", 400)
-            category = category.strip()
-            cosmetic_id = cosmetic_id.strip()
-            if not category or not cosmetic_id:
-                return self._send_error("category and cosmetic_id required", 400)
-
-            catalog_key = COSMETIC_CATEGORY_TO_CATALOG_KEY.get(category)
-            if not catalog_key:
-                return self._send_error("Invalid category", 400)
-
-            item = get_cosmetic_item(catalog_key, cosmetic_id)
-            if not item:
-                return self._send_error("Invalid cosmetic", 400)
-
-            # Shop does not sell premium cosmetics (donation-only)
-            if bool(item.get('premium', False)):
-                return self._send_error("Premium cosmetics cannot be purchased with credits", 403)
+        save_user(user)
+        econ = ensure_user_economy(user, persist=False)
+        return self._send_json({
+            "status": "claimed",
+            "reward_credits": reward,
+            "wallet": econ.get("wallet") or {"credits": 0},
+        })
+
+    # POST /api/shop/purchase - Purchase a cosmetic with credits (shop exclusives)
+    @ROUTES.post('/api/shop/purchase')
+    def _handle_post_shop_purchase(self, body: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
 
-            try:
-                price = int(item.get('price', 0) or 0)
-            except Exception:
-                price = 0
-            if price <= 0:
-                return self._send_error("This item is not for sale", 400)
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
+
+        category = body.get('category', '')
+        cosmetic_id = body.get('cosmetic_id', '')
+        if not isinstance(category, str) or not isinstance(cosmetic_id, str):
+            return self._send_error("category and cosmetic_id required", 400)
+        category = category.strip()
+        cosmetic_id = cosmetic_id.strip()
+        if not category or not cosmetic_id:
+            return self._send_error("category and cosmetic_id required", 400)
+
+        catalog_key = COSMETIC_CATEGORY_TO_CATALOG_KEY.get(category)
+        if not catalog_key:
+            return self._send_error("Invalid category", 400)
+
+        item = get_cosmetic_item(catalog_key, cosmetic_id)
+        if not item:
+            return self._send_error("Invalid cosmetic", 400)
 
-            user = get_user_by_id(payload.get('sub', ''))
-            if not user:
-                return self._send_error("User not found", 404)
+        # Shop does not sell premium cosmetics (donation-only)
+        if bool(item.get('premium', False)):
+            return self._send_error("Premium cosmetics cannot be purchased with credits", 403)
 
-            ensure_user_economy(user, persist=False)
+        try:
+            price = int(item.get('price', 0) or 0)
+        except Exception:
+            price = 0
+        if price <= 0:
+            return self._send_error("This item is not for sale", 400)
 
-            if user_owns_cosmetic(user, category, cosmetic_id):
-                econ = ensure_user_economy(user, persist=False)
-                return self._send_json({
-                    "status": "already_owned",
-                    "wallet": econ.get("wallet") or {"credits": 0},
-                    "owned_cosmetics": econ.get("owned_cosmetics") or {},
-                })
+        user = get_user_by_id(payload.get('sub', ''))
+        if not user:
+            return self._send_error("User not found", 404)
 
-            credits = get_user_credits(user)
-            if credits < price:
-                return self._send_error("Not enough credits", 403)
+        ensure_user_economy(user, persist=False)
 
-            add_user_credits(user, -price, persist=False)
-            grant_owned_cosmetic(user, category, cosmetic_id, persist=False)
-            save_user(user)
+        if user_owns_cosmetic(user, category, cosmetic_id):
             econ = ensure_user_economy(user, persist=False)
             return self._send_json({
-                "status": "purchased",
+                "status": "already_owned",
                 "wallet": econ.get("wallet") or {"credits": 0},
                 "owned_cosmetics": econ.get("owned_cosmetics") or {},
             })
 
-        # POST /api/shop/purchase-bundle - Purchase a cosmetic bundle
-        if path == '/api/shop/purchase-bundle':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
+        credits = get_user_credits(user)
+        if credits < price:
+            return self._send_error("Not enough credits", 403)
 
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
+        add_user_credits(user, -price, persist=False)
+        grant_owned_cosmetic(user, category, cosmetic_id, persist=False)
+        save_user(user)
+        econ = ensure_user_economy(user, persist=False)
+        return self._send_json({
+            "status": "purchased",
+            "wallet": econ.get("wallet") or {"credits": 0},
+            "owned_cosmetics": econ.get("owned_cosmetics") or {},
+        })
+
+    # POST /api/shop/purchase-bundle - Purchase a cosmetic bundle
+    @ROUTES.post('/api/shop/purchase-bundle')
+    def _handle_post_shop_purchase_bundle(self, body: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
 
-            bundle_id = body.get('bundle_id', '')
-            if not isinstance(bundle_id, str) or not bundle_id.strip():
-                return self._send_error("bundle_id required", 400)
-            bundle_id = bundle_id.strip()
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
 
-            # Get bundle from catalog
-            bundles = COSMETICS_CATALOG.get('bundles', {})
-            bundle = bundles.get(bundle_id)
-            if not bundle:
-                return self._send_error("Invalid bundle", 400)
+        bundle_id = body.get('bundle_id', '')
+        if not isinstance(bundle_id, str) or not bundle_id.strip():
+            return self._send_error("bundle_id required", 400)
+        bundle_id = bundle_id.strip()
 
-            try:
-                price = int(bundle.get('price', 0) or 0)
-            except Exception:
-                price = 0
-            if price <= 0:
-                return self._send_error("This bundle is not for sale", 400)
+        # Get bundle from catalog
+        bundles = COSMETICS_CATALOG.get('bundles', {})
+        bundle = bundles.get(bundle_id)
+        if not bundle:
+            return self._send_error("Invalid bundle", 400)
 
-            contents = bundle.get('contents', {})
-            if not contents:
-                return self._send_error("Bundle has no contents", 400)
+        try:
+            price = int(bundle.get('price', 0) or 0)
+        except Exception:
+            price = 0
+        if price <= 0:
+            return self._send_error("This bundle is not for sale", 400)
 
-            user = get_user_by_id(payload.get('sub', ''))
-            if not user:
-                return self._send_error("User not found", 404)
+        contents = bundle.get('contents', {})
+        if not contents:
+            return self._send_error("Bundle has no contents", 400)
 
-            ensure_user_economy(user, persist=False)
+        user = get_user_by_id(payload.get('sub', ''))
+        if not user:
+            return self._send_error("User not found", 404)
 
-            credits = get_user_credits(user)
-            if credits < price:
-                return self._send_error("Not enough credits", 403)
+        ensure_user_economy(user, persist=False)
 
-            # Grant all items in bundle
-            for cat_key, cosmetic_id in contents.items():
-                if not user_owns_cosmetic(user, cat_key, cosmetic_id):
-                    grant_owned_cosmetic(user, cat_key, cosmetic_id, persist=False)
+        credits = get_user_credits(user)
+        if credits < price:
+            return self._send_error("Not enough credits", 403)
 
-            add_user_credits(user, -price, persist=False)
-            save_user(user)
-            econ = ensure_user_economy(user, persist=False)
-            return self._send_json({
-                "status": "purchased",
-                "bundle_id": bundle_id,
-                "wallet": econ.get("wallet") or {"credits": 0},
-                "owned_cosmetics": econ.get("owned_cosmetics") or {},
-            })
+        # Grant all items in bundle
+        for cat_key, cosmetic_id in contents.items():
+            if not user_owns_cosmetic(user, cat_key, cosmetic_id):
+                grant_owned_cosmetic(user, cat_key, cosmetic_id, persist=False)
 
-        # POST /api/cosmetics/equip - Equip a cosmetic
-        if path == '/api/cosmetics/equip':
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return self._send_error("Not authenticated", 401)
-            
-            token = auth_header[7:]
-            payload = verify_jwt_token(token)
-            
-            if not payload:
-                return self._send_error("Invalid or expired token", 401)
-            
-            category = body.get('category', '')
-            cosmetic_id = body.get('cosmetic_id', '')
-            
-            if not category or not cosmetic_id:
-                return self._send_error("Category and cosmetic_id required", 400)
+        add_user_credits(user, -price, persist=False)
+        save_user(user)
+        econ = ensure_user_economy(user, persist=False)
+        return self._send_json({
+            "status": "purchased",
+            "bundle_id": bundle_id,
+            "wallet": econ.get("wallet") or {"credits": 0},
+            "owned_cosmetics": econ.get("owned_cosmetics") or {},
+        })
+
+    # POST /api/cosmetics/equip - Equip a cosmetic
+    @ROUTES.post('/api/cosmetics/equip')
+    def _handle_post_cosmetics_equip(self, body: dict, client_ip: str):
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return self._send_error("Not authenticated", 401)
+        
+        token = auth_header[7:]
+        payload = verify_jwt_token(token)
+        
+        if not payload:
+            return self._send_error("Invalid or expired token", 401)
+        
+        category = body.get('category', '')
+        cosmetic_id = body.get('cosmetic_id', '')
+        
+        if not category or not cosmetic_id:
+            return self._send_error("Category and cosmetic_id required", 400)
 
-            catalog_key = COSMETIC_CATEGORY_TO_CATALOG_KEY.get(category)
-            if not catalog_key:
-                return self._send_error("Invalid category", 400)
-            
-            item = get_cosmetic_item(catalog_key, cosmetic_id)
-            if not item:
-                return self._send_error("Invalid cosmetic", 400)
-            
-            user = get_user_by_id(payload['sub'])
-            if not user:
-                return self._send_error("User not found", 404)
-            
-            if not category or not cosmetic_id:
-                return self._send_error("Category and cosmetic_id required", 400)
-            
-            is_donor = user.get('is_donor', False)
-            is_admin = user.get('is_admin', False)
+        catalog_key = COSMETIC_CATEGORY_TO_CATALOG_KEY.get(category)
+        if not catalog_key:
+            return self._send_error("Invalid category", 400)
+        
+        item = get_cosmetic_item(catalog_key, cosmetic_id)
+        if not item:
+            return self._send_error("Invalid cosmetic", 400)
+        
+        user = get_user_by_id(payload['sub'])
+        if not user:
+            return self._send_error("User not found", 404)
+        
+        if not category or not cosmetic_id:
+            return self._send_error("Category and cosmetic_id required", 400)
+        
+        is_donor = user.get('is_donor', False)
+        is_admin = user.get('is_admin', False)
 
-            # Admin-only gating (always enforced)
-            if item.get('admin_only', False) and not is_admin:
-                return self._send_error("This legendary cosmetic is admin-only!", 403)
+        # Admin-only gating (always enforced)
+        if item.get('admin_only', False) and not is_admin:
+            return self._send_error("This legendary cosmetic is admin-only!", 403)
 
-            # Premium gating (feature-flagged)
-            if COSMETICS_PAYWALL_ENABLED and not COSMETICS_UNLOCK_ALL and item.get('premium', False) and not is_donor and not is_admin:
-                return self._send_error("Donate to unlock premium cosmetics!", 403)
-            
-            # Progression gating (always on): requirements are multiplayer-only stats (mp_*)
-            if not (is_admin or COSMETICS_UNLOCK_ALL):
-                unmet = get_unmet_cosmetic_requirement(item, get_user_stats(user))
-                if unmet:
-                    label = COSMETIC_REQUIREMENT_LABELS.get(unmet['metric'], unmet['metric'])
-                    return self._send_error(
-                        f"Locked: requires {unmet['min']} {label} ({unmet['have']}/{unmet['min']})",
-                        403,
-                    )
-
-            # Shop ownership gating: priced cosmetics must be purchased before equipping
-            if not (is_admin or COSMETICS_UNLOCK_ALL):
-                try:
-                    price = int(item.get('price', 0) or 0)
-                except Exception:
-                    price = 0
-                if price > 0 and not user_owns_cosmetic(user, category, cosmetic_id):
-                    return self._send_error(f"Locked: purchase in Shop ({price} credits)", 403)
-            
-            # Update user's cosmetics
-            if 'cosmetics' not in user:
-                user['cosmetics'] = DEFAULT_COSMETICS.copy()
-            user['cosmetics'][category] = cosmetic_id
-            
-            save_user(user)
-            return self._send_json({
-                "status": "equipped",
-                "cosmetics": get_user_cosmetics(user),
-            })
+        # Premium gating (feature-flagged)
+        if COSMETICS_PAYWALL_ENABLED and not COSMETICS_UNLOCK_ALL and item.get('premium', False) and not is_donor and not is_admin:
+            return self._send_error("Donate to unlock premium cosmetics!", 403)
+        
+        # Progression gating (always on): requirements are multiplayer-only stats (mp_*)
+        if not (is_admin or COSMETICS_UNLOCK_ALL):
+            unmet = get_unmet_cosmetic_requirement(item, get_user_stats(user))
+            if unmet:
+                label = COSMETIC_REQUIREMENT_LABELS.get(unmet['metric'], unmet['metric'])
+                return self._send_error(
+                    f"Locked: requires {unmet['min']} {label} ({unmet['have']}/{unmet['min']})",
+                    403,
+                )
 
-        # POST /api/webhooks/kofi - Handle Ko-fi donation webhooks
-        if path == '/api/webhooks/kofi':
-            client_ip = get_client_ip(self.headers)
-            
-            # Ko-fi sends data as form-urlencoded with a 'data' field containing JSON
+        # Shop ownership gating: priced cosmetics must be purchased before equipping
+        if not (is_admin or COSMETICS_UNLOCK_ALL):
             try:
-                # The body should contain a 'data' field with JSON
-                kofi_data = body.get('data')
-                if isinstance(kofi_data, str):
-                    kofi_data = json.loads(kofi_data)
-                elif not kofi_data:
-                    kofi_data = body  # Fallback to direct body
-                
-                # SECURITY: Verify the webhook token
-                # In production, this is REQUIRED to prevent spoofed donations
-                is_production = os.getenv('VERCEL_ENV') == 'production'
-                received_token = kofi_data.get('verification_token', '')
-                
-                if KOFI_VERIFICATION_TOKEN:
-                    # Use constant-time comparison to prevent timing attacks
-                    if not constant_time_compare(received_token, KOFI_VERIFICATION_TOKEN):
-                        log_webhook_event(client_ip, "kofi", False, {"reason": "invalid_token"})
-                        print(f"Ko-fi webhook: Invalid verification token from {client_ip}")
-                        return self._send_error("Invalid verification token", 403)
-                elif not KOFI_SKIP_VERIFICATION:
-                    # SECURITY: Default to requiring verification - explicit opt-out required
-                    log_webhook_event(client_ip, "kofi", False, {"reason": "no_token_configured"})
-                    print(f"[SECURITY ERROR] Ko-fi webhook received but KOFI_VERIFICATION_TOKEN not configured")
-                    return self._send_error("Webhook verification not configured", 500)
-                else:
-                    # Explicit skip enabled - warn but allow (development only)
-                    print(f"[SECURITY WARNING] Ko-fi webhook verification explicitly skipped via KOFI_SKIP_VERIFICATION")
-                
-                # Get donor email
-                donor_email = kofi_data.get('email', '').lower().strip()
-                if not donor_email:
-                    log_webhook_event(client_ip, "kofi", True, {"status": "no_email"})
-                    print(f"Ko-fi webhook: No email provided")
-                    return self._send_json({"status": "ok", "message": "No email to process"})
-                
-                # Look up user by email
-                user = get_user_by_email(donor_email)
-                if not user:
-                    # Store pending donation for when user signs up
-                    redis = get_redis()
-                    redis.set(f"pending_donation:{donor_email}", json.dumps({
-                        'amount': kofi_data.get('amount', '0'),
-                        'timestamp': int(time.time()),
-                        'message': kofi_data.get('message', ''),
-                    }))
-                    log_webhook_event(client_ip, "kofi", True, {"status": "pending", "email_hash": hashlib.sha256(donor_email.encode()).hexdigest()[:8]})
-                    print(f"Ko-fi webhook: Stored pending donation for {donor_email}")
-                    return self._send_json({"status": "ok", "message": "Pending donation stored"})
-                
-                # Mark user as donor
-                user['is_donor'] = True
-                user['donation_date'] = int(time.time())
-                user['donation_amount'] = kofi_data.get('amount', '0')
-                save_user(user)
-                
-                log_webhook_event(client_ip, "kofi", True, {"status": "processed", "user_id": user.get('id', '')[:16]})
-                print(f"Ko-fi webhook: Marked {donor_email} as donor")
-                return self._send_json({"status": "ok", "message": "Donor status updated"})
-                
-            except Exception as e:
-                log_webhook_event(client_ip, "kofi", False, {"reason": "exception", "error": str(e)[:100]})
-                print(f"Ko-fi webhook error: {e}")
-                return self._send_error("Webhook processing failed", 500)
+                price = int(item.get('price', 0) or 0)
+            except Exception:
+                price = 0
+            if price > 0 and not user_owns_cosmetic(user, category, cosmetic_id):
+                return self._send_error(f"Locked: purchase in Shop ({price} credits)", 403)
+        
+        # Update user's cosmetics
+        if 'cosmetics' not in user:
+            user['cosmetics'] = DEFAULT_COSMETICS.copy()
+        user['cosmetics'][category] = cosmetic_id
+        
+        save_user(user)
+        return self._send_json({
+            "status": "equipped",
+            "cosmetics": get_user_cosmetics(user),
+        })
+
+    # POST /api/webhooks/kofi - Handle Ko-fi donation webhooks
+    @ROUTES.post('/api/webhooks/kofi')
+    def _handle_post_webhooks_kofi(self, body: dict, client_ip: str):
+        client_ip = get_client_ip(self.headers)
+        
+        # Ko-fi sends data as form-urlencoded with a 'data' field containing JSON
+        try:
+            # The body should contain a 'data' field with JSON
+            kofi_data = body.get('data')
+            if isinstance(kofi_data, str):
+                kofi_data = json.loads(kofi_data)
+            elif not kofi_data:
+                kofi_data = body  # Fallback to direct body
+            
+            # SECURITY: Verify the webhook token
+            # In production, this is REQUIRED to prevent spoofed donations
+            is_production = os.getenv('VERCEL_ENV') == 'production'
+            received_token = kofi_data.get('verification_token', '')
+            
+            if KOFI_VERIFICATION_TOKEN:
+                # Use constant-time comparison to prevent timing attacks
+                if not constant_time_compare(received_token, KOFI_VERIFICATION_TOKEN):
+                    log_webhook_event(client_ip, "kofi", False, {"reason": "invalid_token"})
+                    print(f"Ko-fi webhook: Invalid verification token from {client_ip}")
+                    return self._send_error("Invalid verification token", 403)
+            elif not KOFI_SKIP_VERIFICATION:
+                # SECURITY: Default to requiring verification - explicit opt-out required
+                log_webhook_event(client_ip, "kofi", False, {"reason": "no_token_configured"})
+                print(f"[SECURITY ERROR] Ko-fi webhook received but KOFI_VERIFICATION_TOKEN not configured")
+                return self._send_error("Webhook verification not configured", 500)
+            else:
+                # Explicit skip enabled - warn but allow (development only)
+                print(f"[SECURITY WARNING] Ko-fi webhook verification explicitly skipped via KOFI_SKIP_VERIFICATION")
+            
+            # Get donor email
+            donor_email = kofi_data.get('email', '').lower().strip()
+            if not donor_email:
+                log_webhook_event(client_ip, "kofi", True, {"status": "no_email"})
+                print(f"Ko-fi webhook: No email provided")
+                return self._send_json({"status": "ok", "message": "No email to process"})
+            
+            # Look up user by email
+            user = get_user_by_email(donor_email)
+            if not user:
+                # Store pending donation for when user signs up
+                redis = get_redis()
+                redis.set(f"pending_donation:{donor_email}", json.dumps({
+                    'amount': kofi_data.get('amount', '0'),
+                    'timestamp': int(time.time()),
+                    'message': kofi_data.get('message', ''),
+                }))
+                log_webhook_event(client_ip, "kofi", True, {"status": "pending", "email_hash": hashlib.sha256(donor_email.encode()).hexdigest()[:8]})
+                print(f"Ko-fi webhook: Stored pending donation for {donor_email}")
+                return self._send_json({"status": "ok", "message": "Pending donation stored"})
+            
+            # Mark user as donor
+            user['is_donor'] = True
+            user['donation_date'] = int(time.time())
+            user['donation_amount'] = kofi_data.get('amount', '0')
+            save_user(user)
+            
+            log_webhook_event(client_ip, "kofi", True, {"status": "processed", "user_id": user.get('id', '')[:16]})
+            print(f"Ko-fi webhook: Marked {donor_email} as donor")
+            return self._send_json({"status": "ok", "message": "Donor status updated"})
+            
+        except Exception as e:
+            log_webhook_event(client_ip, "kofi", False, {"reason": "exception", "error": str(e)[:100]})
+            print(f"Ko-fi webhook error: {e}")
+            return self._send_error("Webhook processing failed", 500)
+
+    # ============== METRICS ==============
+    # GET /api/admin/metrics - Prometheus text exposition. Admins, or scrapers
+    # sending "Authorization: Bearer $METRICS_TOKEN". With flushing enabled the
+    # counters cover every live instance (?scope=local for this one only).
+    @ROUTES.get('/api/admin/metrics')
+    def _handle_get_admin_metrics(self, query: dict, client_ip: str):
+        if not (self._has_metrics_token() or self._is_admin_request()):
+            return self._send_error("Admin access required", 403)
+        if METRICS_FLUSHER.enabled and query.get('scope') != 'local':
+            snapshot = METRICS_FLUSHER.merged_snapshot()
+        else:
+            snapshot = METRICS.snapshot()
+        text = render(snapshot, METRICS.prefix) + render(live_metrics(snapshot), METRICS.prefix)
+        return self._send_text(text, 'text/plain; version=0.0.4; charset=utf-8')
+
+    def _has_metrics_token(self) -> bool:
+        expected = os.getenv('METRICS_TOKEN', '')
+        auth_header = self.headers.get('Authorization', '') or ''
+        if not expected or not auth_header.startswith('Bearer '):
+            return False
+        return constant_time_compare(auth_header[7:], expected)
 
-        self._send_error("Not found", 404)
+    def _send_text(self, text: str, content_type: str, status: int = 200):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self._send_server_timing(len(body))
+        self._send_standard_headers()
+        self.wfile.write(body)
+
+    # ============== MODULE ROUTES ==============
+    # Endpoints from the api/routes package that this handler doesn't define
+    # itself. They return (status, body) and are mounted under their prefix.
+
+    def _send_module_result(self, result):
+        """Send a routes-module result; None means the module didn't handle the path."""
+        if not result:
+            return self._send_error("Not found", 404)
+        status, data = result
+        return self._send_json(data, status)
+
+    def _handle_admin_module(self, payload: dict, client_ip: str, path: str):
+        module = load_route_module('admin')
+        result = module and module.handle_admin_routes(self, self.command, path, payload, self.headers, client_ip)
+        return self._send_module_result(result)
+
+    def _handle_auth_module(self, payload: dict, client_ip: str, path: str):
+        module = load_route_module('auth')
+        result = module and module.handle_auth_routes(self, self.command, path, {}, payload, self.headers, client_ip)
+        return self._send_module_result(result)
+
+
+ROUTES.mount('GET', '/api/admin', handler._handle_admin_module)
+ROUTES.mount('POST', '/api/admin', handler._handle_admin_module)
+ROUTES.mount('POST', '/api/auth', handler._handle_auth_module)
@@ -0,0 +1,378 @@
+"""
+Request Metrics
+Rolling per-route statistics and Prometheus-style metrics for the API handler
+
+RouteStats keeps the most recent requests of every route (window samples
+each) and summarizes them on demand: latency percentiles, Redis round
+trips, commands, time and bytes per request, and response size. Lifetime
+request and server error (5xx) counts are kept beside the window.
+
+    ROUTE_STATS = RouteStats(window=500)
+    ROUTE_STATS.record("POST /api/games/{code}/guess", seconds, trace)
+    ROUTE_STATS.snapshot()   # {route: {"count": ..., "p95_ms": ..., ...}}
+
+MetricsRegistry holds labelled counters, gauges and histograms and renders
+them in the Prometheus text exposition format:
+
+    METRICS = MetricsRegistry(prefix="embeddle_")
+    METRICS.histogram("http_request_duration_seconds", "Handler time")
+    METRICS.observe("http_request_duration_seconds", 0.012, route="GET /api/lobbies", status="200")
+    render(METRICS.snapshot())
+
+Statistics are per process: on serverless every instance has its own.
+MetricsFlusher periodically writes an instance's snapshot to Redis so a
+scrape can merge every live instance (merge_snapshots).
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_WINDOW = 500
+
+# Histogram upper bounds in seconds (+Inf is implicit)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+WAIT_BUCKETS = (1.0, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0, 180.0, 300.0)
+
+# Redis keys for flushed instance snapshots
+INSTANCES_KEY = "metrics:instances"
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list (0 for an empty one)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class _RouteWindow:
+    __slots__ = ("count", "errors", "samples")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        # (seconds, redis calls, redis commands, redis seconds, bytes sent, bytes received, response bytes)
+        self.samples = deque(maxlen=window)
+
+
+class RouteStats:
+    """Rolling request statistics per route (thread-safe)."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = max(1, int(window))
+        self._lock = threading.Lock()
+        self._routes: Dict[str, _RouteWindow] = {}
+
+    def record(self, route: str, seconds: float, trace=None):
+        """
+        Add one request.
+
+        Args:
+            route: Route label, e.g. "GET /api/games/{code}"
+            seconds: Handler time
+            trace: The request's RequestTrace, if it was traced (a missing
+                status counts as an error: the handler raised)
+        """
+        status = getattr(trace, "status", None) or 500
+        sample = (
+            seconds,
+            getattr(trace, "redis_calls", 0),
+            getattr(trace, "redis_commands", 0),
+            getattr(trace, "redis_seconds", 0.0),
+            getattr(trace, "redis_bytes_sent", 0),
+            getattr(trace, "redis_bytes_received", 0),
+            getattr(trace, "response_bytes", 0),
+        )
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = _RouteWindow(self.window)
+            entry.count += 1
+            if status >= 500:
+                entry.errors += 1
+            entry.samples.append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Summary per route, busiest first; times in ms, Redis and byte figures are means per request."""
+        with self._lock:
+            routes = {name: (entry.count, entry.errors, list(entry.samples))
+                      for name, entry in self._routes.items()}
+
+        summary = {}
+        for name, (count, errors, samples) in sorted(routes.items(), key=lambda item: -item[1][0]):
+            n = len(samples)
+            ms = sorted(s[0] * 1000 for s in samples)
+            columns = list(zip(*samples))
+            summary[name] = {
+                "count": count,
+                "errors": errors,
+                "window": n,
+                "p50_ms": round(percentile(ms, 0.50), 2),
+                "p95_ms": round(percentile(ms, 0.95), 2),
+                "p99_ms": round(percentile(ms, 0.99), 2),
+                "max_ms": round(ms[-1], 2),
+                "redis_calls": round(sum(columns[1]) / n, 2),
+                "redis_commands": round(sum(columns[2]) / n, 2),
+                "redis_ms": round(sum(columns[3]) * 1000 / n, 2),
+                "redis_bytes_sent": round(sum(columns[4]) / n),
+                "redis_bytes_received": round(sum(columns[5]) / n),
+                "response_bytes": round(sum(columns[6]) / n),
+            }
+        return summary
+
+
+# ============== PROMETHEUS METRICS ==============
+
+METRIC_TYPES = ("counter", "gauge", "histogram")
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Labelled counters, gauges and histograms (thread-safe).
+
+    Metrics are declared once with counter()/gauge()/histogram(); updating
+    an undeclared name raises KeyError. Collectors (add_collector) run before
+    every snapshot to copy in values kept elsewhere, using set().
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # name -> {"type", "help", "buckets"}
+        self._meta: Dict[str, dict] = {}
+        # name -> {label key: float, or histogram [count per bucket..., +Inf count, sum]}
+        self._values: Dict[str, dict] = {}
+        self._collectors: List[Callable] = []
+
+    # ============== DECLARATION ==============
+
+    def _declare(self, name: str, kind: str, help_text: str, buckets: tuple = ()):
+        with self._lock:
+            if name not in self._meta:
+                self._meta[name] = {"type": kind, "help": help_text, "buckets": list(buckets)}
+                self._values[name] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._declare(name, "counter", help_text)
+
+    def gauge(self, name: str, help_text: str):
+        self._declare(name, "gauge", help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DURATION_BUCKETS):
+        self._declare(name, "histogram", help_text, tuple(sorted(buckets)))
+
+    def add_collector(self, collector: Callable):
+        """Call collector(registry) before every snapshot."""
+        self._collectors.append(collector)
+
+    # ============== UPDATES ==============
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """Add to a counter (or gauge)."""
+        key = _label_key(labels)
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge, or a counter mirrored from another monotonic source."""
+        with self._lock:
+            self._values[name][_label_key(labels)] = float(value)
+
+    def observe(self, name: str, value: float, **labels):
+        """Add one observation to a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            buckets = self._meta[name]["buckets"]
+            values = self._values[name]
+            counts = values.get(key)
+            if counts is None:
+                counts = values[key] = [0] * (len(buckets) + 1) + [0.0]
+            i = 0
+            while i < len(buckets) and value > buckets[i]:
+                i += 1
+            counts[i] += 1
+            counts[-1] += value
+
+    # ============== EXPORT ==============
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable copy of every metric (after running the collectors).
+
+        Returns:
+            {name: {"type", "help", "buckets", "samples": [[labels, value], ...]}}
+        """
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        with self._lock:
+            return {
+                name: {
+                    **meta,
+                    "buckets": list(meta["buckets"]),
+                    "samples": [[dict(key), list(value) if isinstance(value, list) else value]
+                                for key, value in self._values[name].items()],
+                }
+                for name, meta in self._meta.items()
+            }
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """
+    Sum snapshots from several instances (counters, gauges and histogram
+    buckets add up; histograms whose buckets differ keep the first layout).
+    """
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in (snapshot or {}).items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, "samples": {}}
+            elif target["type"] != metric.get("type") or target["buckets"] != metric.get("buckets"):
+                continue
+            for labels, value in metric.get("samples", []):
+                key = _label_key(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(current, list):
+                    target["samples"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["samples"][key] = current + value
+    for metric in merged.values():
+        metric["samples"] = [[dict(key), value] for key, value in metric["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labels: dict, extra: Optional[tuple] = None) -> str:
+    items = sorted(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snapshot: dict, prefix: str = "") -> str:
+    """Prometheus text exposition (format 0.0.4) of a snapshot."""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        full = prefix + name
+        lines.append(f"# HELP {full} {metric['help']}")
+        lines.append(f"# TYPE {full} {metric['type']}")
+        samples = sorted(metric["samples"], key=lambda s: sorted(s[0].items()))
+        for labels, value in samples:
+            if metric["type"] != "histogram":
+                lines.append(f"{full}{_labels_text(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + [float("inf")], value[:-1]):
+                cumulative += count
+                lines.append(f"{full}_bucket{_labels_text(labels, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{full}_sum{_labels_text(labels)} {_number(value[-1])}")
+            lines.append(f"{full}_count{_labels_text(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ============== INSTANCE FLUSH ==============
+
+def _instance_key(instance_id: str) -> str:
+    return f"metrics:instance:{instance_id}"
+
+
+class MetricsFlusher:
+    """
+    Writes a registry's snapshot to Redis at most every interval seconds.
+
+    Snapshots expire after ttl_seconds, so instances that stop (serverless
+    scale-down) drop out of merged totals; counters then step down, which
+    rate() treats as a reset.
+    """
+
+    def __init__(self, registry: MetricsRegistry, get_redis: Callable, instance_id: str,
+                 interval_seconds: float, ttl_seconds: int = 3600):
+        self.registry = registry
+        self.instance_id = instance_id
+        self.interval = float(interval_seconds)
+        self.ttl = max(1, int(ttl_seconds))
+        self._get_redis = get_redis
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def maybe_flush(self):
+        """Flush if enabled and the interval has passed (never raises)."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_flush < self.interval:
+                return
+            self._last_flush = now
+        self.flush()
+
+    def flush(self) -> bool:
+        """Write this instance's snapshot now."""
+        try:
+            pipe = self._get_redis().pipeline()
+            pipe.setex(_instance_key(self.instance_id), self.ttl, json.dumps(self.registry.snapshot()))
+            pipe.zadd(INSTANCES_KEY, {self.instance_id: time.time()})
+            pipe.expire(INSTANCES_KEY, self.ttl)
+            pipe.exec()
+            return True
+        except Exception as e:
+            print(f"Metrics flush error: {e}")
+            return False
+
+    def merged_snapshot(self) -> dict:
+        """
+        This instance's live snapshot merged with every other instance's last flush.
+
+        Falls back to the local snapshot if Redis can't be read.
+        """
+        local = self.registry.snapshot()
+        try:
+            redis = self._get_redis()
+            now = time.time()
+            redis.zremrangebyscore(INSTANCES_KEY, 0, now - self.ttl)
+            others = [i for i in (redis.zrange(INSTANCES_KEY, 0, -1) or []) if i != self.instance_id]
+            raw = redis.mget(*[_instance_key(i) for i in others]) if others else []
+        except Exception as e:
+            print(f"Metrics merge error: {e}")
+            return local
+        snapshots = [local]
+        for value in raw:
+            try:
+                if value:
+                    snapshots.append(json.loads(value))
+            except ValueError:
+                pass
+        return merge_snapshots(snapshots)
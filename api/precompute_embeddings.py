@@ -11,11 +11,22 @@ Run this script:
 - Periodically to refresh cache (embeddings expire after 24h by default)
 - On server startup for local development
 
+With --artifacts it also writes versioned .npy similarity matrices, plus a
+sorted top-K nearest-neighbour table per matrix, to api/themes/artifacts/.
+The API memory-maps them before trying Redis. Commit those files so game
+start never depends on cache TTLs.
+
+Embeddings come from the configured provider. With EMBEDDING_PROVIDER=local
+and --artifacts-only the whole run is offline (artifacts are named by the
+local model, so they never replace the OpenAI ones).
+
 Usage:
-    python api/precompute_embeddings.py [--force]
+    python api/precompute_embeddings.py [--force] [--artifacts | --artifacts-only]
 
 Options:
-    --force    Recompute even if already cached
+    --force             Recompute even if already cached
+    --artifacts         Also write .npy artifacts next to the theme files
+    --artifacts-only    Only write artifacts (no Redis required)
 """
 
 import argparse
@@ -26,19 +37,29 @@ import time
 from pathlib import Path
 
 import numpy as np
-from openai import OpenAI
 from upstash_redis import Redis
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
+from embeddings.similarity_matrix import SimilarityMatrix
+from embeddings.artifacts import (
+    artifact_path,
+    load_similarity_artifact,
+    neighbor_artifact_path,
+    write_similarity_artifact,
+)
+from embeddings.codec import encode_embedding
+from embeddings.providers import EmbeddingProvider, provider_from_config
+from embeddings.store import redis_key
+
 # Load config
 CONFIG_PATH = Path(__file__).parent / "config.json"
 with open(CONFIG_PATH) as f:
     CONFIG = json.load(f)
 
-EMBEDDING_MODEL = CONFIG.get("embedding", {}).get("model", "text-embedding-3-large")
 EMBEDDING_CACHE_SECONDS = CONFIG.get("embedding", {}).get("cache_expiry_seconds", 86400)
+EMBEDDING_STORAGE_DTYPE = CONFIG.get("embedding", {}).get("storage_dtype", "float32")
 # Similarity matrices can be cached longer since themes are static
 SIMILARITY_MATRIX_CACHE_SECONDS = 86400 * 7  # 7 days
 
@@ -52,12 +73,23 @@ def get_redis():
     return Redis(url=url, token=token)
 
 
+_openai_client = None
+
+
 def get_openai_client():
-    """Get OpenAI client."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY required")
-    return OpenAI(api_key=api_key)
+    """Get OpenAI client (only the openai provider calls this)."""
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY required")
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=api_key)
+    return _openai_client
+
+
+EMBEDDING_PROVIDER = provider_from_config(CONFIG, get_openai_client)
+EMBEDDING_MODEL = EMBEDDING_PROVIDER.model
 
 
 def load_themes() -> dict:
@@ -82,68 +114,42 @@ def load_themes() -> dict:
     return themes
 
 
-def batch_get_embeddings(client: OpenAI, words: list, batch_size: int = 100) -> dict:
+def batch_get_embeddings(provider: EmbeddingProvider, words: list, batch_size: int = 100) -> dict:
     """Get embeddings for multiple words in batches."""
     result = {}
     words_lower = [w.lower().strip() for w in words]
     
     for i in range(0, len(words_lower), batch_size):
         batch = words_lower[i:i + batch_size]
-        response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=batch,
-        )
-        for j, embedding_data in enumerate(response.data):
-            result[batch[j]] = embedding_data.embedding
+        for word, embedding in zip(batch, provider.embed(batch)):
+            result[word] = embedding
     
     return result
 
 
-def compute_similarity_matrix(embeddings: dict) -> dict:
+def compute_similarity_matrix(embeddings: dict) -> SimilarityMatrix:
     """
     Compute similarity matrix for all words using vectorized numpy operations.
-    Returns dict mapping word -> {word: similarity} for O(1) lookups.
+    Returns a compact SimilarityMatrix (ordered word list + quantized array).
     """
-    words = list(embeddings.keys())
-    if not words:
-        return {}
-    
-    # Stack all embeddings into a matrix for vectorized computation
-    embeddings_matrix = np.array([embeddings[w] for w in words])
-    
-    # Normalize all vectors (for cosine similarity)
-    norms = np.linalg.norm(embeddings_matrix, axis=1, keepdims=True)
-    norms[norms == 0] = 1  # Avoid division by zero
-    normalized = embeddings_matrix / norms
-    
-    # Compute all pairwise similarities at once: (n x d) @ (d x n) = (n x n)
-    similarity_matrix = np.dot(normalized, normalized.T)
-    
-    # Convert to dict format
-    matrix = {}
-    for i, w1 in enumerate(words):
-        matrix[w1] = {}
-        for j, w2 in enumerate(words):
-            matrix[w1][w2] = round(float(similarity_matrix[i, j]), 4)
-    
-    return matrix
+    return SimilarityMatrix.from_embeddings(embeddings)
 
 
 def cache_embeddings(redis: Redis, embeddings: dict, force: bool = False) -> int:
     """Cache individual word embeddings in Redis. Returns count of newly cached."""
     cached_count = 0
     for word, embedding in embeddings.items():
-        cache_key = f"emb:{word}"
+        cache_key = redis_key(word, EMBEDDING_PROVIDER.key_prefix)
         if not force:
             existing = redis.get(cache_key)
             if existing:
                 continue
-        redis.setex(cache_key, EMBEDDING_CACHE_SECONDS, json.dumps(embedding))
+        redis.setex(cache_key, EMBEDDING_CACHE_SECONDS, encode_embedding(embedding, EMBEDDING_MODEL, EMBEDDING_STORAGE_DTYPE))
         cached_count += 1
     return cached_count
 
 
-def cache_similarity_matrix(redis: Redis, theme_name: str, matrix: dict, force: bool = False) -> bool:
+def cache_similarity_matrix(redis: Redis, theme_name: str, matrix: SimilarityMatrix, force: bool = False) -> bool:
     """Cache similarity matrix for a theme. Returns True if cached."""
     # Use a consistent key format for theme similarity matrices
     cache_key = f"theme_sim:{theme_name.lower().replace(' ', '_').replace('&', 'and')}"
@@ -153,33 +159,40 @@ def cache_similarity_matrix(redis: Redis, theme_name: str, matrix: dict, force:
         if existing:
             return False
     
-    redis.setex(cache_key, SIMILARITY_MATRIX_CACHE_SECONDS, json.dumps(matrix))
+    redis.setex(cache_key, SIMILARITY_MATRIX_CACHE_SECONDS, matrix.to_base64())
     return True
 
 
-def get_cached_similarity_matrix(redis: Redis, theme_name: str) -> dict | None:
-    """Get cached similarity matrix for a theme."""
+def get_cached_similarity_matrix(redis: Redis, theme_name: str) -> SimilarityMatrix | None:
+    """Get cached similarity matrix for a theme (compact or legacy JSON format)."""
     cache_key = f"theme_sim:{theme_name.lower().replace(' ', '_').replace('&', 'and')}"
     cached = redis.get(cache_key)
     if cached:
-        return json.loads(cached)
+        return SimilarityMatrix.loads(cached)
     return None
 
 
-def precompute_all(force: bool = False, verbose: bool = True) -> dict:
+def precompute_all(force: bool = False, verbose: bool = True,
+                   artifacts: bool = False, use_redis: bool = True) -> dict:
     """
     Precompute embeddings and similarity matrices for all themes.
     
+    Args:
+        force: Recompute even if already cached / written
+        verbose: Print per-theme progress
+        artifacts: Also write versioned .npy artifacts to api/themes/artifacts/
+        use_redis: Cache embeddings and matrices in Redis (disable for artifact-only builds)
+    
     Returns stats dict with counts of what was processed.
     """
-    redis = get_redis()
-    client = get_openai_client()
+    redis = get_redis() if use_redis else None
     themes = load_themes()
     
     stats = {
         "themes_processed": 0,
         "embeddings_cached": 0,
         "matrices_cached": 0,
+        "artifacts_written": 0,
         "themes_skipped": 0,
         "errors": [],
     }
@@ -192,40 +205,61 @@ def precompute_all(force: bool = False, verbose: bool = True) -> dict:
             if verbose:
                 print(f"\nProcessing theme: {theme_name} ({len(words)} words)")
             
-            # Check if matrix already cached
-            if not force:
-                existing_matrix = get_cached_similarity_matrix(redis, theme_name)
-                if existing_matrix:
-                    if verbose:
-                        print(f"  ✓ Matrix already cached, skipping")
-                    stats["themes_skipped"] += 1
-                    continue
+            # Check what is already cached / shipped
+            need_redis = use_redis and (force or not get_cached_similarity_matrix(redis, theme_name))
+            need_artifact = artifacts and (
+                force
+                or not artifact_path(theme_name, words, EMBEDDING_MODEL).exists()
+                or not neighbor_artifact_path(theme_name, words, EMBEDDING_MODEL).exists()
+            )
+            if not need_redis and not need_artifact:
+                if verbose:
+                    print(f"  ✓ Matrix already cached, skipping")
+                stats["themes_skipped"] += 1
+                continue
+            
+            # Matrix shipped before neighbour tables existed: build the table from it
+            shipped = None if (force or need_redis) else load_similarity_artifact(theme_name, words, EMBEDDING_MODEL)
+            if shipped is not None:
+                path = write_similarity_artifact(theme_name, words, shipped, EMBEDDING_MODEL)
+                stats["artifacts_written"] += 1
+                if verbose:
+                    print(f"  ✓ Added neighbour table for {path.relative_to(Path(__file__).parent)}")
+                stats["themes_processed"] += 1
+                continue
             
             # Get embeddings
             start = time.time()
-            embeddings = batch_get_embeddings(client, words)
+            embeddings = batch_get_embeddings(EMBEDDING_PROVIDER, words)
             embed_time = time.time() - start
             if verbose:
                 print(f"  Got {len(embeddings)} embeddings in {embed_time:.2f}s")
             
             # Cache individual embeddings
-            cached = cache_embeddings(redis, embeddings, force=force)
-            stats["embeddings_cached"] += cached
-            if verbose:
-                print(f"  Cached {cached} embeddings")
+            if use_redis:
+                cached = cache_embeddings(redis, embeddings, force=force)
+                stats["embeddings_cached"] += cached
+                if verbose:
+                    print(f"  Cached {cached} embeddings")
             
             # Compute and cache similarity matrix
             start = time.time()
             matrix = compute_similarity_matrix(embeddings)
             compute_time = time.time() - start
             if verbose:
-                print(f"  Computed similarity matrix in {compute_time:.3f}s")
+                print(f"  Computed similarity matrix in {compute_time:.3f}s ({matrix.nbytes // 1024} KB)")
             
-            if cache_similarity_matrix(redis, theme_name, matrix, force=force):
+            if need_redis and cache_similarity_matrix(redis, theme_name, matrix, force=force):
                 stats["matrices_cached"] += 1
                 if verbose:
                     print(f"  ✓ Cached similarity matrix")
             
+            if need_artifact:
+                path = write_similarity_artifact(theme_name, words, matrix, EMBEDDING_MODEL)
+                stats["artifacts_written"] += 1
+                if verbose:
+                    print(f"  ✓ Wrote {path.relative_to(Path(__file__).parent)}")
+            
             stats["themes_processed"] += 1
             
         except Exception as e:
@@ -241,14 +275,24 @@ def main():
     parser = argparse.ArgumentParser(description="Precompute theme embeddings and similarity matrices")
     parser.add_argument("--force", action="store_true", help="Recompute even if already cached")
     parser.add_argument("--quiet", action="store_true", help="Minimal output")
+    parser.add_argument("--artifacts", action="store_true",
+                        help="Also write versioned .npy similarity artifacts to api/themes/artifacts/")
+    parser.add_argument("--artifacts-only", action="store_true",
+                        help="Only write artifacts (no Redis required)")
     args = parser.parse_args()
     
     print("=" * 60)
     print("Precomputing theme embeddings and similarity matrices")
+    print(f"Provider: {EMBEDDING_PROVIDER.name} ({EMBEDDING_MODEL})")
     print("=" * 60)
     
     start = time.time()
-    stats = precompute_all(force=args.force, verbose=not args.quiet)
+    stats = precompute_all(
+        force=args.force,
+        verbose=not args.quiet,
+        artifacts=args.artifacts or args.artifacts_only,
+        use_redis=not args.artifacts_only,
+    )
     total_time = time.time() - start
     
     print("\n" + "=" * 60)
@@ -257,6 +301,7 @@ def main():
     print(f"  Themes skipped (already cached): {stats['themes_skipped']}")
     print(f"  Embeddings cached: {stats['embeddings_cached']}")
     print(f"  Similarity matrices cached: {stats['matrices_cached']}")
+    print(f"  Artifacts written: {stats['artifacts_written']}")
     print(f"  Errors: {len(stats['errors'])}")
     print(f"  Total time: {total_time:.2f}s")
     print("=" * 60)
@@ -272,4 +317,3 @@ def main():
 
 if __name__ == "__main__":
     sys.exit(main())
-
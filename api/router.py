@@ -0,0 +1,194 @@
+"""
+Route Table
+Method + path pattern dispatch for the API handler
+
+Routes are registered with a decorator on the handler method:
+
+    ROUTES = RouteTable()
+
+    class handler(BaseHTTPRequestHandler):
+        @ROUTES.post('/api/games/{code}/guess')
+        def _post_guess(self, body, client_ip, code):
+            ...
+
+Patterns are literal segments and {name} parameters (one whole segment
+each). Matching walks a segment tree: one dict probe per path segment no
+matter how many routes exist, backtracking only where a literal segment
+leads to a dead end. Literal segments win over parameters
+(/api/challenge/create before /api/challenge/{id}), so registration order
+never matters. Whole subtrees served by another module's dispatcher are
+attached with mount().
+
+Keyword arguments to the decorators are kept as route.options for the
+dispatcher (e.g. @ROUTES.post('/api/games/{code}/vote', retry=True)).
+
+Dispatchers wrap the handler call in timed(); timing hooks then get
+(route, target, seconds) once per request, after the handler returns or
+raises.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_PARAM = object()
+
+
+class Route:
+    """One registered route: method, pattern, the function serving it and dispatcher options."""
+
+    __slots__ = ("method", "pattern", "handler", "params", "options")
+
+    def __init__(self, method: str, pattern: str, handler: Callable, params: tuple = (),
+                 options: Optional[dict] = None):
+        self.method = method
+        self.pattern = pattern
+        self.handler = handler
+        self.params = params
+        self.options = options or {}
+
+    @property
+    def name(self) -> str:
+        """Label for logs and metrics, e.g. "POST /api/games/{code}/guess"."""
+        return f"{self.method} {self.pattern}"
+
+    def __repr__(self) -> str:
+        return f"Route({self.name!r})"
+
+
+def _split(path: str) -> List[str]:
+    return [segment for segment in path.split('/') if segment]
+
+
+def _walk(node: dict, segments: List[str], i: int, values: list) -> Optional[Tuple[Route, list]]:
+    """Match segments[i:] below node, literal children first (backtracking into parameters)."""
+    if i == len(segments):
+        route = node.get(None)
+        return (route, values) if route is not None else None
+    child = node.get(segments[i])
+    if child is not None:
+        found = _walk(child, segments, i + 1, values)
+        if found is not None:
+            return found
+    param = node.get(_PARAM)
+    if param is not None:
+        return _walk(param[1], segments, i + 1, values + [segments[i]])
+    return None
+
+
+class RouteTable:
+    """Compiled routes for one handler class."""
+
+    def __init__(self):
+        # method -> segment tree; each node is {segment: child, _PARAM: (name, child), None: Route}
+        self._trees: Dict[str, dict] = {}
+        self._mounts: List[Tuple[str, str, Route]] = []
+        self._timing_hooks: List[Callable] = []
+
+    # ============== REGISTRATION ==============
+
+    def add(self, method: str, pattern: str, handler: Callable, **options) -> Route:
+        """
+        Register a function for a method and pattern (options are kept on the route).
+
+        Raises:
+            ValueError: The pattern is already registered (or differs from an
+                existing one only in parameter names)
+        """
+        method = method.upper()
+        node = self._trees.setdefault(method, {})
+        params = []
+        for segment in _split(pattern):
+            if segment.startswith('{') and segment.endswith('}'):
+                name = segment[1:-1]
+                existing = node.get(_PARAM)
+                if existing is None:
+                    existing = node[_PARAM] = (name, {})
+                elif existing[0] != name:
+                    raise ValueError(f"{method} {pattern}: parameter {{{name}}} clashes with {{{existing[0]}}}")
+                params.append(name)
+                node = existing[1]
+            else:
+                node = node.setdefault(segment, {})
+        if None in node:
+            raise ValueError(f"Duplicate route: {method} {pattern}")
+        route = node[None] = Route(method, pattern, handler, tuple(params), options)
+        return route
+
+    def route(self, method: str, pattern: str, **options) -> Callable:
+        """Decorator form of add(); returns the function unchanged."""
+        def register(fn: Callable) -> Callable:
+            self.add(method, pattern, fn, **options)
+            return fn
+        return register
+
+    def get(self, pattern: str, **options) -> Callable:
+        return self.route('GET', pattern, **options)
+
+    def post(self, pattern: str, **options) -> Callable:
+        return self.route('POST', pattern, **options)
+
+    def mount(self, method: str, prefix: str, handler: Callable) -> Route:
+        """
+        Serve every path under prefix (that no pattern matched) with handler.
+
+        Mounted handlers get the full path as the "path" parameter.
+        """
+        route = Route(method.upper(), prefix.rstrip('/') + '/*', handler, ('path',))
+        self._mounts.append((route.method, prefix.rstrip('/') + '/', route))
+        return route
+
+    def add_timing_hook(self, hook: Callable):
+        """Call hook(route, target, seconds) after every timed() handler call."""
+        self._timing_hooks.append(hook)
+
+    # ============== DISPATCH ==============
+
+    def match(self, method: str, path: str) -> Optional[Tuple[Route, Dict[str, str]]]:
+        """
+        Find the route for a request.
+
+        Returns:
+            (route, path parameters), or None if nothing matches
+        """
+        method = method.upper()
+        tree = self._trees.get(method)
+        if tree is not None:
+            found = _walk(tree, _split(path), 0, [])
+            if found is not None:
+                route, values = found
+                return route, dict(zip(route.params, values))
+        for mount_method, prefix, route in self._mounts:
+            if mount_method == method and path.startswith(prefix):
+                return route, {'path': path}
+        return None
+
+    def routes(self) -> List[Route]:
+        """Every registered route (patterns, then mounts)."""
+        found = []
+        stack = list(self._trees.values())
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    found.append(child)
+                elif key is _PARAM:
+                    stack.append(child[1])
+                else:
+                    stack.append(child)
+        found.sort(key=lambda r: (r.pattern, r.method))
+        return found + [route for _, _, route in self._mounts]
+
+    @contextmanager
+    def timed(self, route: Route, target: Any):
+        """Time the enclosed handler call and report it to the timing hooks (even if it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in self._timing_hooks:
+                try:
+                    hook(route, target, elapsed)
+                except Exception as e:
+                    print(f"Route timing hook error: {e}")
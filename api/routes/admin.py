@@ -14,13 +14,13 @@ import os
 import json
 from typing import Tuple, Any, Optional, Dict, List
 
-from ..data.redis_client import get_redis
-from ..data.user_repository import get_user_by_id, save_user
+from data.redis_client import get_redis
+from data.user_repository import get_user_by_id, save_user
 
 # Try to import security modules
 try:
-    from ..security.auth import verify_jwt_token
-    from ..security.monitoring import (
+    from security.auth import verify_jwt_token
+    from security.monitoring import (
         get_security_monitor,
         SecurityEventType,
         log_admin_action,
@@ -127,7 +127,7 @@ def handle_admin_routes(
     
     # GET /api/admin/status - System status
     if path == '/api/admin/status' and method == 'GET':
-        return _handle_system_status()
+        return _handle_system_status(handler)
     
     # GET /api/admin/security-events - Security event log
     if path == '/api/admin/security-events' and method == 'GET':
@@ -166,7 +166,7 @@ def handle_admin_routes(
     if path.startswith('/api/admin/game/') and path.endswith('/end') and method == 'POST':
         parts = path.split('/')
         code = parts[-2].upper()
-        return _handle_end_game(code, admin_user_id, client_ip)
+        return _handle_end_game(code, admin_user_id, client_ip, handler)
     
     # GET /api/admin/env-status - Environment variable status
     if path == '/api/admin/env-status' and method == 'GET':
@@ -177,8 +177,14 @@ def handle_admin_routes(
 
 # ============== HANDLER IMPLEMENTATIONS ==============
 
-def _handle_system_status() -> Tuple[int, Any]:
-    """Get system status information."""
+def _handle_system_status(handler=None) -> Tuple[int, Any]:
+    """
+    Get system status information.
+    
+    Request metrics (rolling per-route latency percentiles, Redis calls and
+    bytes per request) come from the handler, which owns them; they cover
+    only the instance that served this request.
+    """
     redis = get_redis()
     
     status = {
@@ -187,6 +193,13 @@ def _handle_system_status() -> Tuple[int, Any]:
         "security_modules": _SECURITY_AVAILABLE,
     }
     
+    request_metrics = getattr(handler, 'request_metrics', None)
+    if request_metrics:
+        try:
+            status["request_metrics"] = request_metrics()
+        except Exception as e:
+            status["request_metrics"] = {"error": str(e)}
+    
     if redis:
         try:
             # Get some basic stats
@@ -416,20 +429,24 @@ def _handle_list_games() -> Tuple[int, Any]:
 def _handle_end_game(
     code: str,
     admin_user_id: str,
-    client_ip: str
+    client_ip: str,
+    handler=None
 ) -> Tuple[int, Any]:
-    """Force end a game."""
-    from ..data.game_repository import load_game, save_game, delete_game
+    """
+    Force end a game.
     
-    game = load_game(code)
+    The handler owns game storage: its end_game() saves through the
+    versioned compare-and-set, so pollers and event streams see the end and
+    a concurrent save can't overwrite it.
+    """
+    end_game = getattr(handler, 'end_game', None)
+    if not end_game:
+        return 503, {"detail": "Game storage unavailable"}
+    
+    game = end_game(code)
     if not game:
         return 404, {"detail": "Game not found"}
     
-    # Mark game as finished
-    game["status"] = "finished"
-    game["ended_by_admin"] = True
-    save_game(code, game)
-    
     # Log admin action
     log_admin_action(client_ip, admin_user_id, "end_game", {
         "game_code": code,
@@ -21,13 +21,13 @@ import requests
 
 # Try to import security modules
 try:
-    from ..security.auth import (
+    from security.auth import (
         create_jwt_token,
         verify_jwt_token,
         revoke_token,
         constant_time_compare,
     )
-    from ..security.monitoring import log_auth_success, log_auth_failure
+    from security.monitoring import log_auth_success, log_auth_failure
     _SECURITY_AVAILABLE = True
 except ImportError:
     _SECURITY_AVAILABLE = False
@@ -46,7 +46,7 @@ except ImportError:
     def log_auth_failure(*args, **kwargs):
         pass
 
-from ..data.redis_client import get_redis
+from data.redis_client import get_redis
 
 
 # ============== CONFIGURATION ==============
@@ -360,7 +360,7 @@ def _handle_oauth_callback(
     client_ip: str
 ) -> Tuple[Any, Any]:
     """Handle OAuth callback from Google."""
-    from ..data.user_repository import get_user_by_email, save_user
+    from data.user_repository import get_user_by_email, save_user
     
     code = query.get('code', '')
     error = query.get('error', '')
@@ -473,7 +473,7 @@ def _handle_oauth_callback(
 
 def _handle_get_current_user(headers: Dict[str, str]) -> Tuple[int, Any]:
     """Handle GET /api/auth/me - get current user info."""
-    from ..data.user_repository import get_user_by_id
+    from data.user_repository import get_user_by_id
     
     auth_header = headers.get('Authorization', '')
     if not auth_header.startswith('Bearer '):
@@ -15,8 +15,8 @@ def handle_games_routes(handler, method: str, path: str, body: dict) -> Tuple[in
         Tuple of (status_code, response_body)
     """
     # Import here to avoid circular imports
-    from ..data import load_game, save_game, get_public_lobbies, get_spectateable_games
-    from ..services import (
+    from data import load_game, save_game, get_public_lobbies, get_spectateable_games
+    from services import (
         create_game, add_player, remove_player, 
         set_player_word, advance_turn, eliminate_player,
         check_game_over, get_game_for_player, get_embedding, cosine_similarity
@@ -55,8 +55,8 @@ def handle_games_routes(handler, method: str, path: str, body: dict) -> Tuple[in
 
 def handle_game_action(handler, method: str, code: str, action: Optional[str], body: dict) -> Tuple[int, Any]:
     """Handle actions on a specific game."""
-    from ..data import load_game, save_game, touch_presence, get_spectator_count
-    from ..services import (
+    from data import load_game, save_game, touch_presence, get_spectator_count
+    from services import (
         add_player, remove_player, set_player_word,
         advance_turn, eliminate_player, check_game_over,
         get_game_for_player, get_embedding, cosine_similarity
@@ -123,7 +123,7 @@ def handle_game_action(handler, method: str, code: str, action: Optional[str], b
     
     # POST /api/games/:code/start - Start the game (host only)
     if action == "start" and method == "POST":
-        from ..services import batch_get_embeddings
+        from services import batch_get_embeddings
         import threading
         
         player_id = body.get("player_id")
@@ -13,7 +13,7 @@ def handle_leaderboard_routes(handler, method: str, path: str, body: dict) -> Tu
     Returns:
         Tuple of (status_code, response_body)
     """
-    from ..data import get_leaderboard, get_ranked_leaderboard
+    from data import get_leaderboard, get_ranked_leaderboard
     
     # GET /api/leaderboard - Get casual leaderboard
     if path == "/api/leaderboard" and method == "GET":
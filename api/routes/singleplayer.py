@@ -11,8 +11,8 @@ This module handles:
 
 from typing import Tuple, Any, Optional, Dict, List
 
-from ..data.game_repository import load_game, save_game
-from ..services.ai_service import (
+from data.game_repository import load_game, save_game
+from services.ai_service import (
     create_ai_player,
     ai_select_secret_word,
     ai_choose_guess,
@@ -117,8 +117,8 @@ def handle_singleplayer_routes(
 
 def _handle_create_singleplayer(body: Dict[str, Any]) -> Tuple[int, Any]:
     """Create a new singleplayer game."""
-    from ..services.game_service import generate_game_code, generate_player_id
-    from ..services.theme_service import select_random_theme_options
+    from services.game_service import generate_game_code, generate_player_id
+    from services.theme_service import select_random_theme_options
     import time
     
     difficulty = body.get('difficulty', DEFAULT_DIFFICULTY)
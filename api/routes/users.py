@@ -13,8 +13,8 @@ def handle_users_routes(handler, method: str, path: str, body: dict) -> Tuple[in
     Returns:
         Tuple of (status_code, response_body)
     """
-    from ..data import get_user_by_id, save_user, get_player_stats
-    from ..services import (
+    from data import get_user_by_id, save_user, get_player_stats
+    from services import (
         check_and_update_streak, get_next_streak_info,
         get_user_credits, add_user_credits,
         user_owns_cosmetic, grant_owned_cosmetic,
@@ -90,7 +90,7 @@ def handle_users_routes(handler, method: str, path: str, body: dict) -> Tuple[in
         streak_info = get_next_streak_info(streak_result["streak"]["streak_count"])
         
         # Get or generate daily quests
-        from ..services.economy_service import utc_today_str, get_week_start_str
+        from services.economy_service import utc_today_str, get_week_start_str
         today = utc_today_str()
         week_start = get_week_start_str()
         
@@ -75,11 +75,8 @@ def _get_redis():
     global _redis_client
     if _redis_client is None:
         try:
-            from upstash_redis import Redis
-            _redis_client = Redis(
-                url=os.getenv("UPSTASH_REDIS_REST_URL"),
-                token=os.getenv("UPSTASH_REDIS_REST_TOKEN"),
-            )
+            from data.redis_client import create_redis_client
+            _redis_client = create_redis_client()
         except Exception as e:
             print(f"[SECURITY] Failed to initialize Redis for auth: {e}")
             return None
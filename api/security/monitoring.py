@@ -8,7 +8,6 @@ Provides:
 - Audit trail for sensitive operations
 """
 
-import os
 import time
 import json
 import hashlib
@@ -98,11 +97,8 @@ class SecurityMonitor:
         """Get Redis client (lazy initialization)."""
         if self._redis_client is None:
             try:
-                from upstash_redis import Redis
-                self._redis_client = Redis(
-                    url=os.getenv("UPSTASH_REDIS_REST_URL"),
-                    token=os.getenv("UPSTASH_REDIS_REST_TOKEN"),
-                )
+                from data.redis_client import create_redis_client
+                self._redis_client = create_redis_client()
             except Exception as e:
                 print(f"[SECURITY] Failed to initialize Redis for monitoring: {e}")
                 return None
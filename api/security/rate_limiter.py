@@ -8,7 +8,6 @@ Provides fail-closed rate limiting with:
 - OpenAI embedding cost protection
 """
 
-import os
 import time
 import hashlib
 from dataclasses import dataclass
@@ -65,11 +64,8 @@ def _get_redis():
     global _redis_client
     if _redis_client is None:
         try:
-            from upstash_redis import Redis
-            _redis_client = Redis(
-                url=os.getenv("UPSTASH_REDIS_REST_URL"),
-                token=os.getenv("UPSTASH_REDIS_REST_TOKEN"),
-            )
+            from data.redis_client import create_redis_client
+            _redis_client = create_redis_client()
         except Exception as e:
             print(f"[SECURITY] Failed to initialize Redis for rate limiting: {e}")
             return None
@@ -135,8 +131,27 @@ class RateLimiter:
             now = int(time.time())
             window_start = now - self.window_seconds
             
+            # Block check, window prune and count in one pipelined round trip
+            pipe_result = None
+            try:
+                pipe = redis.pipeline()
+                pipe.get(block_key)
+                pipe.zremrangebyscore(key, 0, window_start)
+                pipe.zcard(key)
+                pipe_result = pipe.exec()
+            except Exception as e:
+                print(f"[SECURITY] Rate limit Redis error: {e}")
+                if self.fail_closed:
+                    return RateLimitResult.RATE_LIMITED, {
+                        "remaining": 0,
+                        "reset_at": now + self.window_seconds,
+                        "error": str(e),
+                    }
+                return RateLimitResult.ALLOWED, {"remaining": self.max_requests, "reset_at": now + self.window_seconds}
+            
+            blocked_until, _, count = pipe_result
+            
             # Check if identifier is blocked (repeat offender)
-            blocked_until = redis.get(block_key)
             if blocked_until:
                 try:
                     blocked_until = int(blocked_until)
@@ -149,25 +164,9 @@ class RateLimiter:
                 except (ValueError, TypeError):
                     pass
             
-            # Use sorted set for sliding window rate limiting
-            pipe_result = None
-            try:
-                # Remove old entries and count current
-                redis.zremrangebyscore(key, 0, window_start)
-                count = redis.zcard(key)
-                
-                if count is None:
-                    count = 0
-                    
-            except Exception as e:
-                print(f"[SECURITY] Rate limit Redis error: {e}")
-                if self.fail_closed:
-                    return RateLimitResult.RATE_LIMITED, {
-                        "remaining": 0,
-                        "reset_at": now + self.window_seconds,
-                        "error": str(e),
-                    }
-                return RateLimitResult.ALLOWED, {"remaining": self.max_requests, "reset_at": now + self.window_seconds}
+            # Sorted set sliding window: count was read in the pipeline above
+            if count is None:
+                count = 0
             
             remaining = max(0, self.max_requests - count)
             reset_at = now + self.window_seconds
@@ -176,8 +175,10 @@ class RateLimiter:
                 # Check for repeat offender pattern (3+ rate limits in short period)
                 violation_key = f"{key}:violations"
                 try:
-                    violations = redis.incr(violation_key)
-                    redis.expire(violation_key, 3600)  # Track violations for 1 hour
+                    pipe = redis.pipeline()
+                    pipe.incr(violation_key)
+                    pipe.expire(violation_key, 3600)  # Track violations for 1 hour
+                    violations, _ = pipe.exec()
                     
                     if violations and int(violations) >= 3:
                         # Block repeat offender with exponential backoff
@@ -201,8 +202,10 @@ class RateLimiter:
             
             # Add current request to window
             try:
-                redis.zadd(key, {f"{now}:{id(self)}": now})
-                redis.expire(key, self.window_seconds + 1)
+                pipe = redis.pipeline()
+                pipe.zadd(key, {f"{now}:{id(self)}": now})
+                pipe.expire(key, self.window_seconds + 1)
+                pipe.exec()
             except Exception as e:
                 print(f"[SECURITY] Rate limit tracking error: {e}")
             
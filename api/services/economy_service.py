@@ -8,8 +8,8 @@ import random
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, List, Any
 
-from ..data.redis_client import get_redis
-from ..data.user_repository import save_user
+from data.redis_client import get_redis
+from data.user_repository import save_user
 
 # Default values
 DEFAULT_WALLET = {"credits": 0}
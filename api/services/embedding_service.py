@@ -1,17 +1,19 @@
 """
 Embedding Service
-Handles OpenAI embedding calls with caching
+Handles embedding lookups through the shared tiered EmbeddingStore
+
+Uses the process-wide store (embeddings.store.get_store), so lookups here
+share the API handler's LRU, single-flight map and hit/miss counters.
+Outside the API process the store is built here from config.json.
 """
 
-import os
 import json
-import hashlib
-from typing import Optional, List
+from pathlib import Path
+from typing import List
 import numpy as np
 
-# Embedding settings
-EMBEDDING_MODEL = "text-embedding-3-small"
-EMBEDDING_CACHE_SECONDS = 86400  # 24 hours
+# Config holds the embedding model and cache settings
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "config.json"
 
 # Lazy-initialized OpenAI client
 _openai_client = None
@@ -26,9 +28,22 @@ def get_openai_client():
     return _openai_client
 
 
-def _cache_key(word: str) -> str:
-    """Generate cache key for embedding."""
-    return f"emb:{hashlib.md5(word.lower().encode()).hexdigest()}"
+def _create_store():
+    from data.redis_client import get_redis
+    from embeddings.providers import provider_from_config
+    from embeddings.store import store_from_config
+
+    try:
+        config = json.loads(CONFIG_PATH.read_text())
+    except Exception:
+        config = {}
+    return store_from_config(config, provider_from_config(config, get_openai_client), get_redis)
+
+
+def get_store():
+    """Get the shared EmbeddingStore (memory -> disk -> Redis -> provider)."""
+    from embeddings.store import get_store as get_shared_store
+    return get_shared_store(_create_store)
 
 
 def get_embedding(word: str) -> List[float]:
@@ -40,38 +55,11 @@ def get_embedding(word: str) -> List[float]:
         
     Returns:
         List of floats representing the embedding vector
+
+    Raises:
+        LookupError: If the embedding is not cached and could not be fetched
     """
-    from ..data.redis_client import get_redis
-    
-    word_lower = word.lower().strip()
-    cache_key = _cache_key(word_lower)
-    
-    # Try cache first
-    redis = get_redis()
-    if redis:
-        try:
-            cached = redis.get(cache_key)
-            if cached:
-                return json.loads(cached)
-        except Exception:
-            pass
-    
-    # Call OpenAI API
-    client = get_openai_client()
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=word_lower,
-    )
-    embedding = response.data[0].embedding
-    
-    # Cache the result
-    if redis:
-        try:
-            redis.setex(cache_key, EMBEDDING_CACHE_SECONDS, json.dumps(embedding))
-        except Exception:
-            pass
-    
-    return embedding
+    return get_store().get(word).tolist()
 
 
 def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float:
@@ -106,50 +94,7 @@ def batch_get_embeddings(words: List[str]) -> dict:
         words: List of words to get embeddings for
         
     Returns:
-        Dict mapping words to their embeddings
+        Dict mapping lowercase words to their embeddings (words that could
+        not be fetched are left out)
     """
-    from ..data.redis_client import get_redis
-    
-    result = {}
-    to_fetch = []
-    
-    # Check cache for each word
-    redis = get_redis()
-    for word in words:
-        word_lower = word.lower().strip()
-        cache_key = _cache_key(word_lower)
-        
-        if redis:
-            try:
-                cached = redis.get(cache_key)
-                if cached:
-                    result[word_lower] = json.loads(cached)
-                    continue
-            except Exception:
-                pass
-        
-        to_fetch.append(word_lower)
-    
-    # Fetch remaining from API
-    if to_fetch:
-        client = get_openai_client()
-        response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=to_fetch,
-        )
-        
-        for i, embedding_data in enumerate(response.data):
-            word = to_fetch[i]
-            embedding = embedding_data.embedding
-            result[word] = embedding
-            
-            # Cache
-            if redis:
-                try:
-                    cache_key = _cache_key(word)
-                    redis.setex(cache_key, EMBEDDING_CACHE_SECONDS, json.dumps(embedding))
-                except Exception:
-                    pass
-    
-    return result
-
+    return {word: vector.tolist() for word, vector in get_store().get_many(words).items()}
@@ -15,7 +15,7 @@ import string
 import time
 from typing import Optional, List, Dict, Any
 
-from ..data import save_game, load_game, delete_game
+from data import save_game, load_game, delete_game
 
 
 def generate_game_code() -> str:
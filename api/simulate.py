@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Headless bot-vs-bot simulation.
+
+Plays complete games between AI opponents offline, using the same code the
+API runs for singleplayer AI turns (ai_select_secret_word, process_ai_turn,
+process_ai_word_change) and the theme's similarity matrix. It never touches
+Redis or OpenAI, and games run in parallel on a process pool. Use it to
+tune AI_DIFFICULTY_CONFIG and to measure AI speed changes without playing
+live games.
+
+The matrix comes from the prebuilt artifact in api/themes/artifacts/ (see
+precompute_embeddings.py --artifacts-only). Without one, --synthetic builds
+a clustered random matrix. That is fine for latency and regression runs,
+but its win rates say little about real themes. For reproducible runs on
+real theme word lists without network access, build local-provider
+artifacts and simulate with the same provider:
+
+    EMBEDDING_PROVIDER=local python api/precompute_embeddings.py --artifacts-only
+    EMBEDDING_PROVIDER=local python api/simulate.py --bots rookie,nemesis --games 1000
+
+Seats rotate from game to game, so no difficulty always moves first.
+
+Usage:
+    python -m api.simulate --theme "Animals & Wildlife" --bots rookie,nemesis --games 10000 --workers 8
+    python api/simulate.py --synthetic --bots analyst,spymaster,ghost --games 500 --json results.json
+
+Options:
+    --theme NAME        Theme to play (default: first pregenerated theme)
+    --bots LIST         Comma-separated difficulties, one per seat
+    --games N           Number of games (default 100)
+    --workers N         Worker processes (default: CPU count; 1 = in-process)
+    --word-count N      Theme size, 100 or 50 (default 100)
+    --max-turns N       Guesses before a game is abandoned (default 1000)
+    --seed N            Base random seed (game i uses seed + i)
+    --synthetic         Use a random clustered matrix when no artifact exists
+    --json PATH         Also write the report as JSON
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index  # noqa: E402
+from embeddings.similarity_matrix import SimilarityMatrix  # noqa: E402
+
+DEFAULT_GAMES = 100
+DEFAULT_MAX_TURNS = 1000
+
+# Decisions whose latency is reported per difficulty
+DECISIONS = ("secret", "guess", "word_change")
+
+# Shape of the --synthetic matrix: words are noisy copies of a few centres
+SYNTHETIC_CLUSTERS = 8
+SYNTHETIC_DIMS = 64
+SYNTHETIC_NOISE = 0.8
+
+# Per-process theme state, set by _init_worker
+_theme: dict = {}
+
+
+# ============== THEME SETUP ==============
+
+def synthetic_matrix(words: list, seed: int = 0) -> SimilarityMatrix:
+    """Clustered random similarity matrix (no embeddings needed)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(SYNTHETIC_CLUSTERS, SYNTHETIC_DIMS))
+    clusters = rng.integers(0, SYNTHETIC_CLUSTERS, size=len(words))
+    vectors = centres[clusters] + SYNTHETIC_NOISE * rng.normal(size=(len(words), SYNTHETIC_DIMS))
+    return SimilarityMatrix.from_embeddings(dict(zip(words, vectors)))
+
+
+def load_theme(theme_name: str, word_count: int, synthetic: bool, seed: int) -> dict:
+    """
+    Resolve a theme's words and matrix and seed index's process cache with it.
+
+    Raises:
+        ValueError: If the theme has no words, or no artifact covers them and
+                    synthetic is off
+    """
+    theme = index.get_theme_words(theme_name or "", word_count)
+    words = theme["words"]
+    if not words:
+        raise ValueError(f"Theme '{theme_name}' has no words")
+
+    matrix = index._load_theme_artifact(theme["name"])
+    if matrix and not all(w in matrix for w in words):
+        matrix = None
+    is_synthetic = matrix is None
+    if is_synthetic:
+        if not synthetic:
+            raise ValueError(
+                f"No similarity artifact for '{theme['name']}'. Run "
+                f"'python api/precompute_embeddings.py --artifacts-only' or pass --synthetic."
+            )
+        matrix = synthetic_matrix(words, seed)
+
+    # get_game_similarity_matrix finds it here first, so nothing hits Redis
+    index._remember_theme_matrix(index._theme_id(theme["name"]), index.theme_matrix_version(words), matrix)
+    return {"name": theme["name"], "words": words, "word_count": word_count, "synthetic": is_synthetic}
+
+
+def _init_worker(theme_name: str, word_count: int, synthetic: bool, seed: int, lineup: list):
+    _theme.clear()
+    _theme.update(load_theme(theme_name, word_count, synthetic, seed))
+    # One unrecorded game, so lazy loads (word frequencies, likelihood tables) aren't timed
+    random.seed(seed - 1)
+    play_game(lineup, DEFAULT_MAX_TURNS, {})
+
+
+# ============== GAME LOOP ==============
+
+def _next_alive_turn(game: dict) -> int:
+    num_players = len(game["players"])
+    next_turn = (game["current_turn"] + 1) % num_players
+    while not game["players"][next_turn].get("is_alive"):
+        next_turn = (next_turn + 1) % num_players
+    return next_turn
+
+
+def _timed(latency: dict, difficulty: str, decision: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    latency.setdefault(difficulty, {d: [] for d in DECISIONS})[decision].append(time.perf_counter() - start)
+    return result
+
+
+def new_game(lineup: list, latency: dict) -> dict:
+    """Deal word pools and let every bot pick its secret, like /begin and /ai-pick-words."""
+    words = _theme["words"]
+    per_player = index.WORDS_PER_PLAYER
+    if per_player * len(lineup) > len(words):
+        raise ValueError(f"Need {per_player * len(lineup)} words for {len(lineup)} bots, theme has {len(words)}")
+
+    shuffled = words.copy()
+    random.shuffle(shuffled)
+    players = []
+    for i, difficulty in enumerate(lineup):
+        player = index.create_ai_player(difficulty, [p["name"] for p in players])
+        player["word_pool"] = sorted(shuffled[i * per_player:(i + 1) * per_player])
+        players.append(player)
+
+    game = {
+        "code": "SIMULATE",
+        "status": "playing",
+        "is_singleplayer": True,
+        "theme": {"name": _theme["name"], "words": words},
+        "word_count": _theme["word_count"],
+        "players": players,
+        "history": [],
+        "current_turn": 0,
+    }
+    for player in players:
+        secret = _timed(latency, player["difficulty"], "secret",
+                        index.ai_select_secret_word, player, player["word_pool"], game)
+        player["secret_word"] = (secret or player["word_pool"][0]).lower()
+    return game
+
+
+def play_game(lineup: list, max_turns: int, latency: dict) -> dict:
+    """
+    Play one game to the end, mirroring the /ai-step loop.
+
+    Returns:
+        {"winner": difficulty or None, "winner_seat", "turns", "eliminations": {difficulty: n}}
+    """
+    game = new_game(lineup, latency)
+    eliminations = {}
+    turns = 0
+    while turns < max_turns:
+        current = game["players"][game["current_turn"]]
+        difficulty = current["difficulty"]
+        result = _timed(latency, difficulty, "guess", index.process_ai_turn, game, current)
+        if not result:
+            break
+        turns += 1
+
+        if result.get("eliminations"):
+            eliminations[difficulty] = eliminations.get(difficulty, 0) + len(result["eliminations"])
+            if current.get("can_change_word"):
+                _timed(latency, difficulty, "word_change", index.process_ai_word_change, game, current)
+
+        alive = [p for p in game["players"] if p.get("is_alive")]
+        if len(alive) <= 1:
+            game["status"] = "finished"
+            break
+        game["current_turn"] = _next_alive_turn(game)
+
+    winner = None
+    winner_seat = None
+    if game["status"] == "finished":
+        for seat, p in enumerate(game["players"]):
+            if p.get("is_alive"):
+                winner, winner_seat = p["difficulty"], seat
+    return {"winner": winner, "winner_seat": winner_seat, "turns": turns, "eliminations": eliminations}
+
+
+# ============== BATCHES ==============
+
+def _empty_summary() -> dict:
+    return {
+        "games": 0,
+        "finished": 0,
+        "wins": {},
+        "seat_wins": {},
+        "seats": {},
+        "eliminations": {},
+        "turns": [],
+        "latency": {},
+    }
+
+
+def run_batch(lineup: list, first_game: int, count: int, seed: int, max_turns: int) -> dict:
+    """Play games first_game .. first_game + count - 1 and summarize them."""
+    summary = _empty_summary()
+    for i in range(first_game, first_game + count):
+        random.seed(seed + i)
+        shift = i % len(lineup)
+        seats = lineup[shift:] + lineup[:shift]
+        result = play_game(seats, max_turns, summary["latency"])
+
+        summary["games"] += 1
+        summary["turns"].append(result["turns"])
+        for difficulty in seats:
+            summary["seats"][difficulty] = summary["seats"].get(difficulty, 0) + 1
+        for difficulty, n in result["eliminations"].items():
+            summary["eliminations"][difficulty] = summary["eliminations"].get(difficulty, 0) + n
+        if result["winner"] is not None:
+            summary["finished"] += 1
+            summary["wins"][result["winner"]] = summary["wins"].get(result["winner"], 0) + 1
+            seat = str(result["winner_seat"])
+            summary["seat_wins"][seat] = summary["seat_wins"].get(seat, 0) + 1
+    return summary
+
+
+def _merge(total: dict, part: dict):
+    total["games"] += part["games"]
+    total["finished"] += part["finished"]
+    total["turns"].extend(part["turns"])
+    for field in ("wins", "seat_wins", "seats", "eliminations"):
+        for key, n in part[field].items():
+            total[field][key] = total[field].get(key, 0) + n
+    for difficulty, decisions in part["latency"].items():
+        merged = total["latency"].setdefault(difficulty, {d: [] for d in DECISIONS})
+        for decision, samples in decisions.items():
+            merged[decision].extend(samples)
+
+
+def simulate(theme_name: str, lineup: list, games: int, workers: int, word_count: int = 100,
+             max_turns: int = DEFAULT_MAX_TURNS, seed: int = 0, synthetic: bool = False) -> dict:
+    """
+    Run games in batches across a process pool and merge the summaries.
+
+    Returns:
+        Raw summary (counts, per-game turn counts and per-decision latencies
+        in seconds); see report() for the derived numbers
+    """
+    init_args = (theme_name, word_count, synthetic, seed, lineup)
+    workers = max(1, int(workers))
+    # Several batches per worker keep the pool busy when game lengths vary
+    batch_size = max(1, min(250, -(-games // (workers * 4))))
+    batches = [(lineup, start, min(batch_size, games - start), seed, max_turns)
+               for start in range(0, games, batch_size)]
+
+    total = _empty_summary()
+    if workers == 1:
+        _init_worker(*init_args)
+        for args in batches:
+            _merge(total, run_batch(*args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            futures = [pool.submit(run_batch, *args) for args in batches]
+            for future in futures:
+                _merge(total, future.result())
+    return total
+
+
+# ============== REPORT ==============
+
+def _latency_stats(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def report(summary: dict) -> dict:
+    """Win rates, game length and latency percentiles from a raw summary."""
+    turns = np.asarray(summary["turns"] or [0])
+    difficulties = {}
+    for difficulty, seats in sorted(summary["seats"].items()):
+        wins = summary["wins"].get(difficulty, 0)
+        difficulties[difficulty] = {
+            "seats": seats,
+            "wins": wins,
+            # Share of this difficulty's seats that won
+            "win_rate": wins / seats if seats else 0.0,
+            "eliminations_per_game": summary["eliminations"].get(difficulty, 0) / seats if seats else 0.0,
+            "latency": {d: _latency_stats(s) for d, s in summary["latency"].get(difficulty, {}).items()},
+        }
+    return {
+        "games": summary["games"],
+        "finished": summary["finished"],
+        "abandoned": summary["games"] - summary["finished"],
+        "turns": {
+            "mean": float(turns.mean()),
+            "p50": float(np.percentile(turns, 50)),
+            "p95": float(np.percentile(turns, 95)),
+            "max": int(turns.max()),
+        },
+        "seat_wins": dict(sorted(summary["seat_wins"].items())),
+        "difficulties": difficulties,
+    }
+
+
+def print_report(result: dict):
+    print(f"\nGames: {result['games']}  finished: {result['finished']}  abandoned: {result['abandoned']}")
+    t = result["turns"]
+    print(f"Game length (guesses): mean {t['mean']:.1f}  p50 {t['p50']:.0f}  p95 {t['p95']:.0f}  max {t['max']}")
+    print(f"Wins by seat: {result['seat_wins']}")
+
+    print(f"\n{'Difficulty':<12} {'Seats':>7} {'Wins':>7} {'Win rate':>9} {'Elims/seat':>11}")
+    for name, d in result["difficulties"].items():
+        print(f"{name:<12} {d['seats']:>7} {d['wins']:>7} {d['win_rate']:>8.1%} {d['eliminations_per_game']:>11.2f}")
+
+    print(f"\n{'Difficulty':<12} {'Decision':<12} {'Count':>8} {'Mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'Max ms':>8}")
+    for name, d in result["difficulties"].items():
+        for decision, s in d["latency"].items():
+            if not s["count"]:
+                continue
+            print(f"{name:<12} {decision:<12} {s['count']:>8} {s['mean_ms']:>8.2f} {s['p50_ms']:>8.2f} "
+                  f"{s['p95_ms']:>8.2f} {s['max_ms']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate bot-vs-bot games offline")
+    parser.add_argument("--theme", default="", help="Theme to play (default: first pregenerated theme)")
+    parser.add_argument("--bots", required=True, help="Comma-separated difficulties, one per seat")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help="Number of games")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (1 = run in-process)")
+    parser.add_argument("--word-count", type=int, choices=(50, 100), default=100, help="Theme size")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS,
+                        help="Guesses before a game is abandoned")
+    parser.add_argument("--seed", type=int, default=0, help="Base random seed")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Use a random clustered matrix when the theme has no artifact")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    lineup = [b.strip().lower() for b in args.bots.split(",") if b.strip()]
+    unknown = [b for b in lineup if b not in index.AI_DIFFICULTY_CONFIG]
+    if len(lineup) < 2 or unknown:
+        parser.error(f"--bots needs at least two of: {', '.join(index.AI_DIFFICULTY_CONFIG)}"
+                     + (f" (unknown: {', '.join(unknown)})" if unknown else ""))
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+
+    try:
+        theme = load_theme(args.theme, args.word_count, args.synthetic, args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    print("=" * 60)
+    print(f"Simulating {args.games} games on '{theme['name']}' ({len(theme['words'])} words"
+          f"{', synthetic matrix' if theme['synthetic'] else ''})")
+    print(f"Bots: {', '.join(lineup)}  workers: {args.workers}")
+    print("=" * 60)
+
+    start = time.time()
+    try:
+        summary = simulate(args.theme, lineup, args.games, args.workers, args.word_count,
+                           args.max_turns, args.seed, args.synthetic)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    result = report(summary)
+    result["theme"] = theme["name"]
+    result["bots"] = lineup
+    result["seconds"] = time.time() - start
+
+    print_report(result)
+    print(f"\nTotal time: {result['seconds']:.2f}s")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
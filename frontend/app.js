@@ -174,6 +174,8 @@ let gameState = {
     playerName: null,
     isHost: false,
     pollingInterval: null,
+    eventStream: null,        // EventSource following the current game (multiplayer)
+    longPollRun: 0,           // Bumped to end a running /wait long-poll loop
     theme: null,
     wordPool: null,
     allThemeWords: null,
@@ -188,6 +190,7 @@ let gameState = {
     turnStartedAt: null,      // When current turn started (client timestamp)
     timeControl: null,        // {initial_time, increment}
     game: null,               // Current game state for reference
+    stateVersion: null,       // state_version of the last full poll (conditional polling)
     // Word selection timer state
     wordSelectionTimerInterval: null,
     wordSelectionTime: null,
@@ -605,29 +608,7 @@ async function pollChatOnce() {
     try {
         resetChatIfNeeded();
         const res = await apiCall(`/api/games/${gameState.code}/chat?after=${chatState.lastId}&limit=50`);
-        const msgs = Array.isArray(res?.messages) ? res.messages : [];
-        if (msgs.length) {
-            // Deduplicate by ID to prevent double-showing sent messages
-            const existingIds = new Set(chatState.messages.map(m => m.id));
-            const newMsgs = msgs.filter(m => !existingIds.has(m.id));
-            chatState.messages = chatState.messages.concat(newMsgs);
-            // Trim memory
-            if (chatState.messages.length > 300) {
-                chatState.messages = chatState.messages.slice(-300);
-            }
-            const nextLast = Number(res?.last_id ?? chatState.lastId);
-            if (Number.isFinite(nextLast) && nextLast > chatState.lastId) {
-                chatState.lastId = nextLast;
-            } else {
-                // Fallback: compute from payloads
-                msgs.forEach(m => {
-                    const mid = Number(m?.id ?? 0);
-                    if (Number.isFinite(mid) && mid > chatState.lastId) chatState.lastId = mid;
-                });
-            }
-            renderChat();
-            updateChatUnreadDot();
-        }
+        receiveChatMessages(res);
     } catch (e) {
         // ignore chat polling failures
     } finally {
@@ -635,6 +616,33 @@ async function pollChatOnce() {
     }
 }
 
+// Add a {messages, last_id} chat payload (from /chat or a game poll) to the chat log
+function receiveChatMessages(res) {
+    const msgs = Array.isArray(res?.messages) ? res.messages : [];
+    if (msgs.length) {
+        // Deduplicate by ID to prevent double-showing sent messages
+        const existingIds = new Set(chatState.messages.map(m => m.id));
+        const newMsgs = msgs.filter(m => !existingIds.has(m.id));
+        chatState.messages = chatState.messages.concat(newMsgs);
+        // Trim memory
+        if (chatState.messages.length > 300) {
+            chatState.messages = chatState.messages.slice(-300);
+        }
+        const nextLast = Number(res?.last_id ?? chatState.lastId);
+        if (Number.isFinite(nextLast) && nextLast > chatState.lastId) {
+            chatState.lastId = nextLast;
+        } else {
+            // Fallback: compute from payloads
+            msgs.forEach(m => {
+                const mid = Number(m?.id ?? 0);
+                if (Number.isFinite(mid) && mid > chatState.lastId) chatState.lastId = mid;
+            });
+        }
+        renderChat();
+        updateChatUnreadDot();
+    }
+}
+
 async function sendChatMessage(text) {
     if (!optionsState.chatEnabled) return;
     if (chatSendInFlight) return;
@@ -4309,9 +4317,7 @@ document.getElementById('sp-leave-lobby-btn')?.addEventListener('click', async (
     } catch (e) {
         // best-effort
     }
-    if (gameState.pollingInterval) {
-        clearInterval(gameState.pollingInterval);
-    }
+    stopPolling();
     gameState.code = null;
     gameState.playerId = null;
     gameState.isSingleplayer = false;
@@ -4574,9 +4580,7 @@ function showWordSelectionScreen(data) {
 }
 
 function startWordSelectPolling() {
-    if (gameState.pollingInterval) {
-        clearInterval(gameState.pollingInterval);
-    }
+    stopPolling();
     updateWordSelectScreen();
     gameState.pollingInterval = setInterval(updateWordSelectScreen, 2000);
 }
@@ -4979,9 +4983,7 @@ document.getElementById('leave-lobby-btn')?.addEventListener('click', async () =
     } catch (e) {
         // best-effort
     }
-    if (gameState.pollingInterval) {
-        clearInterval(gameState.pollingInterval);
-    }
+    stopPolling();
     gameState.code = null;
     gameState.playerId = null;
     clearGameSession();
@@ -4990,40 +4992,191 @@ document.getElementById('leave-lobby-btn')?.addEventListener('click', async () =
 });
 
 // Screen: Game
+// Multiplayer games follow the game's event stream instead of polling every
+// 2s; players without EventSource (or whose stream is refused) long-poll
+// /wait. Singleplayer games publish no events, so they keep interval polling.
 function startGamePolling() {
-    if (gameState.pollingInterval) {
-        clearInterval(gameState.pollingInterval);
+    stopPolling();
+    gameState.stateVersion = null;
+    if (gameState.isSingleplayer) {
+        pollGame();
+        gameState.pollingInterval = setInterval(pollGame, 2000);
+    } else if (!openGameEventStream(applyGameView, pollGame, startGameLongPoll)) {
+        startGameLongPoll();
     }
-    
-    pollGame();
-    gameState.pollingInterval = setInterval(pollGame, 2000);
 }
 
-async function pollGame() {
-    try {
-        const game = await apiCall(`/api/games/${gameState.code}?player_id=${gameState.playerId}`);
-        
-        if (game.status === 'finished') {
-            clearInterval(gameState.pollingInterval);
-            showGameOver(game);
-            return;
+// Follow the current game over GET /api/games/{code}/events. The snapshot is
+// rendered with applyView; each game event triggers one (incremental) refresh
+// poll; chat messages arrive on the stream. If the server refuses the stream,
+// fallback takes over. Returns false when the browser has no EventSource.
+function openGameEventStream(applyView, refresh, fallback) {
+    if (typeof window.EventSource !== 'function') return false;
+    const code = gameState.code;
+    const viewer = gameState.isSpectator
+        ? `spectator_id=${encodeURIComponent(gameState.spectatorId)}`
+        : `player_id=${encodeURIComponent(gameState.playerId)}`;
+    const source = new EventSource(`${API_BASE}/api/games/${code}/events?${viewer}`);
+    gameState.eventStream = source;
+    const live = () => gameState.eventStream === source && gameState.code === code;
+    const parse = (e) => {
+        try {
+            return JSON.parse(e.data);
+        } catch (err) {
+            return null;
         }
-        
-        // Check if we still need to set our word
-        const myPlayer = game.players.find(p => p.id === gameState.playerId);
-        if (!myPlayer.secret_word && game.status === 'playing') {
-            showWordSelectionScreen(game);
-            return;
+    };
+
+    let refreshQueued = false;
+    const queueRefresh = () => {
+        if (refreshQueued) return;
+        refreshQueued = true;
+        // One poll covers a burst of events (a guess, its elimination and the next turn)
+        setTimeout(() => {
+            refreshQueued = false;
+            if (live()) refresh();
+        }, 100);
+    };
+
+    source.addEventListener('snapshot', (e) => {
+        const view = parse(e);
+        if (view && live()) applyView(view);
+    });
+    ['guess', 'elimination', 'word_change', 'turn', 'status'].forEach(type => {
+        source.addEventListener(type, (e) => {
+            const data = parse(e);
+            if (!live()) return;
+            // Already covered by the view we hold
+            const version = Number(data?.state_version);
+            if (gameState.stateVersion !== null && version <= gameState.stateVersion) return;
+            queueRefresh();
+        });
+    });
+    source.addEventListener('chat', (e) => {
+        const msg = parse(e);
+        if (!msg || !live() || !optionsState.chatEnabled) return;
+        resetChatIfNeeded();
+        receiveChatMessages({ messages: [msg], last_id: msg.id });
+    });
+    source.onerror = () => {
+        // EventSource reconnects by itself; CLOSED means the server refused the stream
+        if (source.readyState !== EventSource.CLOSED || !live()) return;
+        gameState.eventStream = null;
+        fallback();
+    };
+    return true;
+}
+
+// Long-poll fallback for players: /wait holds the request until the game
+// changes or times out. Chat has no long-poll endpoint and keeps its interval.
+function startGameLongPoll() {
+    const code = gameState.code;
+    const run = ++gameState.longPollRun;
+    const live = () => gameState.longPollRun === run && gameState.code === code;
+    gameState.pollingInterval = setInterval(pollChatOnce, 2000);
+
+    (async () => {
+        while (live()) {
+            const started = Date.now();
+            try {
+                const response = await apiCall(`/api/games/${code}/wait?player_id=${gameState.playerId}${sinceVersionParam()}${historySinceParam()}&timeout=25`);
+                if (live()) applyGameView(response);
+            } catch (error) {
+                // The game is gone; nothing more to wait for
+                if (error.status === 404) return;
+                console.error('Game long-poll error:', error);
+            }
+            // Don't spin when the server answers at once (errors, no-wait deployments)
+            const elapsed = Date.now() - started;
+            if (elapsed < 1000) await new Promise(resolve => setTimeout(resolve, 1000 - elapsed));
         }
-        
-        updateGame(game);
-        pollChatOnce();
-        maybeRunSingleplayerAiTurns(game);
+    })();
+}
+
+// Query suffix asking the server to skip the full state if nothing changed
+function sinceVersionParam() {
+    return gameState.stateVersion === null ? '' : `&since_version=${gameState.stateVersion}`;
+}
+
+// Query suffix asking for an incremental view: history we already hold is not resent
+function historySinceParam() {
+    const known = gameState.game;
+    if (!known || known.code !== gameState.code || !Array.isArray(known.history)) return '';
+    return `&history_since=${known.history.length}`;
+}
+
+// Query suffix folding new chat messages into the game poll
+function chatAfterParam() {
+    if (!optionsState.chatEnabled) return '';
+    resetChatIfNeeded();
+    return `&chat_after=${chatState.lastId}`;
+}
+
+// Rebuild a full view from an incremental one ("delta": true) and the view we
+// already hold. Returns null if they don't line up (e.g. the game changed under us).
+function mergeGameDelta(game) {
+    if (!game.delta) return game;
+    const known = gameState.game;
+    const since = game.history_since || 0;
+    if (!known || known.code !== game.code || !Array.isArray(known.history) || known.history.length < since) {
+        return null;
+    }
+    const merged = { ...game, history: known.history.slice(0, since).concat(game.history || []) };
+    if (since > 0) {
+        // Settled once there is history, so the server leaves them out
+        merged.theme = { ...(known.theme || {}), ...(game.theme || {}), words: known.theme?.words || [] };
+        merged.theme_options = known.theme_options || [];
+        merged.theme_votes = known.theme_votes || {};
+        const knownPlayers = new Map((known.players || []).map(p => [p.id, p]));
+        merged.players = (game.players || []).map(p => {
+            const prev = knownPlayers.get(p.id);
+            return prev && prev.word_pool !== undefined ? { ...p, word_pool: prev.word_pool } : p;
+        });
+    }
+    delete merged.delta;
+    delete merged.history_since;
+    return merged;
+}
+
+async function pollGame() {
+    try {
+        const chatParam = chatAfterParam();
+        const response = await apiCall(`/api/games/${gameState.code}?player_id=${gameState.playerId}${sinceVersionParam()}${historySinceParam()}${chatParam}`);
+        if (response.chat) receiveChatMessages(response.chat);
+        else if (chatParam) pollChatOnce();
+        applyGameView(response);
     } catch (error) {
         console.error('Game poll error:', error);
     }
 }
 
+// Render a player view (from a poll, a long-poll or an event stream snapshot)
+function applyGameView(response) {
+    if (response.unchanged) {
+        maybeRunSingleplayerAiTurns(gameState.game);
+        return;
+    }
+    const game = mergeGameDelta(response);
+    if (!game) return;
+    gameState.stateVersion = game.state_version ?? null;
+    
+    if (game.status === 'finished') {
+        stopPolling();
+        showGameOver(game);
+        return;
+    }
+    
+    // Check if we still need to set our word
+    const myPlayer = game.players.find(p => p.id === gameState.playerId);
+    if (!myPlayer.secret_word && game.status === 'playing') {
+        showWordSelectionScreen(game);
+        return;
+    }
+    
+    updateGame(game);
+    maybeRunSingleplayerAiTurns(game);
+}
+
 function showGame(game) {
     showScreen('game');
     updateGame(game);
@@ -6285,7 +6438,7 @@ async function runSingleplayerAiTurns(initialGame) {
         });
         
         if (game.status === 'finished') {
-            clearInterval(gameState.pollingInterval);
+            stopPolling();
             showGameOver(game);
         } else {
             updateGame(game);
@@ -7822,6 +7975,12 @@ function stopPolling() {
         clearInterval(gameState.pollingInterval);
         gameState.pollingInterval = null;
     }
+    if (gameState.eventStream) {
+        gameState.eventStream.close();
+        gameState.eventStream = null;
+    }
+    // A running long-poll loop exits after its current request
+    gameState.longPollRun += 1;
 }
 
 // ============ SPECTATOR MODE ============
@@ -7831,6 +7990,13 @@ function startSpectatePolling(code) {
     gameState.code = code;
     gameState.isSpectator = true;
     gameState.spectatorId = getOrCreateSpectatorId();
+    gameState.stateVersion = null;
+    if (!openGameEventStream(applySpectateView, pollSpectate, startSpectateIntervalPolling)) {
+        startSpectateIntervalPolling();
+    }
+}
+
+function startSpectateIntervalPolling() {
     pollSpectate();
     gameState.pollingInterval = setInterval(pollSpectate, 2000);
 }
@@ -7895,22 +8061,10 @@ async function pollSpectate() {
     try {
         const sid = gameState.spectatorId || getOrCreateSpectatorId();
         gameState.spectatorId = sid;
-        const game = await apiCall(`/api/games/${gameState.code}/spectate?spectator_id=${encodeURIComponent(sid)}`);
-        if (game.status === 'waiting') {
-            showSpectateLobby(game);
-            pollChatOnce();
-            return;
-        }
-        // Finished games should still render; showGameOver will reveal if provided
-        if (game.status === 'finished') {
-            clearInterval(gameState.pollingInterval);
-            showGameOver(game);
-            return;
-        }
-        // word_selection / playing -> game screen
-        showScreen('game');
-        updateGame(game);
-        pollChatOnce();
+        const response = await apiCall(`/api/games/${gameState.code}/spectate?spectator_id=${encodeURIComponent(sid)}${sinceVersionParam()}${historySinceParam()}`);
+        applySpectateView(response);
+        // Streamed chat arrives as events; polling picks it up here
+        if (!gameState.eventStream) pollChatOnce();
     } catch (e) {
         // 404 means game ended/expired - this is expected, go back to home
         if (e.status === 404) {
@@ -7923,6 +8077,27 @@ async function pollSpectate() {
     }
 }
 
+// Render a spectator view (from a poll or an event stream snapshot)
+function applySpectateView(response) {
+    if (response.unchanged) return;
+    const game = mergeGameDelta(response);
+    if (!game) return;
+    gameState.stateVersion = game.state_version ?? null;
+    if (game.status === 'waiting') {
+        showSpectateLobby(game);
+        return;
+    }
+    // Finished games should still render; showGameOver will reveal if provided
+    if (game.status === 'finished') {
+        stopPolling();
+        showGameOver(game);
+        return;
+    }
+    // word_selection / playing -> game screen
+    showScreen('game');
+    updateGame(game);
+}
+
 // Matrix Rain Effect
 function initMatrixRain() {
     const canvas = document.createElement('canvas');
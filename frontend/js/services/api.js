@@ -231,6 +231,21 @@ export const games = {
      */
     get: (code, playerId) => apiCall(`/api/games/${code}?player_id=${playerId}`),
 
+    /**
+     * Long-poll game state: resolves when the state version moves past
+     * sinceVersion (with the full game) or after timeout seconds (with
+     * {unchanged: true}). Omit sinceVersion to get the current state at once.
+     * @param {string} code
+     * @param {string} playerId
+     * @param {number|null} sinceVersion
+     * @param {number} timeout
+     * @returns {Promise<Object>}
+     */
+    wait: (code, playerId, sinceVersion = null, timeout = 25) => {
+        const since = sinceVersion === null ? '' : `&since_version=${sinceVersion}`;
+        return apiCall(`/api/games/${code}/wait?player_id=${playerId}${since}&timeout=${timeout}`);
+    },
+
     /**
      * Get game for spectating
      * @param {string} code
@@ -0,0 +1,97 @@
+/**
+ * Game Events Service
+ * Server-Sent Events connection for one game (state, chat and presence)
+ */
+
+import { getApiBase } from './api.js';
+
+// Game event types that mean the per-player view has changed
+export const GAME_STATE_EVENTS = ['guess', 'elimination', 'word_change', 'turn', 'status'];
+
+/**
+ * Check whether the browser supports Server-Sent Events
+ * @returns {boolean}
+ */
+export function isSupported() {
+    return typeof window !== 'undefined' && typeof window.EventSource === 'function';
+}
+
+/**
+ * Open the event stream for a game.
+ *
+ * The server starts a fresh connection with a `snapshot` event (the full
+ * player or spectator view), then relays logged events. When a stream ends
+ * (always after a while on serverless) EventSource reconnects on its own and
+ * resumes from the last event id.
+ *
+ * @param {string} code - Game code
+ * @param {Object} viewer
+ * @param {string} [viewer.playerId] - Stream as this player
+ * @param {string} [viewer.spectatorId] - Otherwise stream as a spectator
+ * @param {Object} handlers
+ * @param {Function} [handlers.onSnapshot] - (view) full game view
+ * @param {Function} [handlers.onGameEvent] - (type, data) guess/elimination/word_change/turn/status
+ * @param {Function} [handlers.onChat] - (message) chat message payload
+ * @param {Function} [handlers.onPresence] - (spectatorCount)
+ * @param {Function} [handlers.onClosed] - stream failed and will not reconnect (e.g. 403/404)
+ * @returns {{close: Function}}
+ */
+export function openGameEvents(code, { playerId = null, spectatorId = null } = {}, handlers = {}) {
+    const params = new URLSearchParams();
+    if (playerId) params.set('player_id', playerId);
+    else if (spectatorId) params.set('spectator_id', spectatorId);
+
+    const source = new EventSource(`${getApiBase()}/api/games/${code}/events?${params}`);
+    // Events already covered by the latest snapshot are skipped
+    let snapshotVersion = -1;
+
+    const parse = (e) => {
+        try {
+            return JSON.parse(e.data);
+        } catch (err) {
+            return null;
+        }
+    };
+
+    source.addEventListener('snapshot', (e) => {
+        const view = parse(e);
+        if (!view) return;
+        snapshotVersion = view.state_version ?? -1;
+        if (handlers.onSnapshot) handlers.onSnapshot(view);
+    });
+
+    GAME_STATE_EVENTS.forEach((type) => {
+        source.addEventListener(type, (e) => {
+            const data = parse(e);
+            if (!data) return;
+            if ((data.state_version ?? Infinity) <= snapshotVersion) return;
+            if (handlers.onGameEvent) handlers.onGameEvent(type, data);
+        });
+    });
+
+    source.addEventListener('chat', (e) => {
+        const msg = parse(e);
+        if (msg && handlers.onChat) handlers.onChat(msg);
+    });
+
+    source.addEventListener('presence', (e) => {
+        const data = parse(e);
+        if (data && handlers.onPresence) handlers.onPresence(data.spectator_count);
+    });
+
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && handlers.onClosed) {
+            handlers.onClosed();
+        }
+    };
+
+    return {
+        close: () => source.close(),
+    };
+}
+
+export default {
+    GAME_STATE_EVENTS,
+    isSupported,
+    openGameEvents,
+};
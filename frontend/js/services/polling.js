@@ -4,6 +4,7 @@
  */
 
 import { games, lobbies, chat } from './api.js';
+import * as gameEvents from './events.js';
 import { gameState } from '../state/gameState.js';
 import * as chatState from '../state/chatState.js';
 import { optionsState } from '../state/optionsState.js';
@@ -19,6 +20,19 @@ let singleplayerLobbyPollingInterval = null;
 let chatPollInFlight = false;
 let gamePollInFlight = false;
 
+// Long-poll state (game screen, players only)
+const LONG_POLL_TIMEOUT_SECONDS = 25;
+const LONG_POLL_RETRY_MS = 2000;
+// Least time between /wait requests that brought nothing new
+const LONG_POLL_MIN_INTERVAL_MS = 1000;
+let gameLongPollGeneration = 0;
+let gameStateVersion = null;
+
+// Event stream state (game screen, players and spectators)
+let gameEventStream = null;
+let gameRefreshTimer = null;
+let lastGame = null;
+
 // Callbacks for UI updates
 let onLobbyUpdate = null;
 let onSpectateUpdate = null;
@@ -148,9 +162,24 @@ async function pollSpectateOnce() {
 /**
  * Start game state polling
  * @param {number} interval
+ * @param {Object} options
+ * @param {boolean} options.longPoll - Players: hold one /wait request open
+ *     instead of polling every interval (chat keeps polling every interval)
+ * @param {boolean} options.events - Use one Server-Sent Events stream for game
+ *     state, chat and presence (falls back to polling if unsupported or refused)
  */
-export function startGamePolling(interval = 2000) {
+export function startGamePolling(interval = 2000, { longPoll = false, events = false } = {}) {
     stopGamePolling();
+    if (events && gameEvents.isSupported() && gameState.code) {
+        startGameEvents(interval);
+        return;
+    }
+    if (longPoll && !gameState.isSpectator) {
+        runGameLongPoll(gameLongPollGeneration);
+        pollChatOnce();
+        gamePollingInterval = setInterval(pollChatOnce, interval);
+        return;
+    }
     pollGameOnce();
     gamePollingInterval = setInterval(pollGameOnce, interval);
 }
@@ -163,12 +192,112 @@ export function stopGamePolling() {
         clearInterval(gamePollingInterval);
         gamePollingInterval = null;
     }
+    // Abandon any long-poll in flight; its result is ignored
+    gameLongPollGeneration++;
+    gameStateVersion = null;
+    if (gameEventStream) {
+        gameEventStream.close();
+        gameEventStream = null;
+    }
+    if (gameRefreshTimer) {
+        clearTimeout(gameRefreshTimer);
+        gameRefreshTimer = null;
+    }
+    lastGame = null;
+}
+
+/**
+ * Follow the game over its event stream. Game events trigger one refresh of
+ * this viewer's view (coalesced); chat and presence are applied directly.
+ * @param {number} fallbackInterval - Polling interval if the stream is refused
+ */
+function startGameEvents(fallbackInterval) {
+    const code = gameState.code;
+    const viewer = gameState.isSpectator
+        ? { spectatorId: gameState.spectatorId }
+        : { playerId: gameState.playerId };
+    
+    // Chat history up to now; new messages arrive on the stream
+    pollChatOnce();
+    
+    gameEventStream = gameEvents.openGameEvents(code, viewer, {
+        onSnapshot: (view) => {
+            lastGame = view;
+            if (onGameUpdate) onGameUpdate(view);
+        },
+        onGameEvent: () => scheduleGameRefresh(),
+        onChat: (msg) => {
+            if (!optionsState.chatEnabled) return;
+            chatState.resetIfNeeded(code);
+            chatState.addMessages([msg], Number(msg.id));
+            if (onChatUpdate) onChatUpdate(chatState.getState());
+        },
+        onPresence: (count) => {
+            if (!lastGame) return;
+            lastGame = { ...lastGame, spectator_count: count };
+            if (onGameUpdate) onGameUpdate(lastGame);
+        },
+        onClosed: () => {
+            console.error('Game event stream closed; falling back to polling');
+            startGamePolling(fallbackInterval);
+        },
+    });
+}
+
+/**
+ * Refresh the game view once for a burst of events
+ */
+function scheduleGameRefresh() {
+    if (gameRefreshTimer) return;
+    gameRefreshTimer = setTimeout(() => {
+        gameRefreshTimer = null;
+        // A poll already in flight may predate the event; refresh after it
+        if (gamePollInFlight) {
+            scheduleGameRefresh();
+            return;
+        }
+        pollGameOnce({ withChat: false });
+    }, 50);
+}
+
+/**
+ * Long-poll loop: one /wait request at a time until stopGamePolling()
+ * @param {number} generation - Loop exits once this is no longer current
+ */
+async function runGameLongPoll(generation) {
+    while (generation === gameLongPollGeneration) {
+        const code = gameState.code;
+        const playerId = gameState.playerId;
+        if (!code || !playerId) return;
+        
+        const started = Date.now();
+        try {
+            const game = await games.wait(code, playerId, gameStateVersion, LONG_POLL_TIMEOUT_SECONDS);
+            if (generation !== gameLongPollGeneration) return;
+            const version = game.state_version ?? null;
+            const changed = !game.unchanged && (version === null || version !== gameStateVersion);
+            if (!game.unchanged) {
+                gameStateVersion = version;
+                if (onGameUpdate) onGameUpdate(game);
+            }
+            // A wait that returned early with nothing new must not turn into a tight loop
+            const elapsed = Date.now() - started;
+            if (!changed && elapsed < LONG_POLL_MIN_INTERVAL_MS) {
+                await new Promise(resolve => setTimeout(resolve, LONG_POLL_MIN_INTERVAL_MS - elapsed));
+            }
+        } catch (e) {
+            console.error('Game long-poll error:', e);
+            await new Promise(resolve => setTimeout(resolve, LONG_POLL_RETRY_MS));
+        }
+    }
 }
 
 /**
  * Poll game state once
+ * @param {Object} options
+ * @param {boolean} options.withChat - Also poll chat
  */
-async function pollGameOnce() {
+async function pollGameOnce({ withChat = true } = {}) {
     const code = gameState.code;
     const playerId = gameState.playerId;
     
@@ -187,10 +316,11 @@ async function pollGameOnce() {
             return;
         }
         
+        lastGame = game;
         if (onGameUpdate) onGameUpdate(game);
         
         // Also poll chat
-        pollChatOnce();
+        if (withChat) pollChatOnce();
     } catch (e) {
         console.error('Game poll error:', e);
     } finally {
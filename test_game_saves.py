@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Game Save Guard Tests
+
+Checks the compare-and-set guard behind save_game against the in-memory
+Redis: a guarded batch only writes while the version key still holds the
+expected version, a missing key only passes for a new document (version
+0), and with_game_retry re-runs a load-mutate-save action that lost a
+race, on top of the state that won it.
+
+Runs offline (REDIS_BACKEND=memory, EMBEDDING_PROVIDER=local; no
+Upstash/OpenAI).
+
+USAGE:
+    python -m pytest test_game_saves.py
+    python test_game_saves.py
+"""
+
+import os
+import sys
+
+os.environ["REDIS_BACKEND"] = "memory"
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+import index  # noqa: E402
+from data.memory_redis import MemoryRedis  # noqa: E402
+from data.redis_batch import GuardedBatch, VersionConflict  # noqa: E402
+
+VERSION_KEY = "game_version:TEST"
+DOC_KEY = "game:TEST"
+
+
+def expect_conflict(batch: GuardedBatch) -> VersionConflict:
+    try:
+        batch.execute()
+    except VersionConflict as e:
+        return e
+    raise AssertionError("expected VersionConflict")
+
+
+def new_game(code: str) -> dict:
+    """Save a minimal waiting lobby and return it as loaded."""
+    index.save_game(code, {
+        "code": code,
+        "status": "waiting",
+        "host_id": "h" * 32,
+        "players": [{"id": "h" * 32, "name": "Host", "is_alive": True}],
+        "history": [],
+        "notes": [],
+    })
+    return index.load_game(code)
+
+
+# ============== GUARDED BATCH ==============
+
+def test_stale_version_conflicts_and_writes_nothing():
+    redis = MemoryRedis()
+    redis.set(VERSION_KEY, "3")
+    redis.set(DOC_KEY, "current")
+
+    batch = GuardedBatch(redis, VERSION_KEY, 2)
+    batch.set(DOC_KEY, "stale")
+    batch.hset("side:TEST", "field", "stale")
+    batch.set(VERSION_KEY, "3")
+    conflict = expect_conflict(batch)
+
+    assert (conflict.key, conflict.expected, conflict.current) == (VERSION_KEY, "2", "3")
+    assert redis.get(DOC_KEY) == "current"
+    assert redis.exists("side:TEST") == 0
+    assert redis.get(VERSION_KEY) == "3"
+
+
+def test_current_version_writes_everything():
+    redis = MemoryRedis()
+    redis.set(VERSION_KEY, "3:tick")
+
+    batch = GuardedBatch(redis, VERSION_KEY, 3)
+    batch.set(DOC_KEY, "next")
+    batch.set(VERSION_KEY, "4")
+    batch.execute()
+
+    assert redis.get(DOC_KEY) == "next"
+    assert redis.get(VERSION_KEY) == "4"
+
+
+def test_missing_key_passes_only_for_version_zero():
+    redis = MemoryRedis()
+
+    batch = GuardedBatch(redis, VERSION_KEY, 1)
+    batch.set(DOC_KEY, "revived")
+    conflict = expect_conflict(batch)
+    assert conflict.current == ""
+    assert redis.get(DOC_KEY) is None
+
+    batch = GuardedBatch(redis, VERSION_KEY, 0)
+    batch.set(DOC_KEY, "new")
+    batch.set(VERSION_KEY, "1")
+    batch.execute()
+    assert redis.get(DOC_KEY) == "new"
+
+
+# ============== SAVE_GAME / WITH_GAME_RETRY ==============
+
+def test_save_game_rejects_a_stale_copy():
+    new_game("SAVEA1")
+    first, second = index.load_game("SAVEA1"), index.load_game("SAVEA1")
+    first["notes"].append("first")
+    index.save_game("SAVEA1", first)
+
+    second["notes"].append("second")
+    try:
+        index.save_game("SAVEA1", second)
+    except VersionConflict:
+        pass
+    else:
+        raise AssertionError("expected VersionConflict")
+    assert index.load_game("SAVEA1")["notes"] == ["first"]
+
+
+def test_with_game_retry_reapplies_on_the_winning_state():
+    new_game("RETRY1")
+    attempts = []
+
+    def add_note():
+        game = index.load_game("RETRY1")
+        attempts.append(game["state_version"])
+        if len(attempts) == 1:
+            # Another request saves between our load and our save
+            rival = index.load_game("RETRY1")
+            rival["notes"].append("rival")
+            index.save_game("RETRY1", rival)
+        game["notes"].append("mine")
+        index.save_game("RETRY1", game)
+        return game
+
+    saved = index.with_game_retry(add_note)
+
+    assert attempts == [1, 2]
+    assert saved["notes"] == ["rival", "mine"]
+    assert index.load_game("RETRY1")["notes"] == ["rival", "mine"]
+
+
+def test_with_game_retry_gives_up_after_its_attempts():
+    new_game("RETRY2")
+    calls = []
+
+    def always_loses():
+        calls.append(1)
+        game = index.load_game("RETRY2")
+        index.save_game("RETRY2", index.load_game("RETRY2"))
+        index.save_game("RETRY2", game)
+
+    try:
+        index.with_game_retry(always_loses, attempts=3)
+    except VersionConflict:
+        pass
+    else:
+        raise AssertionError("expected VersionConflict")
+    assert len(calls) == 3
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} passed")
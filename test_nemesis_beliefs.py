@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Nemesis Belief Engine Parity Tests
+
+Checks the array-backed belief engine (api/ai/beliefs.py) against the
+original dict-based Nemesis implementation, reproduced below as the
+reference: Bayesian updates, top-k candidates, entropy and elimination
+probabilities must agree on random themes. Expected information gain is
+checked against a direct posterior-entropy computation.
+
+Only NumPy is needed (no Redis/OpenAI).
+
+USAGE:
+    python -m pytest test_nemesis_beliefs.py
+    python test_nemesis_beliefs.py
+"""
+
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+from ai.beliefs import NemesisBeliefs, distribution_entropy, observation_likelihoods  # noqa: E402
+from embeddings.similarity_matrix import SimilarityMatrix  # noqa: E402
+
+ATOL = 1e-9
+
+
+# ============== REFERENCE (dict implementation) ==============
+
+def ref_init(theme_words: list, opponent_ids: list) -> dict:
+    uniform = 1.0 / len(theme_words)
+    return {pid: {w.lower(): uniform for w in theme_words} for pid in opponent_ids}
+
+
+def ref_update(beliefs: dict, matrix, guess_word: str, similarities: dict, skip_id=None):
+    guess_lower = guess_word.lower()
+    for player_id, observed_sim in similarities.items():
+        if player_id == skip_id or player_id not in beliefs:
+            continue
+        player_beliefs = beliefs[player_id]
+        if not player_beliefs:
+            continue
+        new_beliefs = {}
+        total_prob = 0.0
+        for word, prior_prob in player_beliefs.items():
+            expected_sim = None
+            if matrix and guess_lower in matrix:
+                expected_sim = matrix.sim(guess_lower, word.lower())
+            if expected_sim is None:
+                new_beliefs[word] = prior_prob
+                total_prob += prior_prob
+                continue
+            sigma = 0.15
+            diff = observed_sim - expected_sim
+            posterior = prior_prob * math.exp(-(diff ** 2) / (2 * sigma ** 2))
+            new_beliefs[word] = posterior
+            total_prob += posterior
+        if total_prob > 0:
+            for word in new_beliefs:
+                new_beliefs[word] /= total_prob
+        beliefs[player_id] = new_beliefs
+
+
+def ref_top(beliefs: dict, player_id: str, k: int) -> list:
+    return sorted(beliefs.get(player_id, {}).items(), key=lambda x: x[1], reverse=True)[:k]
+
+
+def ref_entropy(probabilities: dict) -> float:
+    entropy = 0.0
+    for prob in probabilities.values():
+        if prob > 0:
+            entropy -= prob * math.log2(prob)
+    return entropy
+
+
+def ref_expected_entropy_reduction(prior: np.ndarray, expected: np.ndarray, bins: int) -> float:
+    """H(W) minus the expected posterior entropy, one observation bin at a time."""
+    likelihood = observation_likelihoods(expected, bins)  # words x bins
+    prior_entropy = ref_entropy(dict(enumerate(prior)))
+    expected_posterior_entropy = 0.0
+    for b in range(bins):
+        joint = prior * likelihood[:, b]
+        p_bin = joint.sum()
+        if p_bin > 0:
+            expected_posterior_entropy += p_bin * ref_entropy(dict(enumerate(joint / p_bin)))
+    return prior_entropy - expected_posterior_entropy
+
+
+# ============== HELPERS ==============
+
+def make_theme(seed: int, n: int = 60, dims: int = 32):
+    rng = np.random.default_rng(seed)
+    words = [f"Word{i}" for i in range(n)]
+    vectors = rng.normal(size=(n, dims))
+    return words, SimilarityMatrix.from_embeddings(dict(zip(words, vectors)))
+
+
+def play_guesses(words, matrix, secrets: dict, turns: int, seed: int):
+    """Random guesses with the similarities each opponent would report."""
+    rnd = random.Random(seed)
+    for _ in range(turns):
+        guess = rnd.choice(words)
+        sims = {pid: matrix.sim(guess.lower(), secret.lower()) for pid, secret in secrets.items()}
+        yield guess, sims
+
+
+def engine_with(words, opponent_ids):
+    engine = NemesisBeliefs.for_theme(words)
+    for pid in opponent_ids:
+        engine.ensure_opponent(pid)
+    return engine
+
+
+def assert_same_beliefs(engine, reference: dict):
+    for pid, word_probs in reference.items():
+        expected = np.array([word_probs[w] for w in engine.words])
+        assert np.allclose(engine.probs[pid], expected, rtol=1e-9, atol=ATOL), pid
+
+
+# ============== TESTS ==============
+
+def test_updates_match_dict_implementation():
+    for seed in range(5):
+        words, matrix = make_theme(seed)
+        secrets = {"p1": words[3], "p2": words[17], "p3": words[42]}
+        reference = ref_init(words, list(secrets))
+        engine = engine_with(words, list(secrets))
+        for guess, sims in play_guesses(words, matrix, secrets, turns=12, seed=seed):
+            ref_update(reference, matrix, guess, sims, skip_id="p3")
+            engine.update(matrix, guess, sims, skip_id="p3")
+            assert_same_beliefs(engine, reference)
+
+
+def test_top_candidates_entropy_and_elimination_match():
+    words, matrix = make_theme(7)
+    secrets = {"p1": words[5], "p2": words[9]}
+    reference = ref_init(words, list(secrets))
+    engine = engine_with(words, list(secrets))
+
+    # Uniform priors: ties must come back in word order, like a stable sort
+    for k in (1, 5, 10):
+        assert engine.top_candidates("p1", k) == [(w.lower(), p) for w, p in ref_top(reference, "p1", k)]
+
+    for guess, sims in play_guesses(words, matrix, secrets, turns=6, seed=7):
+        ref_update(reference, matrix, guess, sims)
+        engine.update(matrix, guess, sims)
+        for pid in secrets:
+            ref = ref_top(reference, pid, 10)
+            got = engine.top_candidates(pid, 10)
+            assert [w for w, _ in got] == [w for w, _ in ref]
+            assert np.allclose([p for _, p in got], [p for _, p in ref], atol=ATOL)
+            assert math.isclose(engine.entropy(pid), ref_entropy(reference[pid]), abs_tol=1e-9)
+        for candidate in words[:20]:
+            for pid in secrets:
+                assert math.isclose(engine.probability(pid, candidate),
+                                    reference[pid].get(candidate.lower(), 0.0), abs_tol=ATOL)
+
+
+def test_expected_information_gain_is_exact():
+    words, matrix = make_theme(13, n=40)
+    secrets = {"p1": words[6], "p2": words[30]}
+    engine = engine_with(words, list(secrets))
+    for guess, sims in play_guesses(words, matrix, secrets, turns=3, seed=13):
+        engine.update(matrix, guess, sims)
+
+    candidates = words[:25] + ["Unknown"]
+    rows = engine.expected_similarity_rows(matrix, candidates)
+    gains = engine.expected_information_gain(rows, list(secrets) + ["nobody"], bins=21)
+    assert gains.shape == (len(candidates),)
+    for c, candidate in enumerate(candidates[:-1]):
+        expected = sum(ref_expected_entropy_reduction(engine.probs[pid], rows[c], 21) for pid in secrets)
+        assert math.isclose(gains[c], expected, rel_tol=1e-9, abs_tol=1e-9), candidate
+    # A guess the matrix doesn't know can't teach anything
+    assert gains[-1] == 0.0
+
+    # Gain never exceeds what is left to learn
+    for pid in secrets:
+        single = engine.expected_information_gain(rows, [pid])
+        assert np.all(single <= engine.entropy(pid) + 1e-9)
+
+
+def test_words_missing_from_matrix_keep_their_prior():
+    words, matrix = make_theme(3, n=20)
+    theme = words + ["Stranger"]
+    reference = ref_init(theme, ["p1"])
+    engine = engine_with(theme, ["p1"])
+    for guess, sims in play_guesses(words, matrix, {"p1": words[4]}, turns=5, seed=3):
+        ref_update(reference, matrix, guess, sims)
+        engine.update(matrix, guess, sims)
+    assert_same_beliefs(engine, reference)
+
+    # A guess the matrix doesn't know carries no information
+    before = engine.probs["p1"].copy()
+    engine.update(matrix, "Stranger", {"p1": 0.9})
+    assert np.allclose(engine.probs["p1"], before)
+
+
+def test_matrix_in_different_word_order():
+    words, matrix = make_theme(11, n=30)
+    shuffled = list(reversed(matrix.words))
+    reordered = matrix.reordered(shuffled)
+    secrets = {"p1": words[2]}
+    reference = ref_init(words, ["p1"])
+    engine = engine_with(words, ["p1"])
+    for guess, sims in play_guesses(words, matrix, secrets, turns=8, seed=11):
+        ref_update(reference, matrix, guess, sims)
+        engine.update(reordered, guess, sims)
+    assert_same_beliefs(engine, reference)
+
+
+def test_memory_round_trip_and_legacy_format():
+    words, matrix = make_theme(5, n=25)
+    secrets = {"p1": words[1], "p2": words[2]}
+    reference = ref_init(words, list(secrets))
+    engine = engine_with(words, list(secrets))
+    for guess, sims in play_guesses(words, matrix, secrets, turns=4, seed=5):
+        ref_update(reference, matrix, guess, sims)
+        engine.update(matrix, guess, sims)
+
+    restored = NemesisBeliefs.from_memory(engine.to_memory(), words)
+    assert restored.words == engine.words
+    for pid in secrets:
+        assert np.array_equal(restored.probs[pid], engine.probs[pid])
+
+    legacy = NemesisBeliefs.from_memory(reference, words)
+    assert_same_beliefs(legacy, reference)
+    assert NemesisBeliefs.from_memory(reference, []).words == engine.words
+
+
+def test_entropy_of_dict_and_vector_agree():
+    probs = {"a": 0.5, "b": 0.25, "c": 0.25, "d": 0.0}
+    assert math.isclose(distribution_entropy(list(probs.values())), ref_entropy(probs))
+    assert distribution_entropy([]) == 0.0
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} passed")